@@ -16,7 +16,9 @@ from datetime import datetime, timedelta
 import secrets
 import logging
 
-from .jwt_handler import TokenHandler, PasswordHandler
+from .jwt_handler import EMBED_PERMISSIONS_IN_TOKENS, TokenHandler, PasswordHandler
+from .password_service import password_service
+from .permission_claims import build_permission_claims
 from ..models.user import User
 from ..models.rbac import Role
 from ..crud.user_crud import (
@@ -38,11 +40,18 @@ class AuthenticationError(Exception):
 class AuthService:
     """Main authentication service class"""
     
-    def __init__(self):
+    def __init__(self, embed_permissions: bool = EMBED_PERMISSIONS_IN_TOKENS):
         self.token_handler = TokenHandler()
         self.password_handler = PasswordHandler()
+        self.embed_permissions = embed_permissions
     
-    def register_user(
+    def _access_claims(self, db: Session, user: User) -> Optional[Dict[str, Any]]:
+        """Permission claims for `user`'s access token, when embedding is enabled"""
+        if not self.embed_permissions:
+            return None
+        return build_permission_claims(db, user)
+    
+    async def register_user(
         self, 
         db: Session, 
         user_data: UserCreate,
@@ -77,9 +86,12 @@ class AuthService:
                 detail="Username already taken"
             )
         
+        # Hash off the event loop; raises 429 when the password workers are saturated
+        hashed_password = await password_service.hash(user_data.password)
+        
         try:
             # Create user
-            db_user = crud_create_user(db, user_data)
+            db_user = crud_create_user(db, user_data, hashed_password=hashed_password)
             
             # Assign default role if requested
             if assign_default_role:
@@ -94,7 +106,7 @@ class AuthService:
                 "username": db_user.username,
                 "email": db_user.email
             }
-            tokens = self.token_handler.create_token_pair(token_data)
+            tokens = self.token_handler.create_token_pair(token_data, self._access_claims(db, db_user))
             
             logger.info(f"User registered successfully: {db_user.email}")
             
@@ -107,7 +119,7 @@ class AuthService:
                 detail="Registration failed"
             )
     
-    def authenticate_user(
+    async def authenticate_user(
         self, 
         db: Session, 
         username: str, 
@@ -145,12 +157,17 @@ class AuthService:
                 detail="Account is disabled"
             )
         
-        # Verify password
-        if not self.password_handler.verify_password(password, str(user.hashed_password)):
+        # Verify password, upgrading hashes made with outdated cost parameters
+        valid, new_hash = await password_service.verify_and_update(password, str(user.hashed_password))
+        if not valid:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid credentials"
             )
+        if new_hash:
+            user.hashed_password = new_hash
+            db.commit()
+            logger.info(f"Password hash upgraded for user: {user.email}")
         
         # Generate tokens
         token_data = {
@@ -158,18 +175,19 @@ class AuthService:
             "username": user.username,
             "email": user.email
         }
-        tokens = self.token_handler.create_token_pair(token_data)
+        tokens = self.token_handler.create_token_pair(token_data, self._access_claims(db, user))
         
         logger.info(f"User authenticated successfully: {user.email}")
         
         return UserSchema.from_orm(user), tokens
     
-    def refresh_token(self, refresh_token: str) -> Dict[str, str]:
+    def refresh_token(self, refresh_token: str, db: Optional[Session] = None) -> Dict[str, str]:
         """
         Refresh access token using refresh token
         
         Args:
             refresh_token: Valid refresh token
+            db: Database session; needed to re-embed current permissions
             
         Returns:
             New token pair
@@ -191,10 +209,20 @@ class AuthService:
             "email": payload["email"]
         }
         
+        access_claims = None
+        if self.embed_permissions and db is not None:
+            user = db.query(User).filter(User.id == int(payload["sub"])).first()
+            if not user or not user.is_active:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Invalid refresh token"
+                )
+            access_claims = self._access_claims(db, user)
+        
         # Blacklist old refresh token
         self.token_handler.blacklist_token(refresh_token)
         
-        new_tokens = self.token_handler.create_token_pair(token_data)
+        new_tokens = self.token_handler.create_token_pair(token_data, access_claims)
         
         logger.info(f"Token refreshed for user: {payload['email']}")
         
@@ -250,7 +278,7 @@ class AuthService:
         
         return reset_token
     
-    def reset_password(
+    async def reset_password(
         self, 
         db: Session, 
         reset_token: str, 
@@ -285,7 +313,7 @@ class AuthService:
             )
         
         # Update password
-        hashed_password = self.password_handler.hash_password(new_password)
+        hashed_password = await password_service.hash(new_password)
         setattr(user, 'hashed_password', hashed_password)
         setattr(user, 'updated_at', datetime.utcnow())
         
@@ -296,7 +324,7 @@ class AuthService:
         
         return True
     
-    def change_password(
+    async def change_password(
         self, 
         db: Session, 
         user_id: int, 
@@ -326,14 +354,14 @@ class AuthService:
             )
         
         # Verify current password
-        if not self.password_handler.verify_password(current_password, user.hashed_password):
+        if not await password_service.verify(current_password, user.hashed_password):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Current password is incorrect"
             )
         
         # Update password
-        hashed_password = self.password_handler.hash_password(new_password)
+        hashed_password = await password_service.hash(new_password)
         user.hashed_password = hashed_password
         user.updated_at = datetime.utcnow()
         
@@ -29,6 +29,13 @@ class AuthSettings(BaseModel):
     rate_limit_enabled: bool = True
     rate_limit_calls: int = 100
     rate_limit_period: int = 60  # seconds
+    rate_limit_key: str = "ip"  # ip, user, api_key or tenant; api_key/tenant fall back to ip unless verified into request.state
+    rate_limit_backend: str = "memory"  # memory (per process) or redis (shared by all workers)
+    rate_limit_redis_url: Optional[str] = None
+    
+    # Token Revocation
+    token_revocation_backend: str = "memory"  # memory (per process), database or redis (shared by all workers)
+    token_revocation_redis_url: Optional[str] = None
     
     # CORS Configuration
     cors_enabled: bool = True
@@ -299,6 +306,7 @@ def get_middleware_config() -> dict:
         "enable_rate_limiting": auth_settings.rate_limit_enabled,
         "rate_limit_calls": auth_settings.rate_limit_calls,
         "rate_limit_period": auth_settings.rate_limit_period,
+        "rate_limit_key": auth_settings.rate_limit_key,
         
         "enable_request_logging": auth_settings.request_logging_enabled,
         "log_request_body": auth_settings.log_request_body,
@@ -7,16 +7,25 @@ This module provides comprehensive authentication dependencies including:
 - Role-based access control (RBAC)
 - Permission checking
 - Session management
+
+Callers are resolved to a cached `Principal` (see `principal_cache`), so
+repeated requests with the same token skip JWT verification and role loading,
+and permission checks are set lookups. Tokens that embed their permissions
+(see `permission_claims`) are resolved from their claims instead, and rejected
+once an RBAC change makes them stale.
 """
 
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer, HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from typing import Optional, List, Callable
 import logging
 
 from .auth_service import auth_service
 from .jwt_handler import get_token_expiry_info
+from .permission_claims import StaleTokenError, has_permission_claims, principal_from_claims
+from .principal_cache import Principal, principal_cache
+from .rate_limiter import RateLimiter, client_ip_key
 from ..models.user import User
 from ..models.rbac import Role, Permission
 from ..schemas.user_schemas import User as UserSchema
@@ -70,6 +79,96 @@ async def get_token_from_header(credentials: HTTPAuthorizationCredentials = Depe
     
     return credentials.credentials
 
+def _load_principal(db: Session, payload: dict) -> Optional[Principal]:
+    """Loads the user named by a token's claims with roles and permissions in one round-trip each"""
+    user_id = int(payload["sub"])
+    user = (
+        db.query(User)
+        .options(selectinload(User.roles).selectinload(Role.permissions))
+        .filter(User.id == user_id)
+        .first()
+    )
+    if not user:
+        return None
+    return Principal(
+        user_id=user_id,
+        username=user.username,
+        email=user.email,
+        is_active=bool(getattr(user, 'is_active', True)),
+        roles=frozenset(role.name for role in user.roles),
+        permissions=frozenset(get_user_permissions(user)),
+        claims=payload
+    )
+
+def resolve_principal(db: Session, token: str) -> Principal:
+    """
+    Resolve the principal of an access token, from the cache when possible
+    
+    Tokens with embedded permissions are resolved from their claims; they
+    bypass the cache so every request checks the RBAC version.
+    
+    Args:
+        db: Database session, used only on a cache miss
+        token: JWT access token
+        
+    Returns:
+        Principal of the token's user
+        
+    Raises:
+        AuthenticationError: If token is invalid or user not found
+    """
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
+    
+    payload = auth_service.verify_access_token(token)
+    if not payload or not payload.get("sub"):
+        raise AuthenticationError("Invalid or expired token")
+    
+    if has_permission_claims(payload):
+        try:
+            return principal_from_claims(db, payload)
+        except StaleTokenError:
+            raise AuthenticationError("Token permissions are out of date; refresh the token")
+    
+    principal = _load_principal(db, payload)
+    if principal is None:
+        raise AuthenticationError("User not found")
+    
+    principal_cache.put(token, principal, payload.get("exp"))
+    return principal
+
+async def get_current_principal(
+    token: str = Depends(get_token_from_header),
+    db: Session = Depends(get_db)
+) -> Principal:
+    """
+    Get the current active principal; makes no database queries on a cache hit
+    
+    Args:
+        token: JWT access token
+        db: Database session
+        
+    Returns:
+        Principal object
+        
+    Raises:
+        AuthenticationError: If authentication fails or user is inactive
+    """
+    principal = resolve_principal(db, token)
+    if not principal.is_active:
+        raise AuthenticationError("User account is disabled")
+    
+    return principal
+
+def _get_user(db: Session, principal: Principal) -> User:
+    # Primary key lookup; served from the session's identity map when already loaded
+    user = db.get(User, principal.user_id)
+    if not user:
+        principal_cache.invalidate_user(principal.user_id)
+        raise AuthenticationError("User not found")
+    return user
+
 async def get_current_user_from_token(
     token: str = Depends(get_token_from_header),
     db: Session = Depends(get_db)
@@ -87,17 +186,7 @@ async def get_current_user_from_token(
     Raises:
         AuthenticationError: If token is invalid or user not found
     """
-    # Verify token
-    payload = auth_service.verify_access_token(token)
-    if not payload:
-        raise AuthenticationError("Invalid or expired token")
-    
-    # Get user from database
-    user = auth_service.get_user_from_token(db, token)
-    if not user:
-        raise AuthenticationError("User not found")
-    
-    return user
+    return _get_user(db, resolve_principal(db, token))
 
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
@@ -150,10 +239,8 @@ async def get_current_user_with_roles(
         db: Database session
         
     Returns:
-        User object with roles loaded
+        User object; roles load on first access
     """
-    # Ensure roles are loaded
-    db.refresh(current_user)
     return current_user
 
 class PermissionChecker:
@@ -168,31 +255,35 @@ class PermissionChecker:
             return {"message": "Admin access granted"}
     """
     
-    def __init__(self, required_permission: str):
+    def __init__(self, required_permission: str, return_principal: bool = False):
         self.required_permission = required_permission
+        self.return_principal = return_principal
     
     async def __call__(
         self,
-        current_user: User = Depends(get_current_user_with_roles)
-    ) -> User:
+        principal: Principal = Depends(get_current_principal),
+        db: Session = Depends(get_db)
+    ):
         """
         Check if user has required permission
         
         Args:
-            current_user: Current user with roles
+            principal: Current principal
+            db: Database session
             
         Returns:
-            User object if permission check passes
+            User object if permission check passes, or the Principal
+            (no database access) with return_principal
             
         Raises:
             AuthorizationError: If user lacks permission
         """
-        if not user_has_permission(current_user, self.required_permission):
+        if not principal.has_permission(self.required_permission):
             raise AuthorizationError(
                 f"Missing required permission: {self.required_permission}"
             )
         
-        return current_user
+        return principal if self.return_principal else _get_user(db, principal)
 
 class RoleChecker:
     """
@@ -206,33 +297,34 @@ class RoleChecker:
             return {"message": "Admin access granted"}
     """
     
-    def __init__(self, required_role: str):
+    def __init__(self, required_role: str, return_principal: bool = False):
         self.required_role = required_role
+        self.return_principal = return_principal
     
     async def __call__(
         self,
-        current_user: User = Depends(get_current_user_with_roles)
-    ) -> User:
+        principal: Principal = Depends(get_current_principal),
+        db: Session = Depends(get_db)
+    ):
         """
         Check if user has required role
         
         Args:
-            current_user: Current user with roles
+            principal: Current principal
+            db: Database session
             
         Returns:
-            User object if role check passes
+            User object if role check passes, or the Principal with return_principal
             
         Raises:
             AuthorizationError: If user lacks role
         """
-        user_roles = [role.name for role in getattr(current_user, 'roles', [])]
-        
-        if self.required_role not in user_roles:
+        if self.required_role not in principal.roles:
             raise AuthorizationError(
                 f"Missing required role: {self.required_role}"
             )
         
-        return current_user
+        return principal if self.return_principal else _get_user(db, principal)
 
 class MultiPermissionChecker:
     """
@@ -246,27 +338,30 @@ class MultiPermissionChecker:
             return {"message": "Multi-permission access granted"}
     """
     
-    def __init__(self, required_permissions: List[str], require_all: bool = True):
+    def __init__(self, required_permissions: List[str], require_all: bool = True, return_principal: bool = False):
         self.required_permissions = required_permissions
         self.require_all = require_all
+        self.return_principal = return_principal
     
     async def __call__(
         self,
-        current_user: User = Depends(get_current_user_with_roles)
-    ) -> User:
+        principal: Principal = Depends(get_current_principal),
+        db: Session = Depends(get_db)
+    ):
         """
         Check if user has required permissions
         
         Args:
-            current_user: Current user with roles
+            principal: Current principal
+            db: Database session
             
         Returns:
-            User object if permission checks pass
+            User object if permission checks pass, or the Principal with return_principal
             
         Raises:
             AuthorizationError: If user lacks required permissions
         """
-        user_permissions = get_user_permissions(current_user)
+        user_permissions = principal.permissions
         
         if self.require_all:
             # User must have ALL permissions
@@ -289,7 +384,7 @@ class MultiPermissionChecker:
                     f"Missing any of required permissions: {', '.join(self.required_permissions)}"
                 )
         
-        return current_user
+        return principal if self.return_principal else _get_user(db, principal)
 
 async def get_admin_user(
     current_user: User = Depends(PermissionChecker("manage_system"))
@@ -336,45 +431,38 @@ async def get_user_or_admin(
     
     raise AuthorizationError("Cannot access other user's data")
 
-def create_rate_limiter(max_requests: int, window_seconds: int):
+def create_rate_limiter(
+    max_requests: int,
+    window_seconds: int,
+    key_func: Callable[[Request], str] = client_ip_key,
+    name: Optional[str] = None
+):
     """
     Create a rate limiting dependency
     
     Args:
         max_requests: Maximum requests allowed
         window_seconds: Time window in seconds
+        key_func: Maps a request to the key its limit applies to (client IP by default)
+        name: Counter namespace; limiters with the same name and key share counts
         
     Returns:
         Rate limiting dependency function
     """
-    # Simple in-memory rate limiting (use Redis in production)
-    request_counts = {}
+    limiter = RateLimiter(
+        max_requests, window_seconds, key_func=key_func,
+        scope=name or f"{max_requests}per{window_seconds}s"
+    )
     
     async def rate_limit_dependency(request: Request):
-        import time
-        
-        client_ip = request.client.host if request.client else "unknown"
-        current_time = time.time()
-        
-        # Clean old entries
-        cutoff_time = current_time - window_seconds
-        request_counts[client_ip] = [
-            req_time for req_time in request_counts.get(client_ip, [])
-            if req_time > cutoff_time
-        ]
-        
-        # Check rate limit
-        if len(request_counts.get(client_ip, [])) >= max_requests:
+        result = await limiter.hit(request)
+        if not result.allowed:
             raise HTTPException(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail="Rate limit exceeded"
+                detail="Rate limit exceeded",
+                headers=limiter.headers(result)
             )
         
-        # Add current request
-        if client_ip not in request_counts:
-            request_counts[client_ip] = []
-        request_counts[client_ip].append(current_time)
-        
         return True
     
     return rate_limit_dependency
@@ -394,5 +482,5 @@ async def get_verified_user(
     return current_user
 
 # Rate limiting dependencies
-rate_limit_auth = create_rate_limiter(max_requests=5, window_seconds=60)  # 5 requests per minute
-rate_limit_general = create_rate_limiter(max_requests=100, window_seconds=60)  # 100 requests per minute
\ No newline at end of file
+rate_limit_auth = create_rate_limiter(max_requests=5, window_seconds=60, name="auth")  # 5 requests per minute
+rate_limit_general = create_rate_limiter(max_requests=100, window_seconds=60, name="general")  # 100 requests per minute
\ No newline at end of file
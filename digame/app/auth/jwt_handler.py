@@ -4,7 +4,7 @@ JWT Token Handler for Digame Authentication System
 This module provides comprehensive JWT token management including:
 - Token creation and validation
 - Refresh token handling
-- Token blacklisting
+- Token blacklisting, by token id (see revocation_store.py)
 - Secure configuration management
 """
 
@@ -14,20 +14,35 @@ from typing import Optional, Dict, Any
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 import secrets
+import time
 import hashlib
 from sqlalchemy.orm import Session
 
+from .principal_cache import principal_cache
+from .revocation_store import get_revocation_store
+
 # Configuration - In production, these should come from environment variables
 SECRET_KEY = os.getenv("SECRET_KEY", "your-super-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
+# Embed roles and a permission bitmap in access tokens (see permission_claims.py)
+EMBED_PERMISSIONS_IN_TOKENS = os.getenv("EMBED_PERMISSIONS_IN_TOKENS", "false").lower() == "true"
+
+# bcrypt cost; stored hashes below it are upgraded on the next login (see password_service.py)
+BCRYPT_ROUNDS = int(os.getenv("PASSWORD_BCRYPT_ROUNDS", "12"))
 
 # Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS
+)
 
-# In-memory token blacklist (in production, use Redis or database)
-token_blacklist = set()
+def token_id(payload: Dict[str, Any], token: str) -> str:
+    """The id a token is revoked by: its `jti`, or a hash of the token for tokens without one"""
+    return payload.get("jti") or hashlib.sha256(token.encode()).hexdigest()
 
 class TokenHandler:
     """Handles JWT token operations"""
@@ -54,7 +69,8 @@ class TokenHandler:
         to_encode.update({
             "exp": expire,
             "iat": datetime.utcnow(),
-            "type": "access"
+            "type": "access",
+            "jti": secrets.token_urlsafe(16)  # Unique token ID for blacklisting
         })
         
         encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
@@ -97,11 +113,6 @@ class TokenHandler:
             Decoded token payload or None if invalid
         """
         try:
-            # Check if token is blacklisted
-            token_hash = hashlib.sha256(token.encode()).hexdigest()
-            if token_hash in token_blacklist:
-                return None
-            
             payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
             
             # Verify token type
@@ -113,6 +124,10 @@ class TokenHandler:
             if exp and datetime.fromtimestamp(exp) < datetime.utcnow():
                 return None
             
+            # Check if token is blacklisted
+            if get_revocation_store().is_revoked(token_id(payload, token)):
+                return None
+            
             return dict(payload)
             
         except JWTError:
@@ -121,26 +136,33 @@ class TokenHandler:
     @staticmethod
     def blacklist_token(token: str) -> None:
         """
-        Add a token to the blacklist
+        Add a token to the blacklist until it expires
         
         Args:
             token: JWT token string to blacklist
         """
-        token_hash = hashlib.sha256(token.encode()).hexdigest()
-        token_blacklist.add(token_hash)
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"verify_exp": False})
+        except JWTError:
+            return  # Never valid, so nothing to revoke
+        
+        expires_at = payload.get("exp") or time.time() + REFRESH_TOKEN_EXPIRE_DAYS * 86400
+        get_revocation_store().revoke(token_id(payload, token), expires_at)
+        principal_cache.invalidate_token(token)
     
     @staticmethod
-    def create_token_pair(user_data: Dict[str, Any]) -> Dict[str, str]:
+    def create_token_pair(user_data: Dict[str, Any], access_claims: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
         """
         Create both access and refresh tokens
         
         Args:
             user_data: User data to encode in tokens
+            access_claims: Extra claims for the access token only, e.g. embedded permissions
             
         Returns:
             Dictionary containing access_token and refresh_token
         """
-        access_token = TokenHandler.create_access_token(user_data)
+        access_token = TokenHandler.create_access_token({**user_data, **(access_claims or {})})
         refresh_token = TokenHandler.create_refresh_token(user_data)
         
         return {
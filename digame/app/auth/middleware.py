@@ -21,6 +21,7 @@ from datetime import datetime
 
 from .jwt_handler import get_token_expiry_info
 from .auth_service import auth_service
+from .rate_limiter import KEY_FUNCTIONS, RateLimitBackend, RateLimiter, client_ip_key
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -105,6 +106,9 @@ class RequestLoggingMiddleware(BaseHTTPMiddleware):
 class RateLimitMiddleware(BaseHTTPMiddleware):
     """
     Middleware for rate limiting requests
+
+    Counts requests per key (client IP by default) in sliding-window counters,
+    on `backend` or the shared backend from `rate_limiter`.
     """
     
     def __init__(
@@ -112,48 +116,36 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         app, 
         calls: int = 100, 
         period: int = 60,
-        exempt_paths: Optional[list] = None
+        exempt_paths: Optional[list] = None,
+        key_func: Optional[Callable[[Request], str]] = None,
+        backend: Optional[RateLimitBackend] = None
     ):
         super().__init__(app)
         self.calls = calls
         self.period = period
         self.exempt_paths = exempt_paths or ["/docs", "/redoc", "/openapi.json", "/health"]
-        self.clients = {}
+        self.limiter = RateLimiter(calls, period, key_func=key_func or client_ip_key, backend=backend, scope="middleware")
     
     async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
         # Skip rate limiting for exempt paths
         if any(request.url.path.startswith(path) for path in self.exempt_paths):
             return await call_next(request)
         
-        client_ip = request.client.host if request.client else "unknown"
-        current_time = time.time()
-        
-        # Clean old entries
-        cutoff_time = current_time - self.period
-        if client_ip in self.clients:
-            self.clients[client_ip] = [
-                req_time for req_time in self.clients[client_ip]
-                if req_time > cutoff_time
-            ]
-        
-        # Check rate limit
-        if client_ip in self.clients and len(self.clients[client_ip]) >= self.calls:
-            logger.warning(f"Rate limit exceeded for {client_ip}")
+        result = await self.limiter.hit(request)
+        if not result.allowed:
+            logger.warning(f"Rate limit exceeded for {self.limiter.key_func(request)}")
             return JSONResponse(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                 content={
                     "detail": "Rate limit exceeded",
-                    "retry_after": self.period
+                    "retry_after": result.retry_after
                 },
-                headers={"Retry-After": str(self.period)}
+                headers=self.limiter.headers(result)
             )
         
-        # Add current request
-        if client_ip not in self.clients:
-            self.clients[client_ip] = []
-        self.clients[client_ip].append(current_time)
-        
-        return await call_next(request)
+        response = await call_next(request)
+        response.headers.update(self.limiter.headers(result))
+        return response
 
 class AuthenticationMiddleware(BaseHTTPMiddleware):
     """
@@ -343,27 +335,28 @@ def configure_auth_middleware(app, config: Optional[Dict[str, Any]] = None):
             ])
         )
     
-    # Authentication
-    if config.get("enable_auth_middleware", True):
-        app.add_middleware(
-            AuthenticationMiddleware,
-            exempt_paths=config.get("auth_exempt_paths", [
-                "/docs", "/redoc", "/openapi.json", "/health",
-                "/auth/login", "/auth/register", "/auth/password-reset"
-            ])
-        )
-    
-    # Rate limiting
+    # Rate limiting (inside authentication, so it can key by the authenticated user)
     if config.get("enable_rate_limiting", True):
         app.add_middleware(
             RateLimitMiddleware,
             calls=config.get("rate_limit_calls", 100),
             period=config.get("rate_limit_period", 60),
+            key_func=KEY_FUNCTIONS[config.get("rate_limit_key", "ip")],
             exempt_paths=config.get("rate_limit_exempt_paths", [
                 "/docs", "/redoc", "/openapi.json", "/health"
             ])
         )
     
+    # Authentication
+    if config.get("enable_auth_middleware", True):
+        app.add_middleware(
+            AuthenticationMiddleware,
+            exempt_paths=config.get("auth_exempt_paths", [
+                "/docs", "/redoc", "/openapi.json", "/health",
+                "/auth/login", "/auth/register", "/auth/password-reset"
+            ])
+        )
+    
     # Request logging
     if config.get("enable_request_logging", True):
         app.add_middleware(
@@ -0,0 +1,118 @@
+"""
+Password Service for Digame Platform
+
+bcrypt is deliberately slow (about 100-300 ms per hash at the default cost), so
+calling passlib from an `async def` endpoint stalls every request served by
+that process. This module provides:
+- Async hashing and verification on a dedicated, bounded thread pool (bcrypt
+  releases the GIL, so threads hash in parallel)
+- Backpressure: once every worker is busy and `max_pending` calls are queued,
+  further calls fail fast with 429 instead of queueing without bound
+- Rehash on login: `verify_and_update` returns a new hash when the stored one
+  was made with cost parameters below the current `PASSWORD_BCRYPT_ROUNDS`
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, Tuple
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from .jwt_handler import pwd_context
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Configuration
+PASSWORD_HASH_WORKERS = int(os.getenv("DIGAME_PASSWORD_HASH_THREADS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("DIGAME_PASSWORD_HASH_MAX_PENDING", "32"))
+
+class PasswordServiceBusy(HTTPException):
+    """Every password worker is busy and the queue is full"""
+
+    def __init__(self, retry_after: int = 1):
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many password operations in progress; retry shortly",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+class PasswordService:
+    """
+    Runs password hashing and verification off the event loop
+
+    Args:
+        context: passlib context holding the hash schemes and cost parameters
+        max_workers: Threads hashing concurrently
+        max_pending: Calls allowed to wait for a free thread before rejecting more
+    """
+
+    def __init__(
+        self,
+        context: CryptContext = pwd_context,
+        max_workers: int = PASSWORD_HASH_WORKERS,
+        max_pending: int = PASSWORD_HASH_MAX_PENDING
+    ):
+        self.context = context
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.rejected = 0
+
+    @property
+    def in_flight(self) -> int:
+        """Calls running or queued"""
+        return self._in_flight
+
+    async def hash(self, password: str) -> str:
+        """Hash `password` with the current cost parameters"""
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        """Check `password` against `hashed_password`"""
+        return await self._run(self.context.verify, password, hashed_password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        Check `password`, and rehash it if `hashed_password` uses outdated cost parameters
+
+        Args:
+            password: Plain text password
+            hashed_password: Stored hash
+
+        Returns:
+            Tuple of (whether the password matches, replacement hash to store or None)
+        """
+        return await self._run(self.context.verify_and_update, password, hashed_password)
+
+    async def _run(self, fn: Callable[..., Any], *args) -> Any:
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_pending:
+                self.rejected += 1
+                raise PasswordServiceBusy()
+            self._in_flight += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="digame-password")
+            executor = self._executor
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(fn, *args))
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def shutdown(self, wait: bool = False) -> None:
+        """Stops the pool; called on application shutdown"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=not wait)
+
+# Create singleton instance
+password_service = PasswordService()
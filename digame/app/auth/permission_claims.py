@@ -0,0 +1,249 @@
+"""
+Permission Claims for Digame Platform
+
+Access tokens can carry the caller's authorization so that permission and role
+checks need no database access:
+- `perms`: a bitmap of the user's permissions, where a permission's bit index
+  is its id, encoded as unpadded base64url
+- `roles`: the ids of the user's roles
+- `rbac_v`: the global RBAC version the token was minted at
+- `rbac_uv`: the user's own RBAC version the token was minted at
+
+Changes to roles, permissions or which permissions a role grants bump the
+global version in the `rbac_version` table (`bump_rbac_version`). Changes to
+one user's role assignments or account status bump only that user's version,
+`users.rbac_version` (`bump_user_rbac_version`), so other users' tokens stay
+valid. Checkers reject tokens older than either current version, so clients
+refresh them. The id-to-name tables, the global version and users' versions
+are cached per process for `DIGAME_RBAC_TABLE_TTL_SECONDS`, which bounds how
+long another process's change can go unnoticed.
+"""
+
+import base64
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Tuple
+
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+
+from ..models.rbac import Permission, RBACVersion, Role
+from ..models.user import User
+from .principal_cache import Principal
+
+# Configuration
+RBAC_TABLE_TTL_SECONDS = float(os.getenv("DIGAME_RBAC_TABLE_TTL_SECONDS", "5"))
+USER_RBAC_VERSION_CACHE_SIZE = int(os.getenv("DIGAME_USER_RBAC_VERSION_CACHE_SIZE", "100000"))
+
+PERMISSIONS_CLAIM = "perms"
+ROLES_CLAIM = "roles"
+RBAC_VERSION_CLAIM = "rbac_v"
+USER_RBAC_VERSION_CLAIM = "rbac_uv"
+
+class StaleTokenError(Exception):
+    """The token's embedded permissions predate an RBAC change"""
+    pass
+
+@dataclass(frozen=True)
+class RBACTable:
+    """Id-to-name lookups for one RBAC version"""
+    version: int
+    permission_names: Dict[int, str]
+    role_names: Dict[int, str]
+
+def current_rbac_version(db: Session) -> int:
+    """The RBAC version stored in the database (0 before the first change)"""
+    version = db.execute(select(RBACVersion.version).where(RBACVersion.id == 1)).scalar()
+    return version or 0
+
+def bump_rbac_version(db: Session) -> None:
+    """
+    Increment the RBAC version within the caller's transaction
+
+    Call before committing a change to roles, permissions or the permissions
+    a role grants. This process's cached table is dropped once the commit succeeds.
+    """
+    bumped = db.execute(
+        update(RBACVersion).where(RBACVersion.id == 1).values(version=RBACVersion.version + 1)
+    ).rowcount
+    if not bumped:
+        db.add(RBACVersion(id=1, version=1))
+    event.listen(db, "after_commit", lambda session: rbac_tables.invalidate(), once=True)
+
+def current_user_rbac_version(db: Session, user_id: int) -> Optional[int]:
+    """The user's RBAC version, or None if the user doesn't exist"""
+    return db.execute(select(User.rbac_version).where(User.id == user_id)).scalar()
+
+def bump_user_rbac_version(db: Session, user_id: int) -> None:
+    """
+    Increment one user's RBAC version within the caller's transaction
+
+    Call before committing a change to the user's roles or account status.
+    This process's cached version of the user is dropped once the commit succeeds.
+    """
+    db.execute(
+        update(User).where(User.id == user_id).values(rbac_version=User.rbac_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    event.listen(db, "after_commit", lambda session: user_rbac_versions.invalidate(user_id), once=True)
+
+def load_rbac_table(db: Session) -> RBACTable:
+    """Read the current version and the permission and role names"""
+    version = current_rbac_version(db)
+    permission_names = dict(db.execute(select(Permission.id, Permission.name)).all())
+    role_names = dict(db.execute(select(Role.id, Role.name)).all())
+    return RBACTable(version, permission_names, role_names)
+
+class RBACTableCache:
+    """
+    The current `RBACTable`, reloaded after `ttl_seconds`
+
+    Args:
+        ttl_seconds: How long a loaded table is used before reading it again
+    """
+
+    def __init__(self, ttl_seconds: float = RBAC_TABLE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._table: Optional[RBACTable] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, min_version: int = 0) -> RBACTable:
+        """The cached table, reloaded if expired or older than `min_version`"""
+        with self._lock:
+            table = self._table
+            if table is not None and table.version >= min_version and time.monotonic() - self._loaded_at < self.ttl_seconds:
+                return table
+        table = load_rbac_table(db)
+        with self._lock:
+            self._table, self._loaded_at = table, time.monotonic()
+        return table
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._table = None
+
+class UserRBACVersionCache:
+    """
+    Users' current RBAC versions, each reloaded after `ttl_seconds`
+
+    Args:
+        ttl_seconds: How long a loaded version is used before reading it again
+        max_users: Most users kept; the least recently used are dropped first
+    """
+
+    def __init__(self, ttl_seconds: float = RBAC_TABLE_TTL_SECONDS, max_users: int = USER_RBAC_VERSION_CACHE_SIZE):
+        self.ttl_seconds = ttl_seconds
+        self.max_users = max_users
+        self._versions: "OrderedDict[int, Tuple[Optional[int], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, user_id: int, min_version: int = 0) -> Optional[int]:
+        """The user's cached version, reloaded if expired or older than `min_version`; None if no such user"""
+        with self._lock:
+            entry = self._versions.get(user_id)
+            if entry is not None:
+                version, loaded_at = entry
+                if version is not None and version >= min_version and time.monotonic() - loaded_at < self.ttl_seconds:
+                    self._versions.move_to_end(user_id)
+                    return version
+        version = current_user_rbac_version(db, user_id)
+        with self._lock:
+            self._versions[user_id] = (version, time.monotonic())
+            self._versions.move_to_end(user_id)
+            while len(self._versions) > self.max_users:
+                self._versions.popitem(last=False)
+        return version
+
+    def invalidate(self, user_id: Optional[int] = None) -> None:
+        """Drops one user's version, or all of them when `user_id` is None"""
+        with self._lock:
+            if user_id is None:
+                self._versions.clear()
+            else:
+                self._versions.pop(user_id, None)
+
+# Create singleton instances
+rbac_tables = RBACTableCache()
+user_rbac_versions = UserRBACVersionCache()
+
+def encode_permission_bitmap(permission_ids: Iterable[int]) -> str:
+    """Encode permission ids as a base64url bitmap"""
+    bitmap = 0
+    for permission_id in permission_ids:
+        bitmap |= 1 << permission_id
+    raw = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+def decode_permission_bitmap(encoded: str) -> FrozenSet[int]:
+    """Decode a bitmap from `encode_permission_bitmap` back into permission ids"""
+    raw = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
+    bitmap = int.from_bytes(raw, "little")
+    ids = set()
+    while bitmap:
+        lowest = bitmap & -bitmap
+        ids.add(lowest.bit_length() - 1)
+        bitmap ^= lowest
+    return frozenset(ids)
+
+def build_permission_claims(db: Session, user: User) -> Dict[str, Any]:
+    """
+    Claims embedding `user`'s roles and permissions, stamped with the current RBAC versions
+
+    Args:
+        db: Database session
+        user: User whose roles and permissions are embedded
+
+    Returns:
+        Claims to add to the access token payload
+    """
+    permission_ids = {permission.id for role in user.roles for permission in role.permissions}
+    return {
+        PERMISSIONS_CLAIM: encode_permission_bitmap(permission_ids),
+        ROLES_CLAIM: sorted(role.id for role in user.roles),
+        RBAC_VERSION_CLAIM: current_rbac_version(db),
+        USER_RBAC_VERSION_CLAIM: current_user_rbac_version(db, user.id) or 0,
+    }
+
+def has_permission_claims(payload: Dict[str, Any]) -> bool:
+    return RBAC_VERSION_CLAIM in payload and PERMISSIONS_CLAIM in payload
+
+def principal_from_claims(db: Session, payload: Dict[str, Any]) -> Principal:
+    """
+    Build the principal of a token that embeds its permissions
+
+    Args:
+        db: Database session, used only when the cached RBAC table or user version is reloaded
+        payload: Verified access token payload
+
+    Returns:
+        Principal with the token's roles and permissions
+
+    Raises:
+        StaleTokenError: If the token was minted before the current global or
+            user RBAC version, or its user no longer exists
+    """
+    token_version = payload[RBAC_VERSION_CLAIM]
+    table = rbac_tables.get(db, min_version=token_version)
+    if token_version < table.version:
+        raise StaleTokenError()
+    token_user_version = payload.get(USER_RBAC_VERSION_CLAIM)
+    if token_user_version is None:
+        raise StaleTokenError() # Minted before user versions existed
+    user_version = user_rbac_versions.get(db, int(payload["sub"]), min_version=token_user_version)
+    if user_version is None or token_user_version < user_version:
+        raise StaleTokenError()
+
+    permission_ids = decode_permission_bitmap(payload[PERMISSIONS_CLAIM])
+    return Principal(
+        user_id=int(payload["sub"]),
+        username=payload.get("username"),
+        email=payload.get("email"),
+        is_active=True,  # deactivating a user bumps their RBAC version
+        roles=frozenset(table.role_names[i] for i in payload.get(ROLES_CLAIM, ()) if i in table.role_names),
+        permissions=frozenset(table.permission_names[i] for i in permission_ids if i in table.permission_names),
+        claims=payload
+    )
@@ -0,0 +1,120 @@
+"""
+Principal Cache for Digame Platform
+
+Resolving the caller of an authenticated request used to decode the JWT, load
+the `User` and lazily load its roles and their permissions on every request.
+This module caches the result of that work per access token:
+- A `Principal` holds the decoded claims, the user's identity and status, and
+  the flattened sets of role and permission names
+- Entries live for a short TTL (and never past the token's own expiry) and are
+  evicted least-recently-used beyond a maximum size
+- Blacklisting a token, changing a user's roles or changing what a role grants
+  invalidates the affected entries
+
+Invalidation is per process; other workers pick changes up when their entries
+expire, so the TTL bounds how long a stale permission set can be used.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Optional, Set, Tuple
+
+# Configuration
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("DIGAME_PRINCIPAL_CACHE_TTL_SECONDS", "30"))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("DIGAME_PRINCIPAL_CACHE_MAX_ENTRIES", "10000"))
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated caller of a request, as resolved from its access token"""
+    user_id: int
+    username: str
+    email: str
+    is_active: bool
+    roles: FrozenSet[str]
+    permissions: FrozenSet[str]
+    claims: Dict[str, Any] = field(default_factory=dict, compare=False, hash=False)
+
+    def has_permission(self, permission_name: Optional[str]) -> bool:
+        return permission_name in self.permissions
+
+class PrincipalCache:
+    """
+    TTL and size bounded LRU cache of principals keyed by access token
+
+    Args:
+        ttl_seconds: How long an entry may be served after it was resolved
+        max_entries: Entries kept before the least recently used are evicted
+    """
+
+    def __init__(self, ttl_seconds: float = PRINCIPAL_CACHE_TTL_SECONDS, max_entries: int = PRINCIPAL_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Principal, float]]" = OrderedDict()
+        self._tokens_by_user: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, token: str) -> Optional[Principal]:
+        """The cached principal for `token`, or None if absent or expired"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    self._remove(token)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, token: str, principal: Principal, token_expires_at: Optional[float] = None) -> None:
+        """Caches `principal` for `token` until the TTL or the token's expiry (a Unix time), whichever is first"""
+        if self.ttl_seconds <= 0:
+            return
+        expires_at = time.time() + self.ttl_seconds
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        with self._lock:
+            self._remove(token)
+            self._entries[token] = (principal, expires_at)
+            self._tokens_by_user.setdefault(principal.user_id, set()).add(token)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_token(self, token: str) -> None:
+        """Drops the entry for `token`, e.g. when it's blacklisted"""
+        with self._lock:
+            self._remove(token)
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Drops every entry of `user_id`, e.g. when their roles or account change"""
+        with self._lock:
+            for token in list(self._tokens_by_user.get(user_id, ())):
+                self._remove(token)
+
+    def clear(self) -> None:
+        """Drops all entries, e.g. when the permissions a role grants change"""
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+
+    def _remove(self, token: str) -> None:
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        tokens = self._tokens_by_user.get(entry[0].user_id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[entry[0].user_id]
+
+# Create singleton instance
+principal_cache = PrincipalCache()
@@ -0,0 +1,261 @@
+"""
+Rate Limiting for Digame Platform
+
+This module provides the rate limiting used by `RateLimitMiddleware` and
+`create_rate_limiter`:
+- Sliding-window counters with constant state per key
+- Key functions for client IP, user, API key and tenant
+- An in-memory backend for single-process deployments
+- A shared Redis backend so limits hold across uvicorn workers
+
+A sliding-window counter keeps only the request counts of the current and the
+previous fixed window. The number of requests in the last `period` seconds is
+estimated as `previous * (1 - elapsed_fraction) + current`, so a check costs the
+same no matter how many requests a client has made.
+"""
+
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from fastapi import Request
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+@dataclass
+class RateLimitResult:
+    """Outcome of counting one request against a limit"""
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: int  # seconds until a request would be allowed again; 0 when allowed
+
+def _result(allowed: bool, limit: int, period: int, current: int, previous: int, elapsed: float) -> RateLimitResult:
+    fraction = elapsed / period
+    estimated = previous * (1 - fraction) + current
+    if allowed:
+        return RateLimitResult(True, limit, max(0, int(limit - estimated)), 0)
+    if current >= limit or previous == 0:
+        # Blocked until the current window rolls over at least
+        wait = period - elapsed
+    else:
+        # The previous window's share decays linearly until the estimate drops below the limit
+        wait = (1 - (limit - current) / previous - fraction) * period
+    return RateLimitResult(False, limit, 0, max(1, math.ceil(wait)))
+
+class RateLimitBackend:
+    """
+    Storage for sliding-window counters
+
+    Subclasses implement `hit`, which counts a request against `key` if it fits
+    within `limit` requests per `period` seconds.
+    """
+
+    async def hit(self, key: str, limit: int, period: int, now: Optional[float] = None) -> RateLimitResult:
+        raise NotImplementedError
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """
+    Per-process counters
+
+    Each key holds [window index, current count, previous count]. Keys idle for
+    more than one full window are swept every `sweep_interval` seconds, so
+    memory stays proportional to the clients active recently.
+    """
+
+    def __init__(self, sweep_interval: float = 60.0):
+        self.sweep_interval = sweep_interval
+        self._counters: Dict[str, List[int]] = {}
+        self._periods: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+
+    def __len__(self) -> int:
+        return len(self._counters)
+
+    async def hit(self, key: str, limit: int, period: int, now: Optional[float] = None) -> RateLimitResult:
+        now = time.time() if now is None else now
+        window = int(now // period)
+        elapsed = now - window * period
+        with self._lock:
+            if now - self._last_sweep >= self.sweep_interval:
+                self._sweep(now)
+            counter = self._counters.get(key)
+            if counter is None:
+                counter = self._counters[key] = [window, 0, 0]
+                self._periods[key] = period
+            elif counter[0] != window:
+                # Roll over; after more than one idle window both counts are stale
+                counter[2] = counter[1] if counter[0] == window - 1 else 0
+                counter[0], counter[1] = window, 0
+            _, current, previous = counter
+            allowed = previous * (1 - elapsed / period) + current < limit
+            if allowed:
+                counter[1] = current = current + 1
+        return _result(allowed, limit, period, current, previous, elapsed)
+
+    def _sweep(self, now: float) -> None:
+        stale = [
+            key for key, (window, _, _) in self._counters.items()
+            if window < int(now // self._periods[key]) - 1
+        ]
+        for key in stale:
+            del self._counters[key]
+            del self._periods[key]
+        self._last_sweep = now
+
+# Reads both windows and increments the current one in a single atomic step,
+# so concurrent workers can't both take the last slot.
+_SLIDING_WINDOW_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local limit = tonumber(ARGV[1])
+local fraction = tonumber(ARGV[2])
+if previous * (1 - fraction) + current >= limit then
+    return {0, current, previous}
+end
+current = redis.call('INCR', KEYS[1])
+if current == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+end
+return {1, current, previous}
+"""
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """
+    Counters shared through a Redis-protocol server
+
+    Each window is one integer key that expires after two periods, so idle
+    clients cost nothing. If the server can't be reached the request is
+    allowed and a warning logged, rather than failing every request.
+
+    Args:
+        client: A `redis.asyncio.Redis` compatible client
+        prefix: Prefix for all counter keys
+    """
+
+    def __init__(self, client, prefix: str = "digame:ratelimit"):
+        self.client = client
+        self.prefix = prefix
+        self._script = client.register_script(_SLIDING_WINDOW_SCRIPT)
+
+    @classmethod
+    def from_url(cls, url: str, prefix: str = "digame:ratelimit") -> "RedisRateLimitBackend":
+        import redis.asyncio as aioredis
+
+        return cls(aioredis.Redis.from_url(url), prefix)
+
+    async def hit(self, key: str, limit: int, period: int, now: Optional[float] = None) -> RateLimitResult:
+        now = time.time() if now is None else now
+        window = int(now // period)
+        elapsed = now - window * period
+        # The hash tag keeps both windows of a key in the same cluster slot
+        base = f"{self.prefix}:{{{key}}}:{period}"
+        try:
+            allowed, current, previous = await self._script(
+                keys=[f"{base}:{window}", f"{base}:{window - 1}"],
+                args=[limit, elapsed / period, 2 * period],
+            )
+        except Exception as e:
+            logger.warning(f"Rate limit backend unavailable, allowing request: {e}")
+            return RateLimitResult(True, limit, limit, 0)
+        return _result(bool(allowed), limit, period, int(current), int(previous), elapsed)
+
+# Key functions: map a request to the identity its limit applies to
+def client_ip_key(request: Request) -> str:
+    """Key by client IP address"""
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+def user_key(request: Request) -> str:
+    """Key by authenticated user (set by `AuthenticationMiddleware`), else by client IP"""
+    user_id = getattr(request.state, "user_id", None)
+    return f"user:{user_id}" if user_id is not None else client_ip_key(request)
+
+# The API key and tenant keys trust only request state set by whatever verified the
+# key or tenant. Headers are never used directly: a client could send a new value
+# with every request and get a fresh bucket each time.
+def api_key_key(request: Request) -> str:
+    """Key by the verified API key (`request.state.api_key_id`), else by client IP"""
+    api_key_id = getattr(request.state, "api_key_id", None)
+    return f"apikey:{api_key_id}" if api_key_id is not None else client_ip_key(request)
+
+def tenant_key(request: Request) -> str:
+    """Key by the verified tenant (`request.state.tenant_id`), else by client IP"""
+    tenant_id = getattr(request.state, "tenant_id", None)
+    return f"tenant:{tenant_id}" if tenant_id is not None else client_ip_key(request)
+
+KEY_FUNCTIONS: Dict[str, Callable[[Request], str]] = {
+    "ip": client_ip_key,
+    "user": user_key,
+    "api_key": api_key_key,
+    "tenant": tenant_key,
+}
+
+class RateLimiter:
+    """
+    A limit of `limit` requests per `period` seconds per key
+
+    Args:
+        limit: Maximum requests allowed per period
+        period: Period in seconds
+        key_func: Maps a request to its rate limit key
+        backend: Counter storage; the shared default backend when omitted
+        scope: Namespace separating this limiter's counters from others on the same backend
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        period: int,
+        key_func: Callable[[Request], str] = client_ip_key,
+        backend: Optional[RateLimitBackend] = None,
+        scope: str = "default"
+    ):
+        self.limit = limit
+        self.period = period
+        self.key_func = key_func
+        self.backend = backend
+        self.scope = scope
+
+    async def hit(self, request: Request) -> RateLimitResult:
+        """Counts `request` against its key's limit"""
+        backend = self.backend or get_rate_limit_backend()
+        return await backend.hit(f"{self.scope}:{self.key_func(request)}", self.limit, self.period)
+
+    def headers(self, result: RateLimitResult) -> Dict[str, str]:
+        """Response headers describing `result`"""
+        headers = {"X-RateLimit-Limit": str(result.limit), "X-RateLimit-Remaining": str(result.remaining)}
+        if not result.allowed:
+            headers["Retry-After"] = str(result.retry_after)
+        return headers
+
+_backend_lock = threading.Lock()
+_default_backend: Optional[RateLimitBackend] = None
+
+def get_rate_limit_backend() -> RateLimitBackend:
+    """
+    The backend shared by limiters that don't get one explicitly
+
+    Built on first use from the auth settings: Redis when `rate_limit_backend`
+    is "redis", otherwise in-memory.
+    """
+    global _default_backend
+    with _backend_lock:
+        if _default_backend is None:
+            from .config import auth_settings
+
+            if auth_settings.rate_limit_backend == "redis" and auth_settings.rate_limit_redis_url:
+                _default_backend = RedisRateLimitBackend.from_url(auth_settings.rate_limit_redis_url)
+            else:
+                _default_backend = InMemoryRateLimitBackend()
+        return _default_backend
+
+def set_rate_limit_backend(backend: Optional[RateLimitBackend]) -> None:
+    """Replaces the shared backend; None rebuilds it from settings on next use"""
+    global _default_backend
+    with _backend_lock:
+        _default_backend = backend
@@ -0,0 +1,355 @@
+"""
+Token Revocation for Digame Platform
+
+This module records revoked JWTs for `TokenHandler.blacklist_token` and
+`TokenHandler.verify_token`:
+- Tokens are revoked by their `jti` claim, until the token would have expired
+- An in-memory store for single-process deployments
+- Database and Redis stores shared by all workers
+
+The shared stores keep a local Bloom filter of revoked ids in front of the
+remote store. Almost every token checked is not revoked, and the filter answers
+those without a remote lookup; only filter hits (revoked tokens and rare false
+positives) are confirmed remotely. Each process pulls ids revoked elsewhere
+every `sync_interval` seconds, which bounds how long another worker can accept
+a token after it is revoked, and rebuilds its filter every `rebuild_interval`
+seconds so expired ids stop counting towards false positives. While syncs keep
+failing the filter can't be trusted to hold recent revocations, so every check
+goes to the remote store until a sync succeeds.
+"""
+
+import hashlib
+import logging
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from ..models.revoked_token import RevokedToken
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter of strings
+
+    Sized for `capacity` items at a false positive rate of `error_rate`; the
+    rate degrades gracefully beyond that. Uses double hashing of one BLAKE2b
+    digest to derive the bit positions.
+
+    Args:
+        capacity: Expected number of items
+        error_rate: Target false positive rate at `capacity` items
+    """
+
+    def __init__(self, capacity: int = 100_000, error_rate: float = 0.001):
+        capacity = max(1, capacity)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str) -> Iterable[int]:
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+class RevocationStore:
+    """
+    Storage for revoked token ids
+
+    Subclasses implement `revoke`, which records `jti` as revoked until
+    `expires_at` (a Unix time), and `is_revoked`.
+    """
+
+    def revoke(self, jti: str, expires_at: float) -> None:
+        raise NotImplementedError
+
+    def is_revoked(self, jti: str) -> bool:
+        raise NotImplementedError
+
+class InMemoryRevocationStore(RevocationStore):
+    """
+    Per-process revocations
+
+    Expired ids are swept every `sweep_interval` seconds, so memory stays
+    proportional to the tokens revoked within one token lifetime.
+    """
+
+    def __init__(self, sweep_interval: float = 60.0):
+        self.sweep_interval = sweep_interval
+        self._expires_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+
+    def __len__(self) -> int:
+        return len(self._expires_at)
+
+    def revoke(self, jti: str, expires_at: float) -> None:
+        with self._lock:
+            self._expires_at[jti] = max(expires_at, self._expires_at.get(jti, 0.0))
+
+    def is_revoked(self, jti: str) -> bool:
+        now = time.time()
+        with self._lock:
+            if now - self._last_sweep >= self.sweep_interval:
+                self._sweep(now)
+            expires_at = self._expires_at.get(jti)
+        return expires_at is not None and expires_at > now
+
+    def _sweep(self, now: float) -> None:
+        for jti in [jti for jti, expires_at in self._expires_at.items() if expires_at <= now]:
+            del self._expires_at[jti]
+        self._last_sweep = now
+
+class SharedRevocationStore(RevocationStore):
+    """
+    Revocations in a remote store, with a local Bloom filter in front
+
+    Subclasses implement the remote operations: `_store`, `_contains`,
+    `_revoked_since` and `_purge`.
+
+    Args:
+        sync_interval: Seconds between pulls of ids revoked by other processes
+        rebuild_interval: Seconds between rebuilds of the filter from unexpired ids
+        bloom_capacity: Minimum capacity of the filter
+        error_rate: False positive rate of the filter at capacity
+        use_bloom: When False, every check goes to the remote store, e.g. for benchmarks
+    """
+
+    # Re-read ids revoked shortly before the last sync, in case clocks differ
+    SYNC_OVERLAP_SECONDS = 5.0
+    # The filter is bypassed once this many sync intervals (at least the overlap) pass without a successful sync
+    STALE_AFTER_SYNC_INTERVALS = 5
+
+    def __init__(
+        self,
+        sync_interval: float = 1.0,
+        rebuild_interval: float = 3600.0,
+        bloom_capacity: int = 100_000,
+        error_rate: float = 0.001,
+        use_bloom: bool = True
+    ):
+        self.sync_interval = sync_interval
+        self.rebuild_interval = rebuild_interval
+        self.bloom_capacity = bloom_capacity
+        self.error_rate = error_rate
+        self.use_bloom = use_bloom
+        self._bloom = BloomFilter(bloom_capacity, error_rate)
+        self._lock = threading.Lock()
+        self._syncing = False
+        self._synced_at: Optional[float] = None
+        self._rebuilt_at = 0.0
+        self.remote_lookups = 0
+
+    def revoke(self, jti: str, expires_at: float) -> None:
+        self._store(jti, expires_at, time.time())
+        with self._lock:
+            self._bloom.add(jti)
+
+    def is_revoked(self, jti: str) -> bool:
+        if self.use_bloom:
+            self._maybe_sync()
+            if self._filter_is_current() and jti not in self._bloom:
+                return False
+        self.remote_lookups += 1
+        try:
+            return self._contains(jti, time.time())
+        except Exception as e:
+            # A filter hit is most likely a revoked token, and without a current
+            # filter nothing vouches for the token, so fail closed
+            logger.warning(f"Token revocation store unavailable, rejecting token: {e}")
+            return True
+
+    def sync(self, rebuild: bool = False) -> None:
+        """Pulls ids revoked since the last sync, or rebuilds the filter from all unexpired ids"""
+        now = time.time()
+        rebuild = rebuild or self._synced_at is None or now - self._rebuilt_at >= self.rebuild_interval
+        if rebuild:
+            self._purge(now)
+            revoked = list(self._revoked_since(0.0, now))
+            bloom = BloomFilter(max(self.bloom_capacity, 2 * len(revoked)), self.error_rate)
+            for jti in revoked:
+                bloom.add(jti)
+            with self._lock:
+                # Ids revoked by this process during the rebuild are re-read on the next sync
+                self._bloom, self._rebuilt_at, self._synced_at = bloom, now, now
+            return
+        revoked = list(self._revoked_since(self._synced_at - self.SYNC_OVERLAP_SECONDS, now))
+        with self._lock:
+            for jti in revoked:
+                self._bloom.add(jti)
+            self._synced_at = now
+
+    def _filter_is_current(self) -> bool:
+        synced_at = self._synced_at
+        max_age = max(self.STALE_AFTER_SYNC_INTERVALS * self.sync_interval, self.SYNC_OVERLAP_SECONDS)
+        return synced_at is not None and time.time() - synced_at < max_age
+
+    def _maybe_sync(self) -> None:
+        with self._lock:
+            due = self._synced_at is None or time.time() - self._synced_at >= self.sync_interval
+            if not due or self._syncing:
+                return
+            self._syncing = True
+        try:
+            self.sync()
+        except Exception as e:
+            logger.warning(f"Token revocation sync failed: {e}")
+        finally:
+            with self._lock:
+                self._syncing = False
+
+    def _store(self, jti: str, expires_at: float, revoked_at: float) -> None:
+        raise NotImplementedError
+
+    def _contains(self, jti: str, now: float) -> bool:
+        raise NotImplementedError
+
+    def _revoked_since(self, since: float, now: float) -> Iterable[str]:
+        raise NotImplementedError
+
+    def _purge(self, now: float) -> None:
+        raise NotImplementedError
+
+class DatabaseRevocationStore(SharedRevocationStore):
+    """
+    Revocations in the `revoked_tokens` table
+
+    Args:
+        session_factory: Creates the sessions used for each remote operation
+        **kwargs: See `SharedRevocationStore`
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], **kwargs):
+        super().__init__(**kwargs)
+        self.session_factory = session_factory
+
+    def _store(self, jti: str, expires_at: float, revoked_at: float) -> None:
+        db = self.session_factory()
+        try:
+            db.merge(RevokedToken(jti=jti, expires_at=expires_at, revoked_at=revoked_at))
+            db.commit()
+        finally:
+            db.close()
+
+    def _contains(self, jti: str, now: float) -> bool:
+        db = self.session_factory()
+        try:
+            expires_at = db.execute(select(RevokedToken.expires_at).where(RevokedToken.jti == jti)).scalar()
+        finally:
+            db.close()
+        return expires_at is not None and expires_at > now
+
+    def _revoked_since(self, since: float, now: float) -> Iterable[str]:
+        db = self.session_factory()
+        try:
+            return db.execute(
+                select(RevokedToken.jti).where(RevokedToken.revoked_at >= since, RevokedToken.expires_at > now)
+            ).scalars().all()
+        finally:
+            db.close()
+
+    def _purge(self, now: float) -> None:
+        db = self.session_factory()
+        try:
+            db.execute(delete(RevokedToken).where(RevokedToken.expires_at <= now))
+            db.commit()
+        finally:
+            db.close()
+
+class RedisRevocationStore(SharedRevocationStore):
+    """
+    Revocations shared through a Redis-protocol server
+
+    Each revoked id is a key that expires with its token. A sorted set of ids
+    scored by revocation time lets processes pull recent revocations; entries
+    older than `max_token_lifetime` are trimmed from it, since every token
+    revoked then has expired.
+
+    Args:
+        client: A `redis.Redis` compatible client
+        max_token_lifetime: Longest lifetime of any token, in seconds
+        prefix: Prefix for all keys
+        **kwargs: See `SharedRevocationStore`
+    """
+
+    def __init__(self, client, max_token_lifetime: float, prefix: str = "digame:revoked", **kwargs):
+        super().__init__(**kwargs)
+        self.client = client
+        self.max_token_lifetime = max_token_lifetime
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, max_token_lifetime: float, **kwargs) -> "RedisRevocationStore":
+        import redis
+
+        return cls(redis.Redis.from_url(url), max_token_lifetime, **kwargs)
+
+    def _store(self, jti: str, expires_at: float, revoked_at: float) -> None:
+        ttl = max(1, math.ceil(expires_at - revoked_at))
+        pipeline = self.client.pipeline()
+        pipeline.set(f"{self.prefix}:{jti}", 1, ex=ttl)
+        pipeline.zadd(f"{self.prefix}:log", {jti: revoked_at})
+        pipeline.execute()
+
+    def _contains(self, jti: str, now: float) -> bool:
+        return bool(self.client.exists(f"{self.prefix}:{jti}"))
+
+    def _revoked_since(self, since: float, now: float) -> Iterable[str]:
+        members = self.client.zrangebyscore(f"{self.prefix}:log", since, "+inf")
+        return [m.decode() if isinstance(m, bytes) else m for m in members]
+
+    def _purge(self, now: float) -> None:
+        self.client.zremrangebyscore(f"{self.prefix}:log", "-inf", now - self.max_token_lifetime)
+
+_store_lock = threading.Lock()
+_default_store: Optional[RevocationStore] = None
+
+def get_revocation_store() -> RevocationStore:
+    """
+    The store used by `TokenHandler`
+
+    Built on first use from the auth settings: `token_revocation_backend` is
+    "database", "redis" or "memory" (the default).
+    """
+    global _default_store
+    with _store_lock:
+        if _default_store is None:
+            from .config import auth_settings
+
+            backend = auth_settings.token_revocation_backend
+            if backend == "redis" and auth_settings.token_revocation_redis_url:
+                from .jwt_handler import REFRESH_TOKEN_EXPIRE_DAYS
+
+                _default_store = RedisRevocationStore.from_url(
+                    auth_settings.token_revocation_redis_url, REFRESH_TOKEN_EXPIRE_DAYS * 86400
+                )
+            elif backend == "database":
+                from ..db import SessionLocal
+
+                _default_store = DatabaseRevocationStore(SessionLocal)
+            else:
+                _default_store = InMemoryRevocationStore()
+        return _default_store
+
+def set_revocation_store(store: Optional[RevocationStore]) -> None:
+    """Replaces the store; None rebuilds it from settings on next use"""
+    global _default_store
+    with _store_lock:
+        _default_store = store
@@ -1,72 +1,40 @@
+import io
+import os
+
+import joblib
 import pandas as pd
+import sklearn
+from joblib import Parallel, delayed
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from sklearn.compose import ColumnTransformer
-from sklearn.cluster import KMeans, DBSCAN, AgglomerativeClustering
+from sklearn.cluster import KMeans, MiniBatchKMeans, DBSCAN, HDBSCAN, AgglomerativeClustering
 from sklearn.metrics import silhouette_score
+from sklearn.neighbors import BallTree
 from sqlalchemy.orm import Session, joinedload
 from typing import List, Tuple, Dict, Any, Optional
 import numpy as np # For NaN handling if needed
+from scipy import sparse
 
 # Use relative imports to avoid circular dependencies
 from .models.activity import Activity
 from .models.activity_features import ActivityEnrichedFeature # Import the new model
+from .services.activity_frame_loader import load_activity_frame
 
 # Configure logging
 import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# --- Data Preprocessing with Enriched Features ---
-def preprocess_activity_logs(
-    db: Session, 
-    user_id: int, 
-    include_enriched_features: bool = True # Flag to control inclusion
-) -> Tuple[Optional[pd.DataFrame], Optional[pd.DataFrame]]:
-    """
-    Fetches activity logs for a user, incorporates enriched features, 
-    and preprocesses them for clustering.
-
-    Returns:
-        A tuple containing:
-        - pd.DataFrame: The raw data frame including original and enriched features (for inspection/mapping back).
-        - pd.DataFrame: The processed feature matrix ready for clustering.
-        Returns (None, None) if no suitable data.
-    """
-    
-    # Query activities and left join with enriched features
-    query = (
-        db.query(Activity, ActivityEnrichedFeature)
-        .outerjoin(ActivityEnrichedFeature, Activity.id == ActivityEnrichedFeature.activity_id)
-        .filter(Activity.user_id == user_id)
-        .order_by(Activity.timestamp)
-    )
-    
-    results = query.all()
-
-    if not results:
-        return None, None
-
-    # Convert to DataFrame
-    # Each 'row' in results is a tuple (Activity_obj, ActivityEnrichedFeature_obj_or_None)
-    activities_data = []
-    for activity, feature in results:
-        record = {
-            "activity_id": activity.id,
-            "activity_type": activity.activity_type,
-            "timestamp": activity.timestamp,
-            # Enriched features (handle None if no feature record exists)
-            "app_category": feature.app_category if feature else None,
-            "project_context": feature.project_context if feature else None,
-            "website_category": feature.website_category if feature else None,
-            "is_context_switch": feature.is_context_switch if feature else False, # Default to False if no feature
-        }
-        activities_data.append(record)
-        
-    raw_df = pd.DataFrame(activities_data)
+# --- Feature encoding configuration ---
+# Categories kept per categorical column; rarer ones share an "infrequent" column (0 keeps all)
+FEATURE_MAX_CATEGORIES = int(os.getenv("DIGAME_FEATURE_MAX_CATEGORIES", "100"))
+# Categories seen in fewer rows than this are also treated as infrequent
+FEATURE_MIN_FREQUENCY = int(os.getenv("DIGAME_FEATURE_MIN_FREQUENCY", "1"))
 
-    if raw_df.empty:
-        return None, None
 
+# --- Data Preprocessing with Enriched Features ---
+def _add_derived_features(raw_df: pd.DataFrame, include_enriched_features: bool) -> Tuple[List[str], List[str]]:
+    """Adds the engineered columns to `raw_df` in place; returns the (numerical, categorical) feature columns."""
     # --- Feature Engineering ---
     # Time-based features (example, can be expanded)
     raw_df["hour_of_day"] = raw_df["timestamp"].dt.hour
@@ -89,52 +57,158 @@ def preprocess_activity_logs(
         categorical_features.extend(["app_category", "project_context", "website_category"])
         numerical_features.append("is_context_switch") # Already 0 or 1
 
+    return numerical_features, categorical_features
+
+
+def _feature_names(preprocessor: ColumnTransformer) -> List[str]:
+    """Numerical column names followed by the one-hot encoded names, e.g. "app_category_Development"."""
+    feature_names = []
+    for name, transformer, columns in preprocessor.transformers_:
+        if name == "num":
+            feature_names.extend(columns)
+        elif name == "cat":
+            feature_names.extend(transformer.get_feature_names_out(columns))
+    return feature_names
+
+
+def _processed_frame(processed_data, feature_names: List[str]) -> pd.DataFrame:
+    if sparse.issparse(processed_data):
+        return pd.DataFrame.sparse.from_spmatrix(processed_data.tocsr(), columns=feature_names)
+    return pd.DataFrame(processed_data, columns=feature_names)
+
+
+def fit_activity_preprocessor(
+    raw_df: pd.DataFrame,
+    include_enriched_features: bool = True,
+    sparse_output: bool = False,
+    max_categories: Optional[int] = FEATURE_MAX_CATEGORIES
+) -> Tuple[Optional[pd.DataFrame], Optional[ColumnTransformer]]:
+    """
+    Fits the clustering feature encoding on a frame of activities (as loaded
+    by `load_activity_logs`), adding the derived columns to `raw_df` in place.
+
+    Categorical columns are one-hot encoded, keeping at most `max_categories`
+    categories per column (None or 0 keeps all). With `sparse_output` the
+    processed frame is sparse-backed, built straight from the encoder's CSR
+    output, so its memory is proportional to the number of non-zeros rather
+    than rows x categories.
+
+    Returns the processed frame and the fitted preprocessor, or (None, None)
+    if the features can't be encoded.
+    """
+    numerical_features, categorical_features = _add_derived_features(raw_df, include_enriched_features)
+
     # Define transformers
     numerical_transformer = StandardScaler()
-    # handle_unknown='ignore' will prevent errors if a category seen in fit is not in transform (or vice-versa during partial fits)
-    # It assigns all zeros to that category.
-    categorical_transformer = OneHotEncoder(handle_unknown='ignore', sparse_output=False) 
+    # High-cardinality columns (e.g. project_context) are frequency-capped: the
+    # max_categories most frequent values get their own column, the rest share
+    # an "infrequent" column. Unknown categories at transform time map to it too.
+    categorical_transformer = OneHotEncoder(
+        handle_unknown='infrequent_if_exist',
+        max_categories=max_categories or None,
+        min_frequency=FEATURE_MIN_FREQUENCY if FEATURE_MIN_FREQUENCY > 1 else None,
+        sparse_output=sparse_output
+    )
 
     # Create preprocessor
-    # Note: If a category (e.g. project_context) has too many unique values, OneHotEncoding can lead to a very wide DataFrame.
-    # Consider other encoding strategies for high-cardinality features (e.g., target encoding, frequency encoding, or feature hashing)
-    # For now, using OneHotEncoder as a baseline.
     preprocessor = ColumnTransformer(
         transformers=[
             ("num", numerical_transformer, numerical_features),
             ("cat", categorical_transformer, categorical_features),
-        ]
+        ],
+        sparse_threshold=1.0 if sparse_output else 0.0
     )
 
     # Apply preprocessing
     try:
         processed_data = preprocessor.fit_transform(raw_df)
-        # Get feature names after one-hot encoding
-        feature_names = numerical_features # Start with numerical
-        # Add one-hot encoded feature names
-        if 'cat' in preprocessor.named_transformers_: # Check if categorical transformer was applied
-            cat_encoder = preprocessor.named_transformers_['cat']
-            # get_feature_names_out is preferred, fallback for older sklearn
-            if hasattr(cat_encoder, 'get_feature_names_out'):
-                feature_names.extend(cat_encoder.get_feature_names_out(categorical_features))
-            elif hasattr(cat_encoder, 'get_feature_names'): # Older scikit-learn
-                 feature_names.extend(cat_encoder.get_feature_names(categorical_features))
-
-
-        processed_df = pd.DataFrame(processed_data, columns=feature_names)
+        return _processed_frame(processed_data, _feature_names(preprocessor)), preprocessor
     except ValueError as e:
         # Handle cases where some features might be completely missing or have no variance
         print(f"Error during preprocessing: {e}. This might happen if data is too sparse or categories are all NaN.")
+        return None, None
+
+
+def encode_activity_features(
+    raw_df: pd.DataFrame,
+    include_enriched_features: bool = True,
+    sparse_output: bool = False,
+    max_categories: Optional[int] = FEATURE_MAX_CATEGORIES
+) -> Optional[pd.DataFrame]:
+    """The processed frame of `fit_activity_preprocessor`, or None if the features can't be encoded."""
+    return fit_activity_preprocessor(raw_df, include_enriched_features, sparse_output, max_categories)[0]
+
+
+def transform_activity_features(
+    preprocessor: ColumnTransformer,
+    raw_df: pd.DataFrame,
+    include_enriched_features: bool = True
+) -> pd.DataFrame:
+    """Encodes new activities with an already fitted preprocessor, adding the derived columns to `raw_df`."""
+    _add_derived_features(raw_df, include_enriched_features)
+    return _processed_frame(preprocessor.transform(raw_df), _feature_names(preprocessor))
+
+
+def load_activity_logs(db: Session, user_id: int, after_activity_id: Optional[int] = None) -> pd.DataFrame:
+    """A user's activities with their enriched features, optionally only those with ids above `after_activity_id`."""
+    # Load activities left-joined with enriched features in one columnar query
+    raw_df = load_activity_frame(
+        db, user_id,
+        columns=("activity_id", "activity_type", "timestamp",
+                 "app_category", "project_context", "website_category", "is_context_switch"),
+        after_id=after_activity_id
+    )
+    # Default to False if no feature record exists
+    raw_df["is_context_switch"] = raw_df["is_context_switch"].fillna(False)
+    return raw_df
+
+
+def preprocess_activity_logs(
+    db: Session, 
+    user_id: int, 
+    include_enriched_features: bool = True, # Flag to control inclusion
+    sparse_output: bool = False
+) -> Tuple[Optional[pd.DataFrame], Optional[pd.DataFrame]]:
+    """
+    Fetches activity logs for a user, incorporates enriched features, 
+    and preprocesses them for clustering (see `fit_activity_preprocessor`).
+
+    Returns:
+        A tuple containing:
+        - pd.DataFrame: The raw data frame including original and enriched features (for inspection/mapping back).
+        - pd.DataFrame: The processed feature matrix ready for clustering, sparse-backed if `sparse_output`.
+        Returns (None, None) if no suitable data.
+    """
+    raw_df = load_activity_logs(db, user_id)
+    if raw_df.empty:
+        return None, None
+
+    processed_df = encode_activity_features(raw_df, include_enriched_features, sparse_output=sparse_output)
+    if processed_df is None:
         return raw_df, None # Return raw_df and None for processed_df to indicate failure
 
     return raw_df, processed_df
 
 
+def _feature_matrix(processed_data):
+    """The rows of a processed frame as a CSR matrix if it is sparse-backed, else a dense array."""
+    if sparse.issparse(processed_data):
+        return processed_data.tocsr()
+    if isinstance(processed_data, pd.DataFrame) and len(processed_data.columns) and \
+            all(isinstance(dtype, pd.SparseDtype) for dtype in processed_data.dtypes):
+        return processed_data.sparse.to_coo().tocsr().astype(np.float64)
+    return np.asarray(processed_data, dtype=np.float64)
+
+
+def _dense(data) -> np.ndarray:
+    return data.toarray() if sparse.issparse(data) else data
+
+
 # --- Clustering Logic (Placeholder - can be kept as is if it just takes processed_data) ---
 def cluster_activity_logs(
     processed_data: pd.DataFrame,
     n_clusters: Optional[int] = None, # Default is None to use automatic optimization
-    algorithm: str = "kmeans", # Options: "kmeans", "dbscan", "hierarchical"
+    algorithm: str = "kmeans", # Options: "kmeans", "dbscan", "hdbscan", "hierarchical"
     auto_optimize: bool = True # Whether to automatically optimize the number of clusters
 ) -> Tuple[Optional[np.ndarray], Optional[float]]:
     """
@@ -143,9 +217,12 @@ def cluster_activity_logs(
     Args:
         processed_data: Preprocessed activity data
         n_clusters: Number of clusters (for KMeans and Hierarchical)
-        algorithm: Clustering algorithm to use ("kmeans", "dbscan", "hierarchical")
+        algorithm: Clustering algorithm to use ("kmeans", "dbscan", "hdbscan", "hierarchical")
         auto_optimize: Whether to automatically optimize the number of clusters
         
+    Large datasets are clustered with the scalable backend of the algorithm
+    (see `select_clustering_backend`).
+
     Returns:
         Tuple containing cluster labels and silhouette score (if applicable)
     """
@@ -165,20 +242,37 @@ def cluster_activity_logs(
         print(f"Warning: Number of samples ({processed_data.shape[0]}) is less than n_clusters ({n_clusters}). Adjusting.")
         n_clusters = max(2, processed_data.shape[0] // 2)
     
-    # Choose the appropriate clustering algorithm
-    if algorithm == "dbscan":
+    # Choose the appropriate clustering backend for the algorithm and dataset size
+    data = _feature_matrix(processed_data)
+    backend, sample_size = select_clustering_backend(algorithm, data, n_clusters=n_clusters)
+    if backend is None:
+        logger.error(f"Not enough memory to cluster {processed_data.shape[0]} rows with {algorithm} "
+                     f"within {CLUSTER_MEMORY_LIMIT_MB} MB")
+        return None, None
+    if backend != algorithm:
+        logger.info(f"Clustering {processed_data.shape[0]} rows with the {backend} backend")
+
+    if backend == "dbscan":
         return dbscan_cluster_activity_logs(processed_data)
-    elif algorithm == "hierarchical":
+    elif backend == "hdbscan":
+        return hdbscan_cluster_activity_logs(processed_data)
+    elif backend in ("sampled_dbscan", "sampled_hdbscan"):
+        return sampled_density_cluster_activity_logs(processed_data, algorithm, sample_size=sample_size)
+    elif backend == "hierarchical":
         return hierarchical_cluster_activity_logs(processed_data, n_clusters)
+    elif backend == "sampled_hierarchical":
+        return sampled_hierarchical_cluster_activity_logs(processed_data, n_clusters, sample_size=sample_size)
+    elif backend == "minibatch_kmeans":
+        return minibatch_kmeans_cluster_activity_logs(processed_data, n_clusters)
     else:  # Default to KMeans
         kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init='auto')
     try:
-        cluster_labels = kmeans.fit_predict(processed_data)
+        cluster_labels = kmeans.fit_predict(data)
         
         # Calculate silhouette score only if there's more than 1 unique cluster label and enough samples
         unique_labels = np.unique(cluster_labels)
         if len(unique_labels) > 1 and processed_data.shape[0] > len(unique_labels):
-            score = silhouette_score(processed_data, cluster_labels)
+            score = _clustering_silhouette(data, cluster_labels)
         else:
             score = None # Cannot compute silhouette score
             print("Silhouette score cannot be computed (not enough unique clusters or samples).")
@@ -208,64 +302,139 @@ def cluster_activity_logs(
 #     else:
 #         return {"error": "Clustering failed."}
 
+# --- Cluster-count search configuration ---
+# Silhouette scores are computed on a stratified sample of at most this many rows
+K_SEARCH_SILHOUETTE_SAMPLE = int(os.getenv("DIGAME_K_SEARCH_SILHOUETTE_SAMPLE", "2000"))
+# Datasets at least this large are fit with MiniBatchKMeans
+K_SEARCH_MINIBATCH_MIN_SAMPLES = int(os.getenv("DIGAME_K_SEARCH_MINIBATCH_MIN_SAMPLES", "20000"))
+# Stop once the silhouette score has fallen for this many consecutive k (0 disables)
+K_SEARCH_PATIENCE = int(os.getenv("DIGAME_K_SEARCH_PATIENCE", "3"))
+# Number of k values evaluated in parallel by default (1 = sequential with early stopping)
+K_SEARCH_N_JOBS = int(os.getenv("DIGAME_K_SEARCH_N_JOBS", "1"))
+
+
 # Optimization logic for finding the best number of clusters
-def optimize_clusters(processed_data: pd.DataFrame, min_k: int = 2, max_k: int = 10) -> int:
+def _stratified_sample(labels: np.ndarray, size: int, rng: np.random.Generator) -> np.ndarray:
+    """Row indices of a sample of about `size` rows with each cluster represented proportionally."""
+    if len(labels) <= size:
+        return np.arange(len(labels))
+    indices = []
+    for label in np.unique(labels):
+        members = np.flatnonzero(labels == label)
+        take = max(2, int(round(size * len(members) / len(labels))))
+        indices.append(rng.choice(members, size=min(take, len(members)), replace=False))
+    return np.sort(np.concatenate(indices))
+
+
+def _sampled_silhouette(data: np.ndarray, labels: np.ndarray, sample_size: int) -> float:
+    if len(np.unique(labels)) < 2:
+        return -1  # Invalid score for single cluster
+    sample = _stratified_sample(labels, sample_size, np.random.default_rng(42))
+    if len(np.unique(labels[sample])) >= len(sample):
+        return -1
+    return silhouette_score(data[sample], labels[sample])
+
+
+def _fit_kmeans(data: np.ndarray, k: int):
+    if data.shape[0] >= K_SEARCH_MINIBATCH_MIN_SAMPLES:
+        model = MiniBatchKMeans(n_clusters=k, random_state=42, n_init=3, batch_size=4096)
+    else:
+        model = KMeans(n_clusters=k, random_state=42, n_init='auto')
+    labels = model.fit_predict(data)
+    return model, labels
+
+
+def _evaluate_k(data: np.ndarray, k: int, sample_size: int) -> Tuple[float, float]:
+    model, labels = _fit_kmeans(data, k)
+    return model.inertia_, _sampled_silhouette(data, labels, sample_size)
+
+
+def _choose_k(k_values: List[int], inertia_values: List[float], silhouette_values: List[float]) -> Tuple[int, int, int]:
+    """Combines the Elbow Method and Silhouette Score; returns (optimal_k, elbow_k, silhouette_k)."""
+    # Find optimal k using the Elbow Method
+    # Calculate the rate of decrease in inertia
+    inertia_diffs = np.diff(inertia_values)
+    if len(inertia_diffs):
+        inertia_diffs = np.append(inertia_diffs, inertia_diffs[-1])  # Pad to match length
+        inertia_rate = inertia_diffs / np.asarray(inertia_values)
+        elbow_k = k_values[np.argmax(inertia_rate)]
+    else:
+        elbow_k = k_values[0]
+
+    # Find optimal k using Silhouette Score
+    silhouette_k = k_values[np.argmax(silhouette_values)]
+
+    # Combine both methods (prefer silhouette if it's valid)
+    if max(silhouette_values) > 0.1:  # Threshold for a reasonable silhouette score
+        return silhouette_k, elbow_k, silhouette_k
+    return elbow_k, elbow_k, silhouette_k
+
+
+def optimize_clusters(
+    processed_data: pd.DataFrame,
+    min_k: int = 2,
+    max_k: int = 10,
+    n_jobs: Optional[int] = None,
+    silhouette_sample_size: int = K_SEARCH_SILHOUETTE_SAMPLE,
+    patience: int = K_SEARCH_PATIENCE,
+) -> int:
     """
     Determines the optimal number of clusters using both the Elbow Method and Silhouette Score.
-    
+
+    Silhouette scores are computed on a stratified sample of
+    `silhouette_sample_size` rows and large datasets are fit with
+    MiniBatchKMeans. Sequentially, the search stops early once the silhouette
+    score has fallen for `patience` consecutive k; with `n_jobs` > 1 (or -1 for
+    all cores) every k is evaluated in parallel instead.
+
     Args:
         processed_data: Preprocessed activity data
         min_k: Minimum number of clusters to try
         max_k: Maximum number of clusters to try
-        
+        n_jobs: Number of k values to evaluate in parallel (defaults to K_SEARCH_N_JOBS)
+        silhouette_sample_size: Rows used for each silhouette score
+        patience: Consecutive silhouette declines before stopping (0 disables early stopping)
+
     Returns:
         The optimal number of clusters
     """
     if processed_data is None or processed_data.empty:
         return 5  # Default if no data
-    
+
     # Ensure we don't try more clusters than we have samples
     max_possible_k = min(max_k, processed_data.shape[0] - 1)
     if max_possible_k < min_k:
         return min(5, processed_data.shape[0] // 2)  # Fallback
-    
-    # Initialize metrics
-    inertia_values = []
-    silhouette_values = []
-    k_values = range(min_k, max_possible_k + 1)
-    
-    # Calculate metrics for each k
-    for k in k_values:
-        # KMeans clustering
-        kmeans = KMeans(n_clusters=k, random_state=42, n_init='auto')
-        cluster_labels = kmeans.fit_predict(processed_data)
-        
-        # Inertia (sum of squared distances to closest centroid)
-        inertia_values.append(kmeans.inertia_)
-        
-        # Silhouette score (measure of how similar an object is to its own cluster compared to other clusters)
-        if len(np.unique(cluster_labels)) > 1:
-            silhouette_avg = silhouette_score(processed_data, cluster_labels)
-            silhouette_values.append(silhouette_avg)
-        else:
-            silhouette_values.append(-1)  # Invalid score for single cluster
-    
-    # Find optimal k using the Elbow Method
-    # Calculate the rate of decrease in inertia
-    inertia_diffs = np.diff(inertia_values)
-    inertia_diffs = np.append(inertia_diffs, inertia_diffs[-1])  # Pad to match length
-    inertia_rate = inertia_diffs / inertia_values
-    elbow_k = k_values[np.argmax(inertia_rate)]
-    
-    # Find optimal k using Silhouette Score
-    silhouette_k = k_values[np.argmax(silhouette_values)]
-    
-    # Combine both methods (prefer silhouette if it's valid)
-    if max(silhouette_values) > 0.1:  # Threshold for a reasonable silhouette score
-        optimal_k = silhouette_k
+
+    data = _feature_matrix(processed_data)
+    k_values = list(range(min_k, max_possible_k + 1))
+    n_jobs = K_SEARCH_N_JOBS if n_jobs is None else n_jobs
+
+    if n_jobs != 1 and len(k_values) > 1:
+        # Threads: the fits and distance computations release the GIL, and the data isn't copied.
+        results = Parallel(n_jobs=n_jobs, prefer="threads")(
+            delayed(_evaluate_k)(data, k, silhouette_sample_size) for k in k_values
+        )
+        inertia_values = [inertia for inertia, _ in results]
+        silhouette_values = [silhouette for _, silhouette in results]
     else:
-        optimal_k = elbow_k
-    
+        inertia_values, silhouette_values = [], []
+        declines = 0
+        for k in k_values:
+            inertia, silhouette = _evaluate_k(data, k, silhouette_sample_size)
+            inertia_values.append(inertia)
+            silhouette_values.append(silhouette)
+
+            if len(silhouette_values) > 1 and silhouette_values[-1] < silhouette_values[-2]:
+                declines += 1
+            else:
+                declines = 0
+            # Only stop when the silhouette will decide; the elbow needs the whole curve.
+            if patience and declines >= patience and max(silhouette_values) > 0.1:
+                break
+        k_values = k_values[:len(inertia_values)]
+
+    optimal_k, elbow_k, silhouette_k = _choose_k(k_values, inertia_values, silhouette_values)
     print(f"Optimal number of clusters determined: {optimal_k} (Elbow: {elbow_k}, Silhouette: {silhouette_k})")
     return optimal_k
 
@@ -297,21 +466,15 @@ def dbscan_cluster_activity_logs(
     
     try:
         # Apply DBSCAN
-        dbscan = DBSCAN(eps=eps, min_samples=min_samples)
-        cluster_labels = dbscan.fit_predict(processed_data)
+        data = _feature_matrix(processed_data)
+        # Ball trees need dense rows; sparse input uses chunked brute-force neighbor search
+        dbscan = DBSCAN(eps=eps, min_samples=min_samples, algorithm="auto" if sparse.issparse(data) else "ball_tree")
+        cluster_labels = dbscan.fit_predict(data)
         
-        # Calculate silhouette score if we have more than one cluster and no noise points (-1)
-        unique_labels = np.unique(cluster_labels)
-        if len(unique_labels) > 1 and -1 not in unique_labels:
-            score = silhouette_score(processed_data, cluster_labels)
-        else:
-            # If we have noise points, calculate silhouette only on clustered points
-            if -1 in unique_labels and len(unique_labels) > 2:
-                mask = cluster_labels != -1
-                score = silhouette_score(processed_data[mask], cluster_labels[mask])
-            else:
-                score = None
-                print("Silhouette score cannot be computed for DBSCAN results.")
+        # Calculate silhouette score on the clustered points, ignoring noise (-1)
+        score = _clustering_silhouette(data, cluster_labels)
+        if score is None:
+            print("Silhouette score cannot be computed for DBSCAN results.")
         
         return cluster_labels, score
     except Exception as e:
@@ -346,13 +509,14 @@ def hierarchical_cluster_activity_logs(
     
     try:
         # Apply Hierarchical Clustering
+        data = _dense(_feature_matrix(processed_data))
         hierarchical = AgglomerativeClustering(n_clusters=n_clusters, linkage=linkage)
-        cluster_labels = hierarchical.fit_predict(processed_data)
+        cluster_labels = hierarchical.fit_predict(data)
         
         # Calculate silhouette score
         unique_labels = np.unique(cluster_labels)
         if len(unique_labels) > 1 and processed_data.shape[0] > len(unique_labels):
-            score = silhouette_score(processed_data, cluster_labels)
+            score = _clustering_silhouette(data, cluster_labels)
         else:
             score = None
             print("Silhouette score cannot be computed for hierarchical clustering results.")
@@ -361,3 +525,400 @@ def hierarchical_cluster_activity_logs(
     except Exception as e:
         print(f"Error during hierarchical clustering: {e}")
         return None, None
+
+
+# --- Scalable clustering backends ---
+# Datasets with more rows than this use the scalable backend of their algorithm
+CLUSTER_LARGE_DATASET_ROWS = int(os.getenv("DIGAME_CLUSTER_LARGE_DATASET_ROWS", "50000"))
+# Working memory a clustering run may allocate on top of the feature matrix
+CLUSTER_MEMORY_LIMIT_MB = float(os.getenv("DIGAME_CLUSTER_MEMORY_LIMIT_MB", "1024"))
+# Rows clustered exactly by the sampled DBSCAN/HDBSCAN/hierarchical backends
+CLUSTER_SAMPLE_SIZE = int(os.getenv("DIGAME_CLUSTER_SAMPLE_SIZE", "10000"))
+# Rows per MiniBatchKMeans.partial_fit call
+CLUSTER_BATCH_SIZE = int(os.getenv("DIGAME_CLUSTER_BATCH_SIZE", "4096"))
+
+SCALABLE_BACKENDS = {
+    "kmeans": "minibatch_kmeans",
+    "dbscan": "sampled_dbscan",
+    "hdbscan": "sampled_hdbscan",
+    "hierarchical": "sampled_hierarchical",
+}
+
+
+def _dbscan_neighbors_per_row(data: np.ndarray, eps: float, probes: int = 256) -> float:
+    """Average eps-neighborhood size over all rows, extrapolated from a sample."""
+    n_rows = data.shape[0]
+    sample = _dense(data[_sample_indices(n_rows, CLUSTER_SAMPLE_SIZE)])
+    counts = BallTree(sample).query_radius(sample[:probes], r=eps, count_only=True)
+    return float(counts.mean()) * n_rows / len(sample)
+
+
+def estimate_clustering_memory(backend: str, data: np.ndarray, n_clusters: int = 10,
+                               eps: float = 0.5, min_samples: int = 5, sample_size: int = CLUSTER_SAMPLE_SIZE) -> int:
+    """Rough bytes of working memory `backend` needs for `data`, excluding the matrix itself."""
+    n_rows, n_features = data.shape
+    # Backends that need dense rows densify sparse input first
+    densified = n_rows * n_features * 8 if sparse.issparse(data) else 0
+    if backend == "kmeans":
+        copied = data.nnz * 12 if sparse.issparse(data) else n_rows * n_features * 8
+        return copied + n_rows * n_clusters * 8
+    if backend == "minibatch_kmeans":
+        return min(n_rows, CLUSTER_BATCH_SIZE) * (n_features + n_clusters) * 8 + n_rows * 8
+    if backend == "hierarchical":
+        return n_rows * (n_rows - 1) * 8 + densified  # Two copies of the condensed distance matrix
+    if backend == "dbscan":
+        # Neighbor indices and distances of every row are held at once
+        return int(n_rows * _dbscan_neighbors_per_row(data, eps) * 16)
+    if backend == "hdbscan":
+        return n_rows * (min_samples + n_features) * 16 + densified
+    if backend == "sampled_hierarchical":
+        return sample_size * (sample_size - 1) * 8 + n_rows * 16
+    if backend == "sampled_dbscan":
+        neighbors = _dbscan_neighbors_per_row(data, eps) * min(sample_size, n_rows) / n_rows
+        return int(sample_size * neighbors * 16) + n_rows * 16
+    if backend == "sampled_hdbscan":
+        return sample_size * (min_samples + n_features) * 16 + n_rows * 16
+    raise ValueError(f"Unknown clustering backend: {backend}")
+
+
+def _max_sample_size(backend: str, data: np.ndarray, limit_bytes: int, **params) -> int:
+    """Largest sample (up to CLUSTER_SAMPLE_SIZE) whose estimated memory fits the limit."""
+    size = min(CLUSTER_SAMPLE_SIZE, data.shape[0])
+    while size > 100 and estimate_clustering_memory(backend, data, sample_size=size, **params) > limit_bytes:
+        size //= 2
+    return size
+
+
+def select_clustering_backend(algorithm: str, data: np.ndarray, **params) -> Tuple[Optional[str], int]:
+    """
+    The backend to run `algorithm` with and the sample size for sampled backends.
+
+    That is the exact backend, or its scalable counterpart when the dataset is
+    larger than CLUSTER_LARGE_DATASET_ROWS or the exact backend's estimated
+    memory exceeds CLUSTER_MEMORY_LIMIT_MB. The backend is None if not even
+    the scalable one fits in memory.
+    """
+    limit_bytes = int(CLUSTER_MEMORY_LIMIT_MB * 1024 * 1024)
+    scalable = SCALABLE_BACKENDS.get(algorithm, "minibatch_kmeans")
+    exact = algorithm if algorithm in SCALABLE_BACKENDS else "kmeans"
+
+    if data.shape[0] <= CLUSTER_LARGE_DATASET_ROWS and estimate_clustering_memory(exact, data, **params) <= limit_bytes:
+        return exact, data.shape[0]
+    sample_size = _max_sample_size(scalable, data, limit_bytes, **params)
+    if estimate_clustering_memory(scalable, data, sample_size=sample_size, **params) > limit_bytes:
+        return None, sample_size
+    return scalable, sample_size
+
+
+def _clustering_silhouette(data: np.ndarray, labels: np.ndarray) -> Optional[float]:
+    """
+    Silhouette score of the non-noise rows. Datasets larger than
+    K_SEARCH_SILHOUETTE_SAMPLE rows are scored on a stratified sample,
+    since the exact score is O(n^2).
+    """
+    mask = labels != -1
+    if len(np.unique(labels[mask])) < 2:
+        return None
+    score = _sampled_silhouette(data[mask], labels[mask], K_SEARCH_SILHOUETTE_SAMPLE)
+    return None if score == -1 else score
+
+
+def _propagate_labels(data: np.ndarray, reference: np.ndarray, reference_labels: np.ndarray,
+                      max_distance: Optional[float] = None) -> np.ndarray:
+    """Labels every row with the label of its nearest reference row (-1 if farther than max_distance)."""
+    n_rows = data.shape[0]
+    if len(reference) == 0:
+        return np.full(n_rows, -1)
+    tree = BallTree(reference)
+    labels = np.empty(n_rows, dtype=reference_labels.dtype)
+    # Query in chunks so sparse rows are only densified a batch at a time
+    for start in range(0, n_rows, CLUSTER_BATCH_SIZE):
+        distances, nearest = tree.query(_dense(data[start:start + CLUSTER_BATCH_SIZE]), k=1)
+        chunk = reference_labels[nearest[:, 0]]
+        if max_distance is not None:
+            chunk = np.where(distances[:, 0] <= max_distance, chunk, -1)
+        labels[start:start + CLUSTER_BATCH_SIZE] = chunk
+    return labels
+
+
+def _sample_indices(n_rows: int, sample_size: int) -> np.ndarray:
+    rng = np.random.default_rng(42)
+    return np.sort(rng.choice(n_rows, size=min(sample_size, n_rows), replace=False))
+
+
+def minibatch_kmeans_cluster_activity_logs(
+    processed_data: pd.DataFrame,
+    n_clusters: int = 5,
+    batch_size: int = CLUSTER_BATCH_SIZE,
+    epochs: int = 3
+) -> Tuple[Optional[np.ndarray], Optional[float]]:
+    """
+    KMeans for large datasets: MiniBatchKMeans fed shuffled chunks through
+    partial_fit, so working memory is bounded by the batch size.
+    """
+    if processed_data is None or processed_data.empty:
+        return None, None
+
+    data = _feature_matrix(processed_data)
+    batch_size = max(batch_size, n_clusters * 3)
+    try:
+        kmeans = MiniBatchKMeans(n_clusters=n_clusters, random_state=42, n_init=3, batch_size=batch_size)
+        rng = np.random.default_rng(42)
+        for _ in range(epochs):
+            order = rng.permutation(data.shape[0])
+            for start in range(0, data.shape[0], batch_size):
+                kmeans.partial_fit(data[order[start:start + batch_size]])
+        cluster_labels = kmeans.predict(data)
+        return cluster_labels, _clustering_silhouette(data, cluster_labels)
+    except Exception as e:
+        print(f"Error during MiniBatchKMeans clustering: {e}")
+        return None, None
+
+
+def sampled_density_cluster_activity_logs(
+    processed_data: pd.DataFrame,
+    algorithm: str = "dbscan",
+    eps: float = 0.5,
+    min_samples: int = 5,
+    sample_size: int = CLUSTER_SAMPLE_SIZE
+) -> Tuple[Optional[np.ndarray], Optional[float]]:
+    """
+    DBSCAN or HDBSCAN for large datasets. Clusters a uniform sample of rows
+    on a ball tree, then gives every row the label of its nearest sample row:
+    for DBSCAN its nearest core sample within `eps`, otherwise noise (-1).
+
+    `min_samples` is scaled to the sample fraction so that the density
+    threshold stays comparable to clustering all rows.
+    """
+    if processed_data is None or processed_data.empty:
+        return None, None
+
+    data = _feature_matrix(processed_data)
+    sample = _dense(data[_sample_indices(data.shape[0], sample_size)])
+    scaled_min_samples = max(2, int(round(min_samples * len(sample) / data.shape[0])))
+    try:
+        if algorithm == "hdbscan":
+            model = HDBSCAN(min_cluster_size=max(5, scaled_min_samples), min_samples=scaled_min_samples, algorithm="balltree")
+            sample_labels = model.fit_predict(sample)
+            cluster_labels = _propagate_labels(data, sample, sample_labels)
+        else:
+            model = DBSCAN(eps=eps, min_samples=scaled_min_samples, algorithm="ball_tree")
+            sample_labels = model.fit_predict(sample)
+            core = model.core_sample_indices_
+            cluster_labels = _propagate_labels(data, sample[core], sample_labels[core], max_distance=eps)
+        return cluster_labels, _clustering_silhouette(data, cluster_labels)
+    except Exception as e:
+        print(f"Error during sampled {algorithm} clustering: {e}")
+        return None, None
+
+
+def hdbscan_cluster_activity_logs(
+    processed_data: pd.DataFrame,
+    min_cluster_size: int = 10,
+    min_samples: int = 5
+) -> Tuple[Optional[np.ndarray], Optional[float]]:
+    """
+    Performs HDBSCAN clustering on the preprocessed activity data. Like DBSCAN
+    it finds clusters of arbitrary shape and marks outliers as noise, but it
+    needs no `eps` and copes with clusters of varying density.
+    """
+    if processed_data is None or processed_data.empty:
+        return None, None
+
+    data = _dense(_feature_matrix(processed_data))
+    try:
+        model = HDBSCAN(min_cluster_size=min(min_cluster_size, len(data)), min_samples=min(min_samples, len(data)), algorithm="balltree")
+        cluster_labels = model.fit_predict(data)
+        score = _clustering_silhouette(data, cluster_labels)
+        if score is None:
+            print("Silhouette score cannot be computed for HDBSCAN results.")
+        return cluster_labels, score
+    except Exception as e:
+        print(f"Error during HDBSCAN clustering: {e}")
+        return None, None
+
+
+def sampled_hierarchical_cluster_activity_logs(
+    processed_data: pd.DataFrame,
+    n_clusters: int = 5,
+    linkage: str = 'ward',
+    sample_size: int = CLUSTER_SAMPLE_SIZE
+) -> Tuple[Optional[np.ndarray], Optional[float]]:
+    """
+    Hierarchical clustering for large datasets. Ward linkage needs the full
+    pairwise distance matrix, so only a uniform sample of rows is clustered;
+    every row then takes the label of its nearest sample row.
+    """
+    if processed_data is None or processed_data.empty:
+        return None, None
+
+    data = _feature_matrix(processed_data)
+    sample = _dense(data[_sample_indices(data.shape[0], sample_size)])
+    try:
+        hierarchical = AgglomerativeClustering(n_clusters=min(n_clusters, len(sample)), linkage=linkage)
+        sample_labels = hierarchical.fit_predict(sample)
+        cluster_labels = _propagate_labels(data, sample, sample_labels)
+        return cluster_labels, _clustering_silhouette(data, cluster_labels)
+    except Exception as e:
+        print(f"Error during sampled hierarchical clustering: {e}")
+        return None, None
+
+
+# --- Pattern artifacts ---
+# Bumped whenever the artifact layout changes; older artifacts are ignored and the model must be retrained
+PATTERN_ARTIFACT_FORMAT = 2
+# Algorithms whose clusters have a boundary: rows far from every cluster are noise (-1)
+DENSITY_ALGORITHMS = ("dbscan", "hdbscan")
+# Online training falls back to a full retrain when more than this share of new rows fits no existing cluster
+ONLINE_MAX_OUTLIER_FRACTION = float(os.getenv("DIGAME_ONLINE_MAX_OUTLIER_FRACTION", "0.2"))
+# Online training keeps the current model until at least this many new activities have arrived
+ONLINE_MIN_NEW_ACTIVITIES = int(os.getenv("DIGAME_ONLINE_MIN_NEW_ACTIVITIES", "50"))
+
+
+def _squared_distances(data, centroids: np.ndarray) -> np.ndarray:
+    """(rows x centroids) squared euclidean distances, for dense or CSR rows."""
+    if sparse.issparse(data):
+        row_norms = np.asarray(data.multiply(data).sum(axis=1)).ravel()
+    else:
+        row_norms = (data ** 2).sum(axis=1)
+    distances = row_norms[:, None] - 2 * np.asarray(data @ centroids.T) + (centroids ** 2).sum(axis=1)[None, :]
+    return np.maximum(distances, 0)
+
+
+def build_pattern_artifact(
+    preprocessor: ColumnTransformer,
+    processed_data: pd.DataFrame,
+    cluster_labels: np.ndarray,
+    algorithm: str,
+    include_enriched_features: bool = True,
+    last_activity_id: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Everything needed to assign new activities to a trained model's patterns
+    without retraining: the fitted preprocessor and, per cluster (noise
+    excluded), its centroid in feature space, member count and the largest
+    distance of a member to it. `last_activity_id` is the newest activity
+    the centroids summarize (see `update_pattern_artifact`).
+    """
+    data = _feature_matrix(processed_data)
+    cluster_labels = np.asarray(cluster_labels)
+    labels = np.unique(cluster_labels[cluster_labels != -1])
+
+    # Centroids as one sparse (clusters x rows) averaging matrix times the data
+    rows = np.flatnonzero(cluster_labels != -1)
+    positions = np.searchsorted(labels, cluster_labels[rows])
+    counts = np.bincount(positions, minlength=len(labels))
+    averaging = sparse.csr_matrix((1.0 / counts[positions], (positions, rows)), shape=(len(labels), data.shape[0]))
+    centroids = _dense(averaging @ data)
+
+    radii = np.zeros(len(labels))
+    if len(labels):
+        own = np.sqrt(_squared_distances(data[rows], centroids)[np.arange(len(rows)), positions])
+        np.maximum.at(radii, positions, own)
+
+    return {
+        "format": PATTERN_ARTIFACT_FORMAT,
+        "sklearn_version": sklearn.__version__,
+        "algorithm": algorithm,
+        "include_enriched_features": include_enriched_features,
+        "preprocessor": preprocessor,
+        "feature_names": list(processed_data.columns),
+        "labels": labels,
+        "centroids": centroids,
+        "counts": counts,
+        "radii": radii,
+        "last_activity_id": last_activity_id,
+    }
+
+
+def serialize_pattern_artifact(artifact: Dict[str, Any]) -> bytes:
+    buffer = io.BytesIO()
+    joblib.dump(artifact, buffer, compress=3)
+    return buffer.getvalue()
+
+
+def load_pattern_artifact(model_data: Optional[bytes]) -> Optional[Dict[str, Any]]:
+    """The artifact stored in `BehavioralModel.model_data`, or None if absent or of another format."""
+    if not model_data:
+        return None
+    try:
+        artifact = joblib.load(io.BytesIO(model_data))
+    except Exception as e:
+        logger.warning(f"Could not load pattern artifact: {e}")
+        return None
+    if not isinstance(artifact, dict) or artifact.get("format") != PATTERN_ARTIFACT_FORMAT:
+        return None
+    if artifact["sklearn_version"] != sklearn.__version__:
+        logger.warning(f"Pattern artifact was built with scikit-learn {artifact['sklearn_version']}, "
+                       f"running {sklearn.__version__}")
+    return artifact
+
+
+def assign_to_patterns(artifact: Dict[str, Any], processed_data: pd.DataFrame) -> np.ndarray:
+    """
+    Pattern label of each processed row: that of the nearest centroid, or -1
+    for density-based models when the row lies outside that cluster's radius.
+    """
+    return _nearest_patterns(artifact, _feature_matrix(processed_data))[0]
+
+
+def _nearest_patterns(artifact: Dict[str, Any], data) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Labels (as in `assign_to_patterns`), nearest cluster positions, distances to them and outside-radius mask."""
+    n_rows = data.shape[0]
+    if len(artifact["labels"]) == 0:
+        return np.full(n_rows, -1), np.zeros(n_rows, dtype=int), np.zeros(n_rows), np.ones(n_rows, dtype=bool)
+    squared = _squared_distances(data, artifact["centroids"])
+    nearest = squared.argmin(axis=1)
+    distances = np.sqrt(squared[np.arange(n_rows), nearest])
+    outside = distances > artifact["radii"][nearest]
+    labels = artifact["labels"][nearest]
+    if artifact["algorithm"] in DENSITY_ALGORITHMS:
+        labels = np.where(outside, -1, labels)
+    return labels, nearest, distances, outside
+
+
+def update_pattern_artifact(
+    artifact: Dict[str, Any],
+    processed_data: pd.DataFrame,
+    last_activity_id: Optional[int] = None
+) -> Tuple[Dict[str, Any], np.ndarray, float]:
+    """
+    Folds new processed rows into the artifact's clusters, CluStream-style:
+    each cluster keeps its member count and centroid (the mean of its members),
+    so absorbing a batch costs O(batch) rather than a refit over the history.
+    This is the mini-batch k-means update with a per-cluster learning rate of
+    1 / count.
+
+    Rows are assigned as in `assign_to_patterns` first; noise rows of density
+    models don't move any cluster. Radii grow to stay an upper bound on the
+    members' distances (old radius plus centroid shift, by the triangle
+    inequality).
+
+    Returns:
+        Tuple of the updated artifact (a copy), the rows' labels and the
+        fraction of rows outside every cluster's radius. A high fraction means
+        the clusters no longer describe the activities and a full retrain is due.
+    """
+    data = _feature_matrix(processed_data)
+    labels, nearest, _, outside = _nearest_patterns(artifact, data)
+    updated = dict(artifact, last_activity_id=last_activity_id)
+    outlier_fraction = float(outside.mean()) if len(outside) else 0.0
+
+    absorbed = labels != -1
+    if absorbed.any():
+        positions = nearest[absorbed]
+        n_clusters = len(artifact["labels"])
+        added = np.bincount(positions, minlength=n_clusters)
+        summing = sparse.csr_matrix(
+            (np.ones(len(positions)), (positions, np.flatnonzero(absorbed))), shape=(n_clusters, data.shape[0])
+        )
+        counts = artifact["counts"] + added
+        totals = artifact["centroids"] * artifact["counts"][:, None] + _dense(summing @ data)
+        centroids = np.divide(totals, counts[:, None], out=artifact["centroids"].copy(), where=counts[:, None] > 0)
+
+        radii = artifact["radii"] + np.sqrt(((centroids - artifact["centroids"]) ** 2).sum(axis=1))
+        own = np.sqrt(_squared_distances(data[np.flatnonzero(absorbed)], centroids)[np.arange(len(positions)), positions])
+        np.maximum.at(radii, positions, own)
+        updated.update(centroids=centroids, counts=counts, radii=radii)
+
+    return updated, labels, outlier_fraction
@@ -0,0 +1,215 @@
+"""
+Shared executors for CPU-bound and blocking work.
+
+Clustering and LSTM training hold the GIL for seconds to minutes, so running
+them inline in an `async def` endpoint stalls every request served by that
+process. This module owns two pools for the whole app:
+
+- a process pool for CPU-bound work (training, clustering), and
+- a thread pool for blocking calls, such as database work, made from async code.
+
+Work that should be tracked goes through `submit_job`. It runs in the process
+pool with its own database session, and records its status, progress and
+result on the `Job` row, so clients can poll `GET /api/jobs/{job_id}`.
+
+This module deliberately avoids importing numpy/torch, so worker processes
+can cap their math-library threads before those libraries load.
+"""
+
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import BrokenExecutor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+COMPUTE_PROCESS_WORKERS = int(os.getenv("DIGAME_COMPUTE_PROCESSES", str(max(1, (os.cpu_count() or 2) - 1))))
+COMPUTE_THREAD_WORKERS = int(os.getenv("DIGAME_COMPUTE_THREADS", "8"))
+# BLAS/OpenMP/torch threads per worker process; keeps N concurrent trainings from oversubscribing cores
+COMPUTE_THREADS_PER_PROCESS = os.getenv("DIGAME_COMPUTE_THREADS_PER_PROCESS", "1")
+
+_MATH_THREAD_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+_lock = threading.Lock()
+_process_pool: Optional[ProcessPoolExecutor] = None
+_thread_pool: Optional[ThreadPoolExecutor] = None
+
+
+def _init_compute_process() -> None:
+    for var in _MATH_THREAD_VARS:
+        os.environ[var] = COMPUTE_THREADS_PER_PROCESS
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """The shared process pool, created on first use (spawned, so no inherited connections)."""
+    global _process_pool
+    with _lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=COMPUTE_PROCESS_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_compute_process,
+            )
+        return _process_pool
+
+
+def get_thread_pool() -> ThreadPoolExecutor:
+    """The shared thread pool for blocking calls, created on first use."""
+    global _thread_pool
+    with _lock:
+        if _thread_pool is None:
+            _thread_pool = ThreadPoolExecutor(max_workers=COMPUTE_THREAD_WORKERS, thread_name_prefix="digame-compute")
+        return _thread_pool
+
+
+def _discard_broken_process_pool(pool: ProcessPoolExecutor) -> None:
+    # A worker died (e.g. OOM-killed); later submissions get a fresh pool.
+    global _process_pool
+    with _lock:
+        if _process_pool is pool:
+            _process_pool = None
+    pool.shutdown(wait=False)
+
+
+async def run_in_process(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Awaits `fn(*args, **kwargs)` run in the process pool. `fn` and its arguments must be picklable."""
+    pool = get_process_pool()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(pool, functools.partial(fn, *args, **kwargs))
+    except BrokenExecutor:
+        _discard_broken_process_pool(pool)
+        raise
+
+
+async def run_in_thread(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Awaits `fn(*args, **kwargs)` run in the thread pool."""
+    return await asyncio.get_running_loop().run_in_executor(get_thread_pool(), functools.partial(fn, *args, **kwargs))
+
+
+def call_with_session(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Calls `fn(db, *args, **kwargs)` with a session of its own; for work running inside the pools."""
+    from .db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return fn(db, *args, **kwargs)
+    finally:
+        db.close()
+
+
+def run_tracked_job(job_id: int, fn: Callable[..., Dict[str, Any]], *args, **kwargs) -> Dict[str, Any]:
+    """
+    Runs `fn(db, *args, **kwargs)` as job `job_id`, recording its lifecycle on the Job row.
+
+    `fn` returns a JSON-serialisable dict that becomes the job result; a dict with
+    `"status": "failed"` marks the job failed with its `"message"` as the error.
+    Exceptions mark the job failed and are re-raised to the caller's future.
+
+    Jobs from `job_queue.start_inline_job` are leased: their lease is heartbeated
+    while `fn` runs, and the outcome is only recorded if the lease still holds.
+    """
+    from .crud.job_crud import get_job_by_id, update_job_status
+    from .db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        job = get_job_by_id(db, job_id)
+        if job is not None and job.locked_by is not None:
+            return _run_leased_job(db, job_id, job.locked_by, fn, *args, **kwargs)
+        update_job_status(db, job_id, "running", progress=10)
+        try:
+            result = fn(db, *args, **kwargs)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Job {job_id} failed: {e}")
+            update_job_status(db, job_id, "failed", error=str(e))
+            raise
+
+        if result.get("status") == "failed":
+            update_job_status(db, job_id, "failed", progress=100, result=result, error=result.get("message"))
+        else:
+            update_job_status(db, job_id, "completed", progress=100, result=result)
+        return result
+    finally:
+        db.close()
+
+
+def _run_leased_job(db, job_id: int, owner: str, fn: Callable[..., Dict[str, Any]], *args, **kwargs) -> Dict[str, Any]:
+    from .services.job_queue import fail_job, finish_job, heartbeat_job, keep_lease_alive
+
+    heartbeat_job(db, job_id, owner, progress=10)
+    # A lost lease means the reaper already failed the job, and inline jobs are
+    # never requeued, so nothing else runs it; `fn` is left to finish.
+    done = threading.Event()
+    heartbeat = threading.Thread(target=keep_lease_alive, args=(done, job_id, owner), daemon=True)
+    heartbeat.start()
+    try:
+        try:
+            result = fn(db, *args, **kwargs)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Job {job_id} failed: {e}")
+            fail_job(db, job_id, owner, str(e))
+            raise
+        if not finish_job(db, job_id, owner, result):
+            logger.warning(f"Job {job_id} finished after its lease was lost; result not recorded")
+        return result
+    finally:
+        done.set()
+        heartbeat.join()
+
+
+def _mark_job_failed(job_id: int, error: str) -> None:
+    from .crud.job_crud import update_job_status
+
+    try:
+        call_with_session(update_job_status, job_id, "failed", error=error)
+    except Exception as e:
+        logger.error(f"Could not record failure of job {job_id}: {e}")
+
+
+def _on_job_done(job_id: int, pool: ProcessPoolExecutor, future: Future) -> None:
+    if future.cancelled():
+        get_thread_pool().submit(_mark_job_failed, job_id, "Job was cancelled")
+        return
+    error = future.exception()
+    if isinstance(error, BrokenExecutor):
+        # The worker died before it could record anything itself.
+        _discard_broken_process_pool(pool)
+        get_thread_pool().submit(_mark_job_failed, job_id, "Worker process terminated unexpectedly")
+
+
+def submit_job(job_id: int, fn: Callable[..., Dict[str, Any]], *args, **kwargs) -> Future:
+    """
+    Queues `fn` as tracked job `job_id` on the process pool and returns its future.
+
+    The job row should already exist; create it as "running" so the durable
+    queue's workers (services/job_queue.py) don't claim it too. Await the future with
+    `asyncio.wrap_future` to wait for the result, or let clients poll the job.
+    """
+    pool = get_process_pool()
+    try:
+        future = pool.submit(run_tracked_job, job_id, fn, *args, **kwargs)
+    except BrokenExecutor:
+        _discard_broken_process_pool(pool)
+        pool = get_process_pool()
+        future = pool.submit(run_tracked_job, job_id, fn, *args, **kwargs)
+    future.add_done_callback(functools.partial(_on_job_done, job_id, pool))
+    return future
+
+
+def shutdown(wait: bool = False) -> None:
+    """Stops both pools; called on application shutdown."""
+    global _process_pool, _thread_pool
+    with _lock:
+        process_pool, _process_pool = _process_pool, None
+        thread_pool, _thread_pool = _thread_pool, None
+    if process_pool is not None:
+        process_pool.shutdown(wait=wait, cancel_futures=not wait)
+    if thread_pool is not None:
+        thread_pool.shutdown(wait=wait, cancel_futures=not wait)
@@ -15,7 +15,8 @@ def create_behavioral_model(
     model_data=None,
     silhouette_score=None,
     num_clusters=None,
-    version="1.0.0"
+    version="1.0.0",
+    last_activity_id=None
 ):
     """
     Create a new behavioral model for a user.
@@ -30,6 +31,7 @@ def create_behavioral_model(
         silhouette_score: Model performance metric (optional)
         num_clusters: Number of clusters found (optional)
         version: Model version (default: "1.0.0")
+        last_activity_id: Highest activity id the model was trained on (optional)
         
     Returns:
         The created BehavioralModel instance
@@ -43,6 +45,7 @@ def create_behavioral_model(
         model_data=model_data,
         silhouette_score=silhouette_score,
         num_clusters=num_clusters,
+        last_activity_id=last_activity_id,
         created_at=datetime.utcnow(),
         updated_at=datetime.utcnow()
     )
@@ -12,7 +12,10 @@ def create_job(
     status: str = "pending",
     progress: float = 0.0,
     result: Optional[Dict[str, Any]] = None,
-    error: Optional[str] = None
+    error: Optional[str] = None,
+    payload: Optional[Dict[str, Any]] = None,
+    priority: int = 0,
+    max_attempts: int = 3
 ) -> Job:
     """
     Create a new job record.
@@ -25,6 +28,9 @@ def create_job(
         progress: Initial progress of the job (0-100)
         result: Optional result data
         error: Optional error message
+        payload: Optional keyword arguments for the job's handler
+        priority: Queue priority; higher runs first
+        max_attempts: Number of times the queue runs the job before giving up
         
     Returns:
         The created job
@@ -35,7 +41,10 @@ def create_job(
         status=status,
         progress=progress,
         result=result,
-        error=error
+        error=error,
+        payload=payload,
+        priority=priority,
+        max_attempts=max_attempts
     )
     
     db.add(job)
@@ -2,6 +2,8 @@ from sqlalchemy.orm import Session, joinedload
 from sqlalchemy.exc import IntegrityError
 from typing import List, Optional
 
+from ..auth.permission_claims import bump_rbac_version, bump_user_rbac_version
+from ..auth.principal_cache import principal_cache
 from ..models.user import User
 from ..models.rbac import Role, Permission
 from ..schemas.rbac_schemas import RoleCreate, RoleUpdate, PermissionCreate, PermissionUpdate
@@ -9,13 +11,13 @@ from ..schemas.rbac_schemas import RoleCreate, RoleUpdate, PermissionCreate, Per
 # --- Role CRUD Operations ---
 
 def get_role(db: Session, role_id: int) -> Optional[Role]:
-    return db.query(Role).options(joinedload("permissions")).filter(Role.id == role_id).first()
+    return db.query(Role).options(joinedload(Role.permissions)).filter(Role.id == role_id).first()
 
 def get_role_by_name(db: Session, role_name: str) -> Optional[Role]:
-    return db.query(Role).options(joinedload("permissions")).filter(Role.name == role_name).first()
+    return db.query(Role).options(joinedload(Role.permissions)).filter(Role.name == role_name).first()
 
 def get_roles(db: Session, skip: int = 0, limit: int = 100) -> List[Role]:
-    return db.query(Role).options(joinedload("permissions")).offset(skip).limit(limit).all()
+    return db.query(Role).options(joinedload(Role.permissions)).offset(skip).limit(limit).all()
 
 def create_role(db: Session, role: RoleCreate) -> Role:
     db_role = Role()
@@ -36,8 +38,10 @@ def update_role(db: Session, role_id: int, role_update: RoleUpdate) -> Optional[
             setattr(db_role, "description", role_update.description)
         # Note: Updating permissions list directly here would require more logic (e.g., fetching Permission objects by ID)
         # This basic update only handles name and description.
+        bump_rbac_version(db)
         db.commit()
         db.refresh(db_role)
+        principal_cache.clear() # Cached principals hold role names
     return db_role
 
 def delete_role(db: Session, role_id: int) -> bool:
@@ -47,7 +51,9 @@ def delete_role(db: Session, role_id: int) -> bool:
         # Depending on DB constraints, this might fail or orphan user_role entries if not handled.
         # For simplicity, direct delete. Add cascading deletes or checks as needed.
         db.delete(db_role)
+        bump_rbac_version(db)
         db.commit()
+        principal_cache.clear()
         return True
     return False
 
@@ -78,8 +84,10 @@ def update_permission(db: Session, permission_id: int, permission_update: Permis
             setattr(db_permission, "name", permission_update.name)
         if permission_update.description is not None:
             setattr(db_permission, "description", permission_update.description)
+        bump_rbac_version(db)
         db.commit()
         db.refresh(db_permission)
+        principal_cache.clear() # Cached principals hold permission names
     return db_permission
     
 def delete_permission(db: Session, permission_id: int) -> bool:
@@ -87,31 +95,37 @@ def delete_permission(db: Session, permission_id: int) -> bool:
     if db_permission:
         # Similar to roles, consider implications for roles that have this permission.
         db.delete(db_permission)
+        bump_rbac_version(db)
         db.commit()
+        principal_cache.clear()
         return True
     return False
 
 # --- Assignment Operations ---
 
 def assign_role_to_user(db: Session, user_id: int, role_id: int) -> Optional[User]:
-    user = db.query(User).options(joinedload("roles")).filter(User.id == user_id).first()
+    user = db.query(User).options(joinedload(User.roles)).filter(User.id == user_id).first()
     role = get_role(db, role_id)
     if user and role:
         if role not in user.roles:
             user.roles.append(role)
+            bump_user_rbac_version(db, user_id)
             db.commit()
             db.refresh(user)
+            principal_cache.invalidate_user(user_id)
         return user
     return None
 
 def remove_role_from_user(db: Session, user_id: int, role_id: int) -> Optional[User]:
-    user = db.query(User).options(joinedload("roles")).filter(User.id == user_id).first()
+    user = db.query(User).options(joinedload(User.roles)).filter(User.id == user_id).first()
     role = get_role(db, role_id) # Fetch the role to ensure it exists
     if user and role:
         if role in user.roles:
             user.roles.remove(role)
+            bump_user_rbac_version(db, user_id)
             db.commit()
             db.refresh(user)
+            principal_cache.invalidate_user(user_id)
         return user
     return None
 
@@ -121,8 +135,10 @@ def add_permission_to_role(db: Session, role_id: int, permission_id: int) -> Opt
     if role and permission:
         if permission not in role.permissions:
             role.permissions.append(permission)
+            bump_rbac_version(db)
             db.commit()
             db.refresh(role) # Refresh to see updated role.permissions list immediately
+            principal_cache.clear()
         return role
     return None
 
@@ -132,31 +148,37 @@ def remove_permission_from_role(db: Session, role_id: int, permission_id: int) -
     if role and permission:
         if permission in role.permissions:
             role.permissions.remove(permission)
+            bump_rbac_version(db)
             db.commit()
             db.refresh(role)
+            principal_cache.clear()
         return role
     return None
 
 # Helper for assigning by name (used by endpoints that take names)
 def assign_role_to_user_by_names(db: Session, user_id: int, role_name: str) -> Optional[User]:
-    user = db.query(User).options(joinedload("roles")).filter(User.id == user_id).first()
+    user = db.query(User).options(joinedload(User.roles)).filter(User.id == user_id).first()
     role = get_role_by_name(db, role_name)
     if user and role:
         if role not in user.roles:
             user.roles.append(role)
+            bump_user_rbac_version(db, user_id)
             db.commit()
             db.refresh(user)
+            principal_cache.invalidate_user(user_id)
         return user
     return None
 
 def remove_role_from_user_by_names(db: Session, user_id: int, role_name: str) -> Optional[User]:
-    user = db.query(User).options(joinedload("roles")).filter(User.id == user_id).first()
+    user = db.query(User).options(joinedload(User.roles)).filter(User.id == user_id).first()
     role = get_role_by_name(db, role_name)
     if user and role:
         if role in user.roles:
             user.roles.remove(role)
+            bump_user_rbac_version(db, user_id)
             db.commit()
             db.refresh(user)
+            principal_cache.invalidate_user(user_id)
         return user
     return None
 
@@ -166,8 +188,10 @@ def add_permission_to_role_by_names(db: Session, role_name: str, permission_name
     if role and permission:
         if permission not in role.permissions:
             role.permissions.append(permission)
+            bump_rbac_version(db)
             db.commit()
             db.refresh(role)
+            principal_cache.clear()
         return role
     return None
 
@@ -177,7 +201,9 @@ def remove_permission_from_role_by_names(db: Session, role_name: str, permission
     if role and permission:
         if permission in role.permissions:
             role.permissions.remove(permission)
+            bump_rbac_version(db)
             db.commit()
             db.refresh(role)
+            principal_cache.clear()
         return role
     return None
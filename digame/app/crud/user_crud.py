@@ -1,13 +1,11 @@
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from passlib.context import CryptContext
-
+from ..auth.jwt_handler import pwd_context
+from ..auth.permission_claims import bump_user_rbac_version, user_rbac_versions
+from ..auth.principal_cache import principal_cache
 from ..models.user import User
 from ..schemas.user_schemas import UserCreate, UserUpdate
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 def get_user(db: Session, user_id: int) -> Optional[User]:
     """Get a user by ID"""
     return db.query(User).filter(User.id == user_id).first()
@@ -24,9 +22,9 @@ def get_users(db: Session, skip: int = 0, limit: int = 100) -> List[User]:
     """Get a list of users with pagination"""
     return db.query(User).offset(skip).limit(limit).all()
 
-def create_user(db: Session, user: UserCreate) -> User:
-    """Create a new user"""
-    hashed_password = pwd_context.hash(user.password)
+def create_user(db: Session, user: UserCreate, hashed_password: Optional[str] = None) -> User:
+    """Create a new user; pass `hashed_password` if the password was already hashed, e.g. off the event loop"""
+    hashed_password = hashed_password or pwd_context.hash(user.password)
     db_user = User(
         username=user.username,
         email=user.email,
@@ -54,11 +52,22 @@ def update_user(db: Session, user_id: int, user: UserUpdate) -> Optional[User]:
     
     for key, value in update_data.items():
         setattr(db_user, key, value)
+    if "is_active" in update_data:
+        bump_user_rbac_version(db, user_id) # Tokens embedding permissions don't carry account status
     
     db.commit()
     db.refresh(db_user)
+    principal_cache.invalidate_user(user_id)
     return db_user
 
+def set_user_active(db: Session, user: User, is_active: bool) -> User:
+    """Activate or deactivate a user, e.g. to suspend their account; their embedded-permission tokens go stale"""
+    user.is_active = is_active
+    bump_user_rbac_version(db, user.id)
+    db.commit()
+    principal_cache.invalidate_user(user.id)
+    return user
+
 def delete_user(db: Session, user_id: int) -> bool:
     """Delete a user"""
     db_user = get_user(db, user_id)
@@ -67,6 +76,8 @@ def delete_user(db: Session, user_id: int) -> bool:
     
     db.delete(db_user)
     db.commit()
+    user_rbac_versions.invalidate(user_id) # Tokens of missing users are stale
+    principal_cache.invalidate_user(user_id)
     return True
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -0,0 +1,110 @@
+"""
+Dynamic micro-batching for next-activity prediction.
+
+A single-sequence LSTM forward pass costs nearly as much as a batch of dozens,
+so `InferenceBatcher` runs concurrent prediction requests for the same model
+as one batched forward pass in the compute executor's thread pool. Each
+request awaits its own future, resolved with its row of the batch output.
+
+A request for an idle model is dispatched at once (after `INFERENCE_MAX_WAIT_MS`,
+if set), so light traffic pays no batching delay. Requests arriving while a
+batch for that model is running are collected and dispatched together when it
+finishes, or as soon as `INFERENCE_MAX_BATCH_SIZE` are waiting.
+
+Requests are only batched together when they use the same loaded model and
+have the same input shape.
+"""
+
+import asyncio
+import os
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import torch
+
+from . import compute_executor
+
+# --- Configuration ---
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv("DIGAME_INFERENCE_MAX_BATCH_SIZE", "64"))
+# Extra time an idle model waits for company before running a batch
+INFERENCE_MAX_WAIT_MS = float(os.getenv("DIGAME_INFERENCE_MAX_WAIT_MS", "0"))
+
+
+def _forward(runner, inputs: np.ndarray) -> np.ndarray:
+    with torch.inference_mode():
+        return runner(torch.from_numpy(inputs)).numpy()
+
+
+class InferenceBatcher:
+    """Batches concurrent forward passes per model. Use from a single event loop."""
+
+    def __init__(self, max_batch_size: int = INFERENCE_MAX_BATCH_SIZE, max_wait_ms: float = INFERENCE_MAX_WAIT_MS):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._pending: Dict[Tuple, List[Tuple[np.ndarray, asyncio.Future]]] = {}
+        self._timers: Dict[Tuple, asyncio.TimerHandle] = {}
+        self._in_flight: Dict[Tuple, int] = {}
+        self.requests = 0
+        self.batches = 0
+
+    async def predict(self, assets: Dict[str, Any], sequence: np.ndarray) -> np.ndarray:
+        """
+        Output logits of the model in `assets` (see `predictive.load_inference_assets`)
+        for one input sequence of shape (sequence_length, input_dim).
+        """
+        loop = asyncio.get_running_loop()
+        runner = assets.get("runner") or assets["model"]
+        sequence = np.asarray(sequence, dtype=np.float32)
+        key = (id(runner), sequence.shape)
+
+        future = loop.create_future()
+        pending = self._pending.setdefault(key, [])
+        pending.append((sequence, future))
+        self.requests += 1
+        busy = key in self._in_flight
+        if len(pending) >= self.max_batch_size or (not busy and self.max_wait <= 0):
+            self._flush(key, runner)
+        elif not busy and len(pending) == 1:
+            self._timers[key] = loop.call_later(self.max_wait, self._flush, key, runner)
+        return await future
+
+    def _flush(self, key: Tuple, runner) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, None)
+        if batch:
+            self.batches += 1
+            self._in_flight[key] = self._in_flight.get(key, 0) + 1
+            asyncio.ensure_future(self._run(key, runner, batch))
+
+    async def _run(self, key: Tuple, runner, batch: List[Tuple[np.ndarray, asyncio.Future]]) -> None:
+        inputs = np.stack([sequence for sequence, _ in batch])
+        try:
+            outputs = await compute_executor.run_in_thread(_forward, runner, inputs)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future), row in zip(batch, outputs):
+                if not future.done():
+                    future.set_result(row)
+        finally:
+            self._in_flight[key] -= 1
+            if not self._in_flight[key]:
+                del self._in_flight[key]
+            # Whatever queued up meanwhile goes out as the next batch.
+            if key in self._pending:
+                self._flush(key, runner)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch_size": self.requests / self.batches if self.batches else None,
+        }
+
+
+# The batcher used by the prediction endpoint
+inference_batcher = InferenceBatcher()
@@ -27,10 +27,13 @@ from .routers import workflow_automation_router # Import the workflow automation
 from .routers import integration_router # Import the integration router
 from .routers import tenant_router # Import the tenant router
 from .routers import notification_router # Import the notification router
+from .routers import monitoring as monitoring_router
+from . import compute_executor
 
 # Import authentication components
 from .auth.middleware import configure_auth_middleware
 from .auth.config import auth_settings, get_middleware_config
+from .auth.password_service import password_service
 
 # Configure JSON logging
 logger = logging.getLogger("digame_app") # Use a specific name for the main app logger
@@ -162,6 +165,7 @@ app.include_router(workflow_automation_router.router, tags=["Workflow Automation
 app.include_router(integration_router.router, tags=["Integrations"])
 app.include_router(tenant_router.router, tags=["Tenant Management"])
 app.include_router(notification_router.router, prefix="/api", tags=["Notifications"]) # Add notification router
+app.include_router(monitoring_router.router) # Prefix "/monitoring" is set on the router
 
 # Startup and shutdown events
 @app.on_event("startup")
@@ -194,6 +198,8 @@ async def startup_event():
 async def shutdown_event():
     """Cleanup on application shutdown"""
     logger.info("🛑 Shutting down Digame API...")
+    compute_executor.shutdown()
+    password_service.shutdown()
 
 # Health check endpoints
 @app.get("/", tags=["Health"])
@@ -0,0 +1,167 @@
+"""
+In-process registry of loaded predictive models.
+
+Prediction requests used to `torch.load` the user's model, rebuild its
+optimizer and re-read the encoders on every call. The registry keeps loaded
+inference assets (see `predictive.load_inference_assets`) per model path:
+
+- Entries are evicted least-recently-used once the registry holds more than
+  `MODEL_REGISTRY_MAX_MODELS` models or `MODEL_REGISTRY_MAX_MB` of weights.
+- Every lookup compares the modification time and size of the model's .pth
+  file with those it was loaded from, so retraining takes effect on the next
+  request. The encoders and scaler beside it are shared by every user's model
+  and are not compared, so one user retraining doesn't reload everyone's model.
+- Concurrent misses for the same model load it once.
+- `stats()` reports the hit rate and load latency.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from .predictive import load_inference_assets
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+MODEL_REGISTRY_MAX_MODELS = int(os.getenv("DIGAME_MODEL_REGISTRY_MAX_MODELS", "64"))
+MODEL_REGISTRY_MAX_MB = float(os.getenv("DIGAME_MODEL_REGISTRY_MAX_MB", "512"))
+
+
+def artifact_version(model_path: str) -> Optional[Tuple]:
+    """(mtime, size) of the model file; None if it doesn't exist."""
+    try:
+        stat = os.stat(model_path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _weights_bytes(assets: Dict[str, Any]) -> int:
+    return sum(p.numel() * p.element_size() for p in assets["model"].parameters())
+
+
+class ModelRegistry:
+    """Size-bounded LRU cache of inference assets keyed by resolved model path."""
+
+    def __init__(self, max_models: int = MODEL_REGISTRY_MAX_MODELS, max_bytes: int = int(MODEL_REGISTRY_MAX_MB * 1024 * 1024)):
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Tuple, Dict[str, Any], int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._reset_counters()
+
+    def _reset_counters(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.load_failures = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.load_seconds_total = 0.0
+        self.load_seconds_max = 0.0
+
+    def get(self, model_path: str) -> Optional[Dict[str, Any]]:
+        """The current assets for `model_path`, loading them if absent or stale. None if unloadable."""
+        version = artifact_version(model_path)
+        if version is None:
+            self.invalidate(model_path)
+            return None
+
+        with self._lock:
+            entry = self._lookup(model_path, version)
+            if entry is not None:
+                self.hits += 1
+                return entry
+            self.misses += 1
+            load_lock = self._load_locks.setdefault(model_path, threading.Lock())
+
+        with load_lock:
+            # Another request may have loaded it while we waited.
+            with self._lock:
+                entry = self._lookup(model_path, version)
+            if entry is not None:
+                return entry
+
+            started = time.perf_counter()
+            assets = load_inference_assets(model_path)
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                if assets is None:
+                    self.load_failures += 1
+                    self._load_locks.pop(model_path, None)
+                    return None
+                self.loads += 1
+                self.load_seconds_total += elapsed
+                self.load_seconds_max = max(self.load_seconds_max, elapsed)
+                self._store(model_path, version, assets)
+            logger.info(f"Loaded model {model_path} in {elapsed * 1000:.1f}ms")
+            return assets
+
+    def _lookup(self, model_path: str, version: Tuple) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(model_path)
+        if entry is None:
+            return None
+        if entry[0] != version:
+            self._remove(model_path)
+            self.invalidations += 1
+            return None
+        self._entries.move_to_end(model_path)
+        return entry[1]
+
+    def _store(self, model_path: str, version: Tuple, assets: Dict[str, Any]) -> None:
+        if model_path in self._entries:
+            self._remove(model_path)
+        size = _weights_bytes(assets)
+        self._entries[model_path] = (version, assets, size)
+        self._bytes += size
+        # Always keep the model just loaded, even if it alone exceeds the byte budget.
+        while len(self._entries) > 1 and (len(self._entries) > self.max_models or self._bytes > self.max_bytes):
+            evicted, _ = next(iter(self._entries.items()))
+            self._remove(evicted)
+            self.evictions += 1
+
+    def _remove(self, model_path: str) -> None:
+        _, _, size = self._entries.pop(model_path)
+        self._bytes -= size
+        # Drop its load lock too, or the locks outgrow the cache; a load racing
+        # with the eviction at worst loads the model twice.
+        self._load_locks.pop(model_path, None)
+
+    def invalidate(self, model_path: Optional[str] = None) -> None:
+        """Drops one model, or every model when `model_path` is None."""
+        with self._lock:
+            if model_path is None:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+                self._load_locks.clear()
+                self._bytes = 0
+            elif model_path in self._entries:
+                self._remove(model_path)
+                self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "models": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "loads": self.loads,
+                "load_failures": self.load_failures,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "avg_load_ms": self.load_seconds_total / self.loads * 1000 if self.loads else None,
+                "max_load_ms": self.load_seconds_max * 1000,
+            }
+
+
+# The process-wide registry used by the prediction endpoints
+model_registry = ModelRegistry()
@@ -5,14 +5,17 @@
 # if env.py imports this models package.
 
 from .user import User, Base # Base is often defined in one model file (e.g., user.py) or a database.py
-from .rbac import Role, Permission, user_roles_table, role_permissions_table
-from .process_notes import ProcessNote
+from .rbac import Role, Permission, RBACVersion, user_roles_table, role_permissions_table
+from .process_notes import ProcessNote, ProcessSequenceCandidate, ProcessMiningCheckpoint
 from .activity import Activity 
-from .activity_features import ActivityEnrichedFeature
+from .activity_features import ActivityEnrichedFeature, ActivityEnrichmentCheckpoint
+from .category_mapping import CategoryMapping
+from .activity_baseline import ActivityHourlyCount, ActivityBaseline
 from .anomaly import DetectedAnomaly
 from .task import Task # Added new model
 from .user_setting import UserSetting # Import the new UserSetting model
 from .notification import Notification # Import the new Notification model
+from .revoked_token import RevokedToken
 
 # Optionally, define __all__ to specify what is exported when 'from .models import *' is used
 __all__ = [
@@ -20,13 +23,21 @@ __all__ = [
     "Base", # Exporting Base can be useful
     "Role",
     "Permission",
+    "RBACVersion",
     "user_roles_table",
     "role_permissions_table",
     "ProcessNote",
+    "ProcessSequenceCandidate",
+    "ProcessMiningCheckpoint",
     "Activity",
     "ActivityEnrichedFeature",
+    "ActivityEnrichmentCheckpoint",
+    "CategoryMapping",
+    "ActivityHourlyCount",
+    "ActivityBaseline",
     "DetectedAnomaly",
     "Task", # Added new model
     "UserSetting", # Add UserSetting to __all__
     "Notification", # Add Notification to __all__
+    "RevokedToken",
 ]
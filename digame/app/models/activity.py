@@ -36,6 +36,8 @@ class Activity(Base):
 
     __table_args__ = (
         Index('ix_digital_activities_user_id_timestamp', 'user_id', 'timestamp'),
+        # Keyset pagination order used by the streaming enrichment worker
+        Index('ix_digital_activities_user_id_timestamp_id', 'user_id', 'timestamp', 'id'),
     )
 
     def __repr__(self):
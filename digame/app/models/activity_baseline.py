@@ -0,0 +1,77 @@
+from sqlalchemy import Column, Integer, String, Date, DateTime, Float, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.sql import func
+
+# Import Base from user.py to ensure all tables use the same metadata declaration
+from .user import Base
+
+class ActivityHourlyCount(Base):
+    """
+    Number of enriched activities per user, category and calendar hour.
+
+    One row per (date, hour) bucket that saw activity. Kept so that activities
+    arriving in an already-counted bucket can update `ActivityBaseline` by delta
+    instead of recounting history.
+    """
+    __tablename__ = "activity_hourly_counts"
+
+    id = Column(Integer(), primary_key=True, autoincrement=True)
+    user_id = Column(Integer(), ForeignKey("users.id"), nullable=False)
+    category_type = Column(String(), nullable=False) # "app_category" or "website_category"
+    category = Column(String(), nullable=False)
+    bucket_date = Column(Date(), nullable=False)
+    hour = Column(Integer(), nullable=False) # 0-23
+    activity_count = Column(Integer(), nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint('user_id', 'category_type', 'category', 'bucket_date', 'hour',
+                         name='uq_activity_hourly_counts_bucket'),
+        Index('ix_activity_hourly_counts_user_id_bucket_date', 'user_id', 'bucket_date'),
+    )
+
+    def __repr__(self):
+        return (f"<ActivityHourlyCount(user_id={self.user_id}, {self.category_type}='{self.category}', "
+                f"{self.bucket_date} {self.hour}h, count={self.activity_count})>")
+
+
+class ActivityBaseline(Base):
+    """
+    Running hourly activity baseline per user x category_type x category x weekday x hour.
+
+    Holds the number of observed (date, hour) buckets and the sum and sum of
+    squares of their activity counts, so mean and sample standard deviation can be
+    read in O(1) and updated (or merged) without rescanning history.
+    """
+    __tablename__ = "activity_baselines"
+
+    id = Column(Integer(), primary_key=True, autoincrement=True)
+    user_id = Column(Integer(), ForeignKey("users.id"), nullable=False)
+    category_type = Column(String(), nullable=False) # "app_category" or "website_category"
+    category = Column(String(), nullable=False)
+    day_of_week = Column(Integer(), nullable=False) # Monday=0, Sunday=6
+    hour = Column(Integer(), nullable=False) # 0-23
+    sample_count = Column(Integer(), nullable=False, default=0) # Buckets observed
+    count_sum = Column(Float(), nullable=False, default=0.0)
+    count_sum_sq = Column(Float(), nullable=False, default=0.0)
+    updated_at = Column(DateTime(), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('user_id', 'category_type', 'category', 'day_of_week', 'hour',
+                         name='uq_activity_baselines_slot'),
+        Index('ix_activity_baselines_user_id_day_hour', 'user_id', 'day_of_week', 'hour'),
+    )
+
+    @property
+    def mean(self) -> float:
+        return self.count_sum / self.sample_count if self.sample_count else 0.0
+
+    @property
+    def std(self) -> float:
+        # Sample standard deviation (ddof=1), 0.0 with a single observation, matching pandas' std()
+        if not self.sample_count or self.sample_count < 2:
+            return 0.0
+        variance = (self.count_sum_sq - self.count_sum * self.count_sum / self.sample_count) / (self.sample_count - 1)
+        return max(variance, 0.0) ** 0.5
+
+    def __repr__(self):
+        return (f"<ActivityBaseline(user_id={self.user_id}, {self.category_type}='{self.category}', "
+                f"dow={self.day_of_week}, hour={self.hour}, n={self.sample_count})>")
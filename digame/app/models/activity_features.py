@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
 
 # Import Base from user.py to ensure all tables use the same metadata declaration
 from .user import Base 
@@ -35,3 +36,24 @@ class ActivityEnrichedFeature(Base):
 # To complete the bi-directional one-to-one relationship, the Activity model in activity.py would need:
 # from .activity_features import ActivityEnrichedFeature # Or a forward reference
 # enriched_feature = relationship("ActivityEnrichedFeature", uselist=False, back_populates="activity", cascade="all, delete-orphan")
+
+
+class ActivityEnrichmentCheckpoint(Base):
+    """
+    Progress marker for the streaming enrichment worker, one row per user.
+
+    Stores the `(timestamp, id)` keyset position of the newest enriched activity
+    and its primary category, so context-switch detection carries over between
+    runs. Pending activities are found by their missing features, not by position.
+    """
+    __tablename__ = "activity_enrichment_checkpoints"
+
+    user_id = Column(Integer(), ForeignKey("users.id"), primary_key=True)
+    last_activity_timestamp = Column(DateTime(), nullable=True)
+    last_activity_id = Column(Integer(), nullable=True)
+    last_primary_category = Column(String(), nullable=True)
+    processed_count = Column(Integer(), nullable=False, default=0)
+    updated_at = Column(DateTime(), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<ActivityEnrichmentCheckpoint(user_id={self.user_id}, last_activity_id={self.last_activity_id})>"
@@ -31,7 +31,9 @@ class BehavioralModel(Base):
     num_clusters = Column(Integer(), nullable=True)
     
     # The serialized model itself
-    model_data = Column(LargeBinary(), nullable=True)  # Serialized model (pickle or joblib)
+    model_data = Column(LargeBinary(), nullable=True)  # Pattern artifact (see behavior.serialize_pattern_artifact)
+    # Highest activity id assigned to this model's patterns, by training or incrementally
+    last_activity_id = Column(Integer(), nullable=True)
     
     # Relationship to User model
     user = relationship("User", back_populates="behavioral_models")
@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, UniqueConstraint
+from datetime import datetime
+
+from .user import Base  # Import Base from user.py
+
+class CategoryMapping(Base):
+    """
+    Admin-managed categorization rules for activity enrichment.
+
+    Rows are layered on top of the built-in APP_CATEGORY_MAPPING and
+    WEBSITE_CATEGORY_MAPPING in activity_feature_service and picked up without a
+    restart (see `refresh_category_matchers`). An inactive row removes the built-in
+    mapping with the same pattern.
+    """
+    __tablename__ = "category_mappings"
+
+    id = Column(Integer, primary_key=True, index=True)
+    mapping_type = Column(String, nullable=False, index=True) # "app" (substring of app name) or "website" (domain)
+    pattern = Column(String, nullable=False)
+    category = Column(String, nullable=False)
+    priority = Column(Integer, nullable=False, default=0) # Lower values are matched first among app rules
+    is_active = Column(Boolean, nullable=False, default=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False, index=True)
+
+    __table_args__ = (
+        UniqueConstraint('mapping_type', 'pattern', name='uq_category_mappings_type_pattern'),
+    )
+
+    def __repr__(self):
+        return f"<CategoryMapping(type='{self.mapping_type}', pattern='{self.pattern}', category='{self.category}')>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Float, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Text, Float, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -21,9 +21,22 @@ class Job(Base):
     progress = Column(Float(), nullable=False, default=0.0)  # 0-100
     result = Column(JSON(), nullable=True)  # Store any result data
     error = Column(Text(), nullable=True)  # Store error message if job fails
+    
+    # Queue bookkeeping (see services/job_queue.py)
+    payload = Column(JSON(), nullable=True)  # Keyword arguments for the job's handler
+    priority = Column(Integer(), nullable=False, default=0, server_default="0")  # Higher runs first
+    attempts = Column(Integer(), nullable=False, default=0, server_default="0")
+    max_attempts = Column(Integer(), nullable=False, default=3, server_default="3")
+    run_after = Column(DateTime(), nullable=True)  # Not claimable before this time (retry backoff)
+    locked_by = Column(String(), nullable=True)  # Worker currently running the job
+    heartbeat_at = Column(DateTime(), nullable=True)  # Last sign of life from that worker
     created_at = Column(DateTime(), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(), server_default=func.now(), onupdate=func.now(), nullable=False)
     
+    __table_args__ = (
+        Index("ix_jobs_status_priority", "status", "priority", "id"),
+    )
+    
     # Relationships
     user = relationship("User", back_populates="jobs")
     
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, JSON, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Text, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func # For server_default=func.now()
 
@@ -42,9 +42,67 @@ class ProcessNote(Base):
                                      # Adjust cascade as needed, e.g., "save-update, merge" if tasks should remain but be de-linked.
     )
 
+    __table_args__ = (
+        # Process discovery looks notes up by their sequence
+        Index('ix_process_notes_user_id_steps', 'user_id', 'process_steps_description'),
+    )
+
     def __repr__(self):
         return f"<ProcessNote(id={self.id}, user_id={self.user_id}, task_name='{self.inferred_task_name}')>"
 
+
+class ProcessSequenceCandidate(Base):
+    """
+    A sequence of activity types seen in a user's history that hasn't recurred
+    often enough to become a ProcessNote yet. Incremental process discovery
+    keeps its running count here and promotes it to a note once it reaches the
+    recurrence threshold. Only sequences close to the threshold and recently
+    observed are kept (see `identify_and_update_process_notes`).
+    """
+    __tablename__ = "process_sequence_candidates"
+
+    id = Column(Integer(), primary_key=True, index=True, autoincrement=True)
+    user_id = Column(Integer(), ForeignKey("users.id"), nullable=False)
+    process_steps_description = Column(Text(), nullable=False)
+    source_activity_ids = Column(JSON(), nullable=True) # Activities of the first occurrence
+    occurrence_count = Column(Integer(), nullable=False)
+    first_observed_at = Column(DateTime(), nullable=False)
+    last_observed_at = Column(DateTime(), nullable=False)
+
+    __table_args__ = (
+        Index('ix_process_sequence_candidates_user_id_steps', 'user_id', 'process_steps_description', unique=True),
+    )
+
+    def __repr__(self):
+        return f"<ProcessSequenceCandidate(id={self.id}, user_id={self.user_id}, count={self.occurrence_count})>"
+
+
+class ProcessMiningCheckpoint(Base):
+    """
+    Progress marker for incremental process discovery, one row per user.
+
+    Stores the `(timestamp, id)` keyset position of the last mined activity, the
+    ids of the activities just before it that sequences in the next run can
+    start from (the last `max_sequence_len - 1`), and the parameters the counts
+    were mined with; runs with other parameters start over. `full_scan_at` is
+    when the whole history was last mined, which incremental runs only approximate.
+    """
+    __tablename__ = "process_mining_checkpoints"
+
+    user_id = Column(Integer(), ForeignKey("users.id"), primary_key=True)
+    last_activity_timestamp = Column(DateTime(), nullable=True)
+    last_activity_id = Column(Integer(), nullable=True)
+    tail_activity_ids = Column(JSON(), nullable=True)
+    min_sequence_len = Column(Integer(), nullable=False)
+    max_sequence_len = Column(Integer(), nullable=False)
+    recurrence_threshold = Column(Integer(), nullable=False)
+    processed_count = Column(Integer(), nullable=False, default=0)
+    full_scan_at = Column(DateTime(), nullable=True)
+    updated_at = Column(DateTime(), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<ProcessMiningCheckpoint(user_id={self.user_id}, last_activity_id={self.last_activity_id})>"
+
 # To complete the bi-directional relationship, the User model in user.py would need:
 # from .process_notes import ProcessNote # Or a forward reference if using string for relationship
 # process_notes = relationship("ProcessNote", back_populates="user", cascade="all, delete-orphan")
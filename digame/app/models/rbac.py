@@ -64,3 +64,21 @@ class Permission(Base):
 
     def __repr__(self):
         return f"<Permission(id={self.id}, name='{self.name}')>"
+
+
+class RBACVersion(Base):
+    """
+    Single-row counter bumped whenever roles, permissions or their assignments change.
+
+    Access tokens that embed permissions (see auth/permission_claims.py) carry the
+    version they were minted at, so tokens from before a change can be rejected.
+    Permission ids double as the bit indexes of the embedded permission bitmap.
+    """
+    __tablename__ = "rbac_version"
+
+    id = Column(Integer(), primary_key=True)
+    version = Column(Integer(), nullable=False, default=0)
+    updated_at = Column(DateTime(), default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<RBACVersion(version={self.version})>"
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, String, Float
+
+from .user import Base  # Import Base from user.py
+
+class RevokedToken(Base):
+    """
+    A revoked JWT, by its `jti` claim, kept until the token would have expired anyway.
+
+    Times are Unix timestamps so they compare directly with the token's `exp`.
+    Read through auth/revocation_store.py, which keeps a local Bloom filter of these ids.
+    """
+    __tablename__ = 'revoked_tokens'
+
+    jti = Column(String(64), primary_key=True)
+    expires_at = Column(Float, nullable=False, index=True)
+    revoked_at = Column(Float, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<RevokedToken(jti='{self.jti}', expires_at={self.expires_at})>"
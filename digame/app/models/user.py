@@ -22,6 +22,8 @@ class User(Base):
     updated_at = Column(DateTime(), default=datetime.utcnow, onupdate=datetime.utcnow)
     
     is_active = Column(Integer(), default=True) # Using Integer for broader DB compatibility (e.g. 0 or 1)
+    # Bumped when the user's roles or account status change; see auth/permission_claims.py
+    rbac_version = Column(Integer(), nullable=False, default=0, server_default="0")
     
     # Onboarding fields
     onboarding_completed = Column(Boolean(), default=False)
@@ -85,5 +87,13 @@ class User(Base):
         cascade="all, delete-orphan" # If a user is deleted, their settings are also deleted.
     )
 
+    # Relationship to Job model
+    # Allows accessing the background jobs run for a user.
+    jobs = relationship(
+        "Job", # String reference to the Job class
+        back_populates="user", # Corresponds to the 'user' attribute in Job
+        cascade="all, delete-orphan" # If a user is deleted, their jobs are also deleted.
+    )
+
     def __repr__(self):
         return f"<User(id={self.id}, username='{self.username}', email='{self.email}')>"
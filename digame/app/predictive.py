@@ -8,7 +8,15 @@ import torch.nn as nn
 import torch.optim as optim
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder, StandardScaler
-from torch.utils.data import DataLoader, TensorDataset
+from numpy.lib.stride_tricks import sliding_window_view
+from torch.utils.data import BatchSampler, DataLoader, Dataset, IterableDataset, RandomSampler, SequentialSampler, get_worker_info
+
+from .services.activity_frame_loader import (
+    ACTIVITY_FRAME_FETCH_SIZE,
+    iter_activity_frames,
+    iter_snapshot_frames,
+    max_activity_id,
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -21,6 +29,9 @@ os.makedirs(DEFAULT_MODEL_DIR, exist_ok=True)
 # Default path for the primary model, used by core functions.
 PRIMARY_MODEL_PATH = "models/predictive_model.pth"
 
+# Inference runner built for loaded models: "eager" (the nn.Module) or "torchscript"
+INFERENCE_BACKEND = os.getenv("DIGAME_INFERENCE_BACKEND", "eager")
+
 # Define constants for feature columns
 NUMERICAL_FEATURES = ["hour_of_day", "day_of_week", "is_context_switch_numeric"]
 CATEGORICAL_FEATURES = ["activity_type", "app_category", "project_context", "website_category"]
@@ -44,11 +55,54 @@ class PredictiveModel(nn.Module):
         return out
 
 # --- Data Preparation ---
-def prepare_sequences(df, sequence_length=10):
+class SequenceWindows(Dataset):
+    """
+    Training windows over per-user activity rows, sliced on demand.
+
+    `features` holds every row once (sorted by user, then time); window `i`
+    is `features[starts[i]:starts[i] + sequence_length]` and its target is
+    `targets[starts[i] + sequence_length]`. Windows are strided views into
+    `features`, so memory is O(rows) rather than O(rows x sequence_length).
+
+    Indexing with an array of window indices returns a whole batch; use
+    `batch_loader` to iterate shuffled mini-batches that way.
+    """
+
+    def __init__(self, features: np.ndarray, targets: np.ndarray, starts: np.ndarray, sequence_length: int):
+        self.features = features
+        self.targets = targets
+        self.starts = starts
+        self.sequence_length = sequence_length
+        # (rows - sequence_length + 1, sequence_length, n_features) view, no copy
+        if len(features) >= sequence_length:
+            self.windows = sliding_window_view(features, sequence_length, axis=0).transpose(0, 2, 1)
+        else:
+            self.windows = np.empty((0, sequence_length, features.shape[1]), dtype=features.dtype)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, index):
+        starts = self.starts[index]
+        return self.windows[starts], self.targets[starts + self.sequence_length]
+
+    def window_targets(self) -> np.ndarray:
+        return self.targets[self.starts + self.sequence_length]
+
+    def batch_loader(self, batch_size: int, shuffle: bool = True) -> DataLoader:
+        """Mini-batches gathered with one fancy-indexing copy each, rather than per window."""
+        sampler = RandomSampler(self) if shuffle else SequentialSampler(self)
+        return DataLoader(self, sampler=BatchSampler(sampler, batch_size, drop_last=False), batch_size=None)
+
+
+def prepare_sequence_windows(df, sequence_length=10):
+    """
+    Encodes activity rows and indexes every per-user window of `sequence_length`
+    rows followed by a target row. Returns (SequenceWindows, encoders_scalers);
+    see `prepare_sequences` for the encoding.
+    """
     df['timestamp'] = pd.to_datetime(df['timestamp'])
     df = df.sort_values(by=['user_id', 'timestamp'])
-    all_features = []
-    all_targets = []
     activity_encoder = LabelEncoder()
     df['activity_type_encoded'] = activity_encoder.fit_transform(df['activity_type'])
     user_encoder = LabelEncoder()
@@ -68,37 +122,292 @@ def prepare_sequences(df, sequence_length=10):
     scaler = StandardScaler()
     df[features_to_scale] = scaler.fit_transform(df[features_to_scale])
 
-    for user_id, group in df.groupby('user_id'):
-        if len(group) < sequence_length + 1:
-            continue
-        user_features = group[['activity_type_encoded', 'hour_of_day']].values
-        user_targets = group['cluster_label'].values 
-        for i in range(len(user_features) - sequence_length):
-            all_features.append(user_features[i:i + sequence_length])
-            all_targets.append(user_targets[i + sequence_length])
-            
-    if not all_features: 
+    features = df[['activity_type_encoded', 'hour_of_day']].to_numpy(dtype=np.float32)
+    targets = df['cluster_label'].to_numpy()
+    # A window may start at row i when row i + sequence_length belongs to the same user
+    # (rows are sorted by user, so the rows between do too).
+    user_ids = df['user_id'].to_numpy()
+    if len(df) > sequence_length:
+        starts = np.flatnonzero(user_ids[:-sequence_length] == user_ids[sequence_length:])
+    else:
+        starts = np.empty(0, dtype=np.int64)
+
+    encoders_scalers = {'activity_encoder': activity_encoder, 'user_encoder': user_encoder, 'cluster_encoder': cluster_encoder, 'scaler': scaler}
+    return SequenceWindows(features, targets, starts, sequence_length), encoders_scalers
+
+
+def prepare_sequences(df, sequence_length=10):
+    """
+    Materialized training arrays: X of shape (windows, sequence_length, 2), y of
+    shape (windows,), plus the fitted encoders and scaler. Prefer
+    `prepare_sequence_windows`, which doesn't copy rows into every window.
+    """
+    windows, encoders_scalers = prepare_sequence_windows(df, sequence_length)
+    if len(windows) == 0: 
         logger.warning("No sequences were generated. Check sequence_length and data availability.")
-        return np.empty((0, sequence_length, 2)), np.empty((0,)), {'activity_encoder': activity_encoder, 'user_encoder': user_encoder, 'cluster_encoder': cluster_encoder, 'scaler': scaler}
-    return np.array(all_features), np.array(all_targets), {'activity_encoder': activity_encoder, 'user_encoder': user_encoder, 'cluster_encoder': cluster_encoder, 'scaler': scaler}
+        return np.empty((0, sequence_length, 2)), np.empty((0,)), encoders_scalers
+    X, y = windows[np.arange(len(windows))]
+    return X, y, encoders_scalers
+
+# --- Streaming Data Preparation ---
+class DatabaseActivitySource:
+    """
+    Activities of `user_ids` streamed from the database, user by user, in
+    frames of at most `fetch_size` rows.
+
+    With `db` the frames are read through that session, which only works in the
+    loading process (`num_workers=0`). Without it every pass opens a session of
+    its own, so DataLoader workers each get their own connection.
+
+    Passes read activities with ids up to `until_id`. `pin` sets it to the
+    newest activity when unset, so every later pass (encoder fitting, each
+    epoch) sees the same rows while new activities keep arriving.
+    """
+
+    def __init__(self, user_ids, db=None, fetch_size=ACTIVITY_FRAME_FETCH_SIZE, until_id=None):
+        self.user_ids = list(user_ids)
+        self.db = db
+        self.fetch_size = fetch_size
+        self.until_id = until_id
+
+    def _session(self):
+        if self.db is not None:
+            return self.db
+        from .db import SessionLocal
+        return SessionLocal()
+
+    def pin(self):
+        """Bounds all later passes to the activities logged so far."""
+        if self.until_id is None:
+            db = self._session()
+            try:
+                self.until_id = max_activity_id(db, self.user_ids)
+            finally:
+                if self.db is None:
+                    db.close()
+
+    def frames(self, worker_id=0, num_workers=1):
+        """Frames with user_id, timestamp and activity_type for this worker's share of the users."""
+        db = self._session()
+        try:
+            for user_id in self.user_ids[worker_id::num_workers]:
+                for frame in iter_activity_frames(db, user_id, columns=("timestamp", "activity_type"),
+                                                  fetch_size=self.fetch_size, until_id=self.until_id):
+                    frame.insert(0, "user_id", user_id)
+                    yield frame
+        finally:
+            if self.db is None:
+                db.close()
+
+
+class ParquetActivitySource:
+    """
+    Activities read from a snapshot written by `export_activity_snapshot`
+    (sorted by user, then timestamp), in frames of at most `batch_rows` rows.
+    Workers each read the whole file and keep the users assigned to them.
+    """
+
+    def __init__(self, path, batch_rows=ACTIVITY_FRAME_FETCH_SIZE):
+        self.path = path
+        self.batch_rows = batch_rows
+
+    def pin(self):
+        """A snapshot never changes, so there is nothing to bound."""
+
+    def frames(self, worker_id=0, num_workers=1):
+        """Frames with user_id, timestamp and activity_type for this worker's share of the users."""
+        for frame in iter_snapshot_frames(self.path, self.batch_rows):
+            if num_workers > 1:
+                frame = frame[frame["user_id"] % num_workers == worker_id]
+            if len(frame):
+                yield frame
+
+
+def fit_stream_encoders(source):
+    """
+    Fits the activity encoder and hour scaler in one pass over `source`, holding
+    only the distinct activity types and running moments in memory.
+
+    Returns (encoders_scalers, number of activities seen). Targets are the
+    encoded activity types, so there is no cluster encoder. `source` is pinned
+    first (see `DatabaseActivitySource.pin`), so training streams the same rows.
+    """
+    source.pin()
+    activity_types = set()
+    scaler = StandardScaler()
+    rows = 0
+    for frame in source.frames():
+        activity_types.update(frame['activity_type'].unique())
+        scaler.partial_fit(pd.to_datetime(frame['timestamp']).dt.hour.to_frame('hour_of_day'))
+        rows += len(frame)
+    activity_encoder = LabelEncoder()
+    if activity_types:
+        activity_encoder.fit(sorted(activity_types))
+    encoders_scalers = {'activity_encoder': activity_encoder, 'user_encoder': None, 'cluster_encoder': None, 'scaler': scaler}
+    return encoders_scalers, rows
+
+
+class ActivityStream(IterableDataset):
+    """
+    Shuffled mini-batches of training windows, built while streaming activities
+    from `source` (a `DatabaseActivitySource` or `ParquetActivitySource`).
+
+    Each frame is encoded with the fitted `encoders_scalers`, and its windows
+    are sliced as in `prepare_sequence_windows`. The last `sequence_length` rows
+    of a frame are carried into the next one, so windows crossing frame
+    boundaries are kept, and windows never span two users. Windows are mixed in
+    a buffer of about `shuffle_buffer` windows before being batched, so memory
+    is bounded by the frame size and buffer, not by the history size.
+
+    The source is pinned, so every epoch streams the same activities. Activity
+    types the encoder wasn't fitted on (e.g. with encoders fitted elsewhere) are
+    encoded as one extra unknown index; windows predicting them are skipped,
+    since the model has no output for them.
+
+    Yields (X, y) tensors of at most `batch_size` windows. Under a multi-worker
+    DataLoader each worker streams its own share of the users.
+    """
+
+    def __init__(self, source, encoders_scalers, sequence_length=10, batch_size=32, shuffle_buffer=10000, seed=None):
+        source.pin()
+        self.source = source
+        self.activity_encoder = encoders_scalers['activity_encoder']
+        self.activity_types = pd.Index(getattr(self.activity_encoder, 'classes_', ()))
+        self.unknown_activity = len(self.activity_types)
+        self.scaler = encoders_scalers['scaler']
+        self.sequence_length = sequence_length
+        self.batch_size = batch_size
+        self.shuffle_buffer = shuffle_buffer
+        self.seed = seed
+
+    def _encode(self, frame):
+        timestamps = pd.to_datetime(frame['timestamp'])
+        features = np.empty((len(frame), 2), dtype=np.float32)
+        # Same codes as `activity_encoder.transform`, without raising on unseen types
+        targets = self.activity_types.get_indexer(frame['activity_type'])
+        targets[targets < 0] = self.unknown_activity
+        features[:, 0] = targets
+        features[:, 1] = self.scaler.transform(timestamps.dt.hour.to_frame('hour_of_day'))[:, 0]
+        return frame['user_id'].to_numpy(), features, targets
+
+    def _windows(self):
+        """(X, y) arrays of the windows in each streamed frame, in stream order."""
+        worker = get_worker_info()
+        worker_id, num_workers = (worker.id, worker.num_workers) if worker is not None else (0, 1)
+        length = self.sequence_length
+        tail = None
+        for frame in self.source.frames(worker_id, num_workers):
+            user_ids, features, targets = self._encode(frame)
+            if tail is not None:
+                user_ids, features, targets = (np.concatenate(pair) for pair in zip(tail, (user_ids, features, targets)))
+            # Every target row lies past the carried tail, so no window is produced twice
+            tail = (user_ids[-length:], features[-length:], targets[-length:])
+            if len(user_ids) <= length:
+                continue
+            starts = np.flatnonzero((user_ids[:-length] == user_ids[length:])
+                                    & (targets[length:] != self.unknown_activity))
+            if len(starts):
+                windows = sliding_window_view(features, length, axis=0).transpose(0, 2, 1)
+                yield windows[starts], targets[starts + length]
+
+    def __iter__(self):
+        worker = get_worker_info()
+        seed = self.seed if self.seed is None or worker is None else self.seed + worker.id
+        rng = np.random.default_rng(seed)
+        buffered_X, buffered_y, buffered = [], [], 0
+        for X, y in self._windows():
+            buffered_X.append(X)
+            buffered_y.append(y)
+            buffered += len(y)
+            if buffered < max(self.shuffle_buffer, self.batch_size):
+                continue
+            X, y = np.concatenate(buffered_X), np.concatenate(buffered_y)
+            order = rng.permutation(len(y)) if self.shuffle_buffer else np.arange(len(y))
+            full = len(y) - len(y) % self.batch_size
+            for batch in range(0, full, self.batch_size):
+                index = order[batch:batch + self.batch_size]
+                yield torch.from_numpy(X[index]), torch.from_numpy(y[index])
+            buffered_X, buffered_y, buffered = [X[order[full:]]], [y[order[full:]]], len(y) - full
+        if buffered:
+            X, y = np.concatenate(buffered_X), np.concatenate(buffered_y)
+            order = rng.permutation(len(y)) if self.shuffle_buffer else np.arange(len(y))
+            for batch in range(0, len(y), self.batch_size):
+                index = order[batch:batch + self.batch_size]
+                yield torch.from_numpy(X[index]), torch.from_numpy(y[index])
+
+    def loader(self, num_workers=0):
+        """A DataLoader over the stream's batches; with `num_workers` the users are split across worker processes."""
+        return DataLoader(self, batch_size=None, num_workers=num_workers,
+                          worker_init_fn=_init_stream_worker if num_workers else None)
+
+
+def _init_stream_worker(worker_id):
+    # Forked workers must not reuse pooled connections inherited from the parent.
+    import sys
+    db_module = sys.modules.get(__package__ + '.db')
+    if db_module is not None:
+        db_module.engine.dispose(close=False)
 
 # --- Model Training ---
 def train_predictive_model(df_train, sequence_length=10, hidden_dim=50, num_layers=2, output_dim=None,
                            epochs=20, batch_size=32, learning_rate=0.001, dropout_prob=0.2, model_path=PRIMARY_MODEL_PATH):
-    X_train, y_train, encoders_scalers = prepare_sequences(df_train, sequence_length)
-    if X_train.size == 0:
+    train_windows, encoders_scalers = prepare_sequence_windows(df_train, sequence_length)
+    if len(train_windows) == 0:
         logger.error("Training data is empty after sequence preparation. Aborting training.")
         return None, None
-    input_dim = X_train.shape[2] 
+    input_dim = train_windows.features.shape[1] 
     if output_dim is None:
-        output_dim = len(np.unique(y_train))
-        if output_dim <= 1 and len(y_train) > 0: 
+        output_dim = len(np.unique(train_windows.window_targets()))
+        if output_dim <= 1: 
              logger.warning(f"Target variable has only {output_dim} unique value(s). Model might not learn effectively.")
              output_dim = max(2, output_dim) 
-    X_train_tensor = torch.tensor(X_train, dtype=torch.float32)
-    y_train_tensor = torch.tensor(y_train, dtype=torch.long) 
-    train_dataset = TensorDataset(X_train_tensor, y_train_tensor)
-    train_loader = DataLoader(train_dataset, batch_size=batch_size, shuffle=True)
+    train_loader = train_windows.batch_loader(batch_size, shuffle=True)
+    model, optimizer = _fit_model(train_loader, input_dim, hidden_dim, output_dim, num_layers, dropout_prob,
+                                  epochs, batch_size, learning_rate)
+    model_params_to_save = {
+        'input_dim': input_dim, 'hidden_dim': hidden_dim, 'output_dim': output_dim,
+        'num_layers': num_layers, 'sequence_length': sequence_length, 'dropout_prob': dropout_prob
+    }
+    save_model(model, optimizer, encoders_scalers, model_params_to_save, model_path)
+    logger.info("Training complete.")
+    return model, encoders_scalers
+
+def train_predictive_model_streaming(source, encoders_scalers=None, sequence_length=10, hidden_dim=50, num_layers=2,
+                                     epochs=20, batch_size=32, learning_rate=0.001, dropout_prob=0.2,
+                                     num_workers=0, shuffle_buffer=10000, model_path=PRIMARY_MODEL_PATH):
+    """
+    Trains like `train_predictive_model`, but streams activities from `source`
+    (a `DatabaseActivitySource` or `ParquetActivitySource`) every epoch instead
+    of taking a DataFrame, so memory doesn't grow with the history size.
+
+    Without `encoders_scalers` they're fitted with an extra pass over `source`
+    (see `fit_stream_encoders`). `num_workers` DataLoader workers split the
+    users between them. Returns (model, encoders_scalers), or (None, None) when
+    no window could be built.
+    """
+    if encoders_scalers is None:
+        encoders_scalers, _ = fit_stream_encoders(source)
+    input_dim = 2
+    output_dim = len(getattr(encoders_scalers['activity_encoder'], 'classes_', ()))
+    if output_dim <= 1:
+        logger.warning(f"Target variable has only {output_dim} unique value(s). Model might not learn effectively.")
+        output_dim = 2
+    stream = ActivityStream(source, encoders_scalers, sequence_length, batch_size, shuffle_buffer)
+    model, optimizer = _fit_model(stream.loader(num_workers), input_dim, hidden_dim, output_dim, num_layers, dropout_prob,
+                                  epochs, batch_size, learning_rate)
+    if model is None:
+        logger.error("Training data is empty after sequence preparation. Aborting training.")
+        return None, None
+    model_params_to_save = {
+        'input_dim': input_dim, 'hidden_dim': hidden_dim, 'output_dim': output_dim,
+        'num_layers': num_layers, 'sequence_length': sequence_length, 'dropout_prob': dropout_prob
+    }
+    save_model(model, optimizer, encoders_scalers, model_params_to_save, model_path)
+    logger.info("Training complete.")
+    return model, encoders_scalers
+
+def _fit_model(train_loader, input_dim, hidden_dim, output_dim, num_layers, dropout_prob, epochs, batch_size, learning_rate):
+    """Runs the training epochs over `train_loader`; returns (None, None) if an epoch yields no batches."""
     model = PredictiveModel(input_dim, hidden_dim, output_dim, num_layers, dropout_prob)
     criterion = nn.CrossEntropyLoss() 
     optimizer = optim.Adam(model.parameters(), lr=learning_rate)
@@ -107,22 +416,56 @@ def train_predictive_model(df_train, sequence_length=10, hidden_dim=50, num_laye
     for epoch in range(epochs):
         model.train()
         epoch_loss = 0
+        batches = 0
         for batch_X, batch_y in train_loader:
             optimizer.zero_grad()
             outputs = model(batch_X)
-            loss = criterion(outputs, batch_y)
+            loss = criterion(outputs, batch_y.long())
             loss.backward()
             optimizer.step()
             epoch_loss += loss.item()
-        avg_epoch_loss = epoch_loss / len(train_loader)
+            batches += 1
+        if batches == 0:
+            return None, None
+        avg_epoch_loss = epoch_loss / batches
         logger.info(f"Epoch [{epoch+1}/{epochs}], Loss: {avg_epoch_loss:.4f}")
-    model_params_to_save = {
-        'input_dim': input_dim, 'hidden_dim': hidden_dim, 'output_dim': output_dim,
-        'num_layers': num_layers, 'sequence_length': sequence_length, 'dropout_prob': dropout_prob
+    return model, optimizer
+
+def train_predictive_model_for_user(db, user_id, model_path=None, sequence_length=10, hidden_dim=50, num_layers=2,
+                                    epochs=20, learning_rate=0.001):
+    """
+    Trains and saves a user's predictive model from their activity history,
+    streamed from the database (see `train_predictive_model_streaming`).
+
+    Returns a JSON-serialisable summary (status, message, model_path, num_samples),
+    so it can run as a job via `compute_executor.submit_job` or the job queue.
+    Without `model_path`, the model is saved as the user's model in DEFAULT_MODEL_DIR.
+    """
+    if model_path is None:
+        model_path = os.path.join(DEFAULT_MODEL_DIR, f"user_{user_id}_predictive_model.pth")
+    source = DatabaseActivitySource([user_id], db=db)
+    encoders_scalers, num_samples = fit_stream_encoders(source)
+    if num_samples == 0:
+        return {"status": "failed", "message": f"No activities found for user {user_id}"}
+
+    model, _ = train_predictive_model_streaming(
+        source,
+        encoders_scalers=encoders_scalers,
+        sequence_length=sequence_length,
+        hidden_dim=hidden_dim,
+        num_layers=num_layers,
+        epochs=epochs,
+        learning_rate=learning_rate,
+        model_path=model_path
+    )
+    if model is None:
+        return {"status": "failed", "message": "Model training failed or not enough data."}
+    return {
+        "status": "success",
+        "message": f"Model training completed for user {user_id}.",
+        "model_path": model_path,
+        "num_samples": num_samples
     }
-    save_model(model, optimizer, encoders_scalers, model_params_to_save, model_path)
-    logger.info("Training complete.")
-    return model, encoders_scalers
 
 # --- Model Saving ---
 def save_model(model, optimizer, encoders_scalers, model_params, file_path=PRIMARY_MODEL_PATH):
@@ -180,8 +523,63 @@ def load_model_components(model_path=PRIMARY_MODEL_PATH):
         logger.error(f"Error loading model from {model_path}: {e}")
         return None, None, None, None, None
 
+ENCODER_FILES = {
+    'activity_encoder': 'activity_encoder.joblib',
+    'user_encoder': 'user_encoder.joblib',
+    'cluster_encoder': 'cluster_encoder.joblib',
+}
+SCALER_FILE = 'scaler.joblib'
+
+def resolve_model_path(model_path):
+    """Resolves a plain filename against DEFAULT_MODEL_DIR; other paths are used as is."""
+    if os.path.dirname(model_path) == "" and DEFAULT_MODEL_DIR:
+        return os.path.join(DEFAULT_MODEL_DIR, model_path)
+    return model_path
+
+def script_for_inference(model):
+    """A frozen TorchScript version of an eval-mode model, for faster CPU inference."""
+    return torch.jit.freeze(torch.jit.script(model.eval()))
+
+def load_inference_assets(model_path):
+    """
+    Loads a saved model for inference only: weights on CPU in eval mode, plus
+    encoders and scaler. The optimizer state stored alongside is not rebuilt.
+
+    Returns the assets dict used by `get_loaded_model_assets`, or None if the
+    model file is missing or unreadable. `runner` is what inference should call:
+    the model itself, or its TorchScript version when INFERENCE_BACKEND says so.
+    """
+    if not os.path.exists(model_path):
+        logger.error(f"Model file not found at {model_path}")
+        return None
+    model_dir = os.path.dirname(model_path)
+    try:
+        state = torch.load(model_path, map_location="cpu", weights_only=False)
+        model_params = state['model_params']
+        model = PredictiveModel(
+            input_dim=model_params['input_dim'], hidden_dim=model_params['hidden_dim'],
+            output_dim=model_params['output_dim'], num_layers=model_params['num_layers'],
+            dropout_prob=model_params.get('dropout_prob', 0.2)
+        )
+        model.load_state_dict(state['model_state_dict'])
+        model.eval()
+        encoders = {}
+        for key, filename in ENCODER_FILES.items():
+            path = os.path.join(model_dir, filename)
+            encoders[key] = joblib.load(path) if os.path.exists(path) else None
+        scaler_path = os.path.join(model_dir, SCALER_FILE)
+        scaler = joblib.load(scaler_path) if os.path.exists(scaler_path) else None
+        runner = script_for_inference(model) if INFERENCE_BACKEND == "torchscript" else model
+    except Exception as e:
+        logger.error(f"Error loading model from {model_path}: {e}")
+        return None
+    return {
+        "model": model, "runner": runner, "encoders": encoders, "scaler": scaler, "model_params": model_params,
+        "sequence_length": model_params.get('sequence_length', 10),
+        "model_path": model_path
+    }
+
 # --- Prediction/Inference ---
-_cached_model_assets = None
 
 # Wrapper function for compatibility with router imports
 def load_model(model_path_base=PRIMARY_MODEL_PATH):
@@ -204,29 +602,18 @@ def load_model(model_path_base=PRIMARY_MODEL_PATH):
     return load_model_components(model_path)
 
 def get_loaded_model_assets(model_path=PRIMARY_MODEL_PATH):
-    global _cached_model_assets
-    
-    # Determine the effective path (resolving via DEFAULT_MODEL_DIR if path is a plain filename)
-    effective_model_path = model_path
-    if os.path.dirname(effective_model_path) == "" and DEFAULT_MODEL_DIR:
-        effective_model_path = os.path.join(DEFAULT_MODEL_DIR, effective_model_path)
-
-    # Cache validation: if model path changed or cache empty
-    if _cached_model_assets is None or _cached_model_assets.get("model_path") != effective_model_path:
-        logger.info(f"Loading model assets from: {effective_model_path}")
-        loaded_model, _, loaded_encoders, loaded_scaler, model_params = load_model_components(effective_model_path)
-        if loaded_model and loaded_encoders and loaded_scaler and model_params: # Ensure model_params is also checked
-            loaded_model.eval()
-            _cached_model_assets = {
-                "model": loaded_model, "encoders": loaded_encoders, "scaler": loaded_scaler,
-                "sequence_length": model_params.get('sequence_length', 10), # Correctly from model_params
-                "model_path": effective_model_path # Store resolved path for cache validation
-            }
-        else:
-            logger.error(f"Failed to load model assets from {effective_model_path}. Predictions cannot be made.")
-            _cached_model_assets = None # Ensure cache is cleared on failure
-            return None # Explicitly return None on failure
-    return _cached_model_assets
+    """
+    Returns the inference assets for a saved model from the in-process model
+    registry, loading them on first use or after the files change. Returns None
+    if the model can't be loaded or has no scaler.
+    """
+    from .model_registry import model_registry
+
+    assets = model_registry.get(resolve_model_path(model_path))
+    if assets is None or assets["scaler"] is None:
+        logger.error(f"Failed to load model assets from {model_path}. Predictions cannot be made.")
+        return None
+    return assets
 
 # Function to prepare data for predictive modeling
 def prepare_predictive_data(df, sequence_length=10):
@@ -14,6 +14,7 @@ from ..auth.auth_dependencies import get_current_active_user
 from ..models.user import User
 from ..models.user_setting import UserSetting
 from ..schemas.user_schemas import User as UserResponse
+from ..auth.principal_cache import principal_cache
 from ..crud import user_crud
 from ..crud.user_setting_crud import get_user_setting, create_user_setting, update_user_setting, delete_user_setting
 
@@ -90,13 +91,11 @@ async def perform_user_action(
             raise HTTPException(status_code=404, detail="User not found")
         
         if action == "activate":
-            user.is_active = True
-            db.commit()
+            user_crud.set_user_active(db, user, True)
             return {"message": "User activated successfully"}
             
         elif action == "deactivate":
-            user.is_active = False
-            db.commit()
+            user_crud.set_user_active(db, user, False)
             return {"message": "User deactivated successfully"}
             
         elif action == "update":
@@ -106,11 +105,11 @@ async def perform_user_action(
                 if hasattr(user, key):
                     setattr(user, key, value)
             db.commit()
+            principal_cache.invalidate_user(user.id)
             return {"message": "User updated successfully"}
             
         elif action == "delete":
-            db.delete(user)
-            db.commit()
+            user_crud.delete_user(db, user.id)
             return {"message": "User deleted successfully"}
             
         elif action == "reset_password":
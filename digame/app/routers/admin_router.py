@@ -5,6 +5,7 @@ from typing import List, Dict, Any
 from datetime import datetime, timedelta
 
 from ..db import get_db
+from ..crud import user_crud
 from ..models.user import User
 from ..models.activity import Activity
 from ..models.anomaly import DetectedAnomaly
@@ -119,8 +120,7 @@ async def activate_user(
             detail="User not found"
         )
     
-    user.is_active = True
-    db.commit()
+    user_crud.set_user_active(db, user, True)
     
     return {"message": f"User {user.username} activated successfully"}
 
@@ -145,8 +145,7 @@ async def suspend_user(
             detail="Cannot suspend your own account"
         )
     
-    user.is_active = False
-    db.commit()
+    user_crud.set_user_active(db, user, False)
     
     return {"message": f"User {user.username} suspended successfully"}
 
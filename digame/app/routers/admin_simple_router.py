@@ -12,6 +12,7 @@ import logging
 from ..db import get_db
 from ..auth.auth_dependencies import get_current_active_user
 from ..models.user import User
+from ..crud import user_crud
 
 logger = logging.getLogger(__name__)
 
@@ -61,18 +62,15 @@ async def perform_user_action(
             raise HTTPException(status_code=404, detail="User not found")
         
         if action == "activate":
-            user.is_active = True
-            db.commit()
+            user_crud.set_user_active(db, user, True)
             return {"message": "User activated successfully"}
             
         elif action == "deactivate":
-            user.is_active = False
-            db.commit()
+            user_crud.set_user_active(db, user, False)
             return {"message": "User deactivated successfully"}
             
         elif action == "delete":
-            db.delete(user)
-            db.commit()
+            user_crud.delete_user(db, user.id)
             return {"message": "User deleted successfully"}
             
         else:
@@ -74,7 +74,7 @@ async def register_user(
     - **last_name**: Optional last name
     """
     try:
-        user, tokens = auth_service.register_user(db, user_data)
+        user, tokens = await auth_service.register_user(db, user_data)
         
         return UserRegistrationResponse(
             user=user,
@@ -101,7 +101,7 @@ async def login_user(
     - **password**: User password
     """
     try:
-        user, tokens = auth_service.authenticate_user(
+        user, tokens = await auth_service.authenticate_user(
             db, 
             form_data.username, 
             form_data.password
@@ -122,7 +122,8 @@ async def login_user(
 
 @router.post("/refresh", response_model=TokenResponse)
 async def refresh_access_token(
-    refresh_request: RefreshTokenRequest
+    refresh_request: RefreshTokenRequest,
+    db: Session = Depends(get_db)
 ) -> TokenResponse:
     """
     Refresh access token using refresh token
@@ -130,7 +131,7 @@ async def refresh_access_token(
     - **refresh_token**: Valid refresh token
     """
     try:
-        new_tokens = auth_service.refresh_token(refresh_request.refresh_token)
+        new_tokens = auth_service.refresh_token(refresh_request.refresh_token, db)
         return TokenResponse(**new_tokens)
     except HTTPException:
         raise
@@ -203,7 +204,7 @@ async def confirm_password_reset(
     - **new_password**: New password
     """
     try:
-        success = auth_service.reset_password(
+        success = await auth_service.reset_password(
             db, 
             reset_data.token, 
             reset_data.new_password
@@ -238,7 +239,7 @@ async def change_password(
     - **new_password**: New password
     """
     try:
-        success = auth_service.change_password(
+        success = await auth_service.change_password(
             db,
             getattr(current_user, 'id'),
             password_data.current_password,
@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
 from typing import List, Any, Optional, Dict
@@ -7,7 +8,8 @@ from sqlalchemy.orm import Session
 # Import services and models - avoid circular imports
 # Instead of importing the behavior module directly, import specific functions from behavior_service
 from ..services.behavior_service import (
-    train_and_save_behavior_model,
+    assign_patterns_incremental,
+    train_behavior_model_summary,
     get_behavior_patterns_for_user,
     get_latest_behavior_model_for_user
 )
@@ -18,6 +20,8 @@ from ..models.behavior_model import BehavioralModel # For type hinting
 # Import PermissionChecker and dependencies
 from ..auth.auth_dependencies import PermissionChecker, get_current_active_user
 from ..db import get_db # Import get_db directly from the db module
+from ..services.job_queue import enqueue_job, start_inline_job
+from .. import compute_executor
 
 router = APIRouter(
     tags=["Behavior Recognition"],
@@ -28,8 +32,10 @@ class BehaviorTrainingRequest(BaseModel):
     user_id: int # Specify for which user to train, admin might do this
     n_clusters: Optional[int] = None # Default is None to use automatic optimization
     include_enriched_features: bool = True # Whether to include enriched features
-    algorithm: str = "kmeans" # Options: "kmeans", "dbscan", "hierarchical"
+    algorithm: str = "kmeans" # Options: "kmeans", "dbscan", "hdbscan", "hierarchical"
     auto_optimize: bool = True # Whether to automatically optimize the number of clusters
+    background: bool = False # Return immediately with a job_id to poll instead of waiting
+    online: bool = False # Update the latest model with only the activities logged since it was built
 
 class BehaviorTrainingResponse(BaseModel):
     user_id: int
@@ -39,9 +45,18 @@ class BehaviorTrainingResponse(BaseModel):
     silhouette_score: Optional[float] = None
     algorithm: Optional[str] = None  # The algorithm used for clustering
     auto_optimized: Optional[bool] = None  # Whether the number of clusters was automatically optimized
+    job_id: Optional[int] = None  # Training job; poll GET /api/jobs/{job_id} for its status
     # Optionally, return a sample of data with clusters, or store it and provide an ID
     # For now, keeping it simple
 
+class PatternAssignmentResponse(BaseModel):
+    user_id: int
+    status: str
+    message: Optional[str] = None
+    model_id: Optional[int] = None
+    assigned: int = 0  # New activities assigned to the model's patterns
+    pattern_counts: Dict[int, int] = {}  # Activities added per pattern label
+
 class ActivityPatternResponse(BaseModel):
     activity_id: int
     timestamp: Any # datetime
@@ -84,39 +99,86 @@ async def train_behavior_model_for_user(
 
     user_id = training_request.user_id
     
-    # Train and save the behavior model using the persistent storage service
-    db_model, result_status, error_message = train_and_save_behavior_model(
-        db=db,
-        user_id=user_id,
-        n_clusters=training_request.n_clusters,
-        include_enriched_features=training_request.include_enriched_features,
-        algorithm=training_request.algorithm,
-        auto_optimize=training_request.auto_optimize,
-        name=f"Behavioral Model for User {user_id}"
-    )
+    training_parameters = {
+        "n_clusters": training_request.n_clusters,
+        "include_enriched_features": training_request.include_enriched_features,
+        "algorithm": training_request.algorithm,
+        "auto_optimize": training_request.auto_optimize,
+        "online": training_request.online,
+        "name": f"Behavioral Model for User {user_id}"
+    }
     
-    if result_status == "failed":
+    if training_request.background:
+        # Durable: picked up by a `digame-worker`, survives API restarts
+        job = await compute_executor.run_in_thread(
+            enqueue_job, db, user_id, "model_training", payload=training_parameters
+        )
         return BehaviorTrainingResponse(
             user_id=user_id,
-            status="failed",
-            message=error_message
+            status="pending",
+            message=f"Behavior model training queued; poll /api/jobs/{job.id} for its status.",
+            algorithm=training_request.algorithm,
+            auto_optimized=training_request.auto_optimize,
+            job_id=job.id
         )
     
-    # Handle the case where db_model might be None
-    clusters_found = getattr(db_model, 'num_clusters', None)
-    silhouette = getattr(db_model, 'silhouette_score', None)
-    algorithm_used = getattr(db_model, 'algorithm', training_request.algorithm)
+    # Training is CPU-bound: run it as a tracked job in the process pool so the
+    # event loop keeps serving other requests meanwhile. The job is created
+    # running and leased to this process, so queue workers leave it alone and
+    # the reaper fails it if this process dies.
+    job = await compute_executor.run_in_thread(start_inline_job, db, user_id, "model_training")
+    future = compute_executor.submit_job(job.id, train_behavior_model_summary, user_id=user_id, **training_parameters)
+    
+    try:
+        summary = await asyncio.wrap_future(future)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error during behavior model training: {str(e)}"
+        )
+    
+    if summary["status"] == "failed":
+        return BehaviorTrainingResponse(
+            user_id=user_id,
+            status="failed",
+            message=summary["message"],
+            job_id=job.id
+        )
     
     return BehaviorTrainingResponse(
         user_id=user_id,
         status="success",
-        message="Behavior model training completed and saved to database.",
-        clusters_found=clusters_found,
-        silhouette_score=silhouette,
-        algorithm=algorithm_used,
-        auto_optimized=training_request.auto_optimize
+        message=summary["message"],
+        clusters_found=summary["num_clusters"],
+        silhouette_score=summary["silhouette_score"],
+        algorithm=summary["algorithm"],
+        auto_optimized=training_request.auto_optimize,
+        job_id=job.id
     )
 
+@router.post("/assign",
+             response_model=PatternAssignmentResponse,
+             dependencies=[Depends(PermissionChecker("train_own_behavior_model"))])
+async def assign_new_activities_to_patterns(
+    user_id: int,
+    model_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: "SQLAlchemyUser" = Depends(get_current_active_user)
+):
+    """
+    Assigns activities logged since the user's behavior model was trained to its
+    existing patterns, updating their sizes and distributions without retraining.
+    Requires 'train_own_behavior_model' permission.
+    """
+    if current_user.id != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to update behavior patterns for this user."
+        )
+
+    result = await compute_executor.run_in_thread(assign_patterns_incremental, db, user_id, model_id)
+    return PatternAssignmentResponse(user_id=user_id, **result)
+
 @router.get("/patterns",
             response_model=List[ActivityPatternResponse],
             dependencies=[Depends(PermissionChecker("view_own_behavior_patterns"))])
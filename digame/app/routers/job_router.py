@@ -1,70 +1,67 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
 from ..db import get_db
 from ..models.user import User as SQLAlchemyUser
-from ..auth.auth_dependencies import get_current_active_user
-from ..crud.job_crud import create_job, get_job_by_id, get_jobs_for_user, update_job_status
+from ..auth.auth_dependencies import MANAGE_RBAC_PERMISSION, get_current_active_user
+from ..crud.job_crud import get_job_by_id, get_jobs_for_user
 from ..schemas.job_schemas import Job, JobCreate, JobResponse, JobUpdate
 
-# Import the services that will be run asynchronously
-from ..services.behavior_service import train_behavioral_model
+# Jobs are run by `digame-worker` processes from the durable queue
+from ..services.job_queue import enqueue_job
+from ..services.rbac_service import user_has_permission
 
 router = APIRouter(
     tags=["jobs"],
 )
 
+# Handler parameters clients may set for each job type; anything else is ignored
+JOB_PARAMETERS = {
+    "model_training": {"n_clusters", "algorithm", "auto_optimize", "include_enriched_features", "online"},
+    "predictive_training": {"sequence_length", "hidden_dim", "num_layers", "epochs", "learning_rate"},
+    "pattern_assignment": {"model_id"},
+    # Clients only suggest for themselves; tenant/fleet runs are enqueued by the scheduler
+    "task_suggestion": set(),
+}
+
 
 @router.post("/jobs", response_model=JobResponse)
 async def create_new_job(
     job_create: JobCreate,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: SQLAlchemyUser = Depends(get_current_active_user)
 ):
     """
-    Create a new job and start it in the background.
+    Create a new job and queue it for the workers.
+
+    The queue is shared by all users and ordered by priority first, so only
+    administrators may queue jobs ahead of the default priority of 0.
     """
-    # Create a job record
-    job = create_job(
-        db=db,
-        user_id=current_user.id,
-        job_type=job_create.job_type,
-        status="pending",
-        progress=0.0
-    )
-    
-    # Start the job in the background based on job_type
-    if job_create.job_type == "model_training":
-        # Extract parameters from job_create.result if provided
-        params = job_create.result or {}
-        
-        # Start the training in the background
-        background_tasks.add_task(
-            train_model_async,
-            db=db,
-            user_id=current_user.id,
-            job_id=job.id,
-            **params
-        )
-        
-        return {"job": job, "message": "Model training started in background"}
-    
-    # Add more job types here as needed
-    
-    else:
-        # Update job status to failed for unsupported job type
-        update_job_status(
-            db=db,
-            job_id=job.id,
-            status="failed",
-            error=f"Unsupported job type: {job_create.job_type}"
-        )
+    if job_create.job_type not in JOB_PARAMETERS:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Unsupported job type: {job_create.job_type}"
         )
+    if job_create.priority > 0 and not user_has_permission(user=current_user, permission_name=MANAGE_RBAC_PERMISSION):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only administrators can queue jobs with a priority above 0"
+        )
+    
+    # Parameters come from job_create.payload (or job_create.result, for older clients)
+    params = job_create.payload or job_create.result or {}
+    allowed = JOB_PARAMETERS[job_create.job_type]
+    
+    job = enqueue_job(
+        db,
+        user_id=current_user.id,
+        job_type=job_create.job_type,
+        payload={key: value for key, value in params.items() if key in allowed},
+        priority=job_create.priority
+    )
+    
+    return {"job": job, "message": "Job queued"}
 
 
 @router.get("/jobs/{job_id}", response_model=Job)
@@ -109,69 +106,3 @@ async def get_jobs(
         job_type=job_type,
         status=status
     )
-
-
-# Asynchronous task functions
-
-async def train_model_async(
-    db: Session,
-    user_id: int,
-    job_id: int,
-    **kwargs
-):
-    """
-    Train a behavioral model asynchronously.
-    
-    This function is called by the background task worker and updates the job
-    status as it progresses.
-    """
-    try:
-        # Update job status to running
-        update_job_status(db, job_id, "running", progress=10)
-        
-        # Extract parameters
-        n_clusters = kwargs.get("n_clusters", 5)
-        algorithm = kwargs.get("algorithm", "kmeans")
-        auto_optimize = kwargs.get("auto_optimize", True)
-        include_enriched_features = kwargs.get("include_enriched_features", True)
-        
-        # Update progress
-        update_job_status(db, job_id, "running", progress=20)
-        
-        # Train the model
-        result = train_behavioral_model(
-            db=db,
-            user_id=user_id,
-            n_clusters=n_clusters,
-            algorithm=algorithm,
-            auto_optimize=auto_optimize,
-            include_enriched_features=include_enriched_features
-        )
-        
-        # Update progress
-        update_job_status(db, job_id, "running", progress=90)
-        
-        # Update job status to completed
-        update_job_status(
-            db=db,
-            job_id=job_id,
-            status="completed",
-            progress=100,
-            result={
-                "model_id": result.id,
-                "num_clusters": result.num_clusters,
-                "algorithm": result.algorithm,
-                "silhouette_score": result.silhouette_score
-            }
-        )
-        
-    except Exception as e:
-        # Update job status to failed
-        update_job_status(
-            db=db,
-            job_id=job_id,
-            status="failed",
-            error=str(e)
-        )
-        # Re-raise the exception for logging
-        raise
\ No newline at end of file
@@ -1,21 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import List, Any
+from typing import List, Any, Optional
 
-# Assuming Session and other necessary imports from SQLAlchemy or your DB setup
 from sqlalchemy.orm import Session
 
 # Import PermissionChecker and a get_db dependency
 # (get_db might be defined in a common place like dependencies.py or borrowed for now)
 from ..auth.auth_dependencies import PermissionChecker
 from .admin_rbac_router import get_db # Placeholder: using get_db from another router
+from ..models.activity import Activity
+from ..models.user import User as SQLAlchemyUser
+from ..schemas.activity_schemas import ActivityBulkIngestResponse
+from ..services import activity_ingest_service
+from ..services.activity_feature_service import _parse_activity_details
 
 router = APIRouter(
     prefix="/monitoring",
     tags=["Monitoring"],
 )
 
-# --- Placeholder Schemas ---
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonlines")
+
+# --- Schemas ---
 class LogEntry(BaseModel):
     timestamp: str
     activity: str
@@ -25,39 +32,113 @@ class LogResponse(BaseModel):
     id: int
     entry: LogEntry
 
-# --- Placeholder Endpoints ---
+# --- Endpoints ---
 
-@router.post("/log", 
-             response_model=LogResponse, 
-             status_code=status.HTTP_201_CREATED,
-             dependencies=[Depends(PermissionChecker("log_own_digital_activity"))])
-async def log_digital_activity(log_entry: LogEntry, db: Session = Depends(get_db)):
+@router.post("/log",
+             response_model=LogResponse,
+             status_code=status.HTTP_201_CREATED)
+def log_digital_activity(
+    log_entry: LogEntry,
+    db: Session = Depends(get_db),
+    current_user: SQLAlchemyUser = Depends(PermissionChecker("log_own_digital_activity"))
+):
     """
-    Logs a digital activity for the current user.
+    Logs a single digital activity for the current user.
     Requires 'log_own_digital_activity' permission.
+    Agents sending more than a handful of events should use `/monitoring/activities/bulk`.
+    """
+    try:
+        row = activity_ingest_service.build_activity_row(current_user.id, log_entry.dict())
+    except activity_ingest_service.InvalidActivityEvent as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+    activity = Activity(**row)
+    db.add(activity)
+    db.commit()
+    db.refresh(activity)
+    return LogResponse(id=activity.id, entry=log_entry)
+
+@router.post("/activities/bulk",
+             response_model=ActivityBulkIngestResponse,
+             status_code=status.HTTP_200_OK)
+async def ingest_activities_bulk(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: SQLAlchemyUser = Depends(PermissionChecker("log_own_digital_activity"))
+):
     """
-    # Placeholder: In a real app, this would save to the database
-    # and associate with the current_user (from PermissionChecker or another dependency)
-    print(f"Activity logged: {log_entry.activity} by a user (details not shown here for placeholder).")
-    # Simulate creating a log entry and returning a response
-    # This would typically involve a CRUD operation.
-    # For now, just echoing back with a dummy ID.
-    return LogResponse(id=123, entry=log_entry)
-
-@router.get("/logs", 
-            response_model=List[LogResponse],
-            dependencies=[Depends(PermissionChecker("view_own_activity_logs"))])
-async def get_activity_logs(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    Ingests a batch of digital activities for the current user.
+    Requires 'log_own_digital_activity' permission.
+
+    The body is either a JSON array of events (or `{"activities": [...]}`), or an
+    NDJSON stream (`Content-Type: application/x-ndjson`, one event per line). NDJSON
+    bodies are consumed incrementally, so large uploads are never held in memory.
+    Events are committed in batches; the response acknowledges each batch so clients
+    can retry only the batches reported as `failed`. Events past the per-request
+    limit are not stored, and `truncated` tells the client to resend them.
+    """
+    user_id = current_user.id
+    batch_size = activity_ingest_service.INGEST_BATCH_SIZE
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+
+    if content_type in NDJSON_CONTENT_TYPES:
+        summary = activity_ingest_service.new_ingest_summary()
+        splitter = activity_ingest_service.NDJSONSplitter()
+        pending: List[Any] = []
+        async for chunk in request.stream():
+            pending.extend(splitter.feed(chunk))
+            while len(pending) >= batch_size:
+                batch, pending = pending[:batch_size], pending[batch_size:]
+                await run_in_threadpool(activity_ingest_service.ingest_into_summary, db, user_id, batch, summary)
+                if summary["truncated"]:
+                    # Over the event limit: the rest of the body is not read
+                    return summary
+        pending.extend(splitter.flush())
+        if pending:
+            await run_in_threadpool(activity_ingest_service.ingest_into_summary, db, user_id, pending, summary)
+        return summary
+
+    try:
+        payload = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Request body is not valid JSON")
+
+    events = payload.get("activities") if isinstance(payload, dict) else payload
+    if not isinstance(events, list):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Expected a JSON array of activities or an object with an 'activities' array"
+        )
+    return await run_in_threadpool(activity_ingest_service.ingest_activity_events, db, user_id, events)
+
+@router.get("/logs",
+            response_model=List[LogResponse])
+def get_activity_logs(
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_user: SQLAlchemyUser = Depends(PermissionChecker("view_own_activity_logs"))
+):
     """
-    Retrieves activity logs for the current user.
+    Retrieves activity logs for the current user, most recent first.
     Requires 'view_own_activity_logs' permission.
     """
-    # Placeholder: In a real app, this would fetch logs for the current_user
-    # from the database.
-    print(f"Fetching logs for a user (details not shown here for placeholder) with skip={skip}, limit={limit}.")
-    # Simulate returning a list of log entries
-    dummy_log_entry = LogEntry(timestamp="2024-08-15T10:00:00Z", activity="opened_app", details={"app_name": "DigameApp"})
+    activities = (
+        db.query(Activity)
+        .filter(Activity.user_id == current_user.id)
+        .order_by(Activity.timestamp.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
     return [
-        LogResponse(id=1, entry=dummy_log_entry),
-        LogResponse(id=2, entry=LogEntry(timestamp="2024-08-15T10:05:00Z", activity="viewed_dashboard"))
+        LogResponse(
+            id=activity.id,
+            entry=LogEntry(
+                timestamp=activity.timestamp.isoformat(),
+                activity=activity.activity_type,
+                details=_parse_activity_details(activity.details) or None,
+            ),
+        )
+        for activity in activities
     ]
@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import APIRouter, HTTPException, Body, Depends, Query, status
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
@@ -9,8 +10,8 @@ from typing import List, Dict, Any, Optional
 
 # Import specific functions to avoid circular imports
 from ..predictive import train_predictive_model as service_train_model
-from ..predictive import load_model as service_load_model
 from ..predictive import prepare_predictive_data
+from ..predictive import train_predictive_model_for_user
 
 # Define model paths directly to avoid circular imports
 MODEL_PATH_BASE = "models/predictive_model"
@@ -19,6 +20,10 @@ from ..models.user import User as SQLAlchemyUser # For current_user type hint
 from ..db import get_db # Import get_db from the shared db module
 from ..models.activity import Activity
 from ..models.activity_features import ActivityEnrichedFeature
+from ..services.job_queue import enqueue_job, start_inline_job
+from .. import compute_executor
+from ..model_registry import model_registry
+from ..inference_batcher import inference_batcher
 
 router = APIRouter(
     tags=["Predictive Modeling"]
@@ -36,6 +41,7 @@ class TrainRequest(BaseModel):
     sequence_length: int = 5
     hidden_size: int = 128
     num_layers: int = 2
+    background: bool = False # Return immediately with a job_id to poll instead of waiting
     # model_path_base: str = "models/predictive_model" # Base path for model artifacts
 
 class ActivityInput(BaseModel):
@@ -92,38 +98,43 @@ async def train_model_endpoint(
     # If it's "path/to/model_name.pth", save_model should use it as is.
     # For consistency, let's assume `model_path_base` is the name without extension, and .pth is standard.
     
-    try:
-        # Create a DataFrame for training
-        activities = db.query(Activity).filter(Activity.user_id == request_body.user_id).all()
-        if not activities:
-            raise HTTPException(status_code=404, detail=f"No activities found for user {request_body.user_id}")
-            
-        # Convert activities to DataFrame
-        activities_data = []
-        for activity in activities:
-            activities_data.append({
-                'user_id': activity.user_id,
-                'timestamp': activity.timestamp,
-                'activity_type': activity.activity_type,
-            })
-        
-        df_train = pd.DataFrame(activities_data)
-        
-        trained_model = service_train_model(
-            df_train=df_train,
-            sequence_length=request_body.sequence_length,
-            hidden_dim=request_body.hidden_size,
-            num_layers=request_body.num_layers,
-            epochs=request_body.num_epochs,
-            learning_rate=request_body.learning_rate,
-            model_path=model_path_base + ".pth" # Pass the full .pth path for clarity
+    user_id = request_body.user_id
+    has_activities = await compute_executor.run_in_thread(
+        lambda: db.query(Activity.id).filter(Activity.user_id == user_id).first() is not None
+    )
+    if not has_activities:
+        raise HTTPException(status_code=404, detail=f"No activities found for user {user_id}")
+
+    training_parameters = {
+        "model_path": model_path_base + ".pth", # Pass the full .pth path for clarity
+        "sequence_length": request_body.sequence_length,
+        "hidden_dim": request_body.hidden_size,
+        "num_layers": request_body.num_layers,
+        "epochs": request_body.num_epochs,
+        "learning_rate": request_body.learning_rate
+    }
+    if request_body.background:
+        # Durable: picked up by a `digame-worker`, survives API restarts
+        job = await compute_executor.run_in_thread(
+            enqueue_job, db, user_id, "predictive_training", payload=training_parameters
         )
-        if trained_model is None:
-            raise HTTPException(status_code=500, detail="Model training failed or not enough data.")
-        return {"message": f"Model training initiated/completed for user {request_body.user_id}. Artifacts at ~{model_path_base}"}
+        return {"message": f"Model training queued for user {user_id}; poll /api/jobs/{job.id} for its status.", "job_id": job.id}
+
+    # LSTM training is CPU-bound: run it as a tracked job in the process pool so the
+    # event loop keeps serving other requests meanwhile. The job is created
+    # running and leased to this process, so queue workers leave it alone and
+    # the reaper fails it if this process dies.
+    job = await compute_executor.run_in_thread(start_inline_job, db, user_id, "predictive_training")
+    future = compute_executor.submit_job(job.id, train_predictive_model_for_user, user_id=user_id, **training_parameters)
+
+    try:
+        summary = await asyncio.wrap_future(future)
     except Exception as e:
         # Log e
         raise HTTPException(status_code=500, detail=f"Error during model training: {str(e)}")
+    if summary["status"] == "failed":
+        raise HTTPException(status_code=500, detail=summary["message"])
+    return {"message": f"Model training initiated/completed for user {user_id}. Artifacts at ~{model_path_base}", "job_id": job.id}
 
 
 @router.post("/predict", 
@@ -145,12 +156,13 @@ async def predict_endpoint(
     user_id = request_body.user_id
     model_path_base = DEFAULT_MODEL_PATH_TEMPLATE.format(user_id=user_id)
     
-    # 1. Load model, encoders, scaler, and model parameters
-    model, _, encoders, scaler, model_params = service_load_model(model_path_base=model_path_base)
+    # 1. Load model, encoders, scaler, and model parameters (cached in the model registry)
+    assets = model_registry.get(model_path_base + ".pth")
     
-    if model is None or encoders is None or scaler is None or model_params is None:
+    if assets is None or assets["scaler"] is None:
         raise HTTPException(status_code=404, detail=f"Model for user {user_id} not found or artifacts incomplete. Please train the model first.")
 
+    encoders, scaler, model_params = assets["encoders"], assets["scaler"], assets["model_params"]
     sequence_length = model_params.get("sequence_length", 5) # Get from loaded params
     fitted_categories = model_params.get("fitted_categories", {})
 
@@ -247,21 +259,16 @@ async def predict_endpoint(
     feature_columns = NUMERICAL_FEATURES + CATEGORICAL_FEATURES
     processed_input_features = input_df[feature_columns].values
     
-    sequence_tensor = torch.tensor(np.array([processed_input_features]), dtype=torch.float32) # Batch size of 1
-
-    # 3. Make prediction
-    model.eval() # Set model to evaluation mode
-    with torch.no_grad():
-        try:
-            output_logits = model(sequence_tensor)
-            # output_probs = torch.softmax(output_logits, dim=1) # If confidence is needed
-            # confidence, predicted_idx = torch.max(output_probs, dim=1)
-            predicted_idx = torch.argmax(output_logits, dim=1).item()
-        except Exception as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Error during prediction: {str(e)}"
-            )
+    # 3. Make prediction; concurrent requests for the same model share one batched forward pass
+    try:
+        output_logits = await inference_batcher.predict(assets, processed_input_features.astype(np.float32))
+        # output_probs = torch.softmax(torch.from_numpy(output_logits), dim=0) # If confidence is needed
+        predicted_idx = int(np.argmax(output_logits))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error during prediction: {str(e)}"
+        )
 
     # 4. Decode prediction
     # The `activity_type` encoder is needed here.
@@ -284,3 +291,14 @@ async def predict_endpoint(
         predicted_next_activity_type=predicted_activity_type_str
         # confidence=confidence.item() if confidence is not None else None
     )
+
+
+@router.get("/registry/stats",
+            dependencies=[Depends(PermissionChecker("admin_access"))])
+async def model_registry_stats():
+    """
+    Cache statistics of this process's predictive model registry (hit rate, load latency, evictions)
+    and inference batching.
+    Requires 'admin_access' permission.
+    """
+    return {**model_registry.stats(), "batching": inference_batcher.stats()}
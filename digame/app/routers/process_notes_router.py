@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Path, Body
+from fastapi import APIRouter, Depends, HTTPException, status, Path, Body, Query
 from sqlalchemy.orm import Session
 from typing import List
 
@@ -28,11 +28,15 @@ PERMISSION_ADD_FEEDBACK_OWN_PROCESS_NOTES = "add_feedback_own_process_notes"
              dependencies=[Depends(PermissionChecker(PERMISSION_TRIGGER_OWN_PROCESS_DISCOVERY))])
 async def trigger_process_discovery_for_user(
     user_id: int = Path(..., description="The ID of the user to trigger process discovery for"),
+    full_rescan: bool = Query(False, description="Mine the whole history instead of only activities since the last run"),
     db: Session = Depends(get_db),
     current_user: SQLAlchemyUser = Depends(get_current_active_user) # To check ownership
 ):
     """
     Triggers the process discovery service for a specific user.
+    Only activities logged since the previous run are mined unless `full_rescan` is set,
+    so results are approximate: processes that recur only across many runs are found
+    by the next full run, which happens at least every `FULL_RESCAN_INTERVAL` (a week).
     Requires 'trigger_own_process_discovery' permission.
     The authenticated user must match the user_id in the path.
     """
@@ -46,7 +50,9 @@ async def trigger_process_discovery_for_user(
         )
 
     try:
-        new_notes, updated_notes = process_note_service.identify_and_update_process_notes(db, user_id=user_id)
+        new_notes, updated_notes = process_note_service.identify_and_update_process_notes(
+            db, user_id=user_id, full_rescan=full_rescan
+        )
         return process_note_schemas.ProcessDiscoveryResponse(
             message=f"Process discovery triggered for user {user_id}.",
             user_id=user_id,
@@ -268,7 +268,7 @@ async def authenticate_user(
     Authenticate a user within a specific tenant
     """
     user_service = UserService(db)
-    user = user_service.authenticate_user(username, password, tenant_id)
+    user = await user_service.authenticate_user(username, password, tenant_id)
     
     if not user:
         raise HTTPException(
@@ -321,7 +321,7 @@ async def change_password(
     Change user password
     """
     user_service = UserService(db)
-    success = user_service.change_password(user_id, old_password, new_password)
+    success = await user_service.change_password(user_id, old_password, new_password)
     
     if not success:
         raise HTTPException(
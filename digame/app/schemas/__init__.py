@@ -9,6 +9,7 @@ from .task_schemas import TaskBase, TaskCreate, TaskUpdate, TaskResponse # Added
 from .user_setting_schemas import UserSettingBase, UserSettingCreate, UserSettingUpdate, UserSetting # Import new UserSetting schemas
 from .onboarding_schemas import OnboardingDataBase, OnboardingDataCreate, OnboardingDataUpdate, OnboardingDataResponse, OnboardingStep # Import new onboarding schemas
 from .notification_schemas import Notification, NotificationCreate, NotificationUpdate # Import new notification schemas
+from .activity_schemas import ActivityBatchAcknowledgement, ActivityBulkIngestResponse
 
 __all__ = [
     "RoleCreate", "RoleResponse",
@@ -24,6 +25,7 @@ __all__ = [
     "UserSettingBase", "UserSettingCreate", "UserSettingUpdate", "UserSetting", # Add UserSetting schemas to __all__
     "OnboardingDataBase", "OnboardingDataCreate", "OnboardingDataUpdate", "OnboardingDataResponse", "OnboardingStep", # Add onboarding schemas to __all__
     "Notification", "NotificationCreate", "NotificationUpdate", # Add notification schemas to __all__
+    "ActivityBatchAcknowledgement", "ActivityBulkIngestResponse",
     "writing_assistance_schemas",
 ]
 
@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+from typing import List
+
+
+class ActivityBatchAcknowledgement(BaseModel):
+    batch: int # Zero-based index of the batch within the request
+    offset: int # Position of the batch's first event within the request
+    accepted: int
+    rejected: int
+    status: str # "committed", "failed" or "rejected"
+    errors: List[str] = []
+
+
+class ActivityBulkIngestResponse(BaseModel):
+    accepted: int
+    rejected: int
+    truncated: bool = False # The event limit was hit; events after it were neither read nor stored
+    batches: List[ActivityBatchAcknowledgement] = []
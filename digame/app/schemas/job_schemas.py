@@ -1,6 +1,10 @@
 from typing import Optional, Dict, Any
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+# Priorities clients may request; only administrators may go above 0 (see job_router)
+MIN_JOB_PRIORITY = -10
+MAX_JOB_PRIORITY = 10
 
 
 class JobBase(BaseModel):
@@ -14,7 +18,8 @@ class JobBase(BaseModel):
 
 class JobCreate(JobBase):
     """Schema for creating a new job."""
-    pass
+    payload: Optional[Dict[str, Any]] = None
+    priority: int = Field(0, ge=MIN_JOB_PRIORITY, le=MAX_JOB_PRIORITY)
 
 
 class JobUpdate(BaseModel):
@@ -29,6 +34,9 @@ class Job(JobBase):
     """Schema for job response."""
     id: int
     user_id: int
+    priority: int = 0
+    attempts: int = 0
+    run_after: Optional[datetime] = None
     created_at: datetime
     updated_at: datetime
 
@@ -12,13 +12,24 @@ from .process_note_service import (
 
 from .activity_feature_service import ( 
     generate_features_for_activity,
-    generate_features_for_user_activities
+    generate_features_for_user_activities,
+    stream_enrich_user_activities
 )
 
 from .anomaly_service import ( # Added new service
     calculate_hourly_activity_baselines,
     check_activity_for_anomalies,
-    detect_frequency_anomalies_for_user
+    detect_frequency_anomalies_for_user,
+    detect_frequency_anomalies_for_users
+)
+
+from .activity_baseline_service import (
+    record_enriched_activities,
+    rebuild_activity_baselines
+)
+
+from .job_queue import (
+    enqueue_job
 )
 
 __all__ = [
@@ -28,9 +39,14 @@ __all__ = [
     "identify_and_update_process_notes",
     "generate_features_for_activity", 
     "generate_features_for_user_activities",
+    "stream_enrich_user_activities",
     "calculate_hourly_activity_baselines", # Added new function
     "check_activity_for_anomalies",        # Added new function
     "detect_frequency_anomalies_for_user", # Added new function
+    "detect_frequency_anomalies_for_users",
+    "record_enriched_activities",
+    "rebuild_activity_baselines",
+    "enqueue_job",
     "writing_assistance_service",
 ]
 
@@ -0,0 +1,185 @@
+"""
+Persisted, incrementally maintained hourly activity baselines.
+
+A baseline slot (user x category_type x category x weekday x hour) stores the
+number of observed (date, hour) buckets plus the sum and sum of squares of their
+activity counts. Enrichment calls `record_enriched_activities` with each batch
+of newly enriched activities; the affected hourly buckets are bumped and the
+change in each bucket's count is folded into its slot, so mean and standard
+deviation stay exact without rescanning history. Both are incremented with
+upserts, so concurrent updates for a user add up rather than overwrite.
+"""
+
+from collections import Counter, defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from ..models.activity import Activity
+from ..models.activity_features import ActivityEnrichedFeature
+from ..models.activity_baseline import ActivityBaseline, ActivityHourlyCount
+
+CATEGORY_TYPES = ("app_category", "website_category")
+
+# Rows streamed per round-trip when rebuilding baselines from history
+REBUILD_FETCH_SIZE = 10000
+
+BucketKey = Tuple[str, str, date, int] # (category_type, category, bucket_date, hour)
+SlotKey = Tuple[str, str, int, int] # (category_type, category, day_of_week, hour)
+
+# Dialect INSERTs with ON CONFLICT ... DO UPDATE, used to increment counts in place
+_UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def _bucket_deltas(activities: Iterable[Tuple[datetime, Optional[str], Optional[str]]]) -> Counter:
+    deltas: Counter = Counter()
+    for timestamp, app_category, website_category in activities:
+        bucket_date, hour = timestamp.date(), timestamp.hour
+        if app_category:
+            deltas[("app_category", app_category, bucket_date, hour)] += 1
+        if website_category:
+            deltas[("website_category", website_category, bucket_date, hour)] += 1
+    return deltas
+
+
+def _upsert_insert(db: Session):
+    dialect = db.get_bind().dialect.name
+    if dialect not in _UPSERT_INSERTS:
+        raise NotImplementedError(f"Activity baselines need INSERT ... ON CONFLICT, which {dialect} doesn't support")
+    return _UPSERT_INSERTS[dialect]
+
+
+def _apply_bucket_deltas(db: Session, user_id: int, deltas: Counter) -> None:
+    if not deltas:
+        return
+    upsert = _upsert_insert(db)
+
+    # Counts and sums are incremented in the database rather than read, changed and
+    # written back, so concurrent enrichment of the same user (API and worker)
+    # can't overwrite each other. Keys are sorted so concurrent upserts lock rows
+    # in the same order.
+    buckets = ActivityHourlyCount.__table__
+    bucket_key = [buckets.c.category_type, buckets.c.category, buckets.c.bucket_date, buckets.c.hour]
+    bump_buckets = upsert(buckets)
+    bump_buckets = bump_buckets.on_conflict_do_update(
+        index_elements=[buckets.c.user_id, *bucket_key],
+        set_={"activity_count": buckets.c.activity_count + bump_buckets.excluded.activity_count},
+    ).returning(*bucket_key, buckets.c.activity_count)
+    new_counts: Dict[BucketKey, int] = {
+        (row.category_type, row.category, row.bucket_date, row.hour): row.activity_count
+        for row in db.execute(bump_buckets, [
+            {"user_id": user_id, "category_type": category_type, "category": category,
+             "bucket_date": bucket_date, "hour": hour, "activity_count": added}
+            for (category_type, category, bucket_date, hour), added in sorted(deltas.items())
+        ])
+    }
+
+    # Per slot: [new buckets, added activities, change in sum of squared bucket counts]
+    slot_deltas: Dict[SlotKey, List[float]] = defaultdict(lambda: [0, 0.0, 0.0])
+    for key, added in deltas.items():
+        category_type, category, bucket_date, hour = key
+        new_count = new_counts[key]
+        old_count = new_count - added
+        slot = slot_deltas[(category_type, category, bucket_date.weekday(), hour)]
+        slot[0] += 0 if old_count else 1
+        slot[1] += added
+        slot[2] += new_count * new_count - old_count * old_count
+
+    baselines = ActivityBaseline.__table__
+    bump_slots = upsert(baselines)
+    bump_slots = bump_slots.on_conflict_do_update(
+        index_elements=[baselines.c.user_id, baselines.c.category_type, baselines.c.category,
+                        baselines.c.day_of_week, baselines.c.hour],
+        set_={
+            "sample_count": baselines.c.sample_count + bump_slots.excluded.sample_count,
+            "count_sum": baselines.c.count_sum + bump_slots.excluded.count_sum,
+            "count_sum_sq": baselines.c.count_sum_sq + bump_slots.excluded.count_sum_sq,
+            # ON CONFLICT updates don't run the column's onupdate
+            "updated_at": func.now(),
+        },
+    )
+    db.execute(bump_slots, [
+        {"user_id": user_id, "category_type": category_type, "category": category,
+         "day_of_week": day_of_week, "hour": hour, "sample_count": int(new_samples),
+         "count_sum": added_sum, "count_sum_sq": added_sum_sq}
+        for (category_type, category, day_of_week, hour), (new_samples, added_sum, added_sum_sq)
+        in sorted(slot_deltas.items())
+    ])
+
+
+def record_enriched_activities(
+    db: Session,
+    user_id: int,
+    activities: Iterable[Tuple[datetime, Optional[str], Optional[str]]]
+) -> None:
+    """
+    Folds newly enriched activities, given as `(timestamp, app_category, website_category)`,
+    into the user's hourly buckets and baseline slots.
+
+    Runs in the caller's transaction; the caller commits. Each activity must be
+    recorded exactly once, which enrichment guarantees by only creating features
+    for activities that have none.
+    """
+    _apply_bucket_deltas(db, user_id, _bucket_deltas(activities))
+
+
+def rebuild_activity_baselines(db: Session, user_id: int) -> int:
+    """
+    Recomputes a user's buckets and baselines from their full enriched history.
+
+    Used to backfill users enriched before baselines were persisted, or to repair
+    them. Streams the history instead of loading it whole. Commits. Returns the
+    number of activities counted.
+    """
+    db.query(ActivityBaseline).filter(ActivityBaseline.user_id == user_id).delete()
+    db.query(ActivityHourlyCount).filter(ActivityHourlyCount.user_id == user_id).delete()
+
+    result = db.execute(
+        select(Activity.timestamp, ActivityEnrichedFeature.app_category, ActivityEnrichedFeature.website_category)
+        .join(ActivityEnrichedFeature, Activity.id == ActivityEnrichedFeature.activity_id)
+        .where(Activity.user_id == user_id)
+        .execution_options(yield_per=REBUILD_FETCH_SIZE)
+    )
+    deltas: Counter = Counter()
+    counted = 0
+    for partition in result.partitions():
+        deltas.update(_bucket_deltas(partition))
+        counted += len(partition)
+
+    _apply_bucket_deltas(db, user_id, deltas)
+    db.commit()
+    return counted
+
+
+def has_activity_baselines(db: Session, user_id: int) -> bool:
+    return db.query(ActivityBaseline.id).filter(ActivityBaseline.user_id == user_id).first() is not None
+
+
+def get_baseline_slots(
+    db: Session,
+    user_id: int,
+    day_of_week: int,
+    hour: int,
+    categories: Dict[str, Set[str]]
+) -> Dict[Tuple[str, str], ActivityBaseline]:
+    """
+    Baseline slots for the given weekday/hour, restricted to `categories`
+    (category_type -> category values). Keyed by `(category_type, category)`.
+    """
+    wanted = {(category_type, value) for category_type, values in categories.items() for value in values}
+    if not wanted:
+        return {}
+    slots = db.query(ActivityBaseline).filter(
+        ActivityBaseline.user_id == user_id,
+        ActivityBaseline.day_of_week == day_of_week,
+        ActivityBaseline.hour == hour,
+        ActivityBaseline.category.in_({value for _, value in wanted})
+    ).all()
+    return {
+        (slot.category_type, slot.category): slot
+        for slot in slots
+        if (slot.category_type, slot.category) in wanted
+    }
@@ -1,13 +1,24 @@
 import re
 import json
-from urllib.parse import urlparse
+import logging
+import threading
+import time
+from functools import lru_cache
 from typing import Optional, Dict, Any, List, Tuple
 
 from sqlalchemy.orm import Session, joinedload, selectinload
-from sqlalchemy import desc
+from sqlalchemy import desc, select, insert, and_, or_, func
 
 from ..models.activity import Activity
-from ..models.activity_features import ActivityEnrichedFeature
+from ..models.activity_features import ActivityEnrichedFeature, ActivityEnrichmentCheckpoint
+from ..models.category_mapping import CategoryMapping
+from .category_matcher import AppCategoryMatcher, DomainCategoryIndex
+from .activity_baseline_service import record_enriched_activities
+
+logger = logging.getLogger(__name__)
+
+# Number of activities fetched, enriched and committed per step of the streaming worker
+ENRICHMENT_CHUNK_SIZE = 5000
 
 # --- Mappings (can be moved to a config file or database later) ---
 
@@ -72,9 +83,12 @@ WEBSITE_CATEGORY_MAPPING: Dict[str, str] = {
 }
 
 # --- Helper for parsing details ---
-def _parse_activity_details(details_str: Optional[str]) -> Dict[str, Any]:
+def _parse_activity_details(details_str: Optional[Any]) -> Dict[str, Any]:
     if not details_str:
         return {}
+    if isinstance(details_str, dict):
+        # The JSON column hands back a dict for rows written by the bulk ingest path.
+        return details_str
     try:
         # Assuming details is a JSON string.
         # If it could be other formats, more robust parsing is needed.
@@ -84,25 +98,173 @@ def _parse_activity_details(details_str: Optional[str]) -> Dict[str, Any]:
         # For now, return empty dict if not valid JSON
         return {}
 
+# --- Compiled Matchers ---
+# Built once from the mappings above (plus any `category_mappings` rows, see
+# `refresh_category_matchers`) and swapped wholesale on reload.
+
+CATEGORY_CACHE_SIZE = 65536
+CATEGORY_REFRESH_INTERVAL_SECONDS = 60
+
+_app_matcher = AppCategoryMatcher(APP_CATEGORY_MAPPING)
+_domain_index = DomainCategoryIndex(WEBSITE_CATEGORY_MAPPING)
+_mappings_version: Optional[Tuple[int, Any]] = None
+_mappings_checked_at = 0.0
+_reload_lock = threading.Lock()
+
+# Project context heuristics, compiled once instead of per activity.
+_VSCODE_TITLE_RE = re.compile(r'-\s*([^-\s][^-]+[^-\s])\s*-\s*(Visual Studio Code|VSCode)', re.IGNORECASE)
+_BRACKETED_PATH_RE = re.compile(r'\[(?:[^\]]*[/|\\])?([^/|\\]+)(([/|\\][^/|\\]+)*)\]') # Extracts base folder of path in []
+_SOURCE_DIR_RE = re.compile(r'src|lib|include', re.IGNORECASE)
+_PROJECT_ROOT_PATH_RE = re.compile(r'(?:Projects|dev|workspace)[/\\]([^/\\]+)', re.IGNORECASE)
+
+
+@lru_cache(maxsize=CATEGORY_CACHE_SIZE)
+def _app_category_for_name(app_name: str) -> Optional[str]:
+    return _app_matcher.match(app_name.lower())
+
+
+@lru_cache(maxsize=CATEGORY_CACHE_SIZE)
+def _website_category_for_url(url: str) -> Optional[str]:
+    return _domain_index.match_url(url)
+
+
+@lru_cache(maxsize=CATEGORY_CACHE_SIZE)
+def _project_context_from_window_title(window_title: str) -> Optional[str]:
+    # Regex for VSCode-like titles or IntelliJ-like paths in titles
+    # This is highly dependent on common title formats
+    match_vscode = _VSCODE_TITLE_RE.search(window_title)
+    if match_vscode:
+        return match_vscode.group(1).strip()
+
+    match_intellij_path = _BRACKETED_PATH_RE.search(window_title)
+    if match_intellij_path:
+        # group(1) is the first path component inside [], e.g. "ProjectName" from
+        # "[~/path/to/ProjectName/src/...]", or just "file.java" for "[file.java]".
+        # Only treat it as a project if the rest of the path looks like a source tree.
+        if _SOURCE_DIR_RE.search(match_intellij_path.group(2) or ""):
+            return match_intellij_path.group(1)
+
+    # Generic: if a known project root is part of the title (less reliable)
+    # e.g. "MyProject - SomeApp"
+    # This requires a list of known project names or more dynamic approach.
+    return None
+
+
+@lru_cache(maxsize=CATEGORY_CACHE_SIZE)
+def _project_context_from_file_path(file_path: str) -> Optional[str]:
+    # Assuming projects are under a known root like "/Projects/" or "\Projects\"
+    # This is highly environment-specific.
+    match_path = _PROJECT_ROOT_PATH_RE.search(file_path)
+    return match_path.group(1) if match_path else None
+
+
+def _clear_category_caches() -> None:
+    _app_category_for_name.cache_clear()
+    _website_category_for_url.cache_clear()
+
+
+def load_category_matchers(app_mapping: Dict[str, str], website_mapping: Dict[str, str]) -> None:
+    """Replaces the active matchers with ones compiled from the given mappings."""
+    global _app_matcher, _domain_index
+    app_matcher = AppCategoryMatcher(app_mapping)
+    domain_index = DomainCategoryIndex(website_mapping)
+    with _reload_lock:
+        _app_matcher, _domain_index = app_matcher, domain_index
+        _clear_category_caches()
+
+
+def reload_category_mappings(db: Session) -> None:
+    """
+    Rebuilds the matchers from the built-in mappings plus the `category_mappings` table.
+
+    Active app rules are tried before the built-in app mapping (ordered by
+    `priority`, then id); website rules override built-in domains. Inactive rows
+    remove the built-in entry with the same pattern.
+    """
+    rows = db.execute(
+        select(CategoryMapping).order_by(CategoryMapping.priority, CategoryMapping.id)
+    ).scalars().all()
+
+    app_overrides: Dict[str, str] = {}
+    website_mapping: Dict[str, str] = dict(WEBSITE_CATEGORY_MAPPING)
+    disabled_apps = set()
+    for row in rows:
+        pattern = row.pattern.lower().strip()
+        if row.mapping_type == "app":
+            if row.is_active:
+                app_overrides.setdefault(pattern, row.category)
+            else:
+                disabled_apps.add(pattern)
+        elif row.mapping_type == "website":
+            if row.is_active:
+                website_mapping[pattern] = row.category
+            else:
+                website_mapping.pop(pattern, None)
+
+    app_mapping = dict(app_overrides)
+    for key, category in APP_CATEGORY_MAPPING.items():
+        if key not in disabled_apps:
+            app_mapping.setdefault(key, category)
+
+    load_category_matchers(app_mapping, website_mapping)
+
+
+def refresh_category_matchers(
+    db: Session,
+    max_age_seconds: float = CATEGORY_REFRESH_INTERVAL_SECONDS,
+    force: bool = False
+) -> bool:
+    """
+    Reloads category mappings if the `category_mappings` table changed.
+
+    The table is checked at most once every `max_age_seconds` per process with a
+    cheap count/max(updated_at) query on its own connection, so it never touches
+    the caller's transaction. Failures are logged and the current matchers kept.
+    Returns True if the matchers were rebuilt.
+    """
+    global _mappings_version, _mappings_checked_at
+    now = time.monotonic()
+    if not force and now - _mappings_checked_at < max_age_seconds:
+        return False
+    _mappings_checked_at = now
+
+    try:
+        with db.get_bind().connect() as connection:
+            count, latest = connection.execute(
+                select(func.count(CategoryMapping.id), func.max(CategoryMapping.updated_at))
+            ).one()
+            version = (count, latest)
+            if not force and version == _mappings_version:
+                return False
+            if count == 0 and _mappings_version is None:
+                _mappings_version = version
+                return False
+            mapping_session = Session(bind=connection)
+            try:
+                reload_category_mappings(mapping_session)
+            finally:
+                mapping_session.close()
+            _mappings_version = version
+            return True
+    except Exception as e:
+        logger.warning(f"Could not refresh category mappings, keeping current ones: {e}")
+        return False
+
+
 # --- Individual Feature Generation Logic ---
 
 def _get_app_category(activity_type: str, details: Dict[str, Any]) -> Optional[str]:
     if activity_type == 'app_usage':
-        app_name = details.get('app_name', '').lower()
-        for key, category in APP_CATEGORY_MAPPING.items():
-            if key in app_name:
-                return category
+        app_name = details.get('app_name')
+        if app_name and isinstance(app_name, str):
+            return _app_category_for_name(app_name)
     return None
 
 def _get_website_category(activity_type: str, details: Dict[str, Any]) -> Optional[str]:
     if activity_type == 'website_visit':
         url_str = details.get('url')
-        if url_str:
-            try:
-                domain = urlparse(url_str).netloc.replace("www.", "")
-                return WEBSITE_CATEGORY_MAPPING.get(domain)
-            except Exception: # Broad exception for URL parsing issues
-                return None
+        if url_str and isinstance(url_str, str):
+            return _website_category_for_url(url_str)
     return None
 
 def _extract_project_context(activity_type: str, details: Dict[str, Any]) -> Optional[str]:
@@ -112,46 +274,46 @@ def _extract_project_context(activity_type: str, details: Dict[str, Any]) -> Opt
     # Example: File path "/Users/user/Projects/ProjectName/file.ext"
 
     if activity_type == 'app_usage':
-        window_title = details.get('window_title', '')
-        # Regex for VSCode-like titles or IntelliJ-like paths in titles
-        # This is highly dependent on common title formats
-        match_vscode = re.search(r'-\s*([^-\s][^-]+[^-\s])\s*-\s*(Visual Studio Code|VSCode)', window_title, re.IGNORECASE)
-        if match_vscode:
-            return match_vscode.group(1).strip()
-        
-        match_intellij_path = re.search(r'\[(?:[^\]]*[/|\\])?([^/|\\]+)(([/|\\][^/|\\]+)*)\]', window_title) # Extracts base folder of path in []
-        if match_intellij_path:
-             # This might be too specific, e.g. "ProjectName" from "[~/path/to/ProjectName/src/...]"
-             # Or it might be just the file name if it's "[file.java]". Needs refinement.
-             # For now, let's assume it captures a potential project name if it's a directory.
-             # This regex is complex and needs testing.
-             # A simpler regex might be: r"\[(?:.*[/\\])?([^/\\~]+)[/\\][^/\\~]*?\]" to capture the folder before the last one
-            project_name_candidate = match_intellij_path.group(1)
-            # If the path is something like .../Project/src/file.java, group(1) might be Project.
-            # If it's .../Project/file.java, group(1) might be Project.
-            # If it's just [file.java], group(1) is file.java - not a project.
-            # This needs a list of known non-project folder names or better heuristics.
-            # Let's try to get the folder name if the path contains typical project structure markers like 'src'
-            if re.search(r'src|lib|include', match_intellij_path.group(2) or "", re.IGNORECASE):
-                return project_name_candidate
-
-        # Generic: if a known project root is part of the title (less reliable)
-        # e.g. "MyProject - SomeApp"
-        # This requires a list of known project names or more dynamic approach.
+        window_title = details.get('window_title')
+        if window_title and isinstance(window_title, str):
+            return _project_context_from_window_title(window_title)
 
     elif activity_type in ['file_open', 'file_save', 'file_activity']: # Extend as needed
-        file_path = details.get('file_path', '')
-        # Assuming projects are under a known root like "/Projects/" or "\Projects\"
-        # This is highly environment-specific.
-        match_path = re.search(r'(?:Projects|dev|workspace)[/\\]([^/\\]+)', file_path, re.IGNORECASE)
-        if match_path:
-            return match_path.group(1)
+        file_path = details.get('file_path')
+        if file_path and isinstance(file_path, str):
+            return _project_context_from_file_path(file_path)
             
     return None
 
 
 # --- Main Service Functions ---
 
+def _primary_category(app_category: Optional[str], website_category: Optional[str]) -> Optional[str]:
+    """The category used for context-switch detection; app category takes precedence."""
+    return app_category if app_category else website_category
+
+
+def _compute_activity_features(activity_type: str, details: Any) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """Returns `(app_category, website_category, project_context)` for raw activity fields."""
+    details_dict = _parse_activity_details(details)
+    return (
+        _get_app_category(activity_type, details_dict),
+        _get_website_category(activity_type, details_dict),
+        _extract_project_context(activity_type, details_dict),
+    )
+
+
+def _is_context_switch(current_primary_category: Optional[str], previous_primary_category: Optional[str]) -> bool:
+    # Consider project context switch as well?
+    # if proj_ctx and previous_activity_enriched.project_context and \
+    #    proj_ctx != previous_activity_enriched.project_context:
+    #     is_ctx_switch = True # Or use a more nuanced definition of context switch
+    return bool(
+        current_primary_category and previous_primary_category and
+        current_primary_category != previous_primary_category
+    )
+
+
 def generate_features_for_activity(
     db: Session, # Added db session for potential future use (e.g., fetching related data)
     activity: Activity, 
@@ -161,28 +323,14 @@ def generate_features_for_activity(
     Generates enriched features for a single Activity record.
     `previous_activity_enriched` should be the enriched feature of the chronologically previous activity.
     """
-    details_dict = _parse_activity_details(activity.details) # activity.details is expected to be a string
-
-    app_cat = _get_app_category(activity.activity_type, details_dict)
-    web_cat = _get_website_category(activity.activity_type, details_dict)
-    proj_ctx = _extract_project_context(activity.activity_type, details_dict)
+    app_cat, web_cat, proj_ctx = _compute_activity_features(activity.activity_type, activity.details)
     
     is_ctx_switch = False
     if previous_activity_enriched:
-        # Determine current activity's primary category (app or web)
-        current_primary_category = app_cat if app_cat else web_cat # Prioritize app_cat
-        
-        # Determine previous activity's primary category
-        previous_primary_category = previous_activity_enriched.app_category \
-            if previous_activity_enriched.app_category else previous_activity_enriched.website_category
-            
-        if current_primary_category and previous_primary_category and \
-           current_primary_category != previous_primary_category:
-            is_ctx_switch = True
-        # Consider project context switch as well?
-        # if proj_ctx and previous_activity_enriched.project_context and \
-        #    proj_ctx != previous_activity_enriched.project_context:
-        #     is_ctx_switch = True # Or use a more nuanced definition of context switch
+        is_ctx_switch = _is_context_switch(
+            _primary_category(app_cat, web_cat),
+            _primary_category(previous_activity_enriched.app_category, previous_activity_enriched.website_category)
+        )
 
     # Create or update (if logic allows re-processing)
     # For a 1-to-1, we'd typically only create if not exists.
@@ -211,6 +359,8 @@ def generate_features_for_user_activities(
     Fetches activities for a user that do not yet have enriched features,
     generates features, and saves them.
     """
+    refresh_category_matchers(db)
+
     query = (
         db.query(Activity)
         .outerjoin(ActivityEnrichedFeature, Activity.id == ActivityEnrichedFeature.activity_id)
@@ -266,6 +416,10 @@ def generate_features_for_user_activities(
     if new_features_to_add:
         db.add_all(new_features_to_add)
         try:
+            record_enriched_activities(db, user_id, [
+                (activity.timestamp, feature.app_category, feature.website_category)
+                for activity, feature in zip(activities_to_process, new_features_to_add)
+            ])
             db.commit()
             created_count = len(new_features_to_add)
         except Exception as e:
@@ -275,3 +429,151 @@ def generate_features_for_user_activities(
             raise
             
     return created_count, updated_count # updated_count is 0 for now
+
+
+# --- Streaming Enrichment ---
+
+def _get_or_create_checkpoint(db: Session, user_id: int) -> ActivityEnrichmentCheckpoint:
+    checkpoint = db.get(ActivityEnrichmentCheckpoint, user_id)
+    if checkpoint is None:
+        checkpoint = ActivityEnrichmentCheckpoint(user_id=user_id, processed_count=0)
+        db.add(checkpoint)
+    return checkpoint
+
+
+def _previous_enriched_activity(
+    db: Session, user_id: int, before: Tuple[Any, int]
+) -> Optional[Tuple[Tuple[Any, int], Optional[str]]]:
+    """Keyset position and primary category of the latest enriched activity before `before`."""
+    before_ts, before_id = before
+    row = db.execute(
+        select(Activity.timestamp, Activity.id,
+               ActivityEnrichedFeature.app_category, ActivityEnrichedFeature.website_category)
+        .join(Activity, Activity.id == ActivityEnrichedFeature.activity_id)
+        .where(Activity.user_id == user_id)
+        .where(or_(
+            Activity.timestamp < before_ts,
+            and_(Activity.timestamp == before_ts, Activity.id < before_id)
+        ))
+        .order_by(Activity.timestamp.desc(), Activity.id.desc())
+        .limit(1)
+    ).first()
+    if row is None:
+        return None
+    return (row.timestamp, row.id), _primary_category(row.app_category, row.website_category)
+
+
+def _fetch_unenriched_chunk(db: Session, user_id: int, chunk_size: int) -> List[Any]:
+    """
+    The user's first `chunk_size` un-enriched activities, ordered by `(timestamp, id)`.
+    Only the columns needed for enrichment are loaded.
+    """
+    query = (
+        select(Activity.id, Activity.timestamp, Activity.activity_type, Activity.details)
+        .outerjoin(ActivityEnrichedFeature, Activity.id == ActivityEnrichedFeature.activity_id)
+        .where(Activity.user_id == user_id)
+        .where(ActivityEnrichedFeature.id == None)
+        .order_by(Activity.timestamp.asc(), Activity.id.asc())
+        .limit(chunk_size)
+    )
+    return db.execute(query).all()
+
+
+def stream_enrich_user_activities(
+    db: Session,
+    user_id: int,
+    chunk_size: int = ENRICHMENT_CHUNK_SIZE,
+    max_chunks: Optional[int] = None
+) -> int:
+    """
+    Enriches a user's pending activities in bounded chunks.
+
+    Unlike `generate_features_for_user_activities`, this never holds more than one
+    chunk in memory and commits after every chunk, so each transaction stays short
+    and progress survives a crash. Pending activities are found by their missing
+    features, oldest first, so ones that arrive with past timestamps are picked up
+    like any other.
+
+    The user's checkpoint records the newest enriched activity and its primary
+    category, so context-switch detection carries over between chunks and runs.
+    An activity older than the checkpoint is compared with the activity directly
+    before it (one extra lookup); the flag of the activity after it is left as is.
+
+    Returns the number of features created.
+    """
+    refresh_category_matchers(db)
+    checkpoint = _get_or_create_checkpoint(db, user_id)
+    newest: Optional[Tuple[Any, int]] = None
+    if checkpoint.last_activity_id is not None:
+        newest = (checkpoint.last_activity_timestamp, checkpoint.last_activity_id)
+    # The activity `previous_category` belongs to
+    previous_position: Optional[Tuple[Any, int]] = None
+    previous_category: Optional[str] = None
+
+    created = 0
+    chunks_done = 0
+    while max_chunks is None or chunks_done < max_chunks:
+        rows = _fetch_unenriched_chunk(db, user_id, chunk_size)
+        if not rows:
+            break
+
+        feature_rows: List[Dict[str, Any]] = []
+        for row in rows:
+            position = (row.timestamp, row.id)
+            if newest is not None and position < newest:
+                # Arrived late: the activity before it may be one enriched in an earlier run.
+                before = _previous_enriched_activity(db, user_id, position)
+                if before is not None and (previous_position is None or before[0] > previous_position):
+                    previous_position, previous_category = before
+            elif previous_position is None or (newest is not None and previous_position < newest):
+                if newest is not None:
+                    previous_category = checkpoint.last_primary_category
+                else:
+                    # No checkpoint yet; history may have been enriched some other way.
+                    before = _previous_enriched_activity(db, user_id, position)
+                    previous_category = before[1] if before else None
+
+            app_cat, web_cat, proj_ctx = _compute_activity_features(row.activity_type, row.details)
+            current_category = _primary_category(app_cat, web_cat)
+            feature_rows.append({
+                "activity_id": row.id,
+                "app_category": app_cat,
+                "project_context": proj_ctx,
+                "website_category": web_cat,
+                "is_context_switch": _is_context_switch(current_category, previous_category),
+            })
+            # Mirrors generate_features_for_user_activities: the next activity compares
+            # against this one's primary category, even when it is None.
+            previous_position, previous_category = position, current_category
+
+        last = rows[-1]
+        advanced = newest is None or previous_position > newest
+        try:
+            db.execute(insert(ActivityEnrichedFeature), feature_rows)
+            record_enriched_activities(db, user_id, [
+                (row.timestamp, features["app_category"], features["website_category"])
+                for row, features in zip(rows, feature_rows)
+            ])
+            if advanced:
+                checkpoint.last_activity_timestamp = last.timestamp
+                checkpoint.last_activity_id = last.id
+                checkpoint.last_primary_category = previous_category
+            checkpoint.processed_count = (checkpoint.processed_count or 0) + len(feature_rows)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Streaming enrichment for user {user_id} failed at activity {last.id}: {e}")
+            raise
+        if advanced:
+            newest = previous_position
+
+        created += len(feature_rows)
+        chunks_done += 1
+        if len(rows) < chunk_size:
+            break
+
+    if created == 0 and checkpoint in db.new:
+        # Nothing to do; don't leave a pending empty checkpoint in the session.
+        db.expunge(checkpoint)
+    return created
+
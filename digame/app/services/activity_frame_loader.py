@@ -0,0 +1,192 @@
+"""
+Columnar loading of a user's activities.
+
+Analytics code used to load `Activity` ORM objects and then fetch each
+activity's `ActivityEnrichedFeature` separately. `load_activity_frame` instead
+selects plain columns from one joined query, pushes the time window into the
+WHERE clause and streams the result in partitions straight into column lists,
+so no ORM objects are built and a user's history costs a single round-trip.
+
+`iter_activity_frames` streams the same query partition by partition, and
+`export_activity_snapshot` / `iter_snapshot_frames` write and read histories as
+Parquet snapshots, for consumers such as model training whose memory must not
+grow with history size.
+"""
+
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+import pandas as pd
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..models.activity import Activity
+from ..models.activity_features import ActivityEnrichedFeature
+
+# Rows fetched per round-trip while streaming
+ACTIVITY_FRAME_FETCH_SIZE = 50000
+
+ACTIVITY_COLUMNS = {
+    "activity_id": Activity.id,
+    "timestamp": Activity.timestamp,
+    "activity_type": Activity.activity_type,
+}
+FEATURE_COLUMNS = {
+    "app_category": ActivityEnrichedFeature.app_category,
+    "project_context": ActivityEnrichedFeature.project_context,
+    "website_category": ActivityEnrichedFeature.website_category,
+    "is_context_switch": ActivityEnrichedFeature.is_context_switch,
+}
+DEFAULT_COLUMNS = tuple(ACTIVITY_COLUMNS) + tuple(FEATURE_COLUMNS)
+
+
+def _activity_frame_statement(
+    user_id: int,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    columns: Sequence[str],
+    enriched_only: bool,
+    descending: bool,
+    after_id: Optional[int],
+    until_id: Optional[int] = None
+):
+    unknown = [name for name in columns if name not in ACTIVITY_COLUMNS and name not in FEATURE_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown activity frame columns: {unknown}")
+
+    selected = [ACTIVITY_COLUMNS.get(name, FEATURE_COLUMNS.get(name)) for name in columns]
+    stmt = select(*selected).where(Activity.user_id == user_id)
+
+    if enriched_only:
+        stmt = stmt.join(ActivityEnrichedFeature, Activity.id == ActivityEnrichedFeature.activity_id)
+    elif any(name in FEATURE_COLUMNS for name in columns):
+        stmt = stmt.outerjoin(ActivityEnrichedFeature, Activity.id == ActivityEnrichedFeature.activity_id)
+
+    if start is not None:
+        stmt = stmt.where(Activity.timestamp >= start)
+    if end is not None:
+        stmt = stmt.where(Activity.timestamp <= end)
+    if after_id is not None:
+        stmt = stmt.where(Activity.id > after_id)
+    if until_id is not None:
+        stmt = stmt.where(Activity.id <= until_id)
+
+    if descending:
+        return stmt.order_by(Activity.timestamp.desc(), Activity.id.desc())
+    return stmt.order_by(Activity.timestamp.asc(), Activity.id.asc())
+
+
+def _to_frame(data: Dict[str, List], columns: Sequence[str]) -> pd.DataFrame:
+    frame = pd.DataFrame(data, columns=pd.Index(list(columns)))
+    if "timestamp" in frame.columns:
+        frame["timestamp"] = pd.to_datetime(frame["timestamp"])
+    return frame
+
+
+def load_activity_frame(
+    db: Session,
+    user_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    columns: Sequence[str] = DEFAULT_COLUMNS,
+    enriched_only: bool = False,
+    descending: bool = False,
+    fetch_size: int = ACTIVITY_FRAME_FETCH_SIZE,
+    after_id: Optional[int] = None
+) -> pd.DataFrame:
+    """
+    Loads a user's activities, optionally within `[start, end]` and only those
+    with an id above `after_id`, as a DataFrame.
+
+    `columns` picks from `ACTIVITY_COLUMNS` and `FEATURE_COLUMNS`. Feature columns
+    come from a LEFT JOIN, so activities without enriched features have None
+    there, unless `enriched_only` turns it into an inner join. Rows are ordered by
+    timestamp (then id). The frame always has the requested columns, even when
+    empty, and `timestamp` is a datetime64 column.
+    """
+    stmt = _activity_frame_statement(user_id, start, end, columns, enriched_only, descending, after_id)
+
+    # Core execution on the session's connection: plain tuples, no ORM row processing.
+    data: Dict[str, List] = {name: [] for name in columns}
+    result = db.connection().execute(stmt.execution_options(yield_per=fetch_size))
+    for partition in result.partitions():
+        for name, values in zip(columns, zip(*partition)):
+            data[name].extend(values)
+    return _to_frame(data, columns)
+
+
+def iter_activity_frames(
+    db: Session,
+    user_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    columns: Sequence[str] = DEFAULT_COLUMNS,
+    enriched_only: bool = False,
+    fetch_size: int = ACTIVITY_FRAME_FETCH_SIZE,
+    after_id: Optional[int] = None,
+    until_id: Optional[int] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Like `load_activity_frame`, but yields the history as consecutive frames of
+    at most `fetch_size` rows, in timestamp order, so only one partition is in
+    memory at a time. Yields nothing when no activities match.
+
+    With `until_id`, only activities with an id up to it are read, so repeated
+    passes see the same rows while new activities are being logged.
+    """
+    stmt = _activity_frame_statement(user_id, start, end, columns, enriched_only, False, after_id, until_id)
+    result = db.connection().execute(stmt.execution_options(yield_per=fetch_size))
+    for partition in result.partitions():
+        data = {name: list(values) for name, values in zip(columns, zip(*partition))}
+        yield _to_frame(data, columns)
+
+
+def max_activity_id(db: Session, user_ids: Iterable[int]) -> int:
+    """The highest id among the activities of `user_ids`, or 0 if they have none."""
+    return db.execute(select(func.max(Activity.id)).where(Activity.user_id.in_(list(user_ids)))).scalar() or 0
+
+
+# Columns of an activity snapshot, sorted by user, then timestamp
+SNAPSHOT_COLUMNS = ("user_id", "timestamp", "activity_type")
+
+
+def export_activity_snapshot(
+    db: Session,
+    path: str,
+    user_ids: Iterable[int],
+    fetch_size: int = ACTIVITY_FRAME_FETCH_SIZE
+) -> int:
+    """
+    Writes the activities of `user_ids` to a Parquet file at `path`, one row
+    group per fetched partition, and returns the number of rows written.
+
+    Rows are sorted by user (in the order given), then timestamp, which is the
+    order `iter_snapshot_frames` readers such as the predictive trainer expect.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("user_id", pa.int64()),
+        ("timestamp", pa.timestamp("us")),
+        ("activity_type", pa.string()),
+    ])
+    rows = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for user_id in user_ids:
+            for frame in iter_activity_frames(db, user_id, columns=("timestamp", "activity_type"), fetch_size=fetch_size):
+                frame.insert(0, "user_id", user_id)
+                writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+                rows += len(frame)
+    return rows
+
+
+def iter_snapshot_frames(path: str, batch_rows: int = ACTIVITY_FRAME_FETCH_SIZE) -> Iterator[pd.DataFrame]:
+    """Reads an activity snapshot written by `export_activity_snapshot` back in frames of at most `batch_rows` rows."""
+    import pyarrow.parquet as pq
+
+    snapshot = pq.ParquetFile(path)
+    for batch in snapshot.iter_batches(batch_size=batch_rows, columns=list(SNAPSHOT_COLUMNS)):
+        frame = batch.to_pandas()
+        frame["timestamp"] = pd.to_datetime(frame["timestamp"])
+        yield frame
@@ -0,0 +1,289 @@
+"""
+Bulk ingestion of digital activity events.
+
+Desktop agents report activity in bursts, so events are written to
+`digital_activities` in batches: one multi-row INSERT per batch, or a
+PostgreSQL COPY when the psycopg2 driver is available. Each batch is committed
+on its own so a client gets a per-batch acknowledgement and can safely retry
+only the batches that failed.
+"""
+
+import csv
+import io
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from ..models.activity import Activity
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+INGEST_BATCH_SIZE = int(os.getenv("DIGAME_INGEST_BATCH_SIZE", "1000"))
+INGEST_MAX_EVENTS_PER_REQUEST = int(os.getenv("DIGAME_INGEST_MAX_EVENTS", "50000"))
+INGEST_USE_COPY = os.getenv("DIGAME_INGEST_USE_COPY", "true").lower() in ("1", "true", "yes")
+
+MAX_ACTIVITY_TYPE_LENGTH = 255
+
+_COPY_SQL = (
+    "COPY digital_activities (user_id, activity_type, timestamp, details) "
+    "FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+)
+
+
+class InvalidActivityEvent(ValueError):
+    """Raised when an incoming event cannot be turned into an Activity row."""
+
+
+# --- Row normalisation ---
+
+def _parse_timestamp(value: Any) -> datetime:
+    if value is None:
+        return datetime.utcnow()
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None) if value.tzinfo else value
+    if isinstance(value, (int, float)):
+        return datetime.utcfromtimestamp(value)
+    if isinstance(value, str):
+        try:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            raise InvalidActivityEvent(f"Invalid timestamp: {value!r}")
+        if parsed.tzinfo is not None:
+            parsed = (parsed - parsed.utcoffset()).replace(tzinfo=None)
+        return parsed
+    raise InvalidActivityEvent(f"Unsupported timestamp type: {type(value).__name__}")
+
+
+def build_activity_row(user_id: int, event: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Validates a raw event and converts it into a column dict for `digital_activities`.
+
+    Accepts `activity_type` (or the legacy `activity` key used by `/monitoring/log`),
+    an optional ISO-8601/epoch `timestamp` and an optional `details` object.
+    Timestamps are normalised to naive UTC, matching the rest of the schema.
+    """
+    if not isinstance(event, dict):
+        raise InvalidActivityEvent("Event must be a JSON object")
+
+    activity_type = event.get("activity_type") or event.get("activity")
+    if not isinstance(activity_type, str) or not activity_type.strip():
+        raise InvalidActivityEvent("Missing 'activity_type'")
+    if len(activity_type) > MAX_ACTIVITY_TYPE_LENGTH:
+        raise InvalidActivityEvent("'activity_type' is too long")
+
+    details = event.get("details")
+    if details is not None and not isinstance(details, dict):
+        raise InvalidActivityEvent("'details' must be a JSON object")
+
+    return {
+        "user_id": user_id,
+        "activity_type": activity_type.strip(),
+        "timestamp": _parse_timestamp(event.get("timestamp")),
+        "details": details,
+    }
+
+
+class NDJSONSplitter:
+    """
+    Incrementally splits an NDJSON byte stream into decoded records so a request
+    body can be processed without buffering it whole. Blank lines are skipped;
+    malformed lines come out as `None` so the caller can count them as rejected.
+    """
+
+    def __init__(self):
+        self._buffer = b""
+
+    def feed(self, chunk: bytes) -> List[Optional[Dict[str, Any]]]:
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split(b"\n")
+        return [_loads_or_none(line) for line in lines if line.strip()]
+
+    def flush(self) -> List[Optional[Dict[str, Any]]]:
+        remainder, self._buffer = self._buffer, b""
+        return [_loads_or_none(remainder)] if remainder.strip() else []
+
+
+def iter_ndjson_lines(chunks: Iterable[bytes]) -> Iterator[Optional[Dict[str, Any]]]:
+    """Synchronous convenience wrapper around `NDJSONSplitter`."""
+    splitter = NDJSONSplitter()
+    for chunk in chunks:
+        yield from splitter.feed(chunk)
+    yield from splitter.flush()
+
+
+def _loads_or_none(line: bytes) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(line)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+
+
+# --- Writers ---
+
+def _supports_copy(db: Session) -> bool:
+    bind = db.get_bind()
+    return INGEST_USE_COPY and bind.dialect.name == "postgresql" and bind.dialect.driver == "psycopg2"
+
+
+def _copy_rows(db: Session, rows: List[Dict[str, Any]]) -> None:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([
+            row["user_id"],
+            row["activity_type"],
+            row["timestamp"].isoformat(),
+            json.dumps(row["details"]) if row["details"] is not None else "\\N",
+        ])
+    buffer.seek(0)
+
+    # Run COPY on the session's own DBAPI connection so it shares the transaction.
+    dbapi_connection = db.connection().connection
+    with dbapi_connection.cursor() as cursor:
+        cursor.copy_expert(_COPY_SQL, buffer)
+
+
+def bulk_insert_activities(db: Session, rows: List[Dict[str, Any]]) -> int:
+    """
+    Writes pre-validated activity rows in a single statement.
+
+    Uses COPY on PostgreSQL/psycopg2 and a multi-row INSERT everywhere else.
+    The caller is responsible for committing.
+    """
+    if not rows:
+        return 0
+    if _supports_copy(db):
+        _copy_rows(db, rows)
+    else:
+        # Core executemany; SQLAlchemy 2.0 renders this as batched multi-row VALUES.
+        db.execute(insert(Activity), rows)
+    return len(rows)
+
+
+# --- Main Service Functions ---
+
+def ingest_activity_batch(
+    db: Session,
+    user_id: int,
+    raw_events: List[Optional[Dict[str, Any]]],
+    batch_index: int = 0,
+    offset: int = 0,
+    max_events: int = INGEST_MAX_EVENTS_PER_REQUEST,
+) -> Dict[str, Any]:
+    """
+    Validates and stores one batch of raw events in its own transaction.
+
+    `offset` is the position of the batch's first event within the request and
+    is used for error messages and for enforcing `max_events`: events past the
+    limit are rejected, the ones before it are still stored. Invalid events
+    are rejected individually without failing the batch; a database error rolls
+    back and fails the whole batch.
+
+    Returns the acknowledgement for the batch.
+    """
+    ack: Dict[str, Any] = {
+        "batch": batch_index,
+        "offset": offset,
+        "accepted": 0,
+        "rejected": len(raw_events),
+        "status": "rejected",
+        "errors": [],
+    }
+    room = max(0, max_events - offset)
+    if len(raw_events) > room:
+        ack["errors"].append(f"Request exceeds the limit of {max_events} events")
+        if room == 0:
+            return ack
+
+    rows: List[Dict[str, Any]] = []
+    for position, event in enumerate(raw_events[:room], start=offset):
+        if event is None:
+            ack["errors"].append(f"{position}: malformed JSON")
+            continue
+        try:
+            rows.append(build_activity_row(user_id, event))
+        except InvalidActivityEvent as e:
+            ack["errors"].append(f"{position}: {e}")
+
+    try:
+        accepted = bulk_insert_activities(db, rows)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Activity ingest batch {batch_index} for user {user_id} failed: {e}")
+        ack["status"] = "failed"
+        ack["errors"].append(f"batch: {e.__class__.__name__}")
+        return ack
+
+    ack["accepted"] = accepted
+    ack["rejected"] = len(raw_events) - accepted
+    ack["status"] = "committed"
+    return ack
+
+
+def ingest_activity_events(
+    db: Session,
+    user_id: int,
+    events: Iterable[Optional[Dict[str, Any]]],
+    batch_size: int = INGEST_BATCH_SIZE,
+    max_events: int = INGEST_MAX_EVENTS_PER_REQUEST,
+) -> Dict[str, Any]:
+    """
+    Stores a stream of activity events for a user, `batch_size` at a time.
+
+    Events are consumed lazily, so memory is bounded by the batch size rather
+    than the request size, and consumption stops once `max_events` is passed.
+    Returns a summary with `accepted`, `rejected`, `truncated` and the
+    per-batch acknowledgements.
+    """
+    batch_size = max(1, batch_size)
+    summary = new_ingest_summary()
+    batch: List[Optional[Dict[str, Any]]] = []
+
+    for event in events:
+        batch.append(event)
+        if len(batch) >= batch_size:
+            ingest_into_summary(db, user_id, batch, summary, max_events)
+            batch = []
+            if summary["truncated"]:
+                return summary
+    if batch:
+        ingest_into_summary(db, user_id, batch, summary, max_events)
+
+    return summary
+
+
+def new_ingest_summary() -> Dict[str, Any]:
+    return {"accepted": 0, "rejected": 0, "truncated": False, "batches": []}
+
+
+def ingest_into_summary(
+    db: Session,
+    user_id: int,
+    batch: List[Optional[Dict[str, Any]]],
+    summary: Dict[str, Any],
+    max_events: int = INGEST_MAX_EVENTS_PER_REQUEST,
+) -> None:
+    """
+    Ingests one batch and folds its acknowledgement into a running summary.
+
+    Sets `truncated` once the batch runs past `max_events`; callers should stop
+    reading events at that point.
+    """
+    offset = summary["accepted"] + summary["rejected"]
+    ack = ingest_activity_batch(
+        db, user_id, batch,
+        batch_index=len(summary["batches"]),
+        offset=offset,
+        max_events=max_events,
+    )
+    summary["accepted"] += ack["accepted"]
+    summary["rejected"] += ack["rejected"]
+    summary["truncated"] = offset + len(batch) > max_events
+    summary["batches"].append(ack)
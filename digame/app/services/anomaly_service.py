@@ -1,6 +1,8 @@
+import logging
+
 import pandas as pd
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_ # For count and filtering
+from sqlalchemy import func, and_, select, insert, table, column # For count and filtering
 from datetime import datetime, timedelta, time
 from typing import Dict, Optional, Tuple, List, Any
 import numpy as np # For std, mean if needed, though pandas handles it
@@ -9,6 +11,22 @@ from ..models.activity import Activity
 from ..models.activity_features import ActivityEnrichedFeature
 from ..models.anomaly import DetectedAnomaly
 from ..models.user import User # For type hinting if needed
+from ..models.activity_baseline import ActivityBaseline
+from .activity_frame_loader import load_activity_frame
+from .activity_baseline_service import (
+    CATEGORY_TYPES, get_baseline_slots, has_activity_baselines, rebuild_activity_baselines
+)
+
+logger = logging.getLogger(__name__)
+
+# If a baseline's std is below this, use this value to avoid over-sensitivity
+MIN_STD_DEV = 0.5
+
+# Users per IN (...) list when the batch job loads baselines and related activity ids
+BATCH_USER_CHUNK_SIZE = 5000
+
+# Tenant membership (see the multi-tenancy migration); only the columns needed for scoping
+_tenant_users = table("tenant_users", column("tenant_id"), column("user_id"))
 
 # --- Baseline Calculation Logic ---
 
@@ -33,24 +51,13 @@ def calculate_hourly_activity_baselines(db: Session, user_id: int) -> Dict[str,
         "website_category": {}
     }
 
-    # Query to fetch relevant data: activity timestamp and enriched features
-    # We need to join Activity with ActivityEnrichedFeature
-    query_results = (
-        db.query(
-            Activity.timestamp,
-            ActivityEnrichedFeature.app_category,
-            ActivityEnrichedFeature.website_category
-        )
-        .join(ActivityEnrichedFeature, Activity.id == ActivityEnrichedFeature.activity_id)
-        .filter(Activity.user_id == user_id)
-        .all()
+    # Activity timestamps with their enriched features, loaded column-wise
+    df = load_activity_frame(
+        db, user_id, columns=("timestamp", "app_category", "website_category"), enriched_only=True
     )
 
-    if not query_results:
+    if df.empty:
         return baselines
-
-    # Convert to DataFrame for easier manipulation
-    df = pd.DataFrame(query_results, columns=pd.Index(['timestamp', 'app_category', 'website_category']))
     
     # Extract day of week and hour
     df['day_of_week'] = df['timestamp'].dt.dayofweek # Monday=0, Sunday=6
@@ -94,12 +101,10 @@ def calculate_hourly_activity_baselines(db: Session, user_id: int) -> Dict[str,
         if category_type not in baselines:
             baselines[category_type] = {}
 
-        for _, row in baseline_stats.iterrows():
-            cat_value = str(row[category_type])
-            dow = int(row['day_of_week'])
-            hr = int(row['hour'])
-            mean_val = row['mean']
-            std_val = row['std']
+        for cat_value, dow, hr, mean_val, std_val in baseline_stats.itertuples(index=False, name=None):
+            cat_value = str(cat_value)
+            dow = int(dow)
+            hr = int(hr)
 
             if cat_value not in baselines[category_type]:
                 baselines[category_type][cat_value] = {}
@@ -161,64 +166,114 @@ def check_activity_for_anomalies(
         Activity.timestamp <= current_activity_time # Ensure up to current time
     ).scalar() or 0 # scalar() returns None if no rows, so default to 0
 
-    # Check for anomaly
+    deviation = evaluate_frequency_deviation(
+        current_hour_activity_count, mean_activities, std_activities, std_dev_threshold
+    )
+    if deviation is None:
+        return None
+
+    # Fetch related activity IDs within the window
+    # This is similar to the count query but fetches IDs
+    related_ids_query = db.query(Activity.id).join(
+        ActivityEnrichedFeature, Activity.id == ActivityEnrichedFeature.activity_id
+    ).filter(Activity.user_id == user_id)
+    if category_type == "app_category":
+        related_ids_query = related_ids_query.filter(ActivityEnrichedFeature.app_category == activity_category_value)
+    else: # website_category
+        related_ids_query = related_ids_query.filter(ActivityEnrichedFeature.website_category == activity_category_value)
+
+    related_activity_ids_tuples = related_ids_query.filter(
+        Activity.timestamp >= window_start_time,
+        Activity.timestamp <= current_activity_time
+    ).all()
+    related_ids = [id_tuple[0] for id_tuple in related_activity_ids_tuples]
+
+    return build_frequency_anomaly(
+        user_id, current_activity_time, activity_category_value, category_type,
+        current_hour_activity_count, mean_activities, deviation, std_dev_threshold, related_ids
+    )
+
+
+def evaluate_frequency_deviation(
+    observed_count: int,
+    mean_activities: float,
+    std_activities: float,
+    std_dev_threshold: float = 2.0
+) -> Optional[Tuple[str, float, float]]:
+    """
+    Compares an observed activity count with a baseline mean/std.
+
+    Returns `(deviation_type, effective_std, severity_score)` when the count is
+    anomalous, otherwise None. `deviation_type` is "higher" or "lower".
+    """
     # If std_activities is very small (e.g., 0 due to constant past values),
     # any small deviation could be flagged. Add a small epsilon or min_std.
-    min_std_dev = 0.5 # Example: if std is less than this, use this value to avoid over-sensitivity
-    effective_std = max(std_activities, min_std_dev)
-    
+    effective_std = max(std_activities, MIN_STD_DEV)
+
     lower_bound = mean_activities - (std_dev_threshold * effective_std)
     upper_bound = mean_activities + (std_dev_threshold * effective_std)
 
-    anomaly_detected = False
     deviation_type = ""
-    if current_hour_activity_count > upper_bound:
-        anomaly_detected = True
+    if observed_count > upper_bound:
         deviation_type = "higher"
-    elif current_hour_activity_count < lower_bound and lower_bound > 0: # Avoid flagging anomaly if baseline is near zero
+    elif observed_count < lower_bound and lower_bound > 0: # Avoid flagging anomaly if baseline is near zero
          # Also consider if mean is very low, e.g. mean=1, std=0.5, lower_bound=0. User did 0. Is it an anomaly?
          # This might need more nuanced handling, e.g. if mean > some_min_mean_threshold
         if mean_activities > effective_std * std_dev_threshold : # only if lower bound is positive
-            anomaly_detected = True
             deviation_type = "lower"
 
-    if anomaly_detected:
-        anomaly_type_str = f"Unusual{category_type.replace('_', '').title()}Frequency"
-        description = (
-            f"Activity count for '{activity_category_value}' ({category_type.split('_')[0]}) "
-            f"during {current_activity_time.strftime('%A %I-%I%p').replace(' 0', ' ')} was {current_hour_activity_count} (expected ~{mean_activities:.1f} +/- {effective_std:.1f} * {std_dev_threshold}). "
-            f"Observed count was {deviation_type} than expected."
-        )
-        severity = abs(current_hour_activity_count - mean_activities) / effective_std if effective_std > 0 else std_dev_threshold + 1
-        
-        # Fetch related activity IDs within the window
-        # This is similar to the count query but fetches IDs
-        related_ids_query = db.query(Activity.id).join(
-            ActivityEnrichedFeature, Activity.id == ActivityEnrichedFeature.activity_id
-        ).filter(Activity.user_id == user_id)
-        if category_type == "app_category":
-            related_ids_query = related_ids_query.filter(ActivityEnrichedFeature.app_category == activity_category_value)
-        else: # website_category
-            related_ids_query = related_ids_query.filter(ActivityEnrichedFeature.website_category == activity_category_value)
-        
-        related_activity_ids_tuples = related_ids_query.filter(
-            Activity.timestamp >= window_start_time,
-            Activity.timestamp <= current_activity_time
-        ).all()
-        related_ids = [id_tuple[0] for id_tuple in related_activity_ids_tuples]
-
-
-        anomaly = DetectedAnomaly()
-        anomaly.user_id = user_id  # type: ignore
-        anomaly.timestamp = current_activity_time  # type: ignore
-        anomaly.anomaly_type = anomaly_type_str  # type: ignore
-        anomaly.severity_score = min(severity / std_dev_threshold, 1.0) if std_dev_threshold > 0 else 0.5  # type: ignore
-        anomaly.related_activity_ids = related_ids if related_ids else None  # type: ignore
-        anomaly.status = "new"  # type: ignore
-        anomaly.description = description  # type: ignore
-        return anomaly
-        
-    return None
+    if not deviation_type:
+        return None
+
+    severity = abs(observed_count - mean_activities) / effective_std if effective_std > 0 else std_dev_threshold + 1
+    severity_score = min(severity / std_dev_threshold, 1.0) if std_dev_threshold > 0 else 0.5
+    return deviation_type, effective_std, severity_score
+
+
+def _frequency_anomaly_type(category_type: str) -> str:
+    return f"Unusual{category_type.replace('_', '').title()}Frequency"
+
+
+def _frequency_anomaly_subject(activity_category_value: str, category_type: str, current_activity_time: datetime) -> str:
+    # The start of the description; identifies the category and hour an anomaly is about
+    return (
+        f"Activity count for '{activity_category_value}' ({category_type.split('_')[0]}) "
+        f"during {current_activity_time.strftime('%A %I-%I%p').replace(' 0', ' ')}"
+    )
+
+
+def frequency_anomaly_row(
+    user_id: int,
+    current_activity_time: datetime,
+    activity_category_value: str,
+    category_type: str,
+    observed_count: int,
+    mean_activities: float,
+    deviation: Tuple[str, float, float],
+    std_dev_threshold: float,
+    related_ids: Optional[List[int]]
+) -> Dict[str, Any]:
+    """Column values of the DetectedAnomaly for a deviation from `evaluate_frequency_deviation`."""
+    deviation_type, effective_std, severity_score = deviation
+    description = (
+        f"{_frequency_anomaly_subject(activity_category_value, category_type, current_activity_time)} "
+        f"was {observed_count} (expected ~{mean_activities:.1f} +/- {effective_std:.1f} * {std_dev_threshold}). "
+        f"Observed count was {deviation_type} than expected."
+    )
+    return {
+        "user_id": user_id,
+        "timestamp": current_activity_time,
+        "anomaly_type": _frequency_anomaly_type(category_type),
+        "severity_score": severity_score,
+        "related_activity_ids": related_ids if related_ids else None,
+        "status": "new",
+        "description": description,
+    }
+
+
+def build_frequency_anomaly(*args, **kwargs) -> DetectedAnomaly:
+    """Builds the (unsaved) DetectedAnomaly; takes the same arguments as `frequency_anomaly_row`."""
+    return DetectedAnomaly(**frequency_anomaly_row(*args, **kwargs))
 
 
 # --- Main Service Orchestrator ---
@@ -232,49 +287,85 @@ def detect_frequency_anomalies_for_user(
 ) -> List[DetectedAnomaly]:
     """
     Orchestrates anomaly detection for a user based on current activity patterns.
-    """
-    # 1. Calculate (or fetch cached) baselines
-    # For this implementation, we recalculate each time. Caching would be a performance optimization.
-    baselines = calculate_hourly_activity_baselines(db, user_id)
-    if not baselines or (not baselines["app_category"] and not baselines["website_category"]):
-        # No baselines available for the user.
-        return []
 
-    detected_anomalies_list: List[DetectedAnomaly] = []
-
-    # 2. Get a summary of categories active in the last hour for the user
-    # This avoids checking every single category if it wasn't even used recently.
+    Baselines come from the persisted `activity_baselines` slots maintained during
+    enrichment, so a run costs a handful of indexed queries regardless of how much
+    history the user has: one grouped count over the recent window, one lookup of
+    the matching baseline slots, and one fetch of related activity ids when
+    something is flagged. Users without stored baselines are backfilled once.
+    """
     window_start = current_time - timedelta(minutes=recent_window_minutes)
-    
-    recent_categories_query = (
+
+    # 1. Activity counts per category in the recent window, in one grouped query
+    window_rows = (
         db.query(
             ActivityEnrichedFeature.app_category,
-            ActivityEnrichedFeature.website_category
+            ActivityEnrichedFeature.website_category,
+            func.count(Activity.id)
         )
         .join(Activity, Activity.id == ActivityEnrichedFeature.activity_id)
         .filter(Activity.user_id == user_id)
         .filter(Activity.timestamp >= window_start)
         .filter(Activity.timestamp <= current_time)
-        .distinct() # Get unique categories active in the window
+        .group_by(ActivityEnrichedFeature.app_category, ActivityEnrichedFeature.website_category)
         .all()
     )
-    
-    active_categories_to_check: Dict[str, set] = {"app_category": set(), "website_category": set()}
-    for app_cat, web_cat in recent_categories_query:
-        if app_cat and app_cat != "N/A_Baseline": # Avoid checking our baseline placeholder
-            active_categories_to_check["app_category"].add(app_cat)
+
+    window_counts: Dict[str, Dict[str, int]] = {"app_category": {}, "website_category": {}}
+    for app_cat, web_cat, count in window_rows:
+        if app_cat and app_cat != "N/A_Baseline": # Avoid checking the legacy baseline placeholder
+            window_counts["app_category"][app_cat] = window_counts["app_category"].get(app_cat, 0) + count
         if web_cat and web_cat != "N/A_Baseline":
-            active_categories_to_check["website_category"].add(web_cat)
-
-    # 3. For each active category, check for anomalies
-    for category_type, category_values in active_categories_to_check.items():
-        for cat_value in category_values:
-            anomaly = check_activity_for_anomalies(
-                db, user_id, current_time, cat_value, category_type, baselines, 
-                std_dev_threshold, recent_window_minutes
-            )
-            if anomaly:
-                detected_anomalies_list.append(anomaly)
+            window_counts["website_category"][web_cat] = window_counts["website_category"].get(web_cat, 0) + count
+
+    active_categories = {category_type: set(counts) for category_type, counts in window_counts.items()}
+    if not any(active_categories.values()):
+        return []
+
+    # 2. Stored baselines for just the active categories at this weekday/hour
+    day_of_week, hour = current_time.weekday(), current_time.hour
+    slots = get_baseline_slots(db, user_id, day_of_week, hour, active_categories)
+    if not slots and not has_activity_baselines(db, user_id):
+        rebuilt = rebuild_activity_baselines(db, user_id)
+        logger.info(f"Backfilled activity baselines for user {user_id} from {rebuilt} activities")
+        slots = get_baseline_slots(db, user_id, day_of_week, hour, active_categories)
+
+    # 3. Compare each active category with its baseline
+    flagged: List[Tuple[str, str, int, float, Tuple[str, float, float]]] = []
+    for category_type, counts in window_counts.items():
+        for cat_value, count in counts.items():
+            slot = slots.get((category_type, cat_value))
+            if slot is None:
+                # No baseline data for this specific category/day/hour, so cannot determine anomaly
+                continue
+            deviation = evaluate_frequency_deviation(count, slot.mean, slot.std, std_dev_threshold)
+            if deviation:
+                flagged.append((category_type, cat_value, count, slot.mean, deviation))
+
+    if not flagged:
+        return []
+
+    related_ids: Dict[Tuple[str, str], List[int]] = {}
+    related_rows = (
+        db.query(Activity.id, ActivityEnrichedFeature.app_category, ActivityEnrichedFeature.website_category)
+        .join(ActivityEnrichedFeature, Activity.id == ActivityEnrichedFeature.activity_id)
+        .filter(Activity.user_id == user_id)
+        .filter(Activity.timestamp >= window_start)
+        .filter(Activity.timestamp <= current_time)
+        .order_by(Activity.id)
+        .all()
+    )
+    for activity_id, app_cat, web_cat in related_rows:
+        related_ids.setdefault(("app_category", app_cat), []).append(activity_id)
+        related_ids.setdefault(("website_category", web_cat), []).append(activity_id)
+
+    detected_anomalies_list: List[DetectedAnomaly] = [
+        build_frequency_anomaly(
+            user_id, current_time, cat_value, category_type, count, mean_activities,
+            deviation, std_dev_threshold, related_ids.get((category_type, cat_value))
+        )
+        for category_type, cat_value, count, mean_activities, deviation in flagged
+    ]
 
     # 4. Save all detected anomalies for this run
     if detected_anomalies_list:
@@ -286,9 +377,237 @@ def detect_frequency_anomalies_for_user(
                 db.refresh(anom) 
         except Exception as e:
             db.rollback()
-            # Log error e
-            print(f"Error saving detected anomalies: {e}") # Replace with proper logging
+            logger.error(f"Error saving detected anomalies for user {user_id}: {e}")
             # Depending on desired behavior, could re-raise or return empty list/error status
             raise
             
     return detected_anomalies_list
+
+
+# --- Fleet-wide Batch Detection ---
+
+def _chunks(values: List[int], size: int):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def score_frequency_deviations(
+    observed: np.ndarray,
+    sample_count: np.ndarray,
+    count_sum: np.ndarray,
+    count_sum_sq: np.ndarray,
+    std_dev_threshold: float = 2.0
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Vectorized `evaluate_frequency_deviation` over baseline sums.
+
+    Returns `(mean, effective_std, severity_score, direction)` arrays, where
+    direction is 1 for "higher", -1 for "lower" and 0 when not anomalous.
+    """
+    n = sample_count.astype(float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.where(n > 0, count_sum / n, 0.0)
+        variance = np.where(n > 1, (count_sum_sq - count_sum * count_sum / n) / (n - 1), 0.0)
+    std = np.sqrt(np.clip(variance, 0.0, None))
+    effective_std = np.maximum(std, MIN_STD_DEV)
+
+    lower_bound = mean - std_dev_threshold * effective_std
+    upper_bound = mean + std_dev_threshold * effective_std
+    higher = observed > upper_bound
+    lower = ~higher & (observed < lower_bound) & (lower_bound > 0) & (mean > effective_std * std_dev_threshold)
+    direction = np.where(higher, 1, np.where(lower, -1, 0))
+
+    if std_dev_threshold > 0:
+        severity = np.minimum(np.abs(observed - mean) / effective_std / std_dev_threshold, 1.0)
+    else:
+        severity = np.full(observed.shape, 0.5)
+    return mean, effective_std, severity, direction
+
+
+def load_window_category_counts(
+    db: Session,
+    window_start: datetime,
+    window_end: datetime,
+    tenant_id: Optional[int] = None,
+    user_ids: Optional[List[int]] = None
+) -> pd.DataFrame:
+    """
+    Activity counts per user and category within a window, from one grouped query.
+
+    Returns a frame with columns `user_id`, `category_type`, `category`, `observed`.
+    """
+    stmt = (
+        select(
+            Activity.user_id,
+            ActivityEnrichedFeature.app_category,
+            ActivityEnrichedFeature.website_category,
+            func.count(Activity.id)
+        )
+        .join(ActivityEnrichedFeature, Activity.id == ActivityEnrichedFeature.activity_id)
+        .where(Activity.timestamp >= window_start, Activity.timestamp <= window_end)
+        .group_by(Activity.user_id, ActivityEnrichedFeature.app_category, ActivityEnrichedFeature.website_category)
+    )
+    if tenant_id is not None:
+        stmt = stmt.where(Activity.user_id.in_(
+            select(_tenant_users.c.user_id).where(_tenant_users.c.tenant_id == tenant_id)
+        ))
+    if user_ids is not None:
+        stmt = stmt.where(Activity.user_id.in_(user_ids))
+
+    columns = ["user_id", "category_type", "category", "observed"]
+    rows = db.execute(stmt).all()
+    if not rows:
+        return pd.DataFrame(columns=columns)
+
+    grouped = pd.DataFrame(rows, columns=pd.Index(["user_id", "app_category", "website_category", "observed"]))
+    frames = []
+    for category_type in CATEGORY_TYPES:
+        values = grouped[category_type]
+        part = grouped.loc[values.notna() & (values != "N/A_Baseline"), ["user_id", category_type, "observed"]]
+        part = part.rename(columns={category_type: "category"}).groupby(["user_id", "category"], as_index=False)["observed"].sum()
+        part.insert(1, "category_type", category_type)
+        frames.append(part)
+    return pd.concat(frames, ignore_index=True)[columns]
+
+
+def _load_baseline_frame(db: Session, user_ids: List[int], day_of_week: int, hour: int) -> pd.DataFrame:
+    columns = ["user_id", "category_type", "category", "sample_count", "count_sum", "count_sum_sq"]
+    rows: List[Any] = []
+    for chunk in _chunks(user_ids, BATCH_USER_CHUNK_SIZE):
+        rows.extend(db.execute(
+            select(
+                ActivityBaseline.user_id, ActivityBaseline.category_type, ActivityBaseline.category,
+                ActivityBaseline.sample_count, ActivityBaseline.count_sum, ActivityBaseline.count_sum_sq
+            ).where(
+                ActivityBaseline.day_of_week == day_of_week,
+                ActivityBaseline.hour == hour,
+                ActivityBaseline.user_id.in_(chunk)
+            )
+        ).all())
+    return pd.DataFrame(rows, columns=pd.Index(columns))
+
+
+def _load_related_activity_ids(
+    db: Session, user_ids: List[int], window_start: datetime, window_end: datetime
+) -> Dict[Tuple[int, str, str], List[int]]:
+    related: Dict[Tuple[int, str, str], List[int]] = {}
+    for chunk in _chunks(user_ids, BATCH_USER_CHUNK_SIZE):
+        rows = db.execute(
+            select(Activity.id, Activity.user_id, ActivityEnrichedFeature.app_category, ActivityEnrichedFeature.website_category)
+            .join(ActivityEnrichedFeature, Activity.id == ActivityEnrichedFeature.activity_id)
+            .where(
+                Activity.user_id.in_(chunk),
+                Activity.timestamp >= window_start,
+                Activity.timestamp <= window_end
+            )
+            .order_by(Activity.id)
+        )
+        for activity_id, user_id, app_cat, web_cat in rows:
+            related.setdefault((user_id, "app_category", app_cat), []).append(activity_id)
+            related.setdefault((user_id, "website_category", web_cat), []).append(activity_id)
+    return related
+
+
+def _load_recorded_frequency_anomalies(
+    db: Session, user_ids: List[int], hour_start: datetime
+) -> Dict[int, List[str]]:
+    """Descriptions of the frequency anomalies already recorded for each user in an hour."""
+    frequency_types = [_frequency_anomaly_type(category_type) for category_type in CATEGORY_TYPES]
+    recorded: Dict[int, List[str]] = {}
+    for chunk in _chunks(user_ids, BATCH_USER_CHUNK_SIZE):
+        rows = db.execute(
+            select(DetectedAnomaly.user_id, DetectedAnomaly.description).where(
+                DetectedAnomaly.user_id.in_(chunk),
+                DetectedAnomaly.anomaly_type.in_(frequency_types),
+                DetectedAnomaly.timestamp >= hour_start,
+                DetectedAnomaly.timestamp < hour_start + timedelta(hours=1)
+            )
+        )
+        for user_id, description in rows:
+            recorded.setdefault(user_id, []).append(description)
+    return recorded
+
+
+def detect_frequency_anomalies_for_users(
+    db: Session,
+    current_time: datetime,
+    tenant_id: Optional[int] = None,
+    user_ids: Optional[List[int]] = None,
+    std_dev_threshold: float = 2.0,
+    recent_window_minutes: int = 60
+) -> int:
+    """
+    Batch version of `detect_frequency_anomalies_for_user` for every active user,
+    optionally limited to a tenant's members or to `user_ids`.
+
+    One grouped query gives the window counts of all users, their baseline slots
+    are loaded in chunked bulk reads, and deviations are scored with NumPy over
+    the joined frame. Flagged anomalies are written with one multi-row INSERT and
+    committed. Users without stored baselines are skipped; backfill them with
+    `rebuild_activity_baselines`. Returns the number of anomalies recorded.
+
+    Runs are usually more frequent than the window is long, so a category
+    already flagged for a user in `current_time`'s hour is not recorded again.
+    """
+    window_start = current_time - timedelta(minutes=recent_window_minutes)
+
+    counts = load_window_category_counts(db, window_start, current_time, tenant_id, user_ids)
+    if counts.empty:
+        return 0
+
+    active_user_ids = sorted(int(user_id) for user_id in counts["user_id"].unique())
+    baselines = _load_baseline_frame(db, active_user_ids, current_time.weekday(), current_time.hour)
+    if baselines.empty:
+        return 0
+
+    joined = counts.merge(baselines, on=["user_id", "category_type", "category"], how="inner")
+    mean, effective_std, severity, direction = score_frequency_deviations(
+        joined["observed"].to_numpy(dtype=float),
+        joined["sample_count"].to_numpy(dtype=float),
+        joined["count_sum"].to_numpy(dtype=float),
+        joined["count_sum_sq"].to_numpy(dtype=float),
+        std_dev_threshold
+    )
+    flagged_index = np.flatnonzero(direction != 0)
+    if flagged_index.size == 0:
+        return 0
+
+    flagged = joined.iloc[flagged_index]
+    flagged_user_ids = sorted(int(user_id) for user_id in flagged["user_id"].unique())
+    related = _load_related_activity_ids(db, flagged_user_ids, window_start, current_time)
+    recorded = _load_recorded_frequency_anomalies(
+        db, flagged_user_ids, current_time.replace(minute=0, second=0, microsecond=0)
+    )
+
+    anomaly_rows = []
+    for position, row in zip(flagged_index, flagged.itertuples(index=False)):
+        subject = f"{_frequency_anomaly_subject(row.category, row.category_type, current_time)} was "
+        if any(description.startswith(subject) for description in recorded.get(int(row.user_id), ())):
+            continue
+        deviation = (
+            "higher" if direction[position] > 0 else "lower",
+            float(effective_std[position]),
+            float(severity[position])
+        )
+        anomaly_rows.append(frequency_anomaly_row(
+            int(row.user_id), current_time, row.category, row.category_type, int(row.observed),
+            float(mean[position]), deviation, std_dev_threshold,
+            related.get((int(row.user_id), row.category_type, row.category))
+        ))
+
+    if not anomaly_rows:
+        return 0
+
+    try:
+        db.execute(insert(DetectedAnomaly), anomaly_rows)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error saving batch-detected anomalies: {e}")
+        raise
+
+    logger.info(
+        f"Batch anomaly detection at {current_time.isoformat()}: {len(anomaly_rows)} anomalies "
+        f"for {len(flagged_user_ids)} of {len(active_user_ids)} active users"
+    )
+    return len(anomaly_rows)
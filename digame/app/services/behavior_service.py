@@ -30,6 +30,70 @@ def extract_cluster_patterns(raw_df, cluster_labels):
     raw_df_with_clusters['cluster_label'] = cluster_labels
     return raw_df_with_clusters
 
+def _pattern_distributions(cluster_df: pd.DataFrame) -> Tuple[Optional[Dict], Optional[Dict], Dict[str, Any]]:
+    """Temporal distribution, activity type distribution and context features of a cluster's activities."""
+    # Calculate temporal distribution (hour of day, day of week)
+    temporal_distribution = None
+    if 'hour_of_day' in cluster_df.columns and 'day_of_week' in cluster_df.columns:
+        hour_counts = cluster_df['hour_of_day'].value_counts().to_dict()
+        day_counts = cluster_df['day_of_week'].value_counts().to_dict()
+        temporal_distribution = {
+            'hour_of_day': {str(k): v for k, v in hour_counts.items()},
+            'day_of_week': {str(k): v for k, v in day_counts.items()}
+        }
+    
+    # Calculate activity type distribution
+    activity_distribution = None
+    if 'activity_type' in cluster_df.columns:
+        activity_counts = cluster_df['activity_type'].value_counts().to_dict()
+        activity_distribution = {str(k): v for k, v in activity_counts.items()}
+    
+    # Calculate context features
+    context_features = {}  # Initialize as empty dict instead of None
+    context_columns = ['app_category', 'project_context', 'website_category', 'is_context_switch']
+    if all(col in cluster_df.columns for col in context_columns):
+        # context_features already initialized as empty dict
+        for col in context_columns:
+            if col == 'is_context_switch':
+                # For boolean column, calculate percentage of True values
+                context_features[col] = cluster_df[col].mean() if not cluster_df.empty else 0
+            else:
+                # For categorical columns, get value counts
+                context_features[col] = cluster_df[col].value_counts().to_dict()
+
+    return temporal_distribution, activity_distribution, context_features
+
+def _merge_counts(existing: Optional[Dict], new: Optional[Dict]) -> Optional[Dict]:
+    if new is None:
+        return existing
+    merged = dict(existing or {})
+    for key, count in new.items():
+        merged[str(key)] = merged.get(str(key), 0) + int(count)
+    return merged
+
+def _update_pattern(pattern: BehavioralPattern, cluster_df: pd.DataFrame) -> None:
+    """Adds newly assigned activities to a pattern's size and distributions, in place."""
+    temporal, activities, context = _pattern_distributions(cluster_df)
+    old_size, added = pattern.size, len(cluster_df)
+
+    # JSON columns are replaced rather than mutated so the changes are persisted
+    if temporal is not None:
+        current = pattern.temporal_distribution or {}
+        pattern.temporal_distribution = {
+            key: _merge_counts(current.get(key), temporal[key]) for key in ('hour_of_day', 'day_of_week')
+        }
+    pattern.activity_distribution = _merge_counts(pattern.activity_distribution, activities)
+    if context:
+        merged = dict(pattern.context_features or {})
+        for col, value in context.items():
+            if col == 'is_context_switch':
+                # Size-weighted mean of the old and new rates
+                merged[col] = (float(merged.get(col) or 0) * old_size + float(value) * added) / (old_size + added)
+            else:
+                merged[col] = _merge_counts(merged.get(col), value)
+        pattern.context_features = merged
+    pattern.size = old_size + added
+
 def save_clustering_model(
     db: Session,
     user_id: int,
@@ -40,7 +104,9 @@ def save_clustering_model(
     raw_df: pd.DataFrame,
     processed_df: pd.DataFrame,
     model_data=None,
-    name: str = "Behavioral Clustering Model"
+    name: str = "Behavioral Clustering Model",
+    preprocessor=None,
+    include_enriched_features: bool = True
 ) -> BehavioralModel:
     """
     Save a clustering model and its results to the database.
@@ -48,21 +114,32 @@ def save_clustering_model(
     Args:
         db: Database session
         user_id: ID of the user this model belongs to
-        algorithm: Algorithm used (kmeans, dbscan, hierarchical)
+        algorithm: Algorithm used (kmeans, dbscan, hdbscan, hierarchical)
         parameters: Dictionary of algorithm parameters
         cluster_labels: Cluster labels from the clustering algorithm
         silhouette_score: Silhouette score of the clustering
         raw_df: Raw data frame with original features
         processed_df: Processed data frame used for clustering
-        model_data: Serialized model data (optional)
+        model_data: Serialized model data (optional, ignored if preprocessor is given)
         name: Name of the model
+        preprocessor: The fitted preprocessor that produced processed_df. If given, the
+            model stores a pattern artifact (see `behavior.build_pattern_artifact`) so
+            new activities can be assigned with `assign_patterns_incremental`.
+        include_enriched_features: Whether processed_df includes enriched features
         
     Returns:
         The created BehavioralModel instance
     """
+    last_activity_id = int(raw_df['activity_id'].max()) if 'activity_id' in raw_df.columns and not raw_df.empty else None
+
     # Serialize model data if provided
     serialized_model = None
-    if model_data is not None:
+    if preprocessor is not None:
+        from ..behavior import build_pattern_artifact, serialize_pattern_artifact
+        serialized_model = serialize_pattern_artifact(build_pattern_artifact(
+            preprocessor, processed_df, cluster_labels, algorithm, include_enriched_features, last_activity_id
+        ))
+    elif model_data is not None:
         serialized_model = pickle.dumps(model_data)
     
     # Create the behavioral model
@@ -74,7 +151,8 @@ def save_clustering_model(
         parameters=parameters,
         model_data=serialized_model,
         silhouette_score=silhouette_score,
-        num_clusters=len(set(cluster_labels))
+        num_clusters=len(set(cluster_labels)),
+        last_activity_id=last_activity_id
     )
     
     # Create patterns for each cluster
@@ -95,34 +173,7 @@ def save_clustering_model(
             min(5, len(cluster_df))
         ).tolist() if not cluster_df.empty else []
         
-        # Calculate temporal distribution (hour of day, day of week)
-        temporal_distribution = None
-        if 'hour_of_day' in cluster_df.columns and 'day_of_week' in cluster_df.columns:
-            hour_counts = cluster_df['hour_of_day'].value_counts().to_dict()
-            day_counts = cluster_df['day_of_week'].value_counts().to_dict()
-            temporal_distribution = {
-                'hour_of_day': {str(k): v for k, v in hour_counts.items()},
-                'day_of_week': {str(k): v for k, v in day_counts.items()}
-            }
-        
-        # Calculate activity type distribution
-        activity_distribution = None
-        if 'activity_type' in cluster_df.columns:
-            activity_counts = cluster_df['activity_type'].value_counts().to_dict()
-            activity_distribution = {str(k): v for k, v in activity_counts.items()}
-        
-        # Calculate context features
-        context_features = {}  # Initialize as empty dict instead of None
-        context_columns = ['app_category', 'project_context', 'website_category', 'is_context_switch']
-        if all(col in cluster_df.columns for col in context_columns):
-            # context_features already initialized as empty dict
-            for col in context_columns:
-                if col == 'is_context_switch':
-                    # For boolean column, calculate percentage of True values
-                    context_features[col] = cluster_df[col].mean() if not cluster_df.empty else 0
-                else:
-                    # For categorical columns, get value counts
-                    context_features[col] = cluster_df[col].value_counts().to_dict()
+        temporal_distribution, activity_distribution, context_features = _pattern_distributions(cluster_df)
         
         # Create the pattern
         create_behavioral_pattern(
@@ -141,6 +192,111 @@ def save_clustering_model(
     
     return db_model
 
+def _next_version(version: str) -> str:
+    """Bumps the last component of a dotted version, e.g. "1.0.0" -> "1.0.1"."""
+    parts = version.split(".")
+    try:
+        parts[-1] = str(int(parts[-1]) + 1)
+    except ValueError:
+        parts.append("1")
+    return ".".join(parts)
+
+def _update_behavior_model_online(
+    db: Session,
+    user_id: int,
+    algorithm: str,
+    include_enriched_features: bool
+) -> Optional[Tuple[Optional[BehavioralModel], str, Optional[str]]]:
+    """
+    Online training step: folds the activities logged since the user's latest
+    model was built into its clusters (see `behavior.update_pattern_artifact`)
+    and consolidates the result into a new version of that model, whose
+    patterns are copies of the old ones with the new activities added.
+
+    Returns None when a full retrain is needed instead: there is no model with
+    a pattern artifact for this algorithm and feature set, or too many of the
+    new activities fit none of its clusters.
+    """
+    # Imported locally; see the note on circular imports above
+    from ..behavior import (
+        ONLINE_MAX_OUTLIER_FRACTION, ONLINE_MIN_NEW_ACTIVITIES, load_activity_logs, load_pattern_artifact,
+        serialize_pattern_artifact, transform_activity_features, update_pattern_artifact
+    )
+
+    latest = get_latest_behavior_model_for_user(db, user_id)
+    # Row lock: keeps concurrent pattern assignments off the model while it's copied
+    base = None if latest is None else db.query(BehavioralModel).filter(
+        BehavioralModel.id == latest.id
+    ).with_for_update().first()
+    artifact = load_pattern_artifact(base.model_data) if base is not None else None
+    if (artifact is None or artifact["algorithm"] != algorithm
+            or artifact["include_enriched_features"] != include_enriched_features):
+        db.rollback()
+        return None
+
+    raw_df = load_activity_logs(db, user_id, after_activity_id=artifact["last_activity_id"])
+    if raw_df.empty or len(raw_df) < ONLINE_MIN_NEW_ACTIVITIES:
+        db.rollback()
+        return base, "success", f"Only {len(raw_df)} new activities since model {base.id}; kept it."
+
+    processed_df = transform_activity_features(artifact["preprocessor"], raw_df, include_enriched_features)
+    updated, cluster_labels, outlier_fraction = update_pattern_artifact(
+        artifact, processed_df, int(raw_df['activity_id'].max())
+    )
+    if outlier_fraction > ONLINE_MAX_OUTLIER_FRACTION:
+        db.rollback()
+        return None
+    raw_df['cluster_label'] = cluster_labels
+
+    patterns = {
+        pattern.pattern_label: BehavioralPattern(
+            pattern_label=pattern.pattern_label,
+            name=pattern.name,
+            size=pattern.size,
+            representative_activities=pattern.representative_activities,
+            temporal_distribution=pattern.temporal_distribution,
+            activity_distribution=pattern.activity_distribution,
+            context_features=pattern.context_features
+        )
+        for pattern in base.patterns
+    }
+    # Activities up to base.last_activity_id were already counted by assign_patterns_incremental
+    uncounted = raw_df[raw_df['activity_id'] > (base.last_activity_id or 0)]
+    for cluster_label, cluster_df in uncounted.groupby('cluster_label'):
+        cluster_label = int(cluster_label)
+        if cluster_label not in patterns:
+            patterns[cluster_label] = BehavioralPattern(
+                pattern_label=cluster_label, size=0, name=f"Pattern {cluster_label}",
+                representative_activities=cluster_df['activity_id'].head(5).tolist()
+            )
+        _update_pattern(patterns[cluster_label], cluster_df)
+    for cluster_label, centroid in zip(updated["labels"], updated["centroids"]):
+        if int(cluster_label) in patterns:
+            patterns[int(cluster_label)].centroid = dict(zip(updated["feature_names"], centroid.tolist()))
+
+    db_model = create_behavioral_model(
+        db=db,
+        user_id=user_id,
+        name=base.name,
+        algorithm=algorithm,
+        parameters={**base.parameters, "online": True},
+        model_data=serialize_pattern_artifact(updated),
+        silhouette_score=None,  # Not re-evaluated: that would cost a pass over the full history
+        num_clusters=len(patterns),
+        version=_next_version(base.version),
+        last_activity_id=updated["last_activity_id"]
+    )
+    for pattern in patterns.values():
+        pattern.model_id = db_model.id
+        pattern.description = f"Behavioral pattern {pattern.pattern_label} with {pattern.size} activities"
+        db.add(pattern)
+    db.commit()
+    db.refresh(db_model)
+
+    return db_model, "success", (
+        f"Folded {len(raw_df)} new activities into model {base.id} as version {db_model.version}."
+    )
+
 def train_and_save_behavior_model(
     db: Session,
     user_id: int,
@@ -148,7 +304,8 @@ def train_and_save_behavior_model(
     include_enriched_features: bool = True,
     algorithm: str = "kmeans",
     auto_optimize: bool = True,
-    name: str = "Behavioral Clustering Model"
+    name: str = "Behavioral Clustering Model",
+    online: bool = False
 ) -> Tuple[Optional[BehavioralModel], str, Optional[str]]:
     """
     Train a behavior model for a user and save it to the database.
@@ -158,24 +315,37 @@ def train_and_save_behavior_model(
         user_id: ID of the user to train the model for
         n_clusters: Number of clusters (for KMeans and Hierarchical)
         include_enriched_features: Whether to include enriched features
-        algorithm: Clustering algorithm to use ("kmeans", "dbscan", "hierarchical")
+        algorithm: Clustering algorithm to use ("kmeans", "dbscan", "hdbscan", "hierarchical")
         auto_optimize: Whether to automatically optimize the number of clusters
         name: Name of the model
+        online: Update the user's latest model with only the activities logged since
+            it was built, saving the result as a new version of it, instead of
+            retraining on the full history. Falls back to full training when the
+            latest model can't be updated or no longer fits the new activities.
         
     Returns:
         Tuple containing:
         - The created BehavioralModel instance or None if failed
         - Status ("success" or "failed")
-        - Error message if failed, None otherwise
+        - Error message if failed, a note on the outcome of online training, None otherwise
     """
+    # Imported locally; see the note on circular imports above
+    from ..behavior import cluster_activity_logs, fit_activity_preprocessor, load_activity_logs
+
+    if online:
+        result = _update_behavior_model_online(db, user_id, algorithm, include_enriched_features)
+        if result is not None:
+            return result
+
     # Step 1: Preprocess data
-    raw_df, processed_df = preprocess_activity_logs(
-        db,
-        user_id=user_id,
-        include_enriched_features=include_enriched_features
+    raw_df = load_activity_logs(db, user_id)
+    processed_df, preprocessor = (None, None) if raw_df.empty else fit_activity_preprocessor(
+        raw_df,
+        include_enriched_features=include_enriched_features,
+        sparse_output=True
     )
     
-    if raw_df is None or processed_df is None or processed_df.empty:
+    if processed_df is None or processed_df.empty:
         return None, "failed", "Preprocessing failed or no data available for clustering."
     
     # Step 2: Cluster the data
@@ -209,11 +379,132 @@ def train_and_save_behavior_model(
         silhouette_score=silhouette,
         raw_df=raw_df,
         processed_df=processed_df,
-        name=name
+        name=name,
+        preprocessor=preprocessor,
+        include_enriched_features=include_enriched_features
     )
     
     return db_model, "success", None
 
+def train_behavior_model_summary(
+    db: Session,
+    user_id: int,
+    n_clusters: Optional[int] = None,
+    include_enriched_features: bool = True,
+    algorithm: str = "kmeans",
+    auto_optimize: bool = True,
+    name: str = "Behavioral Clustering Model",
+    online: bool = False
+) -> Dict[str, Any]:
+    """
+    Train and save a behavior model, returning a JSON-serialisable summary.
+
+    This is the entry point for running training as a job (see
+    `compute_executor.submit_job`): the summary is stored as the job result.
+
+    Returns:
+        Dictionary with status, message, model_id, num_clusters, algorithm and silhouette_score
+    """
+    db_model, result_status, error_message = train_and_save_behavior_model(
+        db=db,
+        user_id=user_id,
+        n_clusters=n_clusters,
+        include_enriched_features=include_enriched_features,
+        algorithm=algorithm,
+        auto_optimize=auto_optimize,
+        name=name,
+        online=online
+    )
+
+    if result_status == "failed" or db_model is None:
+        return {"status": "failed", "message": error_message}
+
+    silhouette = db_model.silhouette_score
+    return {
+        "status": "success",
+        "message": error_message or "Behavior model training completed and saved to database.",
+        "model_id": db_model.id,
+        "num_clusters": db_model.num_clusters,
+        "algorithm": db_model.algorithm,
+        "silhouette_score": float(silhouette) if silhouette is not None else None
+    }
+
+def assign_patterns_incremental(
+    db: Session,
+    user_id: int,
+    model_id: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Assign activities that arrived since a behavior model was trained (or last
+    assigned) to its existing patterns, without retraining.
+
+    The new activities are encoded with the model's persisted preprocessor and
+    labeled by nearest centroid (see `behavior.assign_to_patterns`); each
+    pattern's size and distributions are updated in place and the model's
+    `last_activity_id` advances, so every activity is counted once.
+
+    Args:
+        db: Database session
+        user_id: ID of the user whose latest model to use
+        model_id: A specific model of the user's to use instead (optional)
+
+    Returns:
+        Dictionary with status, message, model_id, assigned (number of activities)
+        and pattern_counts (activities added per pattern label)
+    """
+    # Imported locally; see the note on circular imports above
+    from ..behavior import assign_to_patterns, load_activity_logs, load_pattern_artifact, transform_activity_features
+
+    if model_id is None:
+        latest = get_latest_behavior_model_for_user(db, user_id)
+        model_id = latest.id if latest is not None else None
+    # Row lock: concurrent assignments for the same model run one after the other
+    model = None if model_id is None else db.query(BehavioralModel).filter(
+        BehavioralModel.id == model_id, BehavioralModel.user_id == user_id
+    ).with_for_update().first()
+    if model is None:
+        return {"status": "failed", "message": "No behavior model found for this user."}
+
+    artifact = load_pattern_artifact(model.model_data)
+    if artifact is None:
+        db.rollback()
+        return {"status": "failed", "message": "Model has no pattern artifact; retrain it to enable incremental assignment."}
+
+    raw_df = load_activity_logs(db, user_id, after_activity_id=model.last_activity_id)
+    if raw_df.empty:
+        db.rollback()
+        return {"status": "success", "message": "No new activities.", "model_id": model.id, "assigned": 0, "pattern_counts": {}}
+
+    processed_df = transform_activity_features(artifact["preprocessor"], raw_df, artifact["include_enriched_features"])
+    raw_df['cluster_label'] = assign_to_patterns(artifact, processed_df)
+
+    patterns = {pattern.pattern_label: pattern for pattern in model.patterns}
+    pattern_counts = {}
+    for cluster_label, cluster_df in raw_df.groupby('cluster_label'):
+        cluster_label = int(cluster_label)
+        pattern = patterns.get(cluster_label)
+        if pattern is None:
+            # e.g. the first noise points of a density-based model
+            pattern = BehavioralPattern(
+                model_id=model.id, pattern_label=cluster_label, size=0,
+                name=f"Pattern {cluster_label}", representative_activities=cluster_df['activity_id'].head(5).tolist()
+            )
+            db.add(pattern)
+        _update_pattern(pattern, cluster_df)
+        pattern.description = f"Behavioral pattern {cluster_label} with {pattern.size} activities"
+        pattern_counts[cluster_label] = len(cluster_df)
+
+    model.last_activity_id = int(raw_df['activity_id'].max())
+    model.num_clusters = len(set(patterns) | set(pattern_counts))
+    db.commit()
+    return {
+        "status": "success",
+        "message": f"Assigned {len(raw_df)} new activities to existing patterns.",
+        "model_id": model.id,
+        "assigned": len(raw_df),
+        "pattern_counts": pattern_counts,
+    }
+
 def get_latest_behavior_model_for_user(db: Session, user_id: int) -> Optional[BehavioralModel]:
     """
     Get the latest behavior model for a user.
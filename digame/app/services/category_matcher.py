@@ -0,0 +1,84 @@
+"""
+Compiled matchers for activity categorization.
+
+`AppCategoryMatcher` folds every app-name keyword into one compiled regex, and
+`DomainCategoryIndex` resolves a host by walking its domain suffixes through a
+dict, so both cost roughly the same no matter how many mappings are configured.
+Matchers are immutable once built; to change mappings, build new ones and swap
+them in.
+"""
+
+import re
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+
+class AppCategoryMatcher:
+    """
+    Substring matcher for app names.
+
+    Gives the same answer as scanning `mapping` in insertion order and returning
+    the first key contained in the app name. Keys are combined into a single
+    lookahead alternation ordered by priority, so one `finditer` pass finds the
+    highest-priority key starting at each position, and the overall winner is the
+    one with the lowest priority index.
+    """
+
+    def __init__(self, mapping: Dict[str, str]):
+        self._keys = [key.lower() for key in mapping if key]
+        self._categories = [mapping[key] for key in mapping if key]
+        self._priority = {key: index for index, key in reversed(list(enumerate(self._keys)))}
+        if self._keys:
+            alternation = "|".join(re.escape(key) for key in self._keys)
+            self._pattern: Optional[re.Pattern] = re.compile(f"(?=({alternation}))")
+        else:
+            self._pattern = None
+
+    def match(self, app_name: str) -> Optional[str]:
+        """Category for `app_name` (expected lower-case), or None."""
+        if not app_name or self._pattern is None:
+            return None
+        best: Optional[int] = None
+        for found in self._pattern.finditer(app_name):
+            priority = self._priority[found.group(1)]
+            if best is None or priority < best:
+                best = priority
+                if best == 0:
+                    break
+        return self._categories[best] if best is not None else None
+
+
+class DomainCategoryIndex:
+    """
+    Domain lookup that also resolves subdomains.
+
+    An exact host match wins; otherwise the host's parent domains are tried from
+    the most to the least specific (`docs.github.com` -> `github.com`), which is a
+    reversed-label trie walk expressed as at most one dict lookup per label.
+    """
+
+    def __init__(self, mapping: Dict[str, str]):
+        self._domains = {domain.lower().strip("."): category for domain, category in mapping.items() if domain}
+
+    def match_host(self, host: str) -> Optional[str]:
+        if not host:
+            return None
+        host = host.lower().rstrip(".")
+        if host.startswith("www."):
+            host = host[4:]
+        category = self._domains.get(host)
+        while category is None:
+            dot = host.find(".")
+            if dot == -1:
+                return None
+            host = host[dot + 1:]
+            category = self._domains.get(host)
+        return category
+
+    def match_url(self, url: str) -> Optional[str]:
+        """Category for a URL's host, or None if the URL has no host or no mapping."""
+        try:
+            host = urlsplit(url).hostname
+        except ValueError:
+            return None
+        return self.match_host(host) if host else None
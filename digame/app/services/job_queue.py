@@ -0,0 +1,314 @@
+"""
+Durable job queue on the `jobs` table.
+
+Jobs are enqueued as "pending" rows and run by `digame-worker` processes
+(see workers/job_worker.py), which may run on any node sharing the database:
+
+- Claiming picks the highest-priority due job with `SELECT ... FOR UPDATE
+  SKIP LOCKED`, so workers never block on, or double-claim, the same row.
+- A claimed job is leased to its worker (`locked_by`), which heartbeats while
+  it runs. Jobs whose heartbeat goes stale are reclaimed, and a worker that
+  loses its lease abandons the job so it never runs twice at once.
+- Jobs the API runs itself (`start_inline_job`) are leased the same way, but
+  are failed rather than retried when their process dies.
+- Failures are retried with exponential backoff (`run_after`) until
+  `max_attempts` is reached.
+- `DIGAME_JOB_CONCURRENCY` (e.g. "model_training=4,predictive_training=2")
+  caps how many jobs of a type run at once across all workers.
+
+A job type maps to a handler called as `handler(db, user_id=..., **payload)`
+that returns a JSON-serialisable summary; a summary with `"status": "failed"`
+fails the job without retrying it.
+"""
+
+import importlib
+import logging
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.orm import Session
+
+from ..crud.job_crud import create_job
+from ..models.job import Job
+
+logger = logging.getLogger(__name__)
+
+# Handlers are "module:function" paths, imported when first run so the API
+# doesn't load training code just to enqueue.
+JOB_HANDLERS: Dict[str, str] = {
+    "model_training": "digame.app.services.behavior_service:train_behavior_model_summary",
+    "predictive_training": "digame.app.predictive:train_predictive_model_for_user",
+    "pattern_assignment": "digame.app.services.behavior_service:assign_patterns_incremental",
+    "task_suggestion": "digame.app.services.task_suggestion_service:suggest_tasks_summary",
+}
+
+# --- Configuration ---
+JOB_HEARTBEAT_SECONDS = int(os.getenv("DIGAME_JOB_HEARTBEAT_SECONDS", "30"))
+# A running job whose heartbeat is older than this is considered abandoned
+JOB_STALE_AFTER_SECONDS = int(os.getenv("DIGAME_JOB_STALE_AFTER_SECONDS", "180"))
+# Consecutive failed heartbeats after which a worker gives its lease up, well before
+# the job would go stale and be reclaimed by another worker
+JOB_HEARTBEAT_MAX_FAILURES = int(os.getenv("DIGAME_JOB_HEARTBEAT_MAX_FAILURES", "3"))
+JOB_RETRY_BASE_SECONDS = int(os.getenv("DIGAME_JOB_RETRY_BASE_SECONDS", "30"))
+JOB_RETRY_MAX_SECONDS = int(os.getenv("DIGAME_JOB_RETRY_MAX_SECONDS", "3600"))
+# Serialises claims on PostgreSQL while per-type limits are checked
+JOB_CLAIM_LOCK_KEY = 0x6A6F6273
+
+
+def _parse_concurrency_limits(spec: str) -> Dict[str, int]:
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        job_type, _, limit = item.partition("=")
+        limits[job_type.strip()] = int(limit)
+    return limits
+
+
+JOB_TYPE_CONCURRENCY: Dict[str, int] = _parse_concurrency_limits(os.getenv("DIGAME_JOB_CONCURRENCY", ""))
+
+_resolved_handlers: Dict[str, Callable[..., Dict[str, Any]]] = {}
+
+
+def get_job_handler(job_type: str) -> Callable[..., Dict[str, Any]]:
+    """Returns the handler for `job_type`, raising ValueError for unknown types."""
+    if job_type not in JOB_HANDLERS:
+        raise ValueError(f"Unsupported job type: {job_type}")
+    if job_type not in _resolved_handlers:
+        module_name, _, attr = JOB_HANDLERS[job_type].partition(":")
+        _resolved_handlers[job_type] = getattr(importlib.import_module(module_name), attr)
+    return _resolved_handlers[job_type]
+
+
+def retry_delay(attempt: int) -> timedelta:
+    """Backoff before retrying after the `attempt`-th failed attempt."""
+    return timedelta(seconds=min(JOB_RETRY_MAX_SECONDS, JOB_RETRY_BASE_SECONDS * 2 ** max(0, attempt - 1)))
+
+
+def enqueue_job(
+    db: Session,
+    user_id: int,
+    job_type: str,
+    payload: Optional[Dict[str, Any]] = None,
+    priority: int = 0,
+    max_attempts: int = 3
+) -> Job:
+    """Adds a pending job for the workers. Raises ValueError for unknown job types."""
+    if job_type not in JOB_HANDLERS:
+        raise ValueError(f"Unsupported job type: {job_type}")
+    return create_job(
+        db, user_id=user_id, job_type=job_type, status="pending",
+        payload=payload or {}, priority=priority, max_attempts=max_attempts
+    )
+
+
+def inline_worker_id() -> str:
+    """Lease owner for jobs this API process runs itself."""
+    return f"inline:{socket.gethostname()}:{os.getpid()}"
+
+
+def start_inline_job(db: Session, user_id: int, job_type: str, owner: Optional[str] = None) -> Job:
+    """
+    Creates a running job that the caller runs itself rather than queueing, leased to `owner`.
+
+    Its runner heartbeats like a worker (see `compute_executor.run_tracked_job`).
+    It has a single attempt: if the process running it dies, the reaper marks it
+    failed instead of requeueing it, since the request waiting on it is gone.
+    """
+    job = Job(
+        user_id=user_id, job_type=job_type, status="running", payload={},
+        attempts=1, max_attempts=1, locked_by=owner or inline_worker_id(), heartbeat_at=datetime.utcnow()
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def _saturated_job_types(db: Session) -> List[str]:
+    if not JOB_TYPE_CONCURRENCY:
+        return []
+    running = db.execute(
+        select(Job.job_type, func.count())
+        .where(Job.status == "running", Job.job_type.in_(list(JOB_TYPE_CONCURRENCY)))
+        .group_by(Job.job_type)
+    ).all()
+    counts = dict(running)
+    return [job_type for job_type, limit in JOB_TYPE_CONCURRENCY.items() if counts.get(job_type, 0) >= limit]
+
+
+def claim_next_job(
+    db: Session,
+    worker_id: str,
+    job_types: Optional[Sequence[str]] = None,
+    now: Optional[datetime] = None
+) -> Optional[Job]:
+    """
+    Leases the next due job to `worker_id` and marks it running.
+
+    Jobs are taken by priority, then age, skipping rows other workers hold and
+    types at their concurrency limit. Returns None when nothing is claimable.
+    """
+    now = now or datetime.utcnow()
+    if JOB_TYPE_CONCURRENCY and db.get_bind().dialect.name == "postgresql":
+        # Held until commit, so two workers can't both take the last free slot of a type.
+        db.execute(select(func.pg_advisory_xact_lock(JOB_CLAIM_LOCK_KEY)))
+
+    stmt = (
+        select(Job)
+        .where(Job.status == "pending", or_(Job.run_after.is_(None), Job.run_after <= now))
+        .order_by(Job.priority.desc(), Job.id.asc())
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    if job_types:
+        stmt = stmt.where(Job.job_type.in_(list(job_types)))
+    saturated = _saturated_job_types(db)
+    if saturated:
+        stmt = stmt.where(Job.job_type.not_in(saturated))
+
+    job = db.execute(stmt).scalars().first()
+    if job is None:
+        db.rollback()
+        return None
+
+    # Guarded on status as well, for databases without row locks (SQLite).
+    claimed = db.execute(
+        update(Job)
+        .where(Job.id == job.id, Job.status == "pending")
+        .values(status="running", attempts=Job.attempts + 1, locked_by=worker_id,
+                heartbeat_at=now, run_after=None, progress=0.0)
+        .execution_options(synchronize_session=False)
+    )
+    if claimed.rowcount != 1:
+        db.rollback()
+        return None
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def heartbeat_job(db: Session, job_id: int, worker_id: str, progress: Optional[float] = None) -> bool:
+    """Renews `worker_id`'s lease on a running job. False means the lease was lost."""
+    values: Dict[str, Any] = {"heartbeat_at": datetime.utcnow()}
+    if progress is not None:
+        values["progress"] = progress
+    renewed = db.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.locked_by == worker_id, Job.status == "running")
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return renewed.rowcount == 1
+
+
+def keep_lease_alive(done: threading.Event, job_id: int, owner: str,
+                     on_lost: Optional[Callable[[], None]] = None) -> None:
+    """
+    Heartbeats `owner`'s lease on a job every `JOB_HEARTBEAT_SECONDS` until `done` is set.
+
+    Meant for a thread beside the one running the job. Returns once the lease is
+    lost, after calling `on_lost`. A database error is retried on the next beat, but
+    after `JOB_HEARTBEAT_MAX_FAILURES` in a row the lease is treated as lost: the
+    reaper will reclaim the job anyway, and it must not keep running here too.
+    """
+    from ..db import SessionLocal
+
+    failures = 0
+    while not done.wait(JOB_HEARTBEAT_SECONDS):
+        db = SessionLocal()
+        try:
+            renewed = heartbeat_job(db, job_id, owner)
+        except Exception as e:
+            failures += 1
+            logger.error(f"Heartbeat for job {job_id} failed ({failures}/{JOB_HEARTBEAT_MAX_FAILURES}): {e}")
+            if failures < JOB_HEARTBEAT_MAX_FAILURES:
+                continue
+            renewed = False
+        finally:
+            db.close()
+        if not renewed:
+            logger.warning(f"{owner} lost its lease on job {job_id}")
+            if on_lost is not None:
+                on_lost()
+            return
+        failures = 0
+
+
+def run_job_handler(db: Session, job: Job) -> Dict[str, Any]:
+    """Runs a claimed job's handler with its payload."""
+    handler = get_job_handler(job.job_type)
+    return handler(db, user_id=job.user_id, **(job.payload or {}))
+
+
+def finish_job(db: Session, job_id: int, worker_id: str, result: Dict[str, Any]) -> bool:
+    """Records a handler's summary as the job result. False if the lease was lost meanwhile."""
+    failed = result.get("status") == "failed"
+    finished = db.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.locked_by == worker_id, Job.status == "running")
+        .values(status="failed" if failed else "completed", progress=100.0, result=result,
+                error=result.get("message") if failed else None, locked_by=None, heartbeat_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return finished.rowcount == 1
+
+
+def _release_for_retry(db: Session, job_id: int, attempts: int, max_attempts: int, error: str,
+                       now: datetime, lease_guard) -> str:
+    if attempts < max_attempts:
+        values = {"status": "pending", "run_after": now + retry_delay(attempts)}
+    else:
+        values = {"status": "failed", "run_after": None}
+    released = db.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == "running", lease_guard)
+        .values(error=error, locked_by=None, heartbeat_at=None, **values)
+        .execution_options(synchronize_session=False)
+    )
+    return values["status"] if released.rowcount == 1 else "running"
+
+
+def fail_job(db: Session, job_id: int, worker_id: str, error: str, now: Optional[datetime] = None) -> str:
+    """
+    Records a failed attempt: the job goes back to "pending" after a backoff, or
+    to "failed" once it has used its attempts. Returns the job's new status.
+    """
+    job = db.get(Job, job_id)
+    if job is None:
+        return "failed"
+    status = _release_for_retry(db, job_id, job.attempts, job.max_attempts, error,
+                                now or datetime.utcnow(), Job.locked_by == worker_id)
+    db.commit()
+    return status
+
+
+def requeue_stale_jobs(db: Session, now: Optional[datetime] = None) -> int:
+    """
+    Treats running jobs whose worker stopped heartbeating as failed attempts. Returns how many.
+
+    Running rows without a lease (started before inline jobs were leased) have
+    nothing to rerun them with, so they are failed once not updated for as long.
+    """
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(seconds=JOB_STALE_AFTER_SECONDS)
+    stale = db.execute(
+        select(Job.id, Job.attempts, Job.max_attempts, Job.locked_by)
+        .where(Job.status == "running", func.coalesce(Job.heartbeat_at, Job.updated_at) < cutoff)
+        .with_for_update(skip_locked=True)
+    ).all()
+    for job_id, attempts, max_attempts, locked_by in stale:
+        if locked_by is None:
+            logger.warning(f"Job {job_id} was abandoned by the process running it; failing it")
+            _release_for_retry(db, job_id, max_attempts, max_attempts, "Process running the job stopped responding",
+                               now, Job.locked_by.is_(None))
+            continue
+        logger.warning(f"Job {job_id} lost its worker {locked_by}; releasing it")
+        _release_for_retry(db, job_id, attempts, max_attempts, f"Worker {locked_by} stopped responding",
+                           now, Job.locked_by == locked_by)
+    db.commit()
+    return len(stale)
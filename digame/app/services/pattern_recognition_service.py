@@ -15,6 +15,7 @@ from ..models.behavior_model import BehavioralModel, BehavioralPattern
 from ..models.activity import Activity
 from ..models.activity_features import ActivityEnrichedFeature
 from ..crud.behavior_model_crud import get_behavioral_model, get_patterns_for_model
+from .activity_frame_loader import load_activity_frame
 
 # Create a simple anomaly creation function if the import fails
 def create_anomaly(db: Session, **kwargs):
@@ -25,6 +26,18 @@ def create_anomaly(db: Session, **kwargs):
     logger.info(f"Anomaly detected: {json.dumps(kwargs, default=str)}")
     return None
 
+def create_anomalies(db: Session, anomalies: List[Dict[str, Any]]):
+    """
+    Bulk counterpart of `create_anomaly`: logs one summary line per anomaly type
+    instead of one line per anomaly.
+    """
+    counts: Dict[str, int] = {}
+    for anomaly in anomalies:
+        counts[anomaly["anomaly_type"]] = counts.get(anomaly["anomaly_type"], 0) + 1
+    for anomaly_type, count in counts.items():
+        logger.info(f"Anomalies detected: {count} x {anomaly_type}")
+    return None
+
 def get_anomalies_for_user(db: Session, user_id: int):
     """
     Fallback function for getting anomalies if the import fails.
@@ -193,42 +206,19 @@ def detect_anomalies(
     if not patterns:
         return []
     
-    # Get recent activities
-    query = db.query(Activity).filter(Activity.user_id == user_id)
-    
-    if time_window:
-        start_date = datetime.now() - timedelta(days=time_window)
-        query = query.filter(Activity.timestamp >= start_date)
-    
-    recent_activities = query.order_by(Activity.timestamp.desc()).all()
-    
-    if not recent_activities:
+    # Get recent activities in one columnar query
+    start_date = datetime.now() - timedelta(days=time_window) if time_window else None
+    activities_df = load_activity_frame(db, user_id, start=start_date, descending=True)
+
+    if activities_df.empty:
         return []
-    
-    # Convert activities to DataFrame for analysis
-    activities_data = []
-    for activity in recent_activities:
-        # Get enriched features if available
-        enriched_feature = db.query(ActivityEnrichedFeature).filter(
-            ActivityEnrichedFeature.activity_id == activity.id
-        ).first()
-        
-        activity_data = {
-            "activity_id": activity.id,
-            "timestamp": activity.timestamp,
-            "activity_type": activity.activity_type,
-            "app_category": enriched_feature.app_category if enriched_feature else None,
-            "project_context": enriched_feature.project_context if enriched_feature else None,
-            "website_category": enriched_feature.website_category if enriched_feature else None,
-            "is_context_switch": enriched_feature.is_context_switch if enriched_feature else None
-        }
-        activities_data.append(activity_data)
-    
-    activities_df = pd.DataFrame(activities_data)
-    
+
+    detected_at = datetime.now()
+    activity_ids = activities_df['activity_id'].to_numpy()
+
     # Detect anomalies
     anomalies = []
-    
+
     # 1. Detect time-based anomalies (activities at unusual times)
     activities_df['hour'] = activities_df['timestamp'].dt.hour
     
@@ -241,31 +231,28 @@ def detect_anomalies(
     
     # Identify anomalous hours
     anomalous_hours = hourly_counts[abs(hourly_counts - mean_count) > threshold * std_count].index.tolist()
-    
-    for hour in anomalous_hours:
-        # Get activities in anomalous hours
-        anomalous_activities = activities_df[activities_df['hour'] == hour]
-        
-        for _, activity in anomalous_activities.iterrows():
-            anomaly = {
-                "user_id": user_id,
-                "activity_id": activity['activity_id'],
-                "anomaly_type": "time_anomaly",
-                "description": f"Activity at unusual hour ({hour}:00)",
-                "severity": "medium",
-                "detected_at": datetime.now(),
-                "metadata": {
-                    "hour": int(hour),
-                    "mean_count": float(mean_count),
-                    "std_count": float(std_count),
-                    "actual_count": int(hourly_counts[hour])
-                }
+
+    # Activities in anomalous hours, grouped by hour in ascending order
+    hours = activities_df['hour'].to_numpy()
+    flagged = np.flatnonzero(np.isin(hours, anomalous_hours))
+    flagged = flagged[np.argsort(hours[flagged], kind="stable")]
+    for index in flagged:
+        hour = int(hours[index])
+        anomalies.append({
+            "user_id": user_id,
+            "activity_id": int(activity_ids[index]),
+            "anomaly_type": "time_anomaly",
+            "description": f"Activity at unusual hour ({hour}:00)",
+            "severity": "medium",
+            "detected_at": detected_at,
+            "metadata": {
+                "hour": hour,
+                "mean_count": float(mean_count),
+                "std_count": float(std_count),
+                "actual_count": int(hourly_counts[hour])
             }
-            
-            # Create anomaly in database
-            create_anomaly(db, **anomaly)
-            anomalies.append(anomaly)
-    
+        })
+
     # 2. Detect activity type anomalies (unusual activity types)
     activity_type_counts = activities_df['activity_type'].value_counts()
     mean_type_count = activity_type_counts.mean()
@@ -273,66 +260,66 @@ def detect_anomalies(
     
     # Identify anomalous activity types
     anomalous_types = activity_type_counts[abs(activity_type_counts - mean_type_count) > threshold * std_type_count].index.tolist()
-    
-    for activity_type in anomalous_types:
-        # Get activities with anomalous types
-        anomalous_activities = activities_df[activities_df['activity_type'] == activity_type]
-        
-        for _, activity in anomalous_activities.iterrows():
-            anomaly = {
-                "user_id": user_id,
-                "activity_id": activity['activity_id'],
-                "anomaly_type": "activity_type_anomaly",
-                "description": f"Unusual frequency of activity type: {activity_type}",
-                "severity": "medium",
-                "detected_at": datetime.now(),
-                "metadata": {
-                    "activity_type": activity_type,
-                    "mean_count": float(mean_type_count),
-                    "std_count": float(std_type_count),
-                    "actual_count": int(activity_type_counts[activity_type])
-                }
+
+    # Activities with anomalous types, grouped by type in order of frequency
+    type_rank = {activity_type: rank for rank, activity_type in enumerate(anomalous_types)}
+    ranks = activities_df['activity_type'].map(type_rank).to_numpy(dtype=float, na_value=np.nan)
+    flagged = np.flatnonzero(~np.isnan(ranks))
+    flagged = flagged[np.argsort(ranks[flagged], kind="stable")]
+    activity_types = activities_df['activity_type'].to_numpy()
+    for index in flagged:
+        activity_type = activity_types[index]
+        anomalies.append({
+            "user_id": user_id,
+            "activity_id": int(activity_ids[index]),
+            "anomaly_type": "activity_type_anomaly",
+            "description": f"Unusual frequency of activity type: {activity_type}",
+            "severity": "medium",
+            "detected_at": detected_at,
+            "metadata": {
+                "activity_type": activity_type,
+                "mean_count": float(mean_type_count),
+                "std_count": float(std_type_count),
+                "actual_count": int(activity_type_counts[activity_type])
             }
-            
-            # Create anomaly in database
-            create_anomaly(db, **anomaly)
-            anomalies.append(anomaly)
-    
+        })
+
     # 3. Detect context switching anomalies
-    if 'is_context_switch' in activities_df.columns:
-        context_switch_rate = activities_df['is_context_switch'].mean()
-        
-        # Get patterns with context switch information
-        pattern_switch_rates = []
-        for pattern in patterns:
-            if pattern.context_features and 'is_context_switch' in pattern.context_features:
-                pattern_switch_rates.append(pattern.context_features['is_context_switch'])
-        
-        if pattern_switch_rates:
-            mean_switch_rate = np.mean(pattern_switch_rates)
-            std_switch_rate = np.std(pattern_switch_rates)
-            
-            if abs(context_switch_rate - mean_switch_rate) > threshold * std_switch_rate:
-                # This is an anomalous context switching rate
-                for _, activity in activities_df[activities_df['is_context_switch'] == True].iterrows():
-                    anomaly = {
-                        "user_id": user_id,
-                        "activity_id": activity['activity_id'],
-                        "anomaly_type": "context_switch_anomaly",
-                        "description": f"Unusual context switching rate",
-                        "severity": "high",
-                        "detected_at": datetime.now(),
-                        "metadata": {
-                            "current_rate": float(context_switch_rate),
-                            "mean_rate": float(mean_switch_rate),
-                            "std_rate": float(std_switch_rate)
-                        }
-                    }
-                    
-                    # Create anomaly in database
-                    create_anomaly(db, **anomaly)
-                    anomalies.append(anomaly)
-    
+    # Activities without enriched features have no value and are left out of the rate.
+    context_switches = activities_df['is_context_switch'].astype(float)
+    context_switch_rate = context_switches.mean()
+
+    # Get patterns with context switch information
+    pattern_switch_rates = []
+    for pattern in patterns:
+        if pattern.context_features and 'is_context_switch' in pattern.context_features:
+            pattern_switch_rates.append(pattern.context_features['is_context_switch'])
+
+    if pattern_switch_rates and not np.isnan(context_switch_rate):
+        mean_switch_rate = np.mean(pattern_switch_rates)
+        std_switch_rate = np.std(pattern_switch_rates)
+
+        if abs(context_switch_rate - mean_switch_rate) > threshold * std_switch_rate:
+            # This is an anomalous context switching rate
+            metadata = {
+                "current_rate": float(context_switch_rate),
+                "mean_rate": float(mean_switch_rate),
+                "std_rate": float(std_switch_rate)
+            }
+            for activity_id in activity_ids[context_switches.to_numpy() == 1.0]:
+                anomalies.append({
+                    "user_id": user_id,
+                    "activity_id": int(activity_id),
+                    "anomaly_type": "context_switch_anomaly",
+                    "description": f"Unusual context switching rate",
+                    "severity": "high",
+                    "detected_at": detected_at,
+                    "metadata": dict(metadata)
+                })
+
+    # Record the anomalies in one call
+    create_anomalies(db, anomalies)
+
     return anomalies
 
 def analyze_temporal_patterns(
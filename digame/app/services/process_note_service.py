@@ -1,14 +1,34 @@
 # Service for identifying process patterns and managing ProcessNotes.
 
+import os
+
+from sqlalchemy import and_, delete, insert, or_, update
 from sqlalchemy.orm import Session
-from typing import List, Dict, Tuple, Any
-from collections import defaultdict, Counter
-from datetime import datetime
+from collections import defaultdict
+from typing import Iterator, List, Dict, Tuple, Any, NamedTuple, Optional, Sequence
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
 
 from ..models.activity import Activity
-from ..models.process_notes import ProcessNote
+from ..models.process_notes import ProcessNote, ProcessSequenceCandidate, ProcessMiningCheckpoint
 from ..models.user import User # For type hinting user_id if needed, though service takes user_id directly
 
+# Existing notes and candidates are looked up by sequence in chunks of this many
+SEQUENCE_LOOKUP_CHUNK_SIZE = 1000
+# Rows per bulk INSERT/UPDATE, bounding memory when a full run finds many sequences
+SEQUENCE_WRITE_CHUNK_SIZE = 10000
+# Sequences are kept as candidates once they've occurred this many times fewer than
+# the recurrence threshold. Most sequences in a history occur once; keeping those
+# too would make incremental counts exact, at the cost of a candidate row each.
+CANDIDATE_SLACK = 1
+# Candidates not observed for this long before the newest mined activity are dropped
+CANDIDATE_RETENTION = timedelta(days=30)
+# Incremental runs fall back to mining the whole history once the last full run is
+# this old, which finds the sequences they missed (see identify_and_update_process_notes)
+FULL_RESCAN_INTERVAL = timedelta(hours=int(os.getenv("DIGAME_PROCESS_FULL_RESCAN_HOURS", "168")))
+
 # --- Helper Function for Sequence to String ---
 
 def _sequence_to_string(sequence: List[str]) -> str:
@@ -22,120 +42,309 @@ def _generate_task_name(sequence_str: str) -> str:
         return f"Process: {sequence_str[:47]}..."
     return f"Process: {sequence_str}"
 
+# --- Sequence Mining ---
+
+class RecurringSequence(NamedTuple):
+    steps: Tuple[str, ...]
+    occurrence_count: int
+    first_start: int # Position of the first activity of the earliest occurrence
+    last_start: int # ... and of the latest one
+
+def mine_recurring_sequences(
+    activity_types: Sequence[str],
+    min_sequence_len: int = 3,
+    max_sequence_len: int = 7,
+    recurrence_threshold: int = 3,
+    new_from: int = 0
+) -> Iterator[RecurringSequence]:
+    """
+    Every run of `min_sequence_len` to `max_sequence_len` consecutive activity
+    types that occurs (overlapping occurrences included) at least
+    `recurrence_threshold` times, with its count and first and last positions.
+    With `new_from`, only occurrences that end at or after that position count,
+    i.e. those not already counted before the activities from there on arrived.
+
+    Activity types are encoded as integers and each window of length L gets an
+    integer id from the pair (id of its length L-1 prefix, its last type),
+    hashed with `pd.factorize`. Each length is therefore one O(n) pass over
+    numpy arrays that keeps only per-id counts and first/last positions, never
+    the occurrences themselves.
+    """
+    codes, type_names = pd.factorize(pd.Series(activity_types, dtype=object), use_na_sentinel=False)
+    codes = codes.astype(np.int64)
+    n, n_types = len(codes), max(len(type_names), 1)
+    type_names = np.asarray(type_names, dtype=object)
+
+    window_ids = codes # Windows of length 1
+    for length in range(2, max_sequence_len + 1):
+        n_windows = n - length + 1
+        if n_windows < recurrence_threshold or n_windows <= 0:
+            break
+        # Ids of length-1 windows are < n, so the combined key fits in int64
+        window_ids, uniques = pd.factorize(window_ids[:n_windows] * n_types + codes[length - 1:])
+        if length < min_sequence_len:
+            continue
+
+        first_counted = max(new_from - length + 1, 0)
+        counted_ids = window_ids[first_counted:]
+        counts = np.bincount(counted_ids, minlength=len(uniques))
+        frequent = np.flatnonzero(counts >= max(recurrence_threshold, 1))
+        if frequent.size == 0:
+            if new_from == 0:
+                # No longer run can recur more often than its prefix
+                break
+            continue
+        positions = np.arange(first_counted, n_windows)
+        first_starts = np.full(len(uniques), n_windows)
+        np.minimum.at(first_starts, counted_ids, positions)
+        last_starts = np.zeros(len(uniques), dtype=np.int64)
+        np.maximum.at(last_starts, counted_ids, positions)
+
+        first_starts, last_starts = first_starts[frequent], last_starts[frequent]
+        steps = type_names[np.lib.stride_tricks.sliding_window_view(codes, length)[first_starts]]
+        for sequence_steps, count, first_start, last_start in zip(
+            steps.tolist(), counts[frequent].tolist(), first_starts.tolist(), last_starts.tolist()
+        ):
+            yield RecurringSequence(tuple(sequence_steps), count, first_start, last_start)
+
 # --- Main Service Function ---
 
+def _get_checkpoint(db: Session, user_id: int) -> Optional[ProcessMiningCheckpoint]:
+    # Row lock: concurrent runs for the same user would count new activities twice
+    return (
+        db.query(ProcessMiningCheckpoint)
+        .filter(ProcessMiningCheckpoint.user_id == user_id)
+        .with_for_update()
+        .first()
+    )
+
+def _by_sequence(db: Session, model, user_id: int, columns: List, sequence_strs: Optional[List[str]]) -> Dict[str, Any]:
+    """The user's rows of `model` (notes or candidates) keyed by sequence; all of them if `sequence_strs` is None."""
+    query = db.query(model.id, model.process_steps_description, *columns).filter(model.user_id == user_id)
+    if sequence_strs is None:
+        return {row.process_steps_description: row for row in query.all()}
+    rows = {}
+    for i in range(0, len(sequence_strs), SEQUENCE_LOOKUP_CHUNK_SIZE):
+        chunk = sequence_strs[i:i + SEQUENCE_LOOKUP_CHUNK_SIZE]
+        for row in query.filter(model.process_steps_description.in_(chunk)).all():
+            rows[row.process_steps_description] = row
+    return rows
+
+class _BulkWriter:
+    """Buffers rows per bulk statement and executes each buffer once it's full."""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.buffers: Dict[Any, List[Dict[str, Any]]] = {}
+        self.counts: Dict[Any, int] = defaultdict(int)
+
+    def add(self, statement, row: Dict[str, Any]) -> None:
+        buffer = self.buffers.setdefault(statement, [])
+        buffer.append(row)
+        self.counts[statement] += 1
+        if len(buffer) >= SEQUENCE_WRITE_CHUNK_SIZE:
+            self.flush(statement)
+
+    def flush(self, statement=None) -> None:
+        for key in [statement] if statement is not None else list(self.buffers):
+            rows = self.buffers.pop(key, None)
+            if rows:
+                self.db.execute(key, rows)
+
 def identify_and_update_process_notes(
     db: Session, 
     user_id: int, # Assuming user_id is an integer based on User model
     min_sequence_len: int = 3, 
     max_sequence_len: int = 7, 
-    recurrence_threshold: int = 3
+    recurrence_threshold: int = 3,
+    full_rescan: bool = False
 ) -> Tuple[int, int]: # Returns (new_notes_created, notes_updated)
     """
     Identifies recurring sequences of activities for a user and creates/updates ProcessNotes.
+
+    Runs are incremental: the user's ProcessMiningCheckpoint records where the
+    previous run stopped, so only activities after it (plus the few before it
+    that new occurrences can start from) are mined, and their occurrences are
+    added to the notes' counts. Runs with other sequence parameters than the
+    checkpoint's, or with `full_rescan`, start over from the whole history.
+
+    Sequences that haven't recurred `recurrence_threshold` times yet are
+    counted in ProcessSequenceCandidate rows until they do, but only once they
+    have occurred `recurrence_threshold - CANDIDATE_SLACK` times within one run,
+    and only until they go unobserved for `CANDIDATE_RETENTION`. Activities that
+    arrive with timestamps older than the checkpoint are not mined either. So
+    incremental results are approximate: a sequence repeated once per run is
+    missed. A run is therefore full whenever the last full one is more than
+    `FULL_RESCAN_INTERVAL` old, which bounds how long such sequences go unnoticed.
     """
-    
-    # Step 1: Fetch Activities for the user, ordered by timestamp
-    activities = (
-        db.query(Activity)
-        .filter(Activity.user_id == user_id)
-        .order_by(Activity.timestamp.asc())
-        .all()
+    checkpoint = _get_checkpoint(db, user_id)
+    incremental = (
+        not full_rescan and checkpoint is not None and checkpoint.last_activity_id is not None
+        and (checkpoint.min_sequence_len, checkpoint.max_sequence_len, checkpoint.recurrence_threshold)
+        == (min_sequence_len, max_sequence_len, recurrence_threshold)
+        and checkpoint.full_scan_at is not None
+        and datetime.utcnow() - checkpoint.full_scan_at < FULL_RESCAN_INTERVAL
     )
+    
+    # Step 1: Fetch the user's new activities, ordered by timestamp (only the columns mining needs)
+    columns = (Activity.id, Activity.activity_type, Activity.timestamp)
+    activity_query = db.query(*columns).filter(Activity.user_id == user_id)
+    if incremental:
+        after_ts, after_id = checkpoint.last_activity_timestamp, checkpoint.last_activity_id
+        activity_query = activity_query.filter(or_(
+            Activity.timestamp > after_ts,
+            and_(Activity.timestamp == after_ts, Activity.id > after_id)
+        ))
+    activities = activity_query.order_by(Activity.timestamp.asc(), Activity.id.asc()).all()
 
-    if not activities or len(activities) < min_sequence_len:
+    if not activities or (not incremental and len(activities) < min_sequence_len):
+        db.rollback() # Releases the checkpoint lock
         return 0, 0 # Not enough activities to form sequences
 
-    # Step 2: Generate Sequences and their occurrences with timestamps
-    # Store sequences as tuples of activity_type strings to make them hashable for Counter
-    # Store all observed instances (list of activity objects) for each sequence type
-    
-    all_sequences_with_instances: Dict[Tuple[str, ...], List[List[Activity]]] = defaultdict(list)
-
-    for i in range(len(activities)):
-        for length in range(min_sequence_len, max_sequence_len + 1):
-            if i + length <= len(activities):
-                current_sub_sequence_activities = activities[i : i + length]
-                # Extract activity types for the key
-                sequence_key = tuple(act.activity_type for act in current_sub_sequence_activities)
-                all_sequences_with_instances[sequence_key].append(current_sub_sequence_activities)
-
-    # Step 3: Filter by Threshold and Prepare for DB Operations
-    new_notes_created = 0
-    notes_updated = 0
-
-    for sequence_key, instances_list in all_sequences_with_instances.items():
-        occurrence_count = len(instances_list)
-        
-        if occurrence_count >= recurrence_threshold:
-            sequence_str = _sequence_to_string(list(sequence_key)) # Convert tuple key back to list for string func
-            
-            # Find the first and last observed instances for timestamping
-            # Sort instances by the timestamp of their first activity
-            instances_list.sort(key=lambda instance_activities: instance_activities[0].timestamp)
-            
-            first_instance_activities = instances_list[0]
-            # To find the "most recent" overall, we need to look at the last activity of the last instance.
-            # Since instances_list is sorted by start_time of each instance, the last one in list is not necessarily
-            # the one that *ended* most recently if sequences can overlap.
-            # For simplicity here, we'll use the end time of the last instance in the sorted list.
-            # A more robust way would be to sort instances by their *end* times.
-            # Let's sort by end time to be more accurate for `last_observed_at`.
-            instances_list_sorted_by_end_time = sorted(instances_list, key=lambda inst_acts: inst_acts[-1].timestamp)
-            most_recent_instance_activities = instances_list_sorted_by_end_time[-1]
-
-            first_observed_at_ts = first_instance_activities[0].timestamp
-            last_observed_at_ts = most_recent_instance_activities[-1].timestamp
-            source_activity_ids_list = [act.id for act in first_instance_activities]
-
-            # Step 4: Check for Existing ProcessNote and Create/Update
-            existing_note = (
-                db.query(ProcessNote)
-                .filter(
-                    ProcessNote.user_id == user_id,
-                    ProcessNote.process_steps_description == sequence_str # Assuming this is unique enough with user_id
-                )
-                .first()
-            )
-            
-            if existing_note:
-                # Update existing note
+    tail = []
+    if incremental and checkpoint.tail_activity_ids:
+        # Occurrences can start in the previous run's last activities and end in this one's
+        tail = (
+            db.query(*columns)
+            .filter(Activity.id.in_(checkpoint.tail_activity_ids))
+            .order_by(Activity.timestamp.asc(), Activity.id.asc())
+            .all()
+        )
+    activities = tail + activities
+    activity_ids = [activity.id for activity in activities]
+    timestamps = [activity.timestamp for activity in activities]
+    candidate_min_count = max(recurrence_threshold - CANDIDATE_SLACK, 1)
+    candidate_horizon = timestamps[-1] - CANDIDATE_RETENTION
+
+    # Step 2: Count the new occurrences of sequences (see mine_recurring_sequences).
+    # A full run only needs those frequent enough to become notes or candidates;
+    # an incremental run needs every one, as any may add to an existing note or candidate.
+    found = (
+        (_sequence_to_string(list(sequence.steps)), sequence)
+        for sequence in mine_recurring_sequences(
+            [activity.activity_type for activity in activities],
+            min_sequence_len, max_sequence_len, 1 if incremental else candidate_min_count, new_from=len(tail)
+        )
+    )
+
+    # Step 3: Fetch the existing notes and candidates for these sequences. A
+    # full run fetches all the user's notes and replaces the candidates.
+    sequence_strs = None
+    if incremental:
+        found = list(found)
+        sequence_strs = [sequence_str for sequence_str, _ in found]
+    existing_notes = _by_sequence(
+        db, ProcessNote, user_id, [ProcessNote.occurrence_count, ProcessNote.last_observed_at], sequence_strs
+    )
+    if incremental:
+        candidates = _by_sequence(
+            db, ProcessSequenceCandidate, user_id,
+            [ProcessSequenceCandidate.occurrence_count, ProcessSequenceCandidate.source_activity_ids,
+             ProcessSequenceCandidate.first_observed_at],
+            sequence_strs
+        )
+    else:
+        candidates = {}
+        db.execute(delete(ProcessSequenceCandidate).where(ProcessSequenceCandidate.user_id == user_id))
+
+    # Step 4: Write new notes, changed existing ones and candidate changes in bulk
+    insert_notes, update_notes = insert(ProcessNote), update(ProcessNote) # Bulk UPDATE by primary key
+    # Candidates are inserted with Core: the ORM's per-row bookkeeping would double the cost of full runs
+    insert_candidates = insert(ProcessSequenceCandidate.__table__)
+    update_candidates = update(ProcessSequenceCandidate)
+    writer = _BulkWriter(db)
+    promoted_candidate_ids: List[int] = []
+    try:
+        for sequence_str, sequence in found:
+            length = len(sequence.steps)
+            # Activities are in timestamp order, so the latest-starting occurrence ends last
+            last_observed_at_ts = timestamps[sequence.last_start + length - 1]
+            occurrence_count = sequence.occurrence_count
+
+            existing_note = existing_notes.get(sequence_str)
+            if existing_note is not None:
+                if incremental:
+                    occurrence_count += existing_note.occurrence_count
                 # Only update if new data is actually different to avoid unnecessary DB writes
-                updated = False
-                if existing_note.occurrence_count != occurrence_count:
-                    existing_note.occurrence_count = occurrence_count
-                    updated = True
-                if existing_note.last_observed_at != last_observed_at_ts: # Timestamps might have microsecond differences
-                    existing_note.last_observed_at = last_observed_at_ts
-                    updated = True
-                
-                if updated:
-                    notes_updated += 1
+                if (existing_note.occurrence_count != occurrence_count
+                        or existing_note.last_observed_at != last_observed_at_ts):
+                    writer.add(update_notes, {
+                        "id": existing_note.id,
+                        "occurrence_count": occurrence_count,
+                        "last_observed_at": last_observed_at_ts,
+                    })
+                continue
+
+            candidate = candidates.get(sequence_str)
+            if candidate is not None:
+                # The candidate saw the first occurrence
+                occurrence_count += candidate.occurrence_count
+                source_activity_ids = candidate.source_activity_ids
+                first_observed_at_ts = candidate.first_observed_at
             else:
-                # Create new note
-                new_note = ProcessNote()
-                new_note.user_id = user_id
-                new_note.inferred_task_name = _generate_task_name(sequence_str)
-                new_note.process_steps_description = sequence_str
-                new_note.source_activity_ids = source_activity_ids_list  # Store as JSON
-                new_note.occurrence_count = occurrence_count
-                new_note.first_observed_at = first_observed_at_ts
-                new_note.last_observed_at = last_observed_at_ts
-                db.add(new_note)
-                new_notes_created += 1
-                
-    # Step 5: Commit Changes (if any notes were created or updated)
-    if new_notes_created > 0 or notes_updated > 0:
-        try:
-            db.commit()
-        except Exception as e:
-            db.rollback()
-            # Handle or raise exception e.g., log it
-            print(f"Error committing process notes: {e}") # Replace with proper logging
-            # Potentially re-raise or return error status
-            raise
+                source_activity_ids = activity_ids[sequence.first_start:sequence.first_start + length]
+                first_observed_at_ts = timestamps[sequence.first_start]
+
+            if occurrence_count >= recurrence_threshold:
+                writer.add(insert_notes, {
+                    "user_id": user_id,
+                    "inferred_task_name": _generate_task_name(sequence_str),
+                    "process_steps_description": sequence_str,
+                    "source_activity_ids": source_activity_ids,
+                    "occurrence_count": occurrence_count,
+                    "first_observed_at": first_observed_at_ts,
+                    "last_observed_at": last_observed_at_ts,
+                })
+                if candidate is not None:
+                    promoted_candidate_ids.append(candidate.id)
+            elif candidate is not None:
+                writer.add(update_candidates, {
+                    "id": candidate.id,
+                    "occurrence_count": occurrence_count,
+                    "last_observed_at": last_observed_at_ts,
+                })
+            elif occurrence_count >= candidate_min_count and last_observed_at_ts >= candidate_horizon:
+                writer.add(insert_candidates, {
+                    "user_id": user_id,
+                    "process_steps_description": sequence_str,
+                    "source_activity_ids": source_activity_ids,
+                    "occurrence_count": occurrence_count,
+                    "first_observed_at": first_observed_at_ts,
+                    "last_observed_at": last_observed_at_ts,
+                })
+        writer.flush()
+        for i in range(0, len(promoted_candidate_ids), SEQUENCE_LOOKUP_CHUNK_SIZE):
+            db.execute(delete(ProcessSequenceCandidate).where(
+                ProcessSequenceCandidate.id.in_(promoted_candidate_ids[i:i + SEQUENCE_LOOKUP_CHUNK_SIZE])
+            ))
+        if incremental:
+            db.execute(delete(ProcessSequenceCandidate).where(
+                ProcessSequenceCandidate.user_id == user_id,
+                ProcessSequenceCandidate.last_observed_at < candidate_horizon
+            ))
+
+        if checkpoint is None:
+            checkpoint = ProcessMiningCheckpoint(user_id=user_id)
+            db.add(checkpoint)
+        last = activities[-1]
+        checkpoint.last_activity_timestamp = last.timestamp
+        checkpoint.last_activity_id = last.id
+        checkpoint.tail_activity_ids = activity_ids[-(max_sequence_len - 1):] if max_sequence_len > 1 else []
+        checkpoint.min_sequence_len = min_sequence_len
+        checkpoint.max_sequence_len = max_sequence_len
+        checkpoint.recurrence_threshold = recurrence_threshold
+        checkpoint.processed_count = (checkpoint.processed_count if incremental else 0) + len(activities) - len(tail)
+        if not incremental:
+            checkpoint.full_scan_at = datetime.utcnow()
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        # Handle or raise exception e.g., log it
+        print(f"Error committing process notes: {e}") # Replace with proper logging
+        # Potentially re-raise or return error status
+        raise
             
-    return new_notes_created, notes_updated
+    return writer.counts[insert_notes], writer.counts[update_notes]
 
 
 # Example usage (conceptual, usually called from an API endpoint or background task)
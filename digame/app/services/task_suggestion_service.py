@@ -1,122 +1,214 @@
+import logging
 from sqlalchemy.orm import Session, joinedload, selectinload
-from sqlalchemy import and_, or_, not_
-from typing import List
+from sqlalchemy import and_, or_, not_, exists, insert, select, table, column
+from typing import List, Optional, Sequence
 from datetime import datetime, timedelta
 
+import numpy as np
+import pandas as pd
+
 from digame.app.models.process_notes import ProcessNote
 from digame.app.models.task import Task
 # from digame.app.models.user import User # For type hinting user_id if needed
 
+logger = logging.getLogger(__name__)
+
 # --- Constants for Task Suggestion Logic ---
 MIN_OCCURRENCE_THRESHOLD = 3 # ProcessNote must occur at least this many times
 RECENCY_DAYS_THRESHOLD = 30  # ProcessNote must have been observed in the last X days
 ACTIVE_TASK_STATUSES = ['suggested', 'accepted', 'in_progress'] # Statuses indicating an active task
+TASK_INSERT_CHUNK_SIZE = 5000 # Rows per multi-row INSERT in batch suggestion
+
+# Normalization factors (these might need tuning or be based on actual data distribution)
+MAX_OCCURRENCE_FOR_NORMALIZATION = 50  # Assume occurrences rarely exceed this for normalization
+MAX_RECENCY_SCORE_DAYS = 90 # Max days to consider for recency affecting score
+
+# Tenant membership (see the multi-tenancy migration); only the columns needed for scoping
+_tenant_users = table("tenant_users", column("tenant_id"), column("user_id"))
 
 # --- Helper for Priority Scoring ---
-def calculate_task_priority(occurrence_count: int, last_observed_at: datetime) -> float:
+def calculate_task_priorities(
+    occurrence_counts: Sequence[int],
+    last_observed_at: Sequence[datetime],
+    now: Optional[datetime] = None
+) -> np.ndarray:
     """
-    Calculates a priority score for a task based on process note attributes.
-    Score is between 0.0 and 1.0.
+    Vectorized `calculate_task_priority` over parallel sequences of process note
+    attributes. Scores are between 0.0 and 1.0.
     """
-    # Normalization factors (these might need tuning or be based on actual data distribution)
-    MAX_OCCURRENCE_FOR_NORMALIZATION = 50  # Assume occurrences rarely exceed this for normalization
-    MAX_RECENCY_SCORE_DAYS = 90 # Max days to consider for recency affecting score
-
-    # Occurrence component (e.g., 0.0 to 0.6 of the score)
-    # Cap occurrence_count to avoid scores > 1 if it exceeds MAX_OCCURRENCE
-    normalized_occurrence = min(occurrence_count / MAX_OCCURRENCE_FOR_NORMALIZATION, 1.0)
-    occurrence_score = normalized_occurrence * 0.6 
-
-    # Recency component (e.g., 0.0 to 0.4 of the score)
-    days_since_last_observed = (datetime.utcnow() - last_observed_at).days
-    # Inverse recency: more recent = higher score. Score decreases as days_since increase.
-    # Cap at MAX_RECENCY_SCORE_DAYS, anything older gets 0 recency score.
-    if days_since_last_observed < 0: days_since_last_observed = 0 # Should not happen if data is correct
-    
-    recency_factor = max(0, (MAX_RECENCY_SCORE_DAYS - days_since_last_observed) / MAX_RECENCY_SCORE_DAYS)
+    now = np.datetime64(now or datetime.utcnow(), "us")
+    counts = np.asarray(occurrence_counts, dtype=float)
+    last_observed = np.asarray(last_observed_at, dtype="datetime64[us]")
+
+    # Occurrence component (0.0 to 0.6 of the score), capped at MAX_OCCURRENCE
+    occurrence_score = np.minimum(counts / MAX_OCCURRENCE_FOR_NORMALIZATION, 1.0) * 0.6
+
+    # Recency component (0.0 to 0.4 of the score): whole days since last seen, like timedelta.days.
+    # Anything older than MAX_RECENCY_SCORE_DAYS gets 0 recency score.
+    days_since_last_observed = np.maximum((now - last_observed) // np.timedelta64(1, "D"), 0)
+    recency_factor = np.maximum(0, (MAX_RECENCY_SCORE_DAYS - days_since_last_observed) / MAX_RECENCY_SCORE_DAYS)
     recency_score_component = recency_factor * 0.4
-    
+
     # Base priority, plus weighted components
     base_priority = 0.1 # Ensure tasks always have some minimal priority
-    
+
     final_priority = base_priority + occurrence_score + recency_score_component
-    return min(max(final_priority, 0.0), 1.0) # Clamp between 0.0 and 1.0
+    return np.clip(final_priority, 0.0, 1.0)
 
 
-# --- Main Service Function ---
-def suggest_tasks_from_process_notes(db: Session, user_id: int) -> List[Task]:
+def calculate_task_priority(occurrence_count: int, last_observed_at: datetime, now: Optional[datetime] = None) -> float:
     """
-    Generates task suggestions from relevant ProcessNotes for a given user.
+    Calculates a priority score for a task based on process note attributes.
+    Score is between 0.0 and 1.0.
+    """
+    return float(calculate_task_priorities([occurrence_count], [last_observed_at], now)[0])
+
+
+# --- Candidate Selection and Task Creation ---
+def _candidate_notes_query(
+    now: datetime,
+    tenant_id: Optional[int] = None,
+    user_ids: Optional[List[int]] = None
+):
     """
-    
-    # 1. Define criteria for "relevant" ProcessNotes
-    recency_threshold_date = datetime.utcnow() - timedelta(days=RECENCY_DAYS_THRESHOLD)
-
-    # 2. Find ProcessNotes that already have an active linked Task
-    # This subquery finds ProcessNote IDs that are linked to any task with an active status.
-    subquery_process_notes_with_active_tasks = (
-        db.query(Task.process_note_id)
-        .filter(Task.user_id == user_id)
-        .filter(Task.process_note_id != None)
-        .filter(Task.status.in_(ACTIVE_TASK_STATUSES))
-        .distinct()
+    Relevant ProcessNotes of all users (or a tenant's members, or `user_ids`) without an
+    active linked Task, as one anti-joined SELECT of the columns a suggestion needs.
+    """
+    recency_threshold_date = now - timedelta(days=RECENCY_DAYS_THRESHOLD)
+    has_active_task = exists().where(
+        Task.process_note_id == ProcessNote.id,
+        Task.user_id == ProcessNote.user_id,
+        Task.status.in_(ACTIVE_TASK_STATUSES)
     )
-    
-    # 3. Fetch relevant ProcessNotes
-    #   - Meets occurrence and recency thresholds.
-    #   - Does NOT have an existing active task linked to it.
-    candidate_notes = (
-        db.query(ProcessNote)
-        .filter(ProcessNote.user_id == user_id)
-        .filter(ProcessNote.occurrence_count >= MIN_OCCURRENCE_THRESHOLD)
-        .filter(ProcessNote.last_observed_at >= recency_threshold_date)
-        .filter(not_(ProcessNote.id.in_(subquery_process_notes_with_active_tasks)))
-        .order_by(ProcessNote.last_observed_at.desc()) # Prioritize more recent notes
-        .all()
+    stmt = (
+        select(
+            ProcessNote.id, ProcessNote.user_id, ProcessNote.inferred_task_name,
+            ProcessNote.process_steps_description, ProcessNote.occurrence_count, ProcessNote.last_observed_at
+        )
+        .where(ProcessNote.occurrence_count >= MIN_OCCURRENCE_THRESHOLD)
+        .where(ProcessNote.last_observed_at >= recency_threshold_date)
+        .where(not_(has_active_task))
     )
+    if tenant_id is not None:
+        stmt = stmt.where(ProcessNote.user_id.in_(
+            select(_tenant_users.c.user_id).where(_tenant_users.c.tenant_id == tenant_id)
+        ))
+    if user_ids is not None:
+        stmt = stmt.where(ProcessNote.user_id.in_(user_ids))
+    # Per user, prioritize more recent notes
+    return stmt.order_by(ProcessNote.user_id, ProcessNote.last_observed_at.desc(), ProcessNote.id)
+
+
+def _load_candidate_notes(db: Session, now: datetime, tenant_id: Optional[int] = None,
+                          user_ids: Optional[List[int]] = None) -> pd.DataFrame:
+    columns = ["id", "user_id", "inferred_task_name", "process_steps_description", "occurrence_count", "last_observed_at"]
+    rows = db.execute(_candidate_notes_query(now, tenant_id, user_ids)).all()
+    return pd.DataFrame(rows, columns=columns)
 
-    if not candidate_notes:
-        return []
 
-    newly_suggested_tasks: List[Task] = []
-    for note in candidate_notes:
-        # 4. Create Task object
+def _suggested_task_rows(notes: pd.DataFrame, now: datetime) -> List[dict]:
+    """INSERT parameters for one suggested Task per candidate note."""
+    priorities = calculate_task_priorities(notes["occurrence_count"].to_numpy(), notes["last_observed_at"].to_numpy(), now)
+    rows = []
+    for note, priority in zip(notes.itertuples(index=False), priorities):
         task_description = f"Consider automating or reviewing process: {note.inferred_task_name or note.process_steps_description[:70]}"
         if len(note.process_steps_description) > 70 and not note.inferred_task_name:
             task_description += "..."
+        last_observed_at = pd.Timestamp(note.last_observed_at).to_pydatetime()
+        rows.append({
+            "user_id": int(note.user_id),
+            "description": task_description,
+            "source_type": 'process_note',
+            "source_identifier": str(note.id),
+            "process_note_id": int(note.id),
+            "status": 'suggested', # Default status
+            "priority_score": float(priority),
+            "notes": f"Based on process: {note.process_steps_description}\nOccurrences: {note.occurrence_count}, Last Seen: {last_observed_at.strftime('%Y-%m-%d %H:%M')}"
+        })
+    return rows
+
+
+# --- Main Service Functions ---
+def suggest_tasks_from_process_notes(db: Session, user_id: int) -> List[Task]:
+    """
+    Generates task suggestions from relevant ProcessNotes for a given user.
+
+    The new Tasks are written with one INSERT ... RETURNING and come back
+    detached with all their columns loaded.
+    """
+    now = datetime.utcnow()
+    candidate_notes = _load_candidate_notes(db, now, user_ids=[user_id])
+    if candidate_notes.empty:
+        return []
+
+    try:
+        newly_suggested_tasks = list(db.scalars(
+            insert(Task).returning(Task), _suggested_task_rows(candidate_notes, now)
+        ).all())
+        # RETURNING already loaded ids and server defaults like created_at; detach the
+        # tasks so the commit doesn't expire them into one refresh per row.
+        for task in newly_suggested_tasks:
+            db.expunge(task)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Error committing new tasks: {e}") # Replace with proper logging
+        raise
 
-        priority = calculate_task_priority(note.occurrence_count, note.last_observed_at)
-
-        new_task = Task(
-            user_id=user_id,
-            description=task_description,
-            source_type='process_note',
-            source_identifier=str(note.id),
-            process_note_id=note.id,
-            status='suggested', # Default status
-            priority_score=priority,
-            # notes field can be populated with more details from the process note if desired
-            notes=f"Based on process: {note.process_steps_description}\nOccurrences: {note.occurrence_count}, Last Seen: {note.last_observed_at.strftime('%Y-%m-%d %H:%M')}"
-        )
-        newly_suggested_tasks.append(new_task)
-
-    # 5. Add to session and commit (if any tasks were created)
-    if newly_suggested_tasks:
-        db.add_all(newly_suggested_tasks)
-        try:
-            db.commit()
-            # Refresh instances to get IDs and server-set defaults like created_at
-            for task in newly_suggested_tasks:
-                db.refresh(task)
-        except Exception as e:
-            db.rollback()
-            # Log error e
-            print(f"Error committing new tasks: {e}") # Replace with proper logging
-            # Depending on desired behavior, could re-raise or return empty list/error status
-            raise # Or return []
-            
     return newly_suggested_tasks
 
+
+def suggest_tasks_for_users(
+    db: Session,
+    now: Optional[datetime] = None,
+    tenant_id: Optional[int] = None,
+    user_ids: Optional[List[int]] = None
+) -> int:
+    """
+    Batch version of `suggest_tasks_from_process_notes` for every user, optionally
+    limited to a tenant's members or to `user_ids`.
+
+    Candidate notes of all users come from one anti-joined query, priorities are
+    scored with NumPy, and tasks are written with chunked multi-row INSERT ...
+    RETURNING and committed together. Returns the number of tasks suggested.
+    """
+    now = now or datetime.utcnow()
+    candidate_notes = _load_candidate_notes(db, now, tenant_id, user_ids)
+    if candidate_notes.empty:
+        return 0
+
+    rows = _suggested_task_rows(candidate_notes, now)
+    task_ids = []
+    try:
+        for start in range(0, len(rows), TASK_INSERT_CHUNK_SIZE):
+            task_ids.extend(db.scalars(
+                insert(Task.__table__).returning(Task.__table__.c.id), rows[start:start + TASK_INSERT_CHUNK_SIZE]
+            ).all())
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error saving batch-suggested tasks: {e}")
+        raise
+
+    logger.info(
+        f"Batch task suggestion: {len(task_ids)} tasks for "
+        f"{candidate_notes['user_id'].nunique()} users"
+    )
+    return len(task_ids)
+
+
+def suggest_tasks_summary(db: Session, user_id: int, tenant_id: Optional[int] = None,
+                          all_users: bool = False) -> dict:
+    """
+    Job handler: suggests tasks for the job's user, or in one batch for a tenant's
+    members (`tenant_id`) or every user (`all_users`).
+    """
+    if tenant_id is None and not all_users:
+        suggested = suggest_tasks_for_users(db, user_ids=[user_id])
+    else:
+        suggested = suggest_tasks_for_users(db, tenant_id=tenant_id)
+    return {"status": "success", "message": f"Suggested {suggested} tasks.", "suggested": suggested}
+
 # Example usage (conceptual)
 # if __name__ == "__main__":
 #     # Requires DB setup, User, ProcessNote, Activity data
@@ -11,10 +11,10 @@ import string
 
 from ..models.tenant import Tenant, User, Role, UserRole, TenantSettings
 from ..database import get_db
-from passlib.context import CryptContext
-
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from ..auth.jwt_handler import pwd_context
+from ..auth.password_service import password_service
+from ..auth.permission_claims import bump_user_rbac_version
+from ..auth.principal_cache import principal_cache
 
 
 class TenantService:
@@ -433,9 +433,9 @@ class UserService:
     def __init__(self, db: Session):
         self.db = db
     
-    def authenticate_user(self, username: str, password: str, tenant_id: int) -> Optional[User]:
+    async def authenticate_user(self, username: str, password: str, tenant_id: int) -> Optional[User]:
         """
-        Authenticate a user within a specific tenant
+        Authenticate a user within a specific tenant, upgrading an outdated password hash
         """
         user = self.db.query(User).filter(
             and_(
@@ -445,7 +445,13 @@ class UserService:
             )
         ).first()
         
-        if user and pwd_context.verify(password, user.hashed_password):
+        if not user:
+            return None
+        
+        valid, new_hash = await password_service.verify_and_update(password, user.hashed_password)
+        if valid:
+            if new_hash:
+                user.hashed_password = new_hash
             # Update last login
             user.last_login = datetime.utcnow()
             self.db.commit()
@@ -478,7 +484,7 @@ class UserService:
         self.db.commit()
         return user
     
-    def change_password(self, user_id: int, old_password: str, new_password: str) -> bool:
+    async def change_password(self, user_id: int, old_password: str, new_password: str) -> bool:
         """
         Change user password
         """
@@ -487,11 +493,11 @@ class UserService:
             return False
         
         # Verify old password
-        if not pwd_context.verify(old_password, user.hashed_password):
+        if not await password_service.verify(old_password, user.hashed_password):
             return False
         
         # Update password
-        user.hashed_password = pwd_context.hash(new_password)
+        user.hashed_password = await password_service.hash(new_password)
         user.updated_at = datetime.utcnow()
         self.db.commit()
         return True
@@ -506,5 +512,7 @@ class UserService:
         
         user.is_active = False
         user.updated_at = datetime.utcnow()
+        bump_user_rbac_version(self.db, user_id)
         self.db.commit()
+        principal_cache.invalidate_user(user_id)
         return True
\ No newline at end of file
@@ -10,6 +10,7 @@ from ..models.activity import Activity
 from ..models.activity_features import ActivityEnrichedFeature
 from ..crud.behavior_model_crud import get_behavioral_model, get_patterns_for_model
 from .pattern_recognition_service import categorize_pattern, generate_pattern_label
+from .activity_frame_loader import load_activity_frame
 
 def generate_pattern_heatmap(
     db: Session,
@@ -174,14 +175,9 @@ def generate_pattern_sankey(
     if not patterns:
         return {"error": "No patterns found for model"}
     
-    # Get recent activities
-    query = db.query(Activity).filter(Activity.user_id == user_id)
-    
-    if time_window:
-        start_date = datetime.now() - timedelta(days=time_window)
-        query = query.filter(Activity.timestamp >= start_date)
-    
-    activities = query.order_by(Activity.timestamp.asc()).all()
+    # Get recent activity ids in timestamp order
+    start_date = datetime.now() - timedelta(days=time_window) if time_window else None
+    activities = load_activity_frame(db, user_id, start=start_date, columns=("activity_id",))
     
     if len(activities) < 2:
         return {"error": "Not enough activities to generate transitions"}
@@ -195,30 +191,18 @@ def generate_pattern_sankey(
         for activity_id in pattern.representative_activities:
             activity_patterns[activity_id] = pattern.id
     
-    # Count transitions between patterns
+    # Sequence of pattern ids, skipping activities without a pattern
+    pattern_sequence = activities["activity_id"].map(activity_patterns).dropna().astype(int).to_numpy()
+
+    # Count pattern occurrences
+    pattern_counts = {int(k): int(v) for k, v in zip(*np.unique(pattern_sequence, return_counts=True))}
+
+    # Count transitions between consecutive, different patterns
     transitions = {}
-    pattern_counts = {}
-    
-    prev_pattern_id = None
-    for activity in activities:
-        if activity.id not in activity_patterns:
-            continue
-        
-        pattern_id = activity_patterns[activity.id]
-        
-        # Count pattern occurrences
-        if pattern_id not in pattern_counts:
-            pattern_counts[pattern_id] = 0
-        pattern_counts[pattern_id] += 1
-        
-        # Count transitions
-        if prev_pattern_id is not None and prev_pattern_id != pattern_id:
-            transition_key = f"{prev_pattern_id}-{pattern_id}"
-            if transition_key not in transitions:
-                transitions[transition_key] = 0
-            transitions[transition_key] += 1
-        
-        prev_pattern_id = pattern_id
+    sources, targets = pattern_sequence[:-1], pattern_sequence[1:]
+    changed = sources != targets
+    for (source_id, target_id), count in pd.Series(list(zip(sources[changed], targets[changed]))).value_counts(sort=False).items():
+        transitions[f"{source_id}-{target_id}"] = int(count)
     
     # Prepare Sankey diagram data
     nodes = []
@@ -356,13 +340,11 @@ def generate_pattern_timeline(
     end_date = datetime.now()
     start_date = end_date - timedelta(days=days)
     
-    activities = db.query(Activity).filter(
-        Activity.user_id == user_id,
-        Activity.timestamp >= start_date,
-        Activity.timestamp <= end_date
-    ).order_by(Activity.timestamp.asc()).all()
+    activities = load_activity_frame(
+        db, user_id, start=start_date, end=end_date, columns=("activity_id", "timestamp")
+    )
     
-    if not activities:
+    if activities.empty:
         return {"error": "No activities found in the specified time range"}
     
     # Get pattern assignments for activities
@@ -383,25 +365,18 @@ def generate_pattern_timeline(
             activity_patterns[activity_id] = pattern.id
     
     # Group activities by day and hour
-    timeline_data = {}
-    
-    for activity in activities:
-        # Format date as YYYY-MM-DD
-        date_str = activity.timestamp.strftime("%Y-%m-%d")
-        hour = activity.timestamp.hour
-        
-        if date_str not in timeline_data:
-            timeline_data[date_str] = {hour: {} for hour in range(24)}
-        
-        if hour not in timeline_data[date_str]:
-            timeline_data[date_str][hour] = {}
-        
-        pattern_id = activity_patterns.get(activity.id)
-        if pattern_id:
-            pattern_key = str(pattern_id)
-            if pattern_key not in timeline_data[date_str][hour]:
-                timeline_data[date_str][hour][pattern_key] = 0
-            timeline_data[date_str][hour][pattern_key] += 1
+    dates = activities["timestamp"].dt.strftime("%Y-%m-%d")
+    timeline_data = {date_str: {hour: {} for hour in range(24)} for date_str in dates.unique()}
+
+    pattern_ids = activities["activity_id"].map(activity_patterns)
+    assigned = pattern_ids.notna()
+    hourly_pattern_counts = pd.DataFrame({
+        "date": dates[assigned],
+        "hour": activities["timestamp"].dt.hour[assigned],
+        "pattern_id": pattern_ids[assigned].astype(int),
+    }).groupby(["date", "hour", "pattern_id"]).size()
+    for (date_str, hour, pattern_id), count in hourly_pattern_counts.items():
+        timeline_data[date_str][int(hour)][str(pattern_id)] = int(count)
     
     # Format data for visualization
     result = {
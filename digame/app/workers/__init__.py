@@ -0,0 +1,3 @@
+# This file makes 'workers' a Python package.
+# Workers are standalone processes (run with `python -m`) that do batch work
+# outside of the API request cycle.
@@ -0,0 +1,82 @@
+"""
+Scheduled fleet-wide frequency anomaly detection.
+
+Runs `detect_frequency_anomalies_for_users` for all active users (or one
+tenant's members) every `--interval-minutes`, aligned to wall-clock
+boundaries. Each run is independent, so the worker can be restarted at any
+time; a failed run is logged and the next one proceeds as scheduled.
+
+Usage:
+    python -m digame.app.workers.anomaly_worker --interval-minutes 15
+    python -m digame.app.workers.anomaly_worker --tenant-id 3 --once
+"""
+
+import argparse
+import logging
+import time
+from datetime import datetime
+from typing import Optional
+
+from ..services.anomaly_service import detect_frequency_anomalies_for_users
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL_MINUTES = 15
+
+
+def run_anomaly_batch(
+    current_time: Optional[datetime] = None,
+    tenant_id: Optional[int] = None,
+    std_dev_threshold: float = 2.0,
+    recent_window_minutes: int = 60
+) -> int:
+    """Runs one detection pass in a fresh session. Returns the number of anomalies recorded."""
+    from ..db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return detect_frequency_anomalies_for_users(
+            db, current_time or datetime.utcnow(), tenant_id=tenant_id,
+            std_dev_threshold=std_dev_threshold, recent_window_minutes=recent_window_minutes
+        )
+    finally:
+        db.close()
+
+
+def run_forever(
+    interval_minutes: int = DEFAULT_INTERVAL_MINUTES,
+    tenant_id: Optional[int] = None,
+    std_dev_threshold: float = 2.0,
+    recent_window_minutes: int = 60
+) -> None:
+    interval = interval_minutes * 60
+    while True:
+        started = time.monotonic()
+        try:
+            recorded = run_anomaly_batch(None, tenant_id, std_dev_threshold, recent_window_minutes)
+            logger.info(f"Anomaly batch recorded {recorded} anomalies in {time.monotonic() - started:.1f}s")
+        except Exception as e:
+            logger.error(f"Anomaly batch failed: {e}")
+        # Sleep to the next interval boundary so runs stay aligned with the clock.
+        time.sleep(interval - (time.time() % interval))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Detect frequency anomalies for all users on a schedule.")
+    parser.add_argument("--interval-minutes", type=int, default=DEFAULT_INTERVAL_MINUTES)
+    parser.add_argument("--once", action="store_true", help="Run a single pass and exit")
+    parser.add_argument("--tenant-id", type=int, default=None, help="Only users belonging to this tenant")
+    parser.add_argument("--threshold", type=float, default=2.0, help="Standard deviations that count as anomalous")
+    parser.add_argument("--window-minutes", type=int, default=60, help="Recent window compared with the baselines")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.once:
+        recorded = run_anomaly_batch(None, args.tenant_id, args.threshold, args.window_minutes)
+        logger.info(f"Recorded {recorded} anomalies")
+        return
+    run_forever(args.interval_minutes, args.tenant_id, args.threshold, args.window_minutes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Streaming activity enrichment worker.
+
+Runs `stream_enrich_user_activities` for every user with activity, fanning users
+out over a pool of worker processes. Each process opens its own database
+connections and commits per chunk, so workers can be stopped and restarted at
+any time and will resume from their checkpoints. Enrichment keeps the hourly
+activity baselines current; `--rebuild-baselines` recomputes them from history,
+e.g. for users enriched before baselines were persisted.
+
+Usage:
+    python -m digame.app.workers.enrichment_worker --workers 4
+    python -m digame.app.workers.enrichment_worker --user-id 42 --chunk-size 2000
+    python -m digame.app.workers.enrichment_worker --rebuild-baselines
+"""
+
+import argparse
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+
+from ..models.activity import Activity
+from ..services.activity_baseline_service import rebuild_activity_baselines
+from ..services.activity_feature_service import ENRICHMENT_CHUNK_SIZE, stream_enrich_user_activities
+
+logger = logging.getLogger(__name__)
+
+
+def _init_worker_process() -> None:
+    # Connections inherited from the parent must not be shared with the child.
+    from ..db import engine
+    engine.dispose(close=False)
+
+
+def enrich_user(
+    user_id: int,
+    chunk_size: int = ENRICHMENT_CHUNK_SIZE,
+    rebuild_baselines: bool = False
+) -> int:
+    """Enriches one user's pending activities in a fresh session. Safe to call from a worker process."""
+    from ..db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        created = stream_enrich_user_activities(db, user_id, chunk_size=chunk_size)
+        if rebuild_baselines:
+            rebuild_activity_baselines(db, user_id)
+        return created
+    finally:
+        db.close()
+
+
+def get_user_ids_with_activity(db) -> List[int]:
+    return list(db.execute(select(Activity.user_id).distinct().order_by(Activity.user_id)).scalars())
+
+
+def enrich_all_users(
+    workers: int = 1,
+    chunk_size: int = ENRICHMENT_CHUNK_SIZE,
+    user_ids: Optional[List[int]] = None,
+    rebuild_baselines: bool = False
+) -> Dict[int, int]:
+    """
+    Enriches pending activities for `user_ids` (default: every user with activity).
+
+    With `workers > 1` users are distributed over a process pool; a user is only
+    ever handled by one process at a time, so per-user ordering and checkpoints
+    stay consistent. Returns a mapping of user id to features created; users whose
+    enrichment failed are logged and omitted.
+    """
+    if user_ids is None:
+        from ..db import SessionLocal
+        db = SessionLocal()
+        try:
+            user_ids = get_user_ids_with_activity(db)
+        finally:
+            db.close()
+
+    results: Dict[int, int] = {}
+    if workers <= 1:
+        for user_id in user_ids:
+            try:
+                results[user_id] = enrich_user(user_id, chunk_size, rebuild_baselines)
+            except Exception as e:
+                logger.error(f"Enrichment failed for user {user_id}: {e}")
+        return results
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker_process) as pool:
+        futures = {pool.submit(enrich_user, user_id, chunk_size, rebuild_baselines): user_id for user_id in user_ids}
+        for future in as_completed(futures):
+            user_id = futures[future]
+            try:
+                results[user_id] = future.result()
+            except Exception as e:
+                logger.error(f"Enrichment failed for user {user_id}: {e}")
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Enrich new digital activities in bounded chunks.")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=ENRICHMENT_CHUNK_SIZE)
+    parser.add_argument("--user-id", type=int, action="append", dest="user_ids",
+                        help="Only enrich this user (repeatable)")
+    parser.add_argument("--rebuild-baselines", action="store_true",
+                        help="Recompute hourly activity baselines from full history after enriching")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    results = enrich_all_users(args.workers, args.chunk_size, args.user_ids, args.rebuild_baselines)
+    logger.info(f"Enriched {sum(results.values())} activities for {len(results)} users")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Job queue worker.
+
+Runs N worker processes that claim jobs from the `jobs` table (see
+services/job_queue.py), run their handlers with a session of their own and
+record the outcome. Any number of these can run, on any number of nodes,
+against the same database. A worker that receives SIGTERM or SIGINT finishes
+its current job before exiting; a worker process that dies is restarted, and
+its job is reclaimed once its heartbeat goes stale. A worker that finds its
+lease lost (its job was reclaimed meanwhile) exits at once and is restarted,
+so the job doesn't run twice at the same time.
+
+Usage:
+    digame-worker --processes 4
+    python -m digame.app.workers.job_worker --processes 2 --job-types model_training,predictive_training
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from typing import Callable, List, Optional, Sequence
+
+from ..services.job_queue import (
+    JOB_HEARTBEAT_SECONDS,
+    JOB_STALE_AFTER_SECONDS,
+    claim_next_job,
+    fail_job,
+    finish_job,
+    keep_lease_alive,
+    requeue_stale_jobs,
+    run_job_handler,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL_SECONDS = 2.0
+
+_stopping = threading.Event()
+
+
+def _request_stop(signum, frame) -> None:
+    _stopping.set()
+
+
+def _abandon_job() -> None:
+    # The handler's thread can't be stopped from outside, and another worker may
+    # already be running the reclaimed job; exiting is the only safe way out.
+    # The supervisor in `main` starts a replacement process.
+    logger.error("Lease lost mid-job; exiting worker process")
+    logging.shutdown()
+    os._exit(1)
+
+
+def run_next_job(worker_id: str, job_types: Optional[Sequence[str]] = None,
+                 on_lease_lost: Callable[[], None] = _abandon_job) -> bool:
+    """Claims and runs one job. Returns False when no job was claimable."""
+    from ..db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        job = claim_next_job(db, worker_id, job_types)
+        if job is None:
+            return False
+        logger.info(f"Worker {worker_id} running job {job.id} ({job.job_type}, attempt {job.attempts})")
+
+        done = threading.Event()
+        heartbeat = threading.Thread(target=keep_lease_alive, args=(done, job.id, worker_id, on_lease_lost),
+                                     daemon=True)
+        heartbeat.start()
+        try:
+            result = run_job_handler(db, job)
+        except Exception as e:
+            db.rollback()
+            status = fail_job(db, job.id, worker_id, str(e))
+            logger.error(f"Job {job.id} failed ({status}): {e}")
+        else:
+            if not finish_job(db, job.id, worker_id, result):
+                logger.warning(f"Job {job.id} finished after its lease was lost; result discarded")
+        finally:
+            done.set()
+            heartbeat.join()
+        return True
+    finally:
+        db.close()
+
+
+def work(worker_id: str, job_types: Optional[Sequence[str]] = None,
+         poll_interval: float = DEFAULT_POLL_INTERVAL_SECONDS) -> None:
+    """Runs jobs until asked to stop, polling when the queue is empty."""
+    from ..db import SessionLocal
+
+    last_reaped = 0.0
+    while not _stopping.is_set():
+        try:
+            if time.monotonic() - last_reaped > JOB_STALE_AFTER_SECONDS / 2:
+                db = SessionLocal()
+                try:
+                    requeue_stale_jobs(db)
+                finally:
+                    db.close()
+                last_reaped = time.monotonic()
+            if run_next_job(worker_id, job_types):
+                continue
+        except Exception as e:
+            logger.error(f"Worker {worker_id} error: {e}")
+        _stopping.wait(poll_interval)
+
+
+def _worker_process(index: int, job_types: Optional[List[str]], poll_interval: float) -> None:
+    logging.basicConfig(level=logging.INFO)
+    signal.signal(signal.SIGTERM, _request_stop)
+    signal.signal(signal.SIGINT, _request_stop)
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{index}"
+    logger.info(f"Worker {worker_id} started")
+    work(worker_id, job_types, poll_interval)
+    logger.info(f"Worker {worker_id} stopped")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run job queue workers.")
+    parser.add_argument("--processes", type=int, default=int(os.getenv("DIGAME_WORKER_PROCESSES", "1")),
+                        help="Worker processes to run")
+    parser.add_argument("--job-types", default=None, help="Comma-separated job types to run (default: all)")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL_SECONDS,
+                        help="Seconds to wait when the queue is empty")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    job_types = [t.strip() for t in args.job_types.split(",") if t.strip()] if args.job_types else None
+    signal.signal(signal.SIGTERM, _request_stop)
+    signal.signal(signal.SIGINT, _request_stop)
+
+    # Spawned, so no worker inherits the parent's database connections.
+    context = multiprocessing.get_context("spawn")
+
+    def start(index: int):
+        process = context.Process(target=_worker_process, args=(index, job_types, args.poll_interval),
+                                  name=f"digame-worker-{index}")
+        process.start()
+        return process
+
+    processes = [start(index) for index in range(args.processes)]
+    while not _stopping.wait(1.0):
+        for index, process in enumerate(processes):
+            if not process.is_alive():
+                logger.warning(f"Worker process {process.pid} exited with {process.exitcode}; restarting")
+                processes[index] = start(index)
+
+    for process in processes:
+        if process.is_alive():
+            os.kill(process.pid, signal.SIGTERM)
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Scheduled fleet-wide task suggestion.
+
+Runs `suggest_tasks_for_users` for all users (or one tenant's members) every
+`--interval-minutes`, aligned to wall-clock boundaries. With `--enqueue-as`,
+each run is instead queued as a "task_suggestion" job owned by that user, so
+the `digame-worker` processes run it with their retries and concurrency limits.
+Each run is independent, so the scheduler can be restarted at any time; a
+failed run is logged and the next one proceeds as scheduled.
+
+Usage:
+    python -m digame.app.workers.task_suggestion_worker --interval-minutes 60
+    python -m digame.app.workers.task_suggestion_worker --tenant-id 3 --once
+    python -m digame.app.workers.task_suggestion_worker --enqueue-as 1
+"""
+
+import argparse
+import logging
+import time
+from typing import Optional
+
+from ..services.job_queue import enqueue_job
+from ..services.task_suggestion_service import suggest_tasks_for_users
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL_MINUTES = 60
+
+
+def run_task_suggestion_batch(tenant_id: Optional[int] = None) -> int:
+    """Runs one suggestion pass in a fresh session. Returns the number of tasks suggested."""
+    from ..db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return suggest_tasks_for_users(db, tenant_id=tenant_id)
+    finally:
+        db.close()
+
+
+def enqueue_task_suggestion_batch(owner_user_id: int, tenant_id: Optional[int] = None) -> int:
+    """Queues one suggestion pass for the job workers. Returns the job id."""
+    from ..db import SessionLocal
+
+    payload = {"tenant_id": tenant_id} if tenant_id is not None else {"all_users": True}
+    db = SessionLocal()
+    try:
+        return enqueue_job(db, user_id=owner_user_id, job_type="task_suggestion", payload=payload).id
+    finally:
+        db.close()
+
+
+def _run_once(tenant_id: Optional[int], enqueue_as: Optional[int]) -> None:
+    started = time.monotonic()
+    if enqueue_as is not None:
+        job_id = enqueue_task_suggestion_batch(enqueue_as, tenant_id)
+        logger.info(f"Queued task suggestion job {job_id}")
+    else:
+        suggested = run_task_suggestion_batch(tenant_id)
+        logger.info(f"Task suggestion batch suggested {suggested} tasks in {time.monotonic() - started:.1f}s")
+
+
+def run_forever(
+    interval_minutes: int = DEFAULT_INTERVAL_MINUTES,
+    tenant_id: Optional[int] = None,
+    enqueue_as: Optional[int] = None
+) -> None:
+    interval = interval_minutes * 60
+    while True:
+        try:
+            _run_once(tenant_id, enqueue_as)
+        except Exception as e:
+            logger.error(f"Task suggestion batch failed: {e}")
+        # Sleep to the next interval boundary so runs stay aligned with the clock.
+        time.sleep(interval - (time.time() % interval))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Suggest tasks from process notes for all users on a schedule.")
+    parser.add_argument("--interval-minutes", type=int, default=DEFAULT_INTERVAL_MINUTES)
+    parser.add_argument("--once", action="store_true", help="Run a single pass and exit")
+    parser.add_argument("--tenant-id", type=int, default=None, help="Only users belonging to this tenant")
+    parser.add_argument("--enqueue-as", type=int, default=None, metavar="USER_ID",
+                        help="Queue each pass as a job owned by this user instead of running it here")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.once:
+        _run_once(args.tenant_id, args.enqueue_as)
+        return
+    run_forever(args.interval_minutes, args.tenant_id, args.enqueue_as)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+# This file makes 'benchmarks' a Python package so scripts can be run with `python -m`.
@@ -0,0 +1,151 @@
+"""
+Load benchmark for activity ingestion.
+
+Compares the per-event ORM write path (what `/monitoring/log` does for every
+event) with the batched path behind `/monitoring/activities/bulk`, and can also
+drive a running API server with concurrent NDJSON uploads.
+
+Usage:
+    python -m digame.benchmarks.bench_activity_ingest --events 100000
+    python -m digame.benchmarks.bench_activity_ingest --database-url postgresql://... --events 500000
+    python -m digame.benchmarks.bench_activity_ingest --url http://localhost:8000 --token <jwt> \
+        --events 200000 --concurrency 8
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from digame.app.models import Base, Activity
+from digame.app.services.activity_ingest_service import build_activity_row, ingest_activity_events
+
+APP_NAMES = ["vscode", "slack", "google chrome", "outlook", "figma", "terminal", "notion"]
+URLS = ["https://github.com/org/repo", "https://stackoverflow.com/q/1", "https://www.nytimes.com/a"]
+
+
+def synthetic_events(count: int, seed: int = 42) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    events = []
+    for i in range(count):
+        if rng.random() < 0.7:
+            event = {"activity_type": "app_usage", "details": {"app_name": rng.choice(APP_NAMES)}}
+        else:
+            event = {"activity_type": "website_visit", "details": {"url": rng.choice(URLS)}}
+        event["timestamp"] = (start + timedelta(seconds=i)).isoformat() + "Z"
+        events.append(event)
+    return events
+
+
+def bench_orm(session_factory, events: List[Dict[str, Any]], user_id: int) -> float:
+    db = session_factory()
+    started = time.perf_counter()
+    for event in events:
+        db.add(Activity(**build_activity_row(user_id, event)))
+        db.commit()
+    elapsed = time.perf_counter() - started
+    db.close()
+    return elapsed
+
+
+def bench_bulk(session_factory, events: List[Dict[str, Any]], user_id: int, batch_size: int) -> float:
+    db = session_factory()
+    started = time.perf_counter()
+    summary = ingest_activity_events(db, user_id, events, batch_size=batch_size, max_events=len(events))
+    elapsed = time.perf_counter() - started
+    db.close()
+    assert summary["accepted"] == len(events), summary["batches"][:1]
+    return elapsed
+
+
+def bench_http(url: str, token: str, events: List[Dict[str, Any]], request_size: int, concurrency: int) -> None:
+    bodies = [
+        ("\n".join(json.dumps(e) for e in events[i:i + request_size]) + "\n").encode()
+        for i in range(0, len(events), request_size)
+    ]
+    latencies: List[float] = []
+    lock = threading.Lock()
+    cursor = iter(bodies)
+
+    def worker():
+        while True:
+            with lock:
+                body = next(cursor, None)
+            if body is None:
+                return
+            request = urllib.request.Request(
+                f"{url.rstrip('/')}/monitoring/activities/bulk",
+                data=body,
+                headers={"Content-Type": "application/x-ndjson", "Authorization": f"Bearer {token}"},
+                method="POST",
+            )
+            started = time.perf_counter()
+            with urllib.request.urlopen(request) as response:
+                response.read()
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    print(f"http: {len(events)} events in {elapsed:.2f}s -> {len(events) / elapsed:,.0f} events/s "
+          f"(requests={len(bodies)}, p50={p50:.1f}ms, p99={p99:.1f}ms)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--orm-events", type=int, default=5_000,
+                        help="Events for the per-row ORM baseline (it is slow; extrapolated)")
+    parser.add_argument("--database-url", default=None, help="Defaults to a temporary SQLite file")
+    parser.add_argument("--url", default=None, help="Benchmark a running API server instead of the service")
+    parser.add_argument("--token", default="", help="Bearer token for --url mode")
+    parser.add_argument("--request-size", type=int, default=5000, help="Events per HTTP request in --url mode")
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    events = synthetic_events(args.events)
+
+    if args.url:
+        bench_http(args.url, args.token, events, args.request_size, args.concurrency)
+        return
+
+    database_url = args.database_url
+    if database_url is None:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'ingest_bench.db')}"
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine, autoflush=False)
+
+    orm_events = events[:args.orm_events]
+    orm_elapsed = bench_orm(session_factory, orm_events, user_id=1)
+    orm_rate = len(orm_events) / orm_elapsed
+    print(f"orm  (per-event commit): {len(orm_events)} events in {orm_elapsed:.2f}s -> {orm_rate:,.0f} events/s")
+
+    bulk_elapsed = bench_bulk(session_factory, events, user_id=2, batch_size=args.batch_size)
+    bulk_rate = len(events) / bulk_elapsed
+    print(f"bulk (batch={args.batch_size}): {len(events)} events in {bulk_elapsed:.2f}s -> {bulk_rate:,.0f} events/s")
+    print(f"speedup: {bulk_rate / orm_rate:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
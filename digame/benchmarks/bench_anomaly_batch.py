@@ -0,0 +1,106 @@
+"""
+Benchmark for fleet-wide frequency anomaly detection.
+
+Seeds baseline slots and one recent window of enriched activity for many
+users, then times `detect_frequency_anomalies_for_users` against calling
+`detect_frequency_anomalies_for_user` once per user.
+
+Usage:
+    python -m digame.benchmarks.bench_anomaly_batch --users 10000
+    python -m digame.benchmarks.bench_anomaly_batch --database-url postgresql://... --users 100000 --per-user-sample 500
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from digame.app.models import Base, Activity, ActivityEnrichedFeature, ActivityBaseline, DetectedAnomaly
+from digame.app.services.anomaly_service import (
+    detect_frequency_anomalies_for_user,
+    detect_frequency_anomalies_for_users,
+)
+
+APP_CATEGORIES = ["Development", "Communication", "Design", "Productivity"]
+NOW = datetime(2024, 3, 4, 10, 59) # A Monday
+
+
+def seed(session_factory, users: int, activities_per_user: int, spike_rate: float, seed_value: int = 42) -> None:
+    rng = random.Random(seed_value)
+    db = session_factory()
+    baseline_rows, activity_rows, categories = [], [], []
+    for user_id in range(1, users + 1):
+        for category in APP_CATEGORIES:
+            samples = [rng.randint(2, 6) for _ in range(8)]
+            baseline_rows.append({
+                "user_id": user_id, "category_type": "app_category", "category": category,
+                "day_of_week": NOW.weekday(), "hour": NOW.hour, "sample_count": len(samples),
+                "count_sum": float(sum(samples)), "count_sum_sq": float(sum(s * s for s in samples)),
+            })
+        spike = rng.random() < spike_rate
+        for i in range(activities_per_user * (5 if spike else 1)):
+            activity_rows.append({
+                "user_id": user_id, "activity_type": "app_usage",
+                "timestamp": NOW - timedelta(seconds=rng.randint(0, 3599)), "details": None,
+            })
+            categories.append(APP_CATEGORIES[0] if spike else rng.choice(APP_CATEGORIES))
+
+    db.execute(insert(ActivityBaseline), baseline_rows)
+    db.execute(insert(Activity), activity_rows)
+    activity_ids = db.execute(select(Activity.id).order_by(Activity.id)).scalars().all()
+    db.execute(insert(ActivityEnrichedFeature), [
+        {"activity_id": activity_id, "app_category": category, "is_context_switch": False}
+        for activity_id, category in zip(activity_ids, categories)
+    ])
+    db.commit()
+    db.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--activities-per-user", type=int, default=12)
+    parser.add_argument("--spike-rate", type=float, default=0.02, help="Share of users with anomalous activity")
+    parser.add_argument("--per-user-sample", type=int, default=200,
+                        help="Users timed through the per-user path; the total is extrapolated")
+    parser.add_argument("--database-url", default=None, help="Defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    tmpdir = None
+    url = args.database_url
+    if url is None:
+        tmpdir = tempfile.mkdtemp()
+        url = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine, autoflush=False)
+
+    started = time.perf_counter()
+    seed(session_factory, args.users, args.activities_per_user, args.spike_rate)
+    print(f"seeded {args.users} users in {time.perf_counter() - started:.1f}s")
+
+    db = session_factory()
+    started = time.perf_counter()
+    recorded = detect_frequency_anomalies_for_users(db, NOW)
+    batch_elapsed = time.perf_counter() - started
+    print(f"batch:    {recorded} anomalies for {args.users} users in {batch_elapsed:.2f}s")
+
+    db.query(DetectedAnomaly).delete()
+    db.commit()
+    sample = min(args.per_user_sample, args.users)
+    started = time.perf_counter()
+    for user_id in range(1, sample + 1):
+        detect_frequency_anomalies_for_user(db, user_id, NOW)
+    per_user_elapsed = (time.perf_counter() - started) / sample * args.users
+    print(f"per-user: ~{per_user_elapsed:.2f}s for {args.users} users (extrapolated from {sample})")
+    print(f"speedup:  {per_user_elapsed / batch_elapsed:.1f}x")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
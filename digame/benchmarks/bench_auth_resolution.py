@@ -0,0 +1,118 @@
+"""
+Benchmark for authenticated request throughput.
+
+Serves one endpoint guarded by the enhanced `PermissionChecker` from a SQLite
+database holding a user whose roles grant a few dozen permissions, and sends
+it authenticated requests with the principal cache disabled (every request
+verifies the JWT and loads the user, roles and permissions) and enabled. Reports
+requests per second and SQL statements per request, for the checker returning
+the `User` and returning the `Principal`.
+
+Usage:
+    python -m digame.benchmarks.bench_auth_resolution
+    python -m digame.benchmarks.bench_auth_resolution --requests 20000 --database-url postgresql://...
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from digame.app.auth.enhanced_auth_dependencies import PermissionChecker
+from digame.app.auth.jwt_handler import TokenHandler
+from digame.app.auth.principal_cache import principal_cache
+from digame.app.db import get_db
+from digame.app.models import Base
+from digame.app.models.rbac import Permission, Role
+from digame.app.models.user import User
+
+
+def seed(session_factory, roles: int, permissions_per_role: int) -> User:
+    db = session_factory()
+    user = User(username="bench", email="bench@example.com", hashed_password="-", is_active=True)
+    for r in range(roles):
+        role = Role(name=f"role_{r}")
+        role.permissions = [Permission(name=f"perm_{r}_{p}") for p in range(permissions_per_role)]
+        user.roles.append(role)
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    db.close()
+    return user
+
+
+def build_app(session_factory, required_permission: str, return_principal: bool) -> FastAPI:
+    app = FastAPI()
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+
+    @app.get("/guarded")
+    def guarded(caller=Depends(PermissionChecker(required_permission, return_principal=return_principal))):
+        return {"ok": True}
+
+    return app
+
+
+def run(app: FastAPI, engine, token: str, requests: int):
+    statements = []
+    listener = lambda *args: statements.append(1)
+    event.listen(engine, "before_cursor_execute", listener)
+    headers = {"Authorization": f"Bearer {token}"}
+    with TestClient(app) as client:
+        client.get("/guarded", headers=headers)  # warm up, and fill the cache when enabled
+        statements.clear()
+        started = time.perf_counter()
+        for _ in range(requests):
+            assert client.get("/guarded", headers=headers).status_code == 200
+        elapsed = time.perf_counter() - started
+    event.remove(engine, "before_cursor_execute", listener)
+    return requests / elapsed, len(statements) / requests
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--roles", type=int, default=4)
+    parser.add_argument("--permissions-per-role", type=int, default=10)
+    parser.add_argument("--database-url", default=None, help="Defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.TemporaryDirectory()
+    url = args.database_url or f"sqlite:///{os.path.join(tmpdir.name, 'auth.db')}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine, autoflush=False)
+    user = seed(session_factory, args.roles, args.permissions_per_role)
+    token = TokenHandler.create_access_token({"sub": str(user.id), "username": user.username, "email": user.email})
+    required = f"perm_{args.roles - 1}_{args.permissions_per_role - 1}"
+
+    print(f"{'cache':>8s} {'returns':>10s} {'req/s':>9s} {'SQL/req':>8s}")
+    ttl = principal_cache.ttl_seconds
+    try:
+        for cache_ttl in (0, 60):
+            for return_principal in (False, True):
+                principal_cache.ttl_seconds = cache_ttl
+                principal_cache.clear()
+                app = build_app(session_factory, required, return_principal)
+                throughput, per_request = run(app, engine, token, args.requests)
+                print(f"{'on' if cache_ttl else 'off':>8s} {'Principal' if return_principal else 'User':>10s} "
+                      f"{throughput:9.0f} {per_request:8.2f}")
+    finally:
+        principal_cache.ttl_seconds = ttl
+        tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
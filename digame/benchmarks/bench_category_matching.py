@@ -0,0 +1,126 @@
+"""
+Microbenchmark for per-event categorization cost in activity enrichment.
+
+Runs the original implementation (linear substring scan over
+APP_CATEGORY_MAPPING, urlparse + exact dict lookup, uncompiled regexes per
+call) against the compiled matchers with their LRU caches on the same stream of
+synthetic events, and reports the cost per event.
+
+Usage:
+    python -m digame.benchmarks.bench_category_matching --events 1000000
+    python -m digame.benchmarks.bench_category_matching --events 1000000 --unique-ratio 0.5
+"""
+
+import argparse
+import random
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from digame.app.services import activity_feature_service as afs
+from digame.app.services.activity_feature_service import APP_CATEGORY_MAPPING, WEBSITE_CATEGORY_MAPPING
+
+# --- Original implementation, kept verbatim for comparison ---
+
+def legacy_app_category(activity_type: str, details: Dict[str, Any]) -> Optional[str]:
+    if activity_type == 'app_usage':
+        app_name = details.get('app_name', '').lower()
+        for key, category in APP_CATEGORY_MAPPING.items():
+            if key in app_name:
+                return category
+    return None
+
+def legacy_website_category(activity_type: str, details: Dict[str, Any]) -> Optional[str]:
+    if activity_type == 'website_visit':
+        url_str = details.get('url')
+        if url_str:
+            try:
+                domain = urlparse(url_str).netloc.replace("www.", "")
+                return WEBSITE_CATEGORY_MAPPING.get(domain)
+            except Exception:
+                return None
+    return None
+
+def legacy_project_context(activity_type: str, details: Dict[str, Any]) -> Optional[str]:
+    if activity_type == 'app_usage':
+        window_title = details.get('window_title', '')
+        match_vscode = re.search(r'-\s*([^-\s][^-]+[^-\s])\s*-\s*(Visual Studio Code|VSCode)', window_title, re.IGNORECASE)
+        if match_vscode:
+            return match_vscode.group(1).strip()
+        match_intellij_path = re.search(r'\[(?:[^\]]*[/|\\])?([^/|\\]+)(([/|\\][^/|\\]+)*)\]', window_title)
+        if match_intellij_path:
+            if re.search(r'src|lib|include', match_intellij_path.group(2) or "", re.IGNORECASE):
+                return match_intellij_path.group(1)
+    elif activity_type in ['file_open', 'file_save', 'file_activity']:
+        file_path = details.get('file_path', '')
+        match_path = re.search(r'(?:Projects|dev|workspace)[/\\]([^/\\]+)', file_path, re.IGNORECASE)
+        if match_path:
+            return match_path.group(1)
+    return None
+
+def legacy_features(activity_type: str, details: Dict[str, Any]) -> Tuple[Optional[str], ...]:
+    return (
+        legacy_app_category(activity_type, details),
+        legacy_website_category(activity_type, details),
+        legacy_project_context(activity_type, details),
+    )
+
+def compiled_features(activity_type: str, details: Dict[str, Any]) -> Tuple[Optional[str], ...]:
+    return (
+        afs._get_app_category(activity_type, details),
+        afs._get_website_category(activity_type, details),
+        afs._extract_project_context(activity_type, details),
+    )
+
+# --- Synthetic events ---
+
+APPS = ["Visual Studio Code", "Slack", "Google Chrome", "Microsoft Outlook", "Figma", "iTerm2",
+        "Spotify", "Zoom", "Microsoft Excel", "Notion", "Unknown Tool"]
+SITES = ["https://github.com/org/repo/pull/{n}", "https://www.nytimes.com/2024/{n}", "https://docs.python.org/3/{n}",
+         "https://mail.google.com/u/{n}", "https://example.org/{n}", "https://en.wikipedia.org/wiki/{n}"]
+
+def synthetic_events(count: int, unique_ratio: float, seed: int = 1) -> List[Tuple[str, Dict[str, Any]]]:
+    rng = random.Random(seed)
+    events = []
+    for i in range(count):
+        suffix = i if rng.random() < unique_ratio else rng.randint(0, 50)
+        roll = rng.random()
+        if roll < 0.55:
+            app = rng.choice(APPS)
+            events.append(("app_usage", {
+                "app_name": f"{app} {suffix}" if suffix % 7 == 0 else app,
+                "window_title": f"module_{suffix}.py - Project{suffix % 40} - Visual Studio Code",
+            }))
+        elif roll < 0.9:
+            events.append(("website_visit", {"url": rng.choice(SITES).format(n=suffix)}))
+        else:
+            events.append(("file_save", {"file_path": f"/home/u/dev/Project{suffix % 40}/file_{suffix}.txt"}))
+    return events
+
+def run(label: str, fn, events) -> float:
+    started = time.perf_counter()
+    for activity_type, details in events:
+        fn(activity_type, details)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<10} {elapsed:7.2f}s  {elapsed / len(events) * 1e9:8.0f} ns/event")
+    return elapsed
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--unique-ratio", type=float, default=0.05,
+                        help="Fraction of events with a never-seen-before name/url/title (cache misses)")
+    args = parser.parse_args()
+
+    events = synthetic_events(args.events, args.unique_ratio)
+    mismatches = sum(1 for t, d in events[:20000] if legacy_features(t, d)[0] != compiled_features(t, d)[0])
+    print(f"{len(events)} events, unique ratio {args.unique_ratio}; app category mismatches in sample: {mismatches}")
+
+    before = run("before", legacy_features, events)
+    afs._clear_category_caches()
+    after = run("after", compiled_features, events)
+    print(f"speedup: {before / after:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark for the exact and scalable clustering backends in `behavior`.
+
+Clusters synthetic activity-like datasets (scaled numeric columns plus one-hot
+columns) of increasing size with each algorithm's exact backend and with its
+scalable backend, each in a fresh process, and reports wall time, peak
+resident memory growth and, where the
+exact backend ran, the adjusted Rand index between the two labelings. Exact
+backends whose estimated memory exceeds `--memory-limit-mb` are skipped.
+
+Usage:
+    python -m digame.benchmarks.bench_clustering_backends
+    python -m digame.benchmarks.bench_clustering_backends --samples 10000 100000 500000 --algorithms kmeans dbscan
+"""
+
+import argparse
+import contextlib
+import io
+import logging
+import multiprocessing
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.datasets import make_blobs
+from sklearn.metrics import adjusted_rand_score
+
+from digame.app import behavior
+
+
+def make_dataset(samples: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    numeric, labels = make_blobs(n_samples=samples, n_features=4, centers=5, cluster_std=0.5, random_state=seed)
+    numeric = (numeric - numeric.mean(axis=0)) / numeric.std(axis=0)
+    types = np.where(rng.random(samples) < 0.9, labels % 4, rng.integers(0, 4, samples))
+    return pd.DataFrame(np.hstack([numeric, np.eye(4)[types]]))
+
+
+def _cluster(data: pd.DataFrame, algorithm: str, large_dataset_rows: int):
+    logging.getLogger(behavior.__name__).setLevel(logging.WARNING)
+    behavior.CLUSTER_LARGE_DATASET_ROWS = large_dataset_rows
+    behavior.CLUSTER_MEMORY_LIMIT_MB = 1e9  # Exact backends are gated by --memory-limit-mb here
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        labels, _ = behavior.cluster_activity_logs(data, n_clusters=5, algorithm=algorithm, auto_optimize=False)
+    elapsed = time.perf_counter() - started
+    peak_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+    return labels, elapsed, peak_growth / 1024
+
+
+def run(data: pd.DataFrame, algorithm: str, large_dataset_rows: int):
+    """Clusters `data` through `cluster_activity_logs` in a new process with the given size threshold."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(_cluster, data, algorithm, large_dataset_rows).result()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, nargs="+", default=[20000, 40000, 200000])
+    parser.add_argument("--algorithms", nargs="+", default=["kmeans", "dbscan", "hdbscan", "hierarchical"])
+    parser.add_argument("--memory-limit-mb", type=float, default=2048)
+    args = parser.parse_args()
+
+    print(f"{'algorithm':13s} {'samples':>8s} {'exact s':>8s} {'exact MB':>9s} {'scalable s':>11s} {'scalable MB':>12s} {'ARI':>6s}")
+    for samples in args.samples:
+        data = make_dataset(samples)
+        for algorithm in args.algorithms:
+            estimate = behavior.estimate_clustering_memory(algorithm, data.to_numpy(), n_clusters=5) / 1024 / 1024
+            if estimate <= args.memory_limit_mb:
+                exact_labels, exact_s, exact_mb = run(data, algorithm, large_dataset_rows=len(data))
+                exact_cols = f"{exact_s:8.2f} {exact_mb:9.0f}"
+            else:
+                exact_labels = None
+                exact_cols = f"{'skipped':>8s} {'~' + format(estimate, '.0f'):>9s}"
+            labels, scalable_s, scalable_mb = run(data, algorithm, large_dataset_rows=0)
+            ari = f"{adjusted_rand_score(exact_labels, labels):6.3f}" if exact_labels is not None else f"{'-':>6s}"
+            print(f"{algorithm:13s} {samples:8d} {exact_cols} {scalable_s:11.2f} {scalable_mb:12.0f} {ari}")
+
+
+if __name__ == "__main__":
+    main()
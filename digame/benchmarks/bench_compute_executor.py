@@ -0,0 +1,103 @@
+"""
+Benchmark for event-loop latency while models train.
+
+Serves a minimal app with an async `/health` endpoint and a training endpoint
+that runs a KMeans fit either inline in the request handler (how `/behavior/train`
+used to run) or in the compute executor's process pool. Fires several trainings
+at once, probes `/health` until they finish and reports its latency percentiles.
+
+Usage:
+    python -m digame.benchmarks.bench_compute_executor --trainings 8
+    python -m digame.benchmarks.bench_compute_executor --samples 50000 --mode executor
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+import numpy as np
+from fastapi import FastAPI
+from sklearn.cluster import KMeans
+
+from digame.app import compute_executor
+
+
+def fit_kmeans(samples: int, features: int, seed: int) -> int:
+    data = np.random.default_rng(seed).normal(size=(samples, features))
+    return int(KMeans(n_clusters=8, n_init=10, random_state=seed).fit(data).n_iter_)
+
+
+def build_app(mode: str, samples: int, features: int) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    @app.post("/train/{seed}")
+    async def train(seed: int):
+        if mode == "inline":
+            n_iter = fit_kmeans(samples, features, seed)
+        else:
+            n_iter = await compute_executor.run_in_process(fit_kmeans, samples, features, seed)
+        return {"n_iter": n_iter}
+
+    return app
+
+
+async def run(mode: str, trainings: int, samples: int, features: int, probe_interval: float):
+    app = build_app(mode, samples, features)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+        started = time.perf_counter()
+        training = asyncio.gather(*(client.post(f"/train/{seed}") for seed in range(trainings)))
+        training = asyncio.ensure_future(training)
+
+        # Probes are due on a fixed schedule and timed from when they were due; every
+        # probe that fell due while the loop was stalled is charged the wait it saw.
+        latencies = []
+        due = time.perf_counter()
+        while not training.done():
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+            await client.get("/health")
+            answered = time.perf_counter()
+            while due <= answered:
+                latencies.append((answered - due) * 1000)
+                due += probe_interval
+        await training
+        return time.perf_counter() - started, latencies
+
+
+def report(mode: str, elapsed: float, latencies) -> None:
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{mode:9s} trainings done in {elapsed:.1f}s; /health probes={len(latencies)} "
+          f"p50={statistics.median(latencies):.1f}ms p99={p99:.1f}ms max={latencies[-1]:.1f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trainings", type=int, default=8, help="Concurrent training requests")
+    parser.add_argument("--samples", type=int, default=20000, help="Rows per KMeans fit")
+    parser.add_argument("--features", type=int, default=16)
+    parser.add_argument("--probe-interval-ms", type=float, default=10.0)
+    parser.add_argument("--mode", choices=["inline", "executor", "both"], default="both")
+    args = parser.parse_args()
+
+    modes = ["inline", "executor"] if args.mode == "both" else [args.mode]
+    # Spawn the pool up front so worker start-up isn't billed to the first probes.
+    pool = compute_executor.get_process_pool()
+    list(pool.map(int, range(compute_executor.COMPUTE_PROCESS_WORKERS)))
+    try:
+        for mode in modes:
+            elapsed, latencies = asyncio.run(run(
+                mode, args.trainings, args.samples, args.features, args.probe_interval_ms / 1000
+            ))
+            report(mode, elapsed, latencies)
+    finally:
+        compute_executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
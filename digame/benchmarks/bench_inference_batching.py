@@ -0,0 +1,83 @@
+"""
+Benchmark for micro-batched next-activity inference.
+
+Runs closed-loop clients that each request predictions back to back against
+one PredictiveModel, either one forward pass per request ("single") or through
+`InferenceBatcher` ("batched"), with the eager model or its TorchScript
+version, and reports throughput and p50/p99 latency per concurrency level.
+
+Usage:
+    python -m digame.benchmarks.bench_inference_batching
+    python -m digame.benchmarks.bench_inference_batching --concurrency 1 16 64 256 --hidden-dim 256
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import numpy as np
+
+from digame.app import compute_executor
+from digame.app.inference_batcher import InferenceBatcher, _forward
+from digame.app.predictive import PredictiveModel, script_for_inference
+
+
+async def run_clients(predict, concurrency: int, duration: float, sequence_length: int, input_dim: int):
+    rng = np.random.default_rng(0)
+    sequences = rng.normal(size=(256, sequence_length, input_dim)).astype(np.float32)
+    latencies = []
+    deadline = time.perf_counter() + duration
+
+    async def client(offset: int):
+        i = offset
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            await predict(sequences[i % len(sequences)])
+            latencies.append((time.perf_counter() - started) * 1000)
+            i += concurrency
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(offset) for offset in range(concurrency)))
+    return len(latencies) / (time.perf_counter() - started), latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--duration", type=float, default=3.0, help="Seconds per run")
+    parser.add_argument("--hidden-dim", type=int, default=128)
+    parser.add_argument("--num-layers", type=int, default=2)
+    parser.add_argument("--sequence-length", type=int, default=5)
+    parser.add_argument("--max-wait-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    input_dim, output_dim = 7, 20
+    model = PredictiveModel(input_dim, args.hidden_dim, output_dim, args.num_layers).eval()
+    runners = {"eager": model, "torchscript": script_for_inference(model)}
+
+    print(f"{'mode':22s} {'clients':>7s} {'req/s':>9s} {'p50 ms':>8s} {'p99 ms':>8s} {'batch':>6s}")
+    try:
+        for backend, runner in runners.items():
+            assets = {"model": model, "runner": runner}
+            for concurrency in args.concurrency:
+                for mode in ("single", "batched"):
+                    batcher = InferenceBatcher(max_wait_ms=args.max_wait_ms)
+                    if mode == "batched":
+                        predict = lambda sequence: batcher.predict(assets, sequence)
+                    else:
+                        predict = lambda sequence: compute_executor.run_in_thread(_forward, runner, sequence[None])
+                    throughput, latencies = asyncio.run(run_clients(
+                        predict, concurrency, args.duration, args.sequence_length, input_dim
+                    ))
+                    latencies.sort()
+                    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+                    batch = batcher.stats()["mean_batch_size"] or 1.0
+                    print(f"{backend + ' ' + mode:22s} {concurrency:7d} {throughput:9.0f} "
+                          f"{statistics.median(latencies):8.2f} {p99:8.2f} {batch:6.1f}")
+    finally:
+        compute_executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
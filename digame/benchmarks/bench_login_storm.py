@@ -0,0 +1,102 @@
+"""
+Benchmark for event-loop latency during a login storm.
+
+Serves a minimal app with an async `/health` endpoint and a login endpoint that
+verifies a bcrypt password either inline in the request handler (how the auth
+endpoints used to run) or through the password service's bounded pool. Fires
+many logins at once, probes `/health` until they finish and reports its latency
+percentiles, along with login throughput and how many logins were turned away
+with 429 once the pool's queue was full.
+
+Usage:
+    python -m digame.benchmarks.bench_login_storm --logins 200
+    python -m digame.benchmarks.bench_login_storm --rounds 12 --workers 4 --max-pending 32 --mode pool
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI
+from passlib.context import CryptContext
+
+from digame.app.auth.password_service import PasswordService
+
+PASSWORD = "correct horse battery staple"
+
+
+def build_app(mode: str, context: CryptContext, service: PasswordService) -> FastAPI:
+    app = FastAPI()
+    hashed = context.hash(PASSWORD)
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    @app.post("/login")
+    async def login():
+        if mode == "inline":
+            valid = context.verify(PASSWORD, hashed)
+        else:
+            valid = await service.verify(PASSWORD, hashed)
+        return {"valid": valid}
+
+    return app
+
+
+async def run(mode: str, logins: int, context: CryptContext, service: PasswordService, probe_interval: float):
+    app = build_app(mode, context, service)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+        started = time.perf_counter()
+        storm = asyncio.ensure_future(asyncio.gather(*(client.post("/login") for _ in range(logins))))
+
+        # Probes are due on a fixed schedule and timed from when they were due; every
+        # probe that fell due while the loop was stalled is charged the wait it saw.
+        latencies = []
+        due = time.perf_counter()
+        while not storm.done():
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+            await client.get("/health")
+            answered = time.perf_counter()
+            while due <= answered:
+                latencies.append((answered - due) * 1000)
+                due += probe_interval
+        responses = await storm
+        elapsed = time.perf_counter() - started
+    accepted = sum(response.status_code == 200 for response in responses)
+    rejected = sum(response.status_code == 429 for response in responses)
+    return elapsed, accepted, rejected, latencies
+
+
+def report(mode: str, elapsed: float, accepted: int, rejected: int, latencies) -> None:
+    latencies = sorted(latencies) or [0.0]
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{mode:7s} {accepted} logins in {elapsed:.1f}s ({accepted / elapsed:.0f}/s), {rejected} rejected; "
+          f"/health probes={len(latencies)} p50={statistics.median(latencies):.1f}ms "
+          f"p99={p99:.1f}ms max={latencies[-1]:.1f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=100, help="Concurrent login requests")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost")
+    parser.add_argument("--workers", type=int, default=4, help="Password pool threads")
+    parser.add_argument("--max-pending", type=int, default=1000, help="Queued calls before 429; lower it to see backpressure")
+    parser.add_argument("--probe-interval-ms", type=float, default=10.0)
+    parser.add_argument("--mode", choices=["inline", "pool", "both"], default="both")
+    args = parser.parse_args()
+
+    context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=args.rounds)
+    service = PasswordService(context, max_workers=args.workers, max_pending=args.max_pending)
+    modes = ["inline", "pool"] if args.mode == "both" else [args.mode]
+    try:
+        for mode in modes:
+            report(mode, *asyncio.run(run(mode, args.logins, context, service, args.probe_interval_ms / 1000)))
+    finally:
+        service.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark for the cluster-count search in `behavior.optimize_clusters`.
+
+Builds synthetic activity-like datasets (scaled numeric columns plus one-hot
+columns, with a known number of behavior groups) and runs both the previous
+exhaustive search (a full KMeans and a full O(n^2) silhouette score for every
+k) and the current one (sampled silhouette, MiniBatchKMeans for large
+datasets, early stopping, optional parallel k). Reports the time of each, the
+speedup and how often both choose the same k.
+
+Usage:
+    python -m digame.benchmarks.bench_optimize_clusters
+    python -m digame.benchmarks.bench_optimize_clusters --samples 2000 10000 --seeds 5 --n-jobs -1
+"""
+
+import argparse
+import contextlib
+import io
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans
+from sklearn.datasets import make_blobs
+from sklearn.metrics import silhouette_score
+
+from digame.app.behavior import _choose_k, optimize_clusters
+
+
+def exhaustive_optimize_clusters(processed_data: pd.DataFrame, min_k: int = 2, max_k: int = 10) -> int:
+    """The search `optimize_clusters` used to run."""
+    max_possible_k = min(max_k, processed_data.shape[0] - 1)
+    k_values = list(range(min_k, max_possible_k + 1))
+    inertia_values, silhouette_values = [], []
+    for k in k_values:
+        kmeans = KMeans(n_clusters=k, random_state=42, n_init='auto')
+        labels = kmeans.fit_predict(processed_data)
+        inertia_values.append(kmeans.inertia_)
+        silhouette_values.append(silhouette_score(processed_data, labels) if len(np.unique(labels)) > 1 else -1)
+    return _choose_k(k_values, inertia_values, silhouette_values)[0]
+
+
+def make_dataset(samples: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    groups = int(rng.integers(3, 8))
+    numeric, labels = make_blobs(n_samples=samples, n_features=6, centers=groups,
+                                 cluster_std=rng.uniform(0.8, 2.0), random_state=seed)
+    numeric = (numeric - numeric.mean(axis=0)) / numeric.std(axis=0)
+    # One-hot activity type, mostly determined by the behavior group
+    types = np.where(rng.random(samples) < 0.8, labels % 4, rng.integers(0, 4, samples))
+    one_hot = np.eye(4)[types]
+    return pd.DataFrame(np.hstack([numeric, one_hot]))
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--seeds", type=int, default=5, help="Datasets per size")
+    parser.add_argument("--n-jobs", type=int, default=1, help="Parallel k evaluation for the fast search")
+    args = parser.parse_args()
+
+    print(f"{'samples':>8s} {'exhaustive s':>13s} {'fast s':>8s} {'speedup':>8s} {'same k':>7s}")
+    for samples in args.samples:
+        exhaustive_total = fast_total = 0.0
+        agree = 0
+        for seed in range(args.seeds):
+            data = make_dataset(samples, seed)
+            exhaustive_k, exhaustive_s = timed(exhaustive_optimize_clusters, data)
+            fast_k, fast_s = timed(optimize_clusters, data, n_jobs=args.n_jobs)
+            exhaustive_total += exhaustive_s
+            fast_total += fast_s
+            agree += exhaustive_k == fast_k
+        print(f"{samples:8d} {exhaustive_total:13.2f} {fast_total:8.2f} "
+              f"{exhaustive_total / fast_total:7.1f}x {agree:>3d}/{args.seeds}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Benchmark for recurring-sequence mining in `process_note_service`.
+
+Generates activity histories made of recurring routines mixed with one-off
+activities, then:
+
+- mines them in a fresh process with the previous enumeration (every
+  subsequence of every length at every position, holding its occurrences) and
+  with `mine_recurring_sequences`, reporting wall time, peak resident memory
+  growth and whether both find the same sequences, counts and positions. The
+  previous enumeration is skipped above `--max-previous`;
+- runs `identify_and_update_process_notes` against a database seeded with the
+  largest history: a first (full) run, then after each batch of new
+  activities an incremental run and, for comparison, a full rescan, reporting
+  wall time, the number of SQL statements issued and the candidate rows
+  left in `process_sequence_candidates` afterwards. The previous service
+  always mined the full history and issued one ProcessNote lookup per
+  recurring sequence.
+
+Usage:
+    python -m digame.benchmarks.bench_process_mining
+    python -m digame.benchmarks.bench_process_mining --activities 10000 100000 1000000 --database-url postgresql://...
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+
+from digame.app.models import Base, Activity, ProcessSequenceCandidate, User
+from digame.app.services.process_note_service import identify_and_update_process_notes, mine_recurring_sequences
+
+
+def make_activity_types(n: int, seed: int = 0, vocabulary: int = 40, routines: int = 60) -> list:
+    """`n` activity types: routines of 3-8 steps (60% of the time) between one-off activities."""
+    rng = np.random.default_rng(seed)
+    routine_steps = [rng.integers(0, vocabulary, rng.integers(3, 9)) for _ in range(routines)]
+    codes = []
+    while len(codes) < n:
+        if rng.random() < 0.6:
+            codes.extend(routine_steps[rng.integers(0, routines)])
+        else:
+            codes.append(rng.integers(0, vocabulary))
+    return [f"type_{code}" for code in codes[:n]]
+
+
+def enumerate_recurring_sequences(activities: list, min_len: int, max_len: int, threshold: int) -> dict:
+    """
+    The mining the service used to do, over (position, activity_type) rows:
+    {steps: (count, first start, last start)}.
+    """
+    instances = defaultdict(list)
+    for i in range(len(activities)):
+        for length in range(min_len, max_len + 1):
+            if i + length <= len(activities):
+                instance = activities[i:i + length]
+                instances[tuple(activity[1] for activity in instance)].append(instance)
+    return {
+        steps: (len(found), found[0][0][0], found[-1][0][0])
+        for steps, found in instances.items() if len(found) >= threshold
+    }
+
+
+def _mine(n: int, method: str):
+    activity_types = make_activity_types(n)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    if method == "previous":
+        found = enumerate_recurring_sequences(list(enumerate(activity_types)), 3, 7, 3)
+    else:
+        found = {
+            sequence.steps: (sequence.occurrence_count, sequence.first_start, sequence.last_start)
+            for sequence in mine_recurring_sequences(activity_types, 3, 7, 3)
+        }
+    elapsed = time.perf_counter() - started
+    peak_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+    return found, elapsed, peak_growth / 1024
+
+
+def run(n: int, method: str):
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(_mine, n, method).result()
+
+
+def seed_activities(db, user_id: int, activity_types: list, start: datetime) -> None:
+    db.execute(insert(Activity), [
+        {"user_id": user_id, "activity_type": activity_type, "timestamp": start + timedelta(seconds=30 * i)}
+        for i, activity_type in enumerate(activity_types)
+    ])
+    db.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--activities", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--max-previous", type=int, default=100000,
+                        help="Largest history mined with the previous enumeration")
+    parser.add_argument("--new-activities", type=int, nargs="+", default=[100, 1000, 10000],
+                        help="Sizes of the batches of new activities for the incremental runs")
+    parser.add_argument("--database-url", default=None, help="Defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    print(f"{'activities':>10s} {'method':>9s} {'seconds':>8s} {'peak MB':>8s} {'sequences':>9s} {'same':>5s}")
+    for n in args.activities:
+        mined, elapsed, peak = run(n, "mined")
+        same = "-"
+        if n <= args.max_previous:
+            previous, previous_elapsed, previous_peak = run(n, "previous")
+            same = "yes" if previous == mined else "no"
+            print(f"{n:10d} {'previous':>9s} {previous_elapsed:8.2f} {previous_peak:8.0f} {len(previous):9d}")
+        print(f"{n:10d} {'mined':>9s} {elapsed:8.2f} {peak:8.0f} {len(mined):9d} {same:>5s}")
+
+    tmpdir = None
+    url = args.database_url
+    if url is None:
+        tmpdir = tempfile.mkdtemp()
+        url = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *a: statements.append(1))
+
+    n = max(args.activities)
+    history = make_activity_types(n + 2 * sum(args.new_activities), seed=1)
+    db = session_factory()
+    db.add(User(id=1, username="bench", email="bench@example.com", hashed_password="x"))
+    db.commit()
+    start = datetime(2024, 1, 1)
+    seed_activities(db, 1, history[:n], start)
+
+    def discover(label: str, total: int, full_rescan: bool) -> None:
+        statements.clear()
+        started = time.perf_counter()
+        new_notes, updated_notes = identify_and_update_process_notes(db, 1, full_rescan=full_rescan)
+        elapsed = time.perf_counter() - started
+        candidates = db.query(ProcessSequenceCandidate).filter(ProcessSequenceCandidate.user_id == 1).count()
+        print(f"{label:>12s} {total:10d} {elapsed:8.2f} {new_notes:7d} {updated_notes:7d} {len(statements):10d} "
+              f"{candidates:10d}")
+
+    print(f"\n{'run':>12s} {'activities':>10s} {'seconds':>8s} {'new':>7s} {'updated':>7s} {'statements':>10s} "
+          f"{'candidates':>10s}")
+    discover("first", n, full_rescan=False)
+    total = n
+    for batch in args.new_activities:
+        for label, full_rescan in ((f"+{batch} incr", False), (f"+{batch} full", True)):
+            seed_activities(db, 1, history[total:total + batch], start + timedelta(seconds=30 * total))
+            total += batch
+            discover(label, total, full_rescan)
+    db.close()
+
+    if tmpdir is not None:
+        os.remove(os.path.join(tmpdir, "bench.db"))
+        os.rmdir(tmpdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark for building LSTM training windows in `predictive`.
+
+Generates activity histories spread over many users and, each in a fresh
+process, prepares sequences with the previous per-user double loop (slices
+appended to lists, then one `np.array` copy), with `prepare_sequences`
+(vectorized, materialized) and with `prepare_sequence_windows` (strided views,
+plus one pass over shuffled training batches). Reports wall time and peak
+resident memory growth. The previous loop is skipped above `--max-previous`.
+
+Usage:
+    python -m digame.benchmarks.bench_sequence_windows
+    python -m digame.benchmarks.bench_sequence_windows --activities 100000 10000000 --sequence-length 20
+"""
+
+import argparse
+import multiprocessing
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+from digame.app.predictive import prepare_sequence_windows, prepare_sequences
+
+
+def make_activities(n: int, users: int = 1000, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "user_id": rng.integers(0, users, n),
+        "activity_type": pd.Categorical.from_codes(rng.integers(0, 40, n), [f"type_{i}" for i in range(40)]).astype(str),
+        "timestamp": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 90 * 86400, n), unit="s"),
+    })
+
+
+def previous_prepare_sequences(df, sequence_length=10):
+    """`prepare_sequences` as it was: encoding, then a per-user loop of window slices."""
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    df = df.sort_values(by=['user_id', 'timestamp'])
+    all_features = []
+    all_targets = []
+    df['activity_type_encoded'] = LabelEncoder().fit_transform(df['activity_type'])
+    df['cluster_label'] = df['activity_type_encoded']
+    df['hour_of_day'] = df['timestamp'].dt.hour
+    df[['hour_of_day']] = StandardScaler().fit_transform(df[['hour_of_day']])
+    for user_id, group in df.groupby('user_id'):
+        if len(group) < sequence_length + 1:
+            continue
+        user_features = group[['activity_type_encoded', 'hour_of_day']].values
+        user_targets = group['cluster_label'].values
+        for i in range(len(user_features) - sequence_length):
+            all_features.append(user_features[i:i + sequence_length])
+            all_targets.append(user_targets[i + sequence_length])
+    return np.array(all_features), np.array(all_targets)
+
+
+def _prepare(n: int, sequence_length: int, method: str):
+    df = make_activities(n)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    if method == "previous":
+        windows = len(previous_prepare_sequences(df, sequence_length)[1])
+    elif method == "materialized":
+        windows = len(prepare_sequences(df, sequence_length)[1])
+    else:
+        dataset, _ = prepare_sequence_windows(df, sequence_length)
+        prepared = time.perf_counter() - started
+        windows = sum(len(batch_y) for _, batch_y in dataset.batch_loader(batch_size=256))
+        elapsed = time.perf_counter() - started
+        peak_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+        return windows, prepared, elapsed - prepared, peak_growth / 1024
+    elapsed = time.perf_counter() - started
+    peak_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+    return windows, elapsed, None, peak_growth / 1024
+
+
+def run(n: int, sequence_length: int, method: str):
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(_prepare, n, sequence_length, method).result()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--activities", type=int, nargs="+", default=[100000, 1000000, 10000000])
+    parser.add_argument("--sequence-length", type=int, default=10)
+    parser.add_argument("--max-previous", type=int, default=1000000,
+                        help="Largest history prepared with the previous loop")
+    args = parser.parse_args()
+
+    print(f"{'activities':>10s} {'method':>12s} {'windows':>9s} {'prepare s':>9s} {'epoch s':>8s} {'peak MB':>8s}")
+    for n in args.activities:
+        methods = ["previous", "materialized", "views"] if n <= args.max_previous else ["materialized", "views"]
+        for method in methods:
+            windows, prepared, epoch, peak = run(n, args.sequence_length, method)
+            epoch_text = f"{epoch:8.2f}" if epoch is not None else f"{'-':>8s}"
+            print(f"{n:10d} {method:>12s} {windows:9d} {prepared:9.2f} {epoch_text} {peak:8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark for sparse, frequency-capped activity feature encoding.
+
+Builds a synthetic activity history with `--project-contexts` distinct
+project contexts (Zipf-distributed, every one used at least once), then, in a
+fresh process per configuration, encodes it with `encode_activity_features`
+and clusters it with KMeans through `cluster_activity_logs`. Reports the
+feature matrix width and size, encode and cluster time and peak resident
+memory growth for:
+
+- dense, uncapped: every project context gets a dense one-hot column (the
+  previous encoding)
+- dense, capped: at most `FEATURE_MAX_CATEGORIES` columns per category
+- sparse, uncapped and sparse, capped: the same, sparse-backed
+
+Usage:
+    python -m digame.benchmarks.bench_sparse_features
+    python -m digame.benchmarks.bench_sparse_features --activities 50000 --project-contexts 5000
+"""
+
+import argparse
+import contextlib
+import io
+import logging
+import multiprocessing
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from digame.app import behavior
+
+
+def make_activities(activities: int, project_contexts: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    contexts = np.concatenate([
+        np.arange(project_contexts),
+        (rng.zipf(1.3, activities - project_contexts) - 1) % project_contexts,
+    ])
+    rng.shuffle(contexts)
+    return pd.DataFrame({
+        "activity_id": np.arange(activities),
+        "activity_type": rng.choice(["app_usage", "web_visit", "meeting", "focus"], activities),
+        "timestamp": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 90 * 86400, activities), unit="s"),
+        "app_category": rng.choice([f"app_{i}" for i in range(20)], activities),
+        "project_context": np.char.add("project_", contexts.astype(str)),
+        "website_category": rng.choice([f"site_{i}" for i in range(15)], activities),
+        "is_context_switch": rng.random(activities) < 0.2,
+    })
+
+
+def _measure(raw_df: pd.DataFrame, sparse_output: bool, max_categories):
+    logging.getLogger(behavior.__name__).setLevel(logging.WARNING)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    processed = behavior.encode_activity_features(raw_df, sparse_output=sparse_output, max_categories=max_categories)
+    encode_s = time.perf_counter() - started
+    frame_mb = processed.memory_usage(deep=True).sum() / 1024 / 1024
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        behavior.cluster_activity_logs(processed, n_clusters=8, algorithm="kmeans", auto_optimize=False)
+    cluster_s = time.perf_counter() - started
+    peak_mb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline) / 1024
+    return processed.shape[1], frame_mb, encode_s, cluster_s, peak_mb
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--activities", type=int, default=20000)
+    parser.add_argument("--project-contexts", type=int, default=5000)
+    args = parser.parse_args()
+
+    raw_df = make_activities(args.activities, args.project_contexts)
+    configurations = [
+        ("dense, uncapped", False, None),
+        ("dense, capped", False, behavior.FEATURE_MAX_CATEGORIES),
+        ("sparse, uncapped", True, None),
+        ("sparse, capped", True, behavior.FEATURE_MAX_CATEGORIES),
+    ]
+    print(f"{args.activities} activities, {args.project_contexts} project contexts")
+    print(f"{'encoding':18s} {'columns':>8s} {'frame MB':>9s} {'encode s':>9s} {'cluster s':>10s} {'peak MB':>8s}")
+    for name, sparse_output, max_categories in configurations:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            columns, frame_mb, encode_s, cluster_s, peak_mb = pool.submit(
+                _measure, raw_df, sparse_output, max_categories
+            ).result()
+        print(f"{name:18s} {columns:8d} {frame_mb:9.1f} {encode_s:9.2f} {cluster_s:10.2f} {peak_mb:8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark for token revocation lookups.
+
+Revokes a number of token ids, then checks a stream of token ids of which a
+small fraction are revoked, as `TokenHandler.verify_token` does for every
+request. Compares the in-memory store with the database store (a SQLite file
+by default) and, when a URL is given, the Redis store, each with and without
+the local Bloom filter. Reports lookups per second, mean microseconds per
+lookup and remote lookups per check.
+
+Usage:
+    python -m digame.benchmarks.bench_token_revocation
+    python -m digame.benchmarks.bench_token_revocation --revoked 100000 --checks 200000 --redis-url redis://localhost:6379/0
+"""
+
+import argparse
+import os
+import random
+import secrets
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from digame.app.auth.revocation_store import (
+    DatabaseRevocationStore,
+    InMemoryRevocationStore,
+    RedisRevocationStore,
+    RevocationStore,
+)
+from digame.app.models import Base, RevokedToken
+
+
+def seed_database(session_factory, revoked: list) -> None:
+    """Inserts the revocations in one transaction rather than one per `revoke`"""
+    now = time.time()
+    db = session_factory()
+    db.add_all(RevokedToken(jti=jti, expires_at=now + 3600, revoked_at=now) for jti in revoked)
+    db.commit()
+    db.close()
+
+
+def run(store: RevocationStore, revoked: list, checks: int, revoked_fraction: float, seed: int):
+    rng = random.Random(seed)
+    if not isinstance(store, DatabaseRevocationStore):
+        expires_at = time.time() + 3600
+        for jti in revoked:
+            store.revoke(jti, expires_at)
+    if hasattr(store, "sync"):
+        store.sync(rebuild=True)
+        store.remote_lookups = 0
+
+    queries = [
+        rng.choice(revoked) if rng.random() < revoked_fraction else secrets.token_urlsafe(16)
+        for _ in range(checks)
+    ]
+    started = time.perf_counter()
+    hits = sum(store.is_revoked(jti) for jti in queries)
+    elapsed = time.perf_counter() - started
+    remote = getattr(store, "remote_lookups", 0) / checks
+    return checks / elapsed, elapsed / checks * 1e6, remote, hits
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--revoked", type=int, default=20000, help="Token ids revoked before checking")
+    parser.add_argument("--checks", type=int, default=50000)
+    parser.add_argument("--revoked-fraction", type=float, default=0.01, help="Share of checked ids that are revoked")
+    parser.add_argument("--database-url", default=None, help="Defaults to a temporary SQLite file")
+    parser.add_argument("--redis-url", default=None, help="Also benchmark the Redis store")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.TemporaryDirectory()
+    url = args.database_url or f"sqlite:///{os.path.join(tmpdir.name, 'revocations.db')}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    revoked = [secrets.token_urlsafe(16) for _ in range(args.revoked)]
+    seed_database(session_factory, revoked)
+
+    stores = [("memory", "-", lambda: InMemoryRevocationStore())]
+    for use_bloom in (False, True):
+        stores.append(("database", "on" if use_bloom else "off",
+                       lambda use_bloom=use_bloom: DatabaseRevocationStore(
+                           session_factory, use_bloom=use_bloom, sync_interval=3600)))
+        if args.redis_url:
+            stores.append(("redis", "on" if use_bloom else "off",
+                           lambda use_bloom=use_bloom: RedisRevocationStore.from_url(
+                               args.redis_url, 7 * 86400, prefix="digame:bench:revoked",
+                               use_bloom=use_bloom, sync_interval=3600)))
+
+    print(f"{'store':>9s} {'bloom':>6s} {'lookups/s':>11s} {'us/lookup':>10s} {'remote/check':>13s} {'revoked':>8s}")
+    try:
+        for name, bloom, make in stores:
+            throughput, micros, remote, hits = run(make(), revoked, args.checks, args.revoked_fraction, args.seed)
+            print(f"{name:>9s} {bloom:>6s} {throughput:11.0f} {micros:10.1f} {remote:13.4f} {hits:8d}")
+    finally:
+        engine.dispose()
+        tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
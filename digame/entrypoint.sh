@@ -84,6 +84,16 @@ start_application() {
         --reload
 }
 
+start_worker() {
+    log "⚙️ Starting Digame job workers..."
+    
+    cd /app
+    
+    # Run queued jobs (model training etc.) from the jobs table
+    exec python -m digame.app.workers.job_worker \
+        --processes "${DIGAME_WORKER_PROCESSES:-2}"
+}
+
 # Main execution flow
 main() {
     # Parse command line arguments
@@ -106,6 +116,11 @@ main() {
             run_migrations
             start_application
             ;;
+        "worker")
+            log "⚙️ Starting in worker mode..."
+            wait_for_db
+            start_worker
+            ;;
         "sleep")
             log "😴 Starting in sleep mode for development..."
             exec sleep infinity
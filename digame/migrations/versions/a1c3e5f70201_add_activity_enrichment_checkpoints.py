@@ -0,0 +1,44 @@
+"""add activity enrichment checkpoints
+
+Revision ID: a1c3e5f70201
+Revises: 57fc3ffd4476
+Create Date: 2026-10-16 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a1c3e5f70201'
+down_revision: Union[str, None] = '57fc3ffd4476'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'activity_enrichment_checkpoints',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('last_activity_timestamp', sa.DateTime(), nullable=True),
+        sa.Column('last_activity_id', sa.Integer(), nullable=True),
+        sa.Column('last_primary_category', sa.String(), nullable=True),
+        sa.Column('processed_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+    # Keyset pagination for the enrichment worker walks (user_id, timestamp, id).
+    op.create_index(
+        'ix_digital_activities_user_id_timestamp_id', 'digital_activities',
+        ['user_id', 'timestamp', 'id'], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_digital_activities_user_id_timestamp_id', table_name='digital_activities')
+    op.drop_table('activity_enrichment_checkpoints')
@@ -0,0 +1,45 @@
+"""add category mappings
+
+Revision ID: b2d4f6a80302
+Revises: a1c3e5f70201
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2d4f6a80302'
+down_revision: Union[str, None] = 'a1c3e5f70201'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'category_mappings',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('mapping_type', sa.String(), nullable=False),
+        sa.Column('pattern', sa.String(), nullable=False),
+        sa.Column('category', sa.String(), nullable=False),
+        sa.Column('priority', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('is_active', sa.Boolean(), nullable=False, server_default=sa.true()),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('mapping_type', 'pattern', name='uq_category_mappings_type_pattern')
+    )
+    op.create_index(op.f('ix_category_mappings_id'), 'category_mappings', ['id'], unique=False)
+    op.create_index(op.f('ix_category_mappings_mapping_type'), 'category_mappings', ['mapping_type'], unique=False)
+    op.create_index(op.f('ix_category_mappings_updated_at'), 'category_mappings', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_category_mappings_updated_at'), table_name='category_mappings')
+    op.drop_index(op.f('ix_category_mappings_mapping_type'), table_name='category_mappings')
+    op.drop_index(op.f('ix_category_mappings_id'), table_name='category_mappings')
+    op.drop_table('category_mappings')
@@ -0,0 +1,66 @@
+"""add activity baselines
+
+Revision ID: c3e5a7b90403
+Revises: b2d4f6a80302
+Create Date: 2026-10-16 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e5a7b90403'
+down_revision: Union[str, None] = 'b2d4f6a80302'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'activity_hourly_counts',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('category_type', sa.String(), nullable=False),
+        sa.Column('category', sa.String(), nullable=False),
+        sa.Column('bucket_date', sa.Date(), nullable=False),
+        sa.Column('hour', sa.Integer(), nullable=False),
+        sa.Column('activity_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'category_type', 'category', 'bucket_date', 'hour',
+                            name='uq_activity_hourly_counts_bucket')
+    )
+    op.create_index('ix_activity_hourly_counts_user_id_bucket_date', 'activity_hourly_counts',
+                    ['user_id', 'bucket_date'], unique=False)
+
+    op.create_table(
+        'activity_baselines',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('category_type', sa.String(), nullable=False),
+        sa.Column('category', sa.String(), nullable=False),
+        sa.Column('day_of_week', sa.Integer(), nullable=False),
+        sa.Column('hour', sa.Integer(), nullable=False),
+        sa.Column('sample_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('count_sum', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('count_sum_sq', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'category_type', 'category', 'day_of_week', 'hour',
+                            name='uq_activity_baselines_slot')
+    )
+    op.create_index('ix_activity_baselines_user_id_day_hour', 'activity_baselines',
+                    ['user_id', 'day_of_week', 'hour'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_activity_baselines_user_id_day_hour', table_name='activity_baselines')
+    op.drop_table('activity_baselines')
+    op.drop_index('ix_activity_hourly_counts_user_id_bucket_date', table_name='activity_hourly_counts')
+    op.drop_table('activity_hourly_counts')
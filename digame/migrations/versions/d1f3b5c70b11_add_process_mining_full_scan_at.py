@@ -0,0 +1,29 @@
+"""add process mining full scan time
+
+Revision ID: d1f3b5c70b11
+Revises: c0e2a4b60a10
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd1f3b5c70b11'
+down_revision: Union[str, None] = 'c0e2a4b60a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # NULL for existing checkpoints, so each user's next run is a full rescan
+    op.add_column('process_mining_checkpoints', sa.Column('full_scan_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('process_mining_checkpoints', 'full_scan_at')
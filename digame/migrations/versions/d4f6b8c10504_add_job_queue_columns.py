@@ -0,0 +1,42 @@
+"""add job queue columns
+
+Revision ID: d4f6b8c10504
+Revises: c3e5a7b90403
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4f6b8c10504'
+down_revision: Union[str, None] = 'c3e5a7b90403'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('jobs', sa.Column('payload', sa.JSON(), nullable=True))
+    op.add_column('jobs', sa.Column('priority', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('jobs', sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('jobs', sa.Column('max_attempts', sa.Integer(), nullable=False, server_default='3'))
+    op.add_column('jobs', sa.Column('run_after', sa.DateTime(), nullable=True))
+    op.add_column('jobs', sa.Column('locked_by', sa.String(), nullable=True))
+    op.add_column('jobs', sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_jobs_status_priority', 'jobs', ['status', 'priority', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_jobs_status_priority', table_name='jobs')
+    op.drop_column('jobs', 'heartbeat_at')
+    op.drop_column('jobs', 'locked_by')
+    op.drop_column('jobs', 'run_after')
+    op.drop_column('jobs', 'max_attempts')
+    op.drop_column('jobs', 'attempts')
+    op.drop_column('jobs', 'priority')
+    op.drop_column('jobs', 'payload')
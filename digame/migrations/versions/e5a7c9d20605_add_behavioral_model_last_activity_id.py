@@ -0,0 +1,28 @@
+"""add behavioral model last activity id
+
+Revision ID: e5a7c9d20605
+Revises: d4f6b8c10504
+Create Date: 2026-10-16 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a7c9d20605'
+down_revision: Union[str, None] = 'd4f6b8c10504'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('behavioral_models', sa.Column('last_activity_id', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('behavioral_models', 'last_activity_id')
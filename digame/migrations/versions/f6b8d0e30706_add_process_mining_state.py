@@ -0,0 +1,64 @@
+"""add process mining state
+
+Revision ID: f6b8d0e30706
+Revises: e5a7c9d20605
+Create Date: 2026-10-16 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6b8d0e30706'
+down_revision: Union[str, None] = 'e5a7c9d20605'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'process_mining_checkpoints',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('last_activity_timestamp', sa.DateTime(), nullable=True),
+        sa.Column('last_activity_id', sa.Integer(), nullable=True),
+        sa.Column('tail_activity_ids', sa.JSON(), nullable=True),
+        sa.Column('min_sequence_len', sa.Integer(), nullable=False),
+        sa.Column('max_sequence_len', sa.Integer(), nullable=False),
+        sa.Column('recurrence_threshold', sa.Integer(), nullable=False),
+        sa.Column('processed_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table(
+        'process_sequence_candidates',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('process_steps_description', sa.Text(), nullable=False),
+        sa.Column('source_activity_ids', sa.JSON(), nullable=True),
+        sa.Column('occurrence_count', sa.Integer(), nullable=False),
+        sa.Column('first_observed_at', sa.DateTime(), nullable=False),
+        sa.Column('last_observed_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_process_sequence_candidates_id'), 'process_sequence_candidates', ['id'], unique=False)
+    op.create_index(
+        'ix_process_sequence_candidates_user_id_steps', 'process_sequence_candidates',
+        ['user_id', 'process_steps_description'], unique=True
+    )
+    # Process discovery looks notes up by their sequence
+    op.create_index('ix_process_notes_user_id_steps', 'process_notes', ['user_id', 'process_steps_description'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_process_notes_user_id_steps', table_name='process_notes')
+    op.drop_index('ix_process_sequence_candidates_user_id_steps', table_name='process_sequence_candidates')
+    op.drop_index(op.f('ix_process_sequence_candidates_id'), table_name='process_sequence_candidates')
+    op.drop_table('process_sequence_candidates')
+    op.drop_table('process_mining_checkpoints')
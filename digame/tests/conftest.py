@@ -8,6 +8,7 @@ import torch.optim as optim
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session as SQLAlchemySession
+from sqlalchemy.pool import StaticPool
 
 # --- Predictive Model Fixtures (from original conftest) ---
 from digame.app.predictive import PredictiveModel # Assuming this path is correct
@@ -67,6 +68,28 @@ def db_session_test() -> SQLAlchemySession:
     finally:
         db.close()
 
+# Every new connection to sqlite:///:memory: is a separate, empty database, so work
+# done on another thread (TestClient requests, run_in_threadpool, heartbeat threads)
+# can't see `engine_test`'s tables. Tests that cross threads use this engine, which
+# hands every thread the same connection.
+@pytest.fixture(scope="session")
+def shared_engine_test():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    AppBase.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def shared_db_session_test(shared_engine_test) -> SQLAlchemySession:
+    """Provides a session on the engine shared across threads."""
+    db = sessionmaker(autocommit=False, autoflush=False, bind=shared_engine_test)()
+    try:
+        yield db
+    finally:
+        db.close()
+
 # --- FastAPI Test Client Fixture ---
 # This needs the main app instance and to override get_db dependency
 from digame.app.main import app as fastapi_app # Main application
@@ -0,0 +1,40 @@
+import pytest
+from fastapi import FastAPI, status
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from digame.app.auth.auth_dependencies import get_current_active_user
+from digame.app.db import get_db
+from digame.app.models.job import Job
+from digame.app.routers.job_router import router
+
+
+@pytest.fixture
+def job_app(shared_db_session_test: Session):
+    # Requests run on TestClient's worker threads, so they share one SQLite connection with the test
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = lambda: shared_db_session_test
+    yield app
+    shared_db_session_test.query(Job).filter(Job.job_type == "pattern_assignment").delete()
+    shared_db_session_test.commit()
+
+
+def test_create_job_queues_at_default_priority(job_app, test_non_admin_user):
+    job_app.dependency_overrides[get_current_active_user] = lambda: test_non_admin_user
+    response = TestClient(job_app).post("/jobs", json={"job_type": "pattern_assignment", "payload": {"model_id": 1}})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["job"]["priority"] == 0
+
+
+def test_only_admins_can_raise_job_priority(job_app, test_non_admin_user, test_admin_user):
+    client = TestClient(job_app)
+    job = {"job_type": "pattern_assignment", "priority": 5}
+
+    job_app.dependency_overrides[get_current_active_user] = lambda: test_non_admin_user
+    assert client.post("/jobs", json=job).status_code == status.HTTP_403_FORBIDDEN
+    assert client.post("/jobs", json={**job, "priority": -5}).status_code == status.HTTP_200_OK
+
+    job_app.dependency_overrides[get_current_active_user] = lambda: test_admin_user
+    assert client.post("/jobs", json=job).json()["job"]["priority"] == 5
+    assert client.post("/jobs", json={**job, "priority": 10**9}).status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
@@ -3,7 +3,9 @@ from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session # Not used in these specific tests but good for consistency
 from digame.app.main import app # Assuming your FastAPI app instance is here
 from digame.app.auth.auth_dependencies import get_current_active_user # For overriding
+from digame.app.routers.admin_rbac_router import get_db
 from fastapi import status # For HTTP status codes
+from sqlalchemy.orm import sessionmaker
 
 # Fixtures for admin and non-admin users should be available from conftest.py
 # (test_admin_user, test_non_admin_user)
@@ -11,6 +13,21 @@ from fastapi import status # For HTTP status codes
 
 client = TestClient(app)
 
+@pytest.fixture
+def monitoring_db(shared_engine_test):
+    # Requests (and bulk ingest's threadpool) run on other threads, which need the
+    # engine shared across threads. Set per test, as the tests clear overrides.
+    sessions = sessionmaker(autocommit=False, autoflush=False, bind=shared_engine_test)
+    def override_get_db():
+        db = sessions()
+        try:
+            yield db
+        finally:
+            db.close()
+    app.dependency_overrides[get_db] = override_get_db
+    yield sessions
+    app.dependency_overrides.pop(get_db, None)
+
 def test_log_monitoring_unauthorized(test_non_admin_user):
     app.dependency_overrides[get_current_active_user] = lambda: test_non_admin_user
     # Payload matches LogEntry schema from monitoring.py
@@ -18,7 +35,7 @@ def test_log_monitoring_unauthorized(test_non_admin_user):
     assert response.status_code == status.HTTP_403_FORBIDDEN
     app.dependency_overrides.clear()
 
-def test_log_monitoring_authorized(test_admin_user):
+def test_log_monitoring_authorized(test_admin_user, monitoring_db):
     # Assuming admin user has 'log_own_digital_activity' from conftest.py setup
     app.dependency_overrides[get_current_active_user] = lambda: test_admin_user
     response = client.post("/monitoring/log", json={"timestamp": "2024-01-01T00:00:00Z", "activity": "test activity", "details": {"info": "test"}})
@@ -36,7 +53,7 @@ def test_get_logs_unauthorized(test_non_admin_user):
     assert response.status_code == status.HTTP_403_FORBIDDEN
     app.dependency_overrides.clear()
 
-def test_get_logs_authorized(test_admin_user):
+def test_get_logs_authorized(test_admin_user, monitoring_db):
     # Assuming admin user has 'view_own_activity_logs' from conftest.py setup
     app.dependency_overrides[get_current_active_user] = lambda: test_admin_user
     response = client.get("/monitoring/logs")
@@ -46,3 +63,48 @@ def test_get_logs_authorized(test_admin_user):
     data = response.json()
     assert isinstance(data, list)
     app.dependency_overrides.clear()
+
+def test_bulk_ingest_unauthorized(test_non_admin_user):
+    app.dependency_overrides[get_current_active_user] = lambda: test_non_admin_user
+    response = client.post("/monitoring/activities/bulk", json=[{"activity_type": "app_usage"}])
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    app.dependency_overrides.clear()
+
+def test_bulk_ingest_json_array(test_admin_user, monitoring_db):
+    app.dependency_overrides[get_current_active_user] = lambda: test_admin_user
+    events = [
+        {"activity_type": "app_usage", "timestamp": "2024-01-01T10:00:00Z", "details": {"app_name": "vscode"}},
+        {"activity_type": "website_visit", "timestamp": "2024-01-01T10:01:00Z", "details": {"url": "https://github.com"}},
+        {"details": {"missing": "type"}},
+    ]
+    response = client.post("/monitoring/activities/bulk", json=events)
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["accepted"] == 2
+    assert data["rejected"] == 1
+    assert data["batches"][0]["status"] == "committed"
+    app.dependency_overrides.clear()
+
+def test_bulk_ingest_ndjson_stream(test_admin_user, monitoring_db):
+    app.dependency_overrides[get_current_active_user] = lambda: test_admin_user
+    body = "\n".join([
+        '{"activity_type": "app_usage", "timestamp": "2024-01-01T11:00:00Z"}',
+        'not json',
+        '{"activity_type": "file_open", "details": {"file_path": "/home/u/dev/Proj/a.py"}}',
+    ]) + "\n"
+    response = client.post(
+        "/monitoring/activities/bulk",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["accepted"] == 2
+    assert data["rejected"] == 1
+    app.dependency_overrides.clear()
+
+def test_bulk_ingest_rejects_non_array_body(test_admin_user):
+    app.dependency_overrides[get_current_active_user] = lambda: test_admin_user
+    response = client.post("/monitoring/activities/bulk", json={"activity_type": "app_usage"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    app.dependency_overrides.clear()
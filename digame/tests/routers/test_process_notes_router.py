@@ -49,7 +49,7 @@ def test_trigger_process_discovery_authorized(
     assert data["user_id"] == target_user_id
     assert data["new_notes_created"] == 2
     assert data["notes_updated"] == 1
-    mock_service_call.assert_called_once_with(db_session_test, user_id=target_user_id)
+    mock_service_call.assert_called_once_with(db_session_test, user_id=target_user_id, full_rescan=False)
     app.dependency_overrides.clear()
 
 @patch("digame.app.services.process_note_service.identify_and_update_process_notes")
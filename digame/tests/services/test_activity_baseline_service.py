@@ -0,0 +1,119 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+
+from digame.app.services.activity_baseline_service import (
+    get_baseline_slots,
+    rebuild_activity_baselines,
+    record_enriched_activities,
+)
+from digame.app.services.activity_feature_service import stream_enrich_user_activities
+from digame.app.services.anomaly_service import (
+    calculate_hourly_activity_baselines,
+    detect_frequency_anomalies_for_user,
+)
+from digame.app.models.activity import Activity
+from digame.app.models.activity_baseline import ActivityBaseline, ActivityHourlyCount
+from digame.app.models.anomaly import DetectedAnomaly
+
+# Mondays, 9am
+WEEKS = [datetime(2023, 5, 1, 9) + timedelta(weeks=w) for w in range(8)]
+
+def _add_app_usage(db: Session, user_id: int, app_name: str, start: datetime, count: int):
+    db.add_all([
+        Activity(user_id=user_id, activity_type="app_usage", details={"app_name": app_name},
+                 timestamp=start + timedelta(minutes=i))
+        for i in range(count)
+    ])
+    db.commit()
+
+def _slot(db: Session, user_id: int, category: str, day_of_week: int = 0, hour: int = 9) -> ActivityBaseline:
+    return get_baseline_slots(db, user_id, day_of_week, hour, {"app_category": {category}})[("app_category", category)]
+
+def test_incremental_baselines_match_full_recalculation(db_session_test: Session):
+    user_id = 601
+    # Enrich week by week, plus a late arrival into an already-counted hour.
+    for week, count in zip(WEEKS, [3, 5, 4, 6]):
+        _add_app_usage(db_session_test, user_id, "vscode", week, count)
+        stream_enrich_user_activities(db_session_test, user_id, chunk_size=2)
+    _add_app_usage(db_session_test, user_id, "vscode", WEEKS[1] + timedelta(minutes=30), 2)
+    stream_enrich_user_activities(db_session_test, user_id, chunk_size=2)
+
+    expected = calculate_hourly_activity_baselines(db_session_test, user_id)["app_category"]["Development"][0][9]
+    slot = _slot(db_session_test, user_id, "Development")
+    assert slot.sample_count == 4
+    assert slot.mean == pytest.approx(expected["mean"])
+    assert slot.std == pytest.approx(expected["std"])
+
+    bucket = db_session_test.query(ActivityHourlyCount).filter_by(
+        user_id=user_id, category="Development", bucket_date=WEEKS[1].date(), hour=9
+    ).one()
+    assert bucket.activity_count == 7
+
+def test_rebuild_activity_baselines_is_idempotent(db_session_test: Session):
+    user_id = 602
+    for week, count in zip(WEEKS, [2, 4, 2, 4]):
+        _add_app_usage(db_session_test, user_id, "slack", week, count)
+    stream_enrich_user_activities(db_session_test, user_id)
+    before = _slot(db_session_test, user_id, "Communication")
+    before_stats = (before.sample_count, before.count_sum, before.count_sum_sq)
+
+    assert rebuild_activity_baselines(db_session_test, user_id) == 12
+    after = _slot(db_session_test, user_id, "Communication")
+    assert (after.sample_count, after.count_sum, after.count_sum_sq) == before_stats
+    assert after.std == pytest.approx(calculate_hourly_activity_baselines(
+        db_session_test, user_id)["app_category"]["Communication"][0][9]["std"])
+
+def test_counts_are_incremented_without_reading_them(db_session_test: Session):
+    user_id = 605
+    record_enriched_activities(db_session_test, user_id, [(WEEKS[0], "Development", None)])
+    db_session_test.commit()
+
+    # Read-modify-write would lose updates when the API and the worker enrich a user at once
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db_session_test.get_bind(), "before_cursor_execute", listener)
+    try:
+        record_enriched_activities(db_session_test, user_id, [(WEEKS[0], "Development", None)] * 2)
+    finally:
+        event.remove(db_session_test.get_bind(), "before_cursor_execute", listener)
+    db_session_test.commit()
+
+    assert [sql.split()[0] for sql in statements] == ["INSERT", "INSERT"]
+    slot = _slot(db_session_test, user_id, "Development")
+    assert (slot.sample_count, slot.count_sum, slot.count_sum_sq) == (1, 3, 9)
+
+def test_detect_frequency_anomalies_uses_stored_baselines(db_session_test: Session):
+    user_id = 603
+    for week, count in zip(WEEKS, [3, 4] * 4):
+        _add_app_usage(db_session_test, user_id, "vscode", week, count)
+    now = datetime(2023, 6, 26, 9, 59) # The following Monday
+    _add_app_usage(db_session_test, user_id, "vscode", now.replace(minute=0), 30)
+    stream_enrich_user_activities(db_session_test, user_id)
+
+    anomalies = detect_frequency_anomalies_for_user(db_session_test, user_id, now)
+
+    assert len(anomalies) == 1
+    anomaly = anomalies[0]
+    assert anomaly.anomaly_type == "UnusualAppcategoryFrequency"
+    assert anomaly.severity_score == 1.0
+    assert len(anomaly.related_activity_ids) == 30
+    assert db_session_test.query(DetectedAnomaly).filter_by(user_id=user_id).count() == 1
+
+def test_detect_frequency_anomalies_backfills_missing_baselines(db_session_test: Session):
+    user_id = 604
+    for week, count in zip(WEEKS, [3, 4] * 4):
+        _add_app_usage(db_session_test, user_id, "vscode", week, count)
+    now = datetime(2023, 6, 26, 9, 59)
+    _add_app_usage(db_session_test, user_id, "vscode", now.replace(minute=0), 30)
+    stream_enrich_user_activities(db_session_test, user_id)
+    # Simulate a user enriched before baselines were persisted.
+    db_session_test.query(ActivityBaseline).filter_by(user_id=user_id).delete()
+    db_session_test.query(ActivityHourlyCount).filter_by(user_id=user_id).delete()
+    db_session_test.commit()
+
+    anomalies = detect_frequency_anomalies_for_user(db_session_test, user_id, now)
+
+    assert [a.anomaly_type for a in anomalies] == ["UnusualAppcategoryFrequency"]
+    assert _slot(db_session_test, user_id, "Development").sample_count == 9
@@ -7,13 +7,16 @@ import json
 from digame.app.services.activity_feature_service import (
     generate_features_for_activity,
     generate_features_for_user_activities,
+    stream_enrich_user_activities,
+    refresh_category_matchers,
     _get_app_category,
     _get_website_category,
     _extract_project_context,
     _parse_activity_details
 )
 from digame.app.models.activity import Activity
-from digame.app.models.activity_features import ActivityEnrichedFeature
+from digame.app.models.activity_features import ActivityEnrichedFeature, ActivityEnrichmentCheckpoint
+from digame.app.models.category_mapping import CategoryMapping
 from digame.app.models.user import User # For context, if needed
 
 # --- Helper Function Tests ---
@@ -116,7 +119,9 @@ def mock_db_session_for_batch():
     session.query.return_value.outerjoin.return_value.filter.return_value.filter.return_value.order_by.return_value.all.return_value = []
     session.query.return_value.join.return_value.filter.return_value.filter.return_value.order_by.return_value.first.return_value = None # For last_processed_activity_of_user
     session.query.return_value.filter.return_value.first.return_value = None # For previous_enriched_feature query
-    return session
+    # Baselines are upserted with dialect SQL, which a mocked session can't run
+    with patch("digame.app.services.activity_feature_service.record_enriched_activities"):
+        yield session
 
 def test_generate_features_for_user_activities_no_new_activities(mock_db_session_for_batch: MagicMock):
     # Default mock setup returns empty list for activities_to_process
@@ -205,3 +210,96 @@ def test_generate_features_for_user_activities_db_commit_error(mock_db_session_f
     mock_db_session_for_batch.add_all.assert_called_once()
     mock_db_session_for_batch.commit.assert_called_once()
     mock_db_session_for_batch.rollback.assert_called_once()
+
+# --- stream_enrich_user_activities Tests ---
+
+def _add_activities(db: Session, user_id: int, app_names, start: datetime):
+    activities = [
+        Activity(user_id=user_id, activity_type="app_usage", details={"app_name": name},
+                 timestamp=start + timedelta(minutes=i))
+        for i, name in enumerate(app_names)
+    ]
+    db.add_all(activities)
+    db.commit()
+    return activities
+
+def _features_in_order(db: Session, user_id: int):
+    return (
+        db.query(ActivityEnrichedFeature)
+        .join(Activity, Activity.id == ActivityEnrichedFeature.activity_id)
+        .filter(Activity.user_id == user_id)
+        .order_by(Activity.timestamp, Activity.id)
+        .all()
+    )
+
+def test_stream_enrich_carries_context_across_chunks(db_session_test: Session):
+    user_id = 501
+    _add_activities(db_session_test, user_id, ["slack", "vscode", "vscode", "outlook", "outlook"], datetime(2023, 3, 1, 9))
+
+    created = stream_enrich_user_activities(db_session_test, user_id, chunk_size=2)
+
+    assert created == 5
+    features = _features_in_order(db_session_test, user_id)
+    # Switches at slack->vscode (within chunk 1) and vscode->outlook (across the chunk 2/3 boundary)
+    assert [f.is_context_switch for f in features] == [False, True, False, True, False]
+    checkpoint = db_session_test.get(ActivityEnrichmentCheckpoint, user_id)
+    assert checkpoint.processed_count == 5
+    assert checkpoint.last_primary_category == "Communication"
+
+def test_stream_enrich_resumes_from_checkpoint(db_session_test: Session):
+    user_id = 502
+    _add_activities(db_session_test, user_id, ["slack", "slack"], datetime(2023, 3, 2, 9))
+    assert stream_enrich_user_activities(db_session_test, user_id, chunk_size=10) == 2
+
+    _add_activities(db_session_test, user_id, ["figma"], datetime(2023, 3, 2, 10))
+    assert stream_enrich_user_activities(db_session_test, user_id, chunk_size=10) == 1
+    assert stream_enrich_user_activities(db_session_test, user_id, chunk_size=10) == 0
+
+    features = _features_in_order(db_session_test, user_id)
+    assert features[-1].app_category == "Design"
+    assert features[-1].is_context_switch is True # Communication -> Design, via the checkpoint
+
+def test_stream_enrich_picks_up_late_arrivals(db_session_test: Session):
+    user_id = 504
+    _add_activities(db_session_test, user_id, ["slack", "slack", "vscode"], datetime(2023, 3, 4, 9))
+    assert stream_enrich_user_activities(db_session_test, user_id, chunk_size=10) == 3
+
+    # Backdated between the two slack activities, plus a new one after the checkpoint
+    _add_activities(db_session_test, user_id, ["figma"], datetime(2023, 3, 4, 9, 0, 30))
+    _add_activities(db_session_test, user_id, ["vscode"], datetime(2023, 3, 4, 10))
+    assert stream_enrich_user_activities(db_session_test, user_id, chunk_size=10) == 2
+
+    features = _features_in_order(db_session_test, user_id)
+    assert [f.app_category for f in features] == ["Communication", "Design", "Communication", "Development", "Development"]
+    # figma compares with the slack before it, the new vscode with the checkpoint's vscode
+    assert features[1].is_context_switch is True
+    assert features[4].is_context_switch is False
+    assert db_session_test.get(ActivityEnrichmentCheckpoint, user_id).last_activity_id == features[4].activity_id
+
+def test_stream_enrich_respects_max_chunks(db_session_test: Session):
+    user_id = 503
+    _add_activities(db_session_test, user_id, ["vscode"] * 5, datetime(2023, 3, 3, 9))
+    assert stream_enrich_user_activities(db_session_test, user_id, chunk_size=2, max_chunks=1) == 2
+    assert stream_enrich_user_activities(db_session_test, user_id, chunk_size=2) == 3
+
+# --- Category mapping reload Tests ---
+
+def test_refresh_category_matchers_applies_database_rules(db_session_test: Session):
+    db_session_test.add_all([
+        CategoryMapping(mapping_type="app", pattern="Sublime Text", category="Development", priority=0),
+        CategoryMapping(mapping_type="app", pattern="word", category="Writing", priority=0),
+        CategoryMapping(mapping_type="website", pattern="news.ycombinator.com", category="News"),
+        CategoryMapping(mapping_type="website", pattern="youtube.com", category="unused", is_active=False),
+    ])
+    db_session_test.commit()
+    try:
+        assert refresh_category_matchers(db_session_test, force=True) is True
+        assert _get_app_category("app_usage", {"app_name": "Sublime Text 4"}) == "Development"
+        assert _get_app_category("app_usage", {"app_name": "Microsoft Word"}) == "Writing" # DB rule overrides built-in
+        assert _get_website_category("website_visit", {"url": "https://news.ycombinator.com/"}) == "News"
+        assert _get_website_category("website_visit", {"url": "https://www.youtube.com/watch"}) is None # Disabled
+    finally:
+        db_session_test.query(CategoryMapping).delete()
+        db_session_test.commit()
+        refresh_category_matchers(db_session_test, force=True)
+    assert _get_app_category("app_usage", {"app_name": "Microsoft Word"}) == "Productivity"
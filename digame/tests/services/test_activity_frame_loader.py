@@ -0,0 +1,70 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+
+from digame.app.services.activity_frame_loader import load_activity_frame
+from digame.app.services.pattern_recognition_service import detect_anomalies
+from digame.app.models.activity import Activity
+from digame.app.models.activity_features import ActivityEnrichedFeature
+from digame.app.models.behavior_model import BehavioralModel, BehavioralPattern
+
+def _seed(db: Session, user_id: int, start: datetime, types, switches):
+    activities = [
+        Activity(user_id=user_id, activity_type=activity_type, timestamp=start + timedelta(hours=i))
+        for i, activity_type in enumerate(types)
+    ]
+    db.add_all(activities)
+    db.flush()
+    db.add_all([
+        ActivityEnrichedFeature(activity_id=activity.id, app_category="Development", is_context_switch=switch)
+        for activity, switch in zip(activities, switches) if switch is not None
+    ])
+    db.commit()
+    return activities
+
+def _count_statements(db: Session):
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+def test_load_activity_frame_left_joins_features_and_pushes_down_window(db_session_test: Session):
+    start = datetime(2024, 2, 1, 8)
+    activities = _seed(db_session_test, 801, start, ["app_usage", "website_visit", "app_usage"], [True, None, False])
+
+    frame = load_activity_frame(db_session_test, 801)
+    assert list(frame["activity_id"]) == [a.id for a in activities]
+    assert list(frame["app_category"]) == ["Development", None, "Development"]
+    assert str(frame["timestamp"].dtype).startswith("datetime64")
+
+    windowed = load_activity_frame(db_session_test, 801, start=start + timedelta(hours=1), enriched_only=True,
+                                   columns=("activity_id", "is_context_switch"))
+    assert list(windowed.columns) == ["activity_id", "is_context_switch"]
+    assert list(windowed["activity_id"]) == [activities[2].id]
+
+    assert load_activity_frame(db_session_test, 999).empty
+    with pytest.raises(ValueError):
+        load_activity_frame(db_session_test, 801, columns=("details",))
+
+def test_detect_anomalies_loads_activities_in_one_query(db_session_test: Session):
+    user_id = 802
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    types = ["app_usage"] * 40 + ["rare_type"]
+    _seed(db_session_test, user_id, now - timedelta(hours=len(types)), types, [True, False] * 20 + [True])
+    model = BehavioralModel(user_id=user_id, name="m", version="1", algorithm="kmeans", parameters={})
+    db_session_test.add(model)
+    db_session_test.flush()
+    db_session_test.add_all([
+        BehavioralPattern(model_id=model.id, pattern_label=k, size=1, context_features={"is_context_switch": rate})
+        for k, rate in enumerate([0.05, 0.1])
+    ])
+    db_session_test.commit()
+
+    statements = _count_statements(db_session_test)
+    anomalies = detect_anomalies(db_session_test, user_id, threshold=2.0, time_window=30)
+
+    activity_queries = [s for s in statements if "FROM digital_activities" in s]
+    assert len(activity_queries) == 1
+    switch_anomalies = [a for a in anomalies if a["anomaly_type"] == "context_switch_anomaly"]
+    assert len(switch_anomalies) == 21
+    assert all(isinstance(a["activity_id"], int) for a in anomalies)
@@ -0,0 +1,85 @@
+import pytest
+from datetime import datetime
+from unittest.mock import MagicMock
+from sqlalchemy.orm import Session
+
+from digame.app.services.activity_ingest_service import (
+    build_activity_row,
+    ingest_activity_events,
+    iter_ndjson_lines,
+    InvalidActivityEvent,
+)
+from digame.app.models.activity import Activity
+
+# --- Row normalisation ---
+
+def test_build_activity_row_normalises_timestamp_to_naive_utc():
+    row = build_activity_row(7, {"activity_type": "app_usage", "timestamp": "2024-01-01T12:00:00+02:00"})
+    assert row["user_id"] == 7
+    assert row["activity_type"] == "app_usage"
+    assert row["timestamp"] == datetime(2024, 1, 1, 10, 0, 0)
+    assert row["details"] is None
+
+def test_build_activity_row_accepts_legacy_activity_key():
+    row = build_activity_row(1, {"activity": "opened_app", "details": {"app_name": "slack"}})
+    assert row["activity_type"] == "opened_app"
+    assert row["details"] == {"app_name": "slack"}
+    assert isinstance(row["timestamp"], datetime)
+
+@pytest.mark.parametrize("event", [
+    {},
+    {"activity_type": ""},
+    {"activity_type": "x", "timestamp": "yesterday"},
+    {"activity_type": "x", "details": "not-a-dict"},
+    ["not", "a", "dict"],
+])
+def test_build_activity_row_rejects_invalid_events(event):
+    with pytest.raises(InvalidActivityEvent):
+        build_activity_row(1, event)
+
+def test_iter_ndjson_lines_handles_lines_split_across_chunks():
+    chunks = [b'{"activity_type": "a"}\n{"activity_', b'type": "b"}\n\nbroken\n{"activity_type": "c"}']
+    records = list(iter_ndjson_lines(chunks))
+    assert records == [{"activity_type": "a"}, {"activity_type": "b"}, None, {"activity_type": "c"}]
+
+# --- Batched ingestion ---
+
+def test_ingest_activity_events_writes_in_batches(db_session_test: Session):
+    events = [{"activity_type": f"type_{i}", "timestamp": f"2024-02-01T00:00:{i:02d}Z"} for i in range(5)]
+    before = db_session_test.query(Activity).filter(Activity.user_id == 999).count()
+
+    summary = ingest_activity_events(db_session_test, user_id=999, events=events, batch_size=2)
+
+    assert summary["accepted"] == 5
+    assert summary["rejected"] == 0
+    assert [ack["accepted"] for ack in summary["batches"]] == [2, 2, 1]
+    assert [ack["offset"] for ack in summary["batches"]] == [0, 2, 4]
+    assert db_session_test.query(Activity).filter(Activity.user_id == 999).count() == before + 5
+
+def test_ingest_activity_events_enforces_max_events(db_session_test: Session):
+    read = []
+    def events():
+        for i in range(10):
+            read.append(i)
+            yield {"activity_type": "a"}
+
+    summary = ingest_activity_events(db_session_test, user_id=998, events=events(), batch_size=2, max_events=3)
+
+    # The batch crossing the limit keeps the event under it, and nothing after it is read
+    assert (summary["accepted"], summary["rejected"], summary["truncated"]) == (3, 1, True)
+    assert summary["batches"][1]["status"] == "committed"
+    assert len(read) == 4
+    assert db_session_test.query(Activity).filter(Activity.user_id == 998).count() == 3
+
+def test_ingest_activity_events_failed_batch_is_rolled_back():
+    session = MagicMock(spec=Session)
+    session.get_bind.return_value.dialect.name = "sqlite"
+    session.execute.side_effect = RuntimeError("db down")
+
+    summary = ingest_activity_events(session, user_id=1, events=[{"activity_type": "a"}], batch_size=10)
+
+    assert summary["accepted"] == 0
+    assert summary["rejected"] == 1
+    assert summary["batches"][0]["status"] == "failed"
+    session.rollback.assert_called_once()
+    session.commit.assert_not_called()
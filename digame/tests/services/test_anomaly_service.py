@@ -0,0 +1,84 @@
+import pytest
+import numpy as np
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+
+from digame.app.services.activity_feature_service import stream_enrich_user_activities
+from digame.app.services.anomaly_service import (
+    evaluate_frequency_deviation,
+    score_frequency_deviations,
+    detect_frequency_anomalies_for_user,
+    detect_frequency_anomalies_for_users,
+)
+from digame.app.models.activity import Activity
+from digame.app.models.anomaly import DetectedAnomaly
+
+# Mondays, 9am, and the Monday after them
+WEEKS = [datetime(2023, 5, 1, 9) + timedelta(weeks=w) for w in range(8)]
+NOW = datetime(2023, 6, 26, 9, 59)
+
+def _add_app_usage(db: Session, user_id: int, app_name: str, start: datetime, count: int):
+    db.add_all([
+        Activity(user_id=user_id, activity_type="app_usage", details={"app_name": app_name},
+                 timestamp=start + timedelta(minutes=i))
+        for i in range(count)
+    ])
+    db.commit()
+
+def _seed_user(db: Session, user_id: int, current_count: int):
+    for week, count in zip(WEEKS, [3, 4] * 4):
+        _add_app_usage(db, user_id, "vscode", week, count)
+    _add_app_usage(db, user_id, "vscode", NOW.replace(minute=0), current_count)
+    stream_enrich_user_activities(db, user_id)
+
+def test_score_frequency_deviations_matches_scalar_evaluation():
+    rng = np.random.default_rng(7)
+    sample_count = rng.integers(0, 10, 500)
+    samples = [rng.integers(0, 12, n) for n in sample_count]
+    count_sum = np.array([s.sum() for s in samples], dtype=float)
+    count_sum_sq = np.array([(s.astype(float) ** 2).sum() for s in samples])
+    observed = rng.integers(0, 25, 500).astype(float)
+
+    mean, effective_std, severity, direction = score_frequency_deviations(
+        observed, sample_count, count_sum, count_sum_sq, 2.0
+    )
+
+    for i, s in enumerate(samples):
+        expected_mean = s.mean() if len(s) else 0.0
+        expected_std = s.std(ddof=1) if len(s) > 1 else 0.0
+        expected = evaluate_frequency_deviation(observed[i], expected_mean, expected_std, 2.0)
+        if expected is None:
+            assert direction[i] == 0
+        else:
+            assert direction[i] == (1 if expected[0] == "higher" else -1)
+            assert effective_std[i] == pytest.approx(expected[1])
+            assert severity[i] == pytest.approx(expected[2])
+
+def test_batch_detection_matches_per_user_detection(db_session_test: Session):
+    _seed_user(db_session_test, 701, current_count=30) # Spike
+    _seed_user(db_session_test, 702, current_count=4)  # Normal
+
+    recorded = detect_frequency_anomalies_for_users(db_session_test, NOW, user_ids=[701, 702])
+
+    assert recorded == 1
+    batch = db_session_test.query(DetectedAnomaly).filter(DetectedAnomaly.user_id.in_([701, 702])).all()
+    assert [a.user_id for a in batch] == [701]
+    db_session_test.query(DetectedAnomaly).filter(DetectedAnomaly.user_id == 701).delete()
+    db_session_test.commit()
+
+    per_user = detect_frequency_anomalies_for_user(db_session_test, 701, NOW)
+    assert len(per_user) == 1
+    for field in ("anomaly_type", "description", "severity_score", "related_activity_ids"):
+        assert getattr(batch[0], field) == getattr(per_user[0], field)
+
+def test_batch_detection_can_be_limited_to_users(db_session_test: Session):
+    _seed_user(db_session_test, 703, current_count=30)
+    assert detect_frequency_anomalies_for_users(db_session_test, NOW, user_ids=[999]) == 0
+    assert detect_frequency_anomalies_for_users(db_session_test, NOW, user_ids=[703]) == 1
+
+def test_batch_detection_records_a_spike_once_per_hour(db_session_test: Session):
+    _seed_user(db_session_test, 704, current_count=30)
+    # Runs every 15 minutes overlap the 60-minute window
+    assert detect_frequency_anomalies_for_users(db_session_test, NOW - timedelta(minutes=15), user_ids=[704]) == 1
+    assert detect_frequency_anomalies_for_users(db_session_test, NOW, user_ids=[704]) == 0
+    assert db_session_test.query(DetectedAnomaly).filter(DetectedAnomaly.user_id == 704).count() == 1
@@ -0,0 +1,67 @@
+import random
+
+import pytest
+
+from digame.app.services.category_matcher import AppCategoryMatcher, DomainCategoryIndex
+from digame.app.services.activity_feature_service import APP_CATEGORY_MAPPING, WEBSITE_CATEGORY_MAPPING
+
+def _linear_scan(mapping, app_name):
+    # The original first-key-wins substring scan that AppCategoryMatcher replaces
+    for key, category in mapping.items():
+        if key in app_name:
+            return category
+    return None
+
+# --- AppCategoryMatcher ---
+
+def test_app_matcher_prefers_earlier_keys_over_earlier_positions():
+    mapping = {"code": "Development", "studio": "Design"}
+    matcher = AppCategoryMatcher(mapping)
+    # "studio" occurs first in the string but "code" comes first in the mapping
+    assert matcher.match("studio code") == "Development"
+
+def test_app_matcher_handles_overlapping_keys():
+    mapping = {"visual studio code": "Development", "studio": "Design"}
+    matcher = AppCategoryMatcher(mapping)
+    assert matcher.match("visual studio code") == "Development"
+    assert matcher.match("android studio") == "Design"
+
+def test_app_matcher_escapes_regex_metacharacters():
+    matcher = AppCategoryMatcher({"c++ builder": "Development", "a.b": "Other"})
+    assert matcher.match("embarcadero c++ builder") == "Development"
+    assert matcher.match("axb") is None
+
+def test_app_matcher_empty_mapping():
+    assert AppCategoryMatcher({}).match("vscode") is None
+
+def test_app_matcher_agrees_with_linear_scan_on_random_names():
+    rng = random.Random(7)
+    keys = list(APP_CATEGORY_MAPPING)
+    noise = ["", "microsoft ", " - ", "pro ", " 2024", "x"]
+    matcher = AppCategoryMatcher(APP_CATEGORY_MAPPING)
+    for _ in range(2000):
+        parts = [rng.choice(noise)]
+        for _ in range(rng.randint(0, 3)):
+            parts += [rng.choice(keys), rng.choice(noise)]
+        name = "".join(parts)
+        assert matcher.match(name) == _linear_scan(APP_CATEGORY_MAPPING, name), name
+
+# --- DomainCategoryIndex ---
+
+@pytest.mark.parametrize("url, expected", [
+    ("https://github.com/user/repo", "Development"),
+    ("http://www.nytimes.com/article", "News"),
+    ("https://gist.github.com/abc", "Development"),
+    ("https://en.wikipedia.org/wiki/Trie", "Reference"),
+    ("https://GITHUB.com:443/x", "Development"),
+    ("https://notgithub.com", None),
+    ("https://unknown-site.com", None),
+    ("not a url", None),
+])
+def test_domain_index_resolves_hosts_and_subdomains(url, expected):
+    assert DomainCategoryIndex(WEBSITE_CATEGORY_MAPPING).match_url(url) == expected
+
+def test_domain_index_prefers_most_specific_domain():
+    index = DomainCategoryIndex({"atlassian.com": "Tools", "jira.atlassian.com": "Project Management"})
+    assert index.match_host("jira.atlassian.com") == "Project Management"
+    assert index.match_host("confluence.atlassian.com") == "Tools"
@@ -0,0 +1,109 @@
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+from digame.app.models.activity import Activity
+from digame.app.models.process_notes import ProcessMiningCheckpoint, ProcessNote, ProcessSequenceCandidate
+from digame.app.services import process_note_service
+from digame.app.services.process_note_service import identify_and_update_process_notes
+
+
+def _log(db: Session, user_id: int, activity_types, start: datetime):
+    db.add_all([
+        Activity(user_id=user_id, activity_type=activity_type, timestamp=start + timedelta(minutes=i))
+        for i, activity_type in enumerate(activity_types)
+    ])
+    db.commit()
+
+
+def _notes(db: Session, user_id: int):
+    return {
+        note.process_steps_description: (
+            note.occurrence_count, note.first_observed_at, note.last_observed_at, note.source_activity_ids
+        )
+        for note in db.query(ProcessNote).filter(ProcessNote.user_id == user_id)
+    }
+
+
+def test_incremental_runs_match_a_full_rescan(db_session_test: Session, monkeypatch):
+    # Keeping every sequence as a candidate makes incremental counts exact
+    monkeypatch.setattr(process_note_service, "CANDIDATE_SLACK", 2)
+    user_id = 1301
+    rng = random.Random(7)
+    history = [rng.choice("ABCD") for _ in range(300)]
+    start = datetime(2024, 5, 1)
+
+    # Batches split mid-sequence, so occurrences span runs
+    for offset, size in ((0, 100), (100, 1), (101, 57), (158, 142)):
+        _log(db_session_test, user_id, history[offset:offset + size], start + timedelta(minutes=offset))
+        identify_and_update_process_notes(db_session_test, user_id)
+
+    checkpoint = db_session_test.get(ProcessMiningCheckpoint, user_id)
+    assert checkpoint.processed_count == 300
+    assert len(checkpoint.tail_activity_ids) == 6
+    incremental = _notes(db_session_test, user_id)
+    assert len(incremental) > 0
+    # Candidates are the sequences that haven't recurred 3 times yet
+    assert all(
+        candidate.occurrence_count < 3 and candidate.process_steps_description not in incremental
+        for candidate in db_session_test.query(ProcessSequenceCandidate).filter_by(user_id=user_id)
+    )
+
+    # Starting over from the whole history changes nothing
+    assert identify_and_update_process_notes(db_session_test, user_id, full_rescan=True) == (0, 0)
+    assert _notes(db_session_test, user_id) == incremental
+    assert identify_and_update_process_notes(db_session_test, user_id) == (0, 0) # No new activities
+
+
+def test_candidates_become_notes_when_they_recur(db_session_test: Session):
+    user_id = 1302
+    start = datetime(2024, 5, 1)
+    _log(db_session_test, user_id, ["Open", "Edit", "Save", "Idle1", "Open", "Edit", "Save"], start)
+    assert identify_and_update_process_notes(db_session_test, user_id) == (0, 0)
+
+    _log(db_session_test, user_id, ["Idle2", "Open", "Edit", "Save"], start + timedelta(hours=1))
+    assert identify_and_update_process_notes(db_session_test, user_id) == (1, 0)
+    note = db_session_test.query(ProcessNote).filter_by(user_id=user_id).one()
+    assert (note.process_steps_description, note.occurrence_count) == ("Open -> Edit -> Save", 3)
+    assert note.first_observed_at == start
+    assert note.last_observed_at == start + timedelta(hours=1, minutes=3)
+
+    _log(db_session_test, user_id, ["Open", "Edit", "Save"], start + timedelta(hours=2))
+    assert identify_and_update_process_notes(db_session_test, user_id) == (0, 1)
+    db_session_test.refresh(note)
+    assert note.occurrence_count == 4
+
+
+def test_only_recent_near_threshold_candidates_are_kept(db_session_test: Session):
+    user_id = 1303
+    start = datetime(2024, 5, 1)
+    _log(db_session_test, user_id, ["Open", "Edit", "Save", "Idle1"], start)
+    identify_and_update_process_notes(db_session_test, user_id)
+    candidates = db_session_test.query(ProcessSequenceCandidate).filter_by(user_id=user_id)
+    assert candidates.count() == 0 # Seen once, below threshold - CANDIDATE_SLACK
+
+    _log(db_session_test, user_id, ["Open", "Edit", "Save", "Idle2", "Open", "Edit", "Save"], start + timedelta(days=1))
+    identify_and_update_process_notes(db_session_test, user_id)
+    assert [(c.process_steps_description, c.occurrence_count) for c in candidates] == [("Open -> Edit -> Save", 2)]
+
+    # Not observed again within CANDIDATE_RETENTION of the newest activity
+    _log(db_session_test, user_id, ["Idle3"], start + timedelta(days=40))
+    identify_and_update_process_notes(db_session_test, user_id)
+    assert candidates.count() == 0
+
+
+def test_periodic_full_rescans_find_sparse_sequences(db_session_test: Session):
+    user_id = 1304
+    start = datetime(2024, 5, 1)
+    # The workflow is repeated once per run, so no incremental run keeps it as a candidate
+    for day in range(3):
+        _log(db_session_test, user_id, ["Open", "Edit", "Save", f"Idle{day}"], start + timedelta(days=day))
+        assert identify_and_update_process_notes(db_session_test, user_id) == (0, 0)
+
+    checkpoint = db_session_test.get(ProcessMiningCheckpoint, user_id)
+    checkpoint.full_scan_at = datetime.utcnow() - process_note_service.FULL_RESCAN_INTERVAL
+    db_session_test.commit()
+    _log(db_session_test, user_id, ["Idle3"], start + timedelta(days=3))
+    assert identify_and_update_process_notes(db_session_test, user_id) == (1, 0)
+    assert db_session_test.get(ProcessMiningCheckpoint, user_id).full_scan_at > datetime.utcnow() - timedelta(minutes=1)
@@ -0,0 +1,179 @@
+import threading
+
+import pytest
+from unittest.mock import patch
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, sessionmaker
+
+from digame.app.services import job_queue
+from digame.app.services.job_queue import (
+    claim_next_job,
+    enqueue_job,
+    fail_job,
+    requeue_stale_jobs,
+    start_inline_job,
+)
+from digame.app.workers.job_worker import run_next_job
+from digame.app.crud.job_crud import create_job, get_job_by_id
+from digame.app.models.job import Job
+
+# Job types private to these tests, so jobs queued elsewhere in the session don't interfere
+HANDLERS = {
+    "queue_test_echo": "digame.tests.services.test_job_queue:echo_handler",
+    "queue_test_other": "digame.tests.services.test_job_queue:echo_handler",
+    "queue_test_boom": "digame.tests.services.test_job_queue:boom_handler",
+    "queue_test_stolen": "digame.tests.services.test_job_queue:stolen_handler",
+}
+TEST_TYPES = list(HANDLERS)
+NOW = datetime(2024, 3, 4, 10, 0)
+
+
+def echo_handler(db: Session, user_id: int, value: int = 0):
+    return {"status": "success", "user_id": user_id, "value": value}
+
+
+def boom_handler(db: Session, user_id: int):
+    raise RuntimeError("handler exploded")
+
+
+lease_lost = threading.Event()
+
+
+def stolen_handler(db: Session, user_id: int):
+    # Another worker reclaims the job while this one is still running it
+    db.execute(update(Job).where(Job.user_id == user_id, Job.job_type == "queue_test_stolen").values(locked_by="w2"))
+    db.commit()
+    lease_lost.wait(5)
+    return {"status": "success"}
+
+
+@pytest.fixture(autouse=True)
+def test_handlers(db_session_test: Session):
+    with patch.dict(job_queue.JOB_HANDLERS, HANDLERS):
+        yield
+    db_session_test.rollback()
+    db_session_test.query(Job).filter(Job.job_type.in_(TEST_TYPES)).delete()
+    db_session_test.commit()
+
+
+def test_claims_by_priority_then_age(db_session_test: Session):
+    low = enqueue_job(db_session_test, 1001, "queue_test_echo", {"value": 1})
+    high = enqueue_job(db_session_test, 1001, "queue_test_echo", {"value": 2}, priority=5)
+    later_low = enqueue_job(db_session_test, 1001, "queue_test_echo", {"value": 3})
+
+    claimed = [claim_next_job(db_session_test, "w1", TEST_TYPES, now=NOW) for _ in range(4)]
+
+    assert [job.id if job else None for job in claimed] == [high.id, low.id, later_low.id, None]
+    assert claimed[0].status == "running"
+    assert claimed[0].locked_by == "w1"
+    assert claimed[0].attempts == 1
+
+
+def test_failed_attempts_back_off_then_fail(db_session_test: Session):
+    job = enqueue_job(db_session_test, 1002, "queue_test_echo", max_attempts=2)
+
+    claim_next_job(db_session_test, "w1", TEST_TYPES, now=NOW)
+    assert fail_job(db_session_test, job.id, "w1", "first", now=NOW) == "pending"
+    retry_at = NOW + job_queue.retry_delay(1)
+    assert get_job_by_id(db_session_test, job.id).run_after == retry_at
+    assert claim_next_job(db_session_test, "w1", TEST_TYPES, now=retry_at - timedelta(seconds=1)) is None
+
+    assert claim_next_job(db_session_test, "w2", TEST_TYPES, now=retry_at).id == job.id
+    assert fail_job(db_session_test, job.id, "w2", "second", now=retry_at) == "failed"
+    assert get_job_by_id(db_session_test, job.id).error == "second"
+
+
+def test_concurrency_limit_skips_saturated_types(db_session_test: Session):
+    enqueue_job(db_session_test, 1003, "queue_test_echo")
+    enqueue_job(db_session_test, 1003, "queue_test_echo", priority=1)
+    other = enqueue_job(db_session_test, 1003, "queue_test_other")
+
+    with patch.dict(job_queue.JOB_TYPE_CONCURRENCY, {"queue_test_echo": 1}):
+        first = claim_next_job(db_session_test, "w1", TEST_TYPES, now=NOW)
+        second = claim_next_job(db_session_test, "w2", TEST_TYPES, now=NOW)
+
+    assert first.job_type == "queue_test_echo"
+    assert second.id == other.id
+
+
+def test_stale_jobs_are_requeued(db_session_test: Session):
+    job = enqueue_job(db_session_test, 1004, "queue_test_echo")
+    claim_next_job(db_session_test, "w1", ["queue_test_echo"], now=NOW)
+
+    assert requeue_stale_jobs(db_session_test, now=NOW + timedelta(seconds=job_queue.JOB_STALE_AFTER_SECONDS + 1)) == 1
+    db_session_test.expire_all()
+    job = get_job_by_id(db_session_test, job.id)
+    assert (job.status, job.locked_by) == ("pending", None)
+    assert "w1" in job.error
+
+
+def test_worker_runs_jobs_and_records_outcome(db_session_test: Session):
+    ok = enqueue_job(db_session_test, 1005, "queue_test_echo", {"value": 7}, priority=100)
+    boom = enqueue_job(db_session_test, 1005, "queue_test_boom", max_attempts=1, priority=99)
+    sessions = sessionmaker(bind=db_session_test.get_bind(), autoflush=False)
+
+    with patch("digame.app.db.SessionLocal", sessions):
+        assert run_next_job("w1", TEST_TYPES)
+        assert run_next_job("w1", TEST_TYPES)
+
+    db_session_test.expire_all()
+    ok, boom = get_job_by_id(db_session_test, ok.id), get_job_by_id(db_session_test, boom.id)
+    assert (ok.status, ok.result) == ("completed", {"status": "success", "user_id": 1005, "value": 7})
+    assert (boom.status, boom.error) == ("failed", "handler exploded")
+
+
+def test_stale_inline_jobs_fail_instead_of_requeueing(db_session_test: Session):
+    job = start_inline_job(db_session_test, 1006, "queue_test_echo", owner="inline:test")
+    assert (job.status, job.locked_by, job.attempts) == ("running", "inline:test", 1)
+
+    later = datetime.utcnow() + timedelta(seconds=job_queue.JOB_STALE_AFTER_SECONDS + 1)
+    requeue_stale_jobs(db_session_test, now=later)
+    db_session_test.expire_all()
+    job = get_job_by_id(db_session_test, job.id)
+    assert (job.status, job.locked_by) == ("failed", None)
+    assert "inline:test" in job.error
+
+
+def test_stale_unleased_running_jobs_fail(db_session_test: Session):
+    job = create_job(db_session_test, 1007, "queue_test_echo", status="running")
+
+    assert requeue_stale_jobs(db_session_test, now=datetime.utcnow()) == 0
+    later = datetime.utcnow() + timedelta(seconds=job_queue.JOB_STALE_AFTER_SECONDS + 1)
+    requeue_stale_jobs(db_session_test, now=later)
+    db_session_test.expire_all()
+    assert get_job_by_id(db_session_test, job.id).status == "failed"
+
+
+def test_worker_abandons_job_when_lease_is_lost(shared_db_session_test: Session):
+    # The heartbeat runs on its own thread, so the job must be on an engine shared across threads
+    db = shared_db_session_test
+    job = enqueue_job(db, 1008, "queue_test_stolen", priority=100)
+    sessions = sessionmaker(bind=db.get_bind(), autoflush=False)
+    lease_lost.clear()
+
+    with patch("digame.app.db.SessionLocal", sessions), patch.object(job_queue, "JOB_HEARTBEAT_SECONDS", 0.01):
+        assert run_next_job("w1", TEST_TYPES, on_lease_lost=lease_lost.set)
+
+    assert lease_lost.is_set()
+    db.expire_all()
+    job = get_job_by_id(db, job.id)
+    # The result of the abandoned run is not recorded over the new owner's lease
+    assert (job.status, job.locked_by) == ("running", "w2")
+    db.delete(job)
+    db.commit()
+
+
+def test_lease_is_given_up_after_repeated_heartbeat_failures():
+    beats = [OperationalError("UPDATE jobs", {}, Exception("db down")), True] + \
+        [OperationalError("UPDATE jobs", {}, Exception("db down"))] * job_queue.JOB_HEARTBEAT_MAX_FAILURES
+    lost = threading.Event()
+
+    with patch.object(job_queue, "heartbeat_job", side_effect=beats) as heartbeat, \
+            patch.object(job_queue, "JOB_HEARTBEAT_SECONDS", 0.001):
+        job_queue.keep_lease_alive(threading.Event(), 1, "w1", on_lost=lost.set)
+
+    # A successful beat resets the count; only consecutive failures give the lease up
+    assert heartbeat.call_count == len(beats)
+    assert lost.is_set()
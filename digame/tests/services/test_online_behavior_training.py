@@ -0,0 +1,87 @@
+import io
+from datetime import datetime, timedelta
+
+import joblib
+from sqlalchemy.orm import Session
+
+from digame.app import behavior
+from digame.app.behavior import load_pattern_artifact
+from digame.app.models.activity import Activity
+from digame.app.models.activity_features import ActivityEnrichedFeature
+from digame.app.services.behavior_service import assign_patterns_incremental, train_and_save_behavior_model
+
+HABITS = {
+    "coding": (9, "app_usage", "IDE"),
+    "meetings": (19, "meeting", "Calendar"),
+    "browsing": (14, "web_visit", "Browser"),
+}
+
+
+def _log(db: Session, user_id: int, start: datetime, count: int, habit: str):
+    hour, activity_type, app = HABITS[habit]
+    activities = [
+        Activity(user_id=user_id, activity_type=activity_type, timestamp=start + timedelta(days=i, hours=hour))
+        for i in range(count)
+    ]
+    db.add_all(activities)
+    db.flush()
+    db.add_all([
+        ActivityEnrichedFeature(activity_id=a.id, app_category=app, project_context="digame", is_context_switch=False)
+        for a in activities
+    ])
+    db.commit()
+
+
+def _train(db: Session, user_id: int, online: bool):
+    return train_and_save_behavior_model(db, user_id, n_clusters=2, auto_optimize=False, online=online)
+
+
+def test_online_training_folds_new_activities_into_a_new_version(db_session_test: Session, monkeypatch):
+    monkeypatch.setattr(behavior, "ONLINE_MIN_NEW_ACTIVITIES", 3)
+    user_id, start = 1201, datetime(2024, 4, 1)
+    _log(db_session_test, user_id, start, 20, "coding")
+    _log(db_session_test, user_id, start, 20, "meetings")
+    first, _, _ = _train(db_session_test, user_id, online=True) # No model yet: full training
+    assert first.version == "1.0.0"
+
+    _log(db_session_test, user_id, start + timedelta(days=30), 2, "coding")
+    kept, status, message = _train(db_session_test, user_id, online=True)
+    assert (kept.id, status) == (first.id, "success") and "kept" in message
+
+    assign_patterns_incremental(db_session_test, user_id) # Counts the 2 coding activities
+    _log(db_session_test, user_id, start + timedelta(days=30), 4, "meetings")
+    model, status, _ = _train(db_session_test, user_id, online=True)
+
+    assert status == "success" and model.id != first.id
+    assert model.version == "1.0.1" and model.parameters["online"]
+    assert sorted(p.size for p in model.patterns) == [22, 24]
+    meetings = next(p for p in model.patterns if "meeting" in p.activity_distribution)
+    assert meetings.activity_distribution == {"meeting": 24}
+    artifact = load_pattern_artifact(model.model_data)
+    assert sorted(artifact["counts"]) == [22, 24]
+    assert artifact["last_activity_id"] == model.last_activity_id
+    # The previous version is untouched
+    db_session_test.refresh(first)
+    assert sorted(p.size for p in first.patterns) == [20, 22]
+
+
+def test_online_training_retrains_when_activities_fit_no_cluster(db_session_test: Session, monkeypatch):
+    monkeypatch.setattr(behavior, "ONLINE_MIN_NEW_ACTIVITIES", 1)
+    user_id, start = 1202, datetime(2024, 4, 1)
+    _log(db_session_test, user_id, start, 20, "coding")
+    _log(db_session_test, user_id, start, 20, "meetings")
+    first, _, _ = _train(db_session_test, user_id, online=False)
+
+    _log(db_session_test, user_id, start + timedelta(days=30), 10, "browsing")
+    model, status, message = _train(db_session_test, user_id, online=True)
+
+    assert status == "success" and message is None
+    assert model.version == "1.0.0" and model.id != first.id
+    assert sum(p.size for p in model.patterns) == 50
+
+
+def test_artifacts_without_online_counts_are_ignored():
+    # Format 1 predates the `counts` and `last_activity_id` keys online training reads
+    buffer = io.BytesIO()
+    joblib.dump({"format": 1, "algorithm": "kmeans", "sklearn_version": "1.0"}, buffer)
+    assert load_pattern_artifact(buffer.getvalue()) is None
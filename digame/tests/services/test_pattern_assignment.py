@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from digame.app.behavior import load_pattern_artifact
+from digame.app.models.activity import Activity
+from digame.app.models.activity_features import ActivityEnrichedFeature
+from digame.app.models.behavior_model import BehavioralModel
+from digame.app.services.behavior_service import assign_patterns_incremental, train_and_save_behavior_model
+
+
+def _log(db: Session, user_id: int, start: datetime, count: int, kind: str):
+    # Two clearly separated habits: morning coding and evening meetings
+    hour, activity_type, app = (9, "app_usage", "IDE") if kind == "coding" else (19, "meeting", "Calendar")
+    activities = [
+        Activity(user_id=user_id, activity_type=activity_type, timestamp=start + timedelta(days=i, hours=hour))
+        for i in range(count)
+    ]
+    db.add_all(activities)
+    db.flush()
+    db.add_all([
+        ActivityEnrichedFeature(activity_id=a.id, app_category=app, project_context="digame", is_context_switch=False)
+        for a in activities
+    ])
+    db.commit()
+
+
+def test_new_activities_join_existing_patterns(db_session_test: Session):
+    user_id = 1101
+    start = datetime(2024, 4, 1)
+    _log(db_session_test, user_id, start, 20, "coding")
+    _log(db_session_test, user_id, start, 20, "meetings")
+
+    model, status, _ = train_and_save_behavior_model(db_session_test, user_id, n_clusters=2, auto_optimize=False)
+    assert status == "success"
+    artifact = load_pattern_artifact(model.model_data)
+    assert artifact["centroids"].shape == (2, len(artifact["feature_names"]))
+    sizes = {p.pattern_label: p.size for p in model.patterns}
+
+    assert assign_patterns_incremental(db_session_test, user_id)["assigned"] == 0
+
+    _log(db_session_test, user_id, start + timedelta(days=30), 3, "meetings")
+    result = assign_patterns_incremental(db_session_test, user_id)
+
+    assert result["assigned"] == 3
+    (label, added), = result["pattern_counts"].items()
+    db_session_test.refresh(model)
+    pattern = next(p for p in model.patterns if p.pattern_label == label)
+    assert added == 3 and pattern.size == sizes[label] + 3
+    assert pattern.activity_distribution == {"meeting": 23}
+    assert pattern.temporal_distribution["hour_of_day"] == {"19": 23}
+    # Already assigned activities aren't counted again
+    assert assign_patterns_incremental(db_session_test, user_id)["assigned"] == 0
+
+
+def test_models_without_artifact_need_retraining(db_session_test: Session):
+    model = BehavioralModel(user_id=1102, name="legacy", version="1.0.0", algorithm="kmeans", parameters={})
+    db_session_test.add(model)
+    db_session_test.commit()
+
+    result = assign_patterns_incremental(db_session_test, 1102)
+    assert result["status"] == "failed"
+    assert assign_patterns_incremental(db_session_test, 1103)["status"] == "failed"
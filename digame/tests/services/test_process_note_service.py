@@ -32,6 +32,7 @@ def mock_db_session():
     # Mock query mechanism
     session.query.return_value.filter.return_value.order_by.return_value.all.return_value = [] # Default: no activities
     session.query.return_value.filter.return_value.first.return_value = None # Default: no existing process note
+    session.query.return_value.filter.return_value.with_for_update.return_value.first.return_value = None # No mining checkpoint: a full run
     return session
 
 @pytest.fixture
@@ -40,6 +41,22 @@ def sample_user():
     # Not strictly needed if service only takes user_id, but useful for context
     return User(id=1, username="testuser", email="test@example.com", hashed_password="fake")
 
+def _bulk_rows(session: MagicMock, kind: str, table: str = "process_notes") -> List[dict]:
+    return [
+        row
+        for statement, *params in (c.args for c in session.execute.call_args_list)
+        if getattr(statement, kind) and statement.table.name == table
+        for row in params[0]
+    ]
+
+def inserted_notes(session: MagicMock) -> List[dict]:
+    """Rows of the bulk ProcessNote inserts issued on the mock session."""
+    return _bulk_rows(session, "is_insert")
+
+def note_updates(session: MagicMock) -> List[dict]:
+    """Rows of the bulk ProcessNote updates issued on the mock session."""
+    return _bulk_rows(session, "is_update")
+
 def create_mock_activity(id: int, user_id: int, activity_type: str, timestamp: datetime, details: dict = None) -> Activity:
     """Helper to create mock Activity objects."""
     act = Activity(id=id, user_id=user_id, activity_type=activity_type, timestamp=timestamp, details=details)
@@ -57,7 +74,7 @@ def test_no_activities_for_user(mock_db_session: MagicMock, sample_user: User):
     
     assert new_count == 0
     assert updated_count == 0
-    mock_db_session.add.assert_not_called()
+    mock_db_session.execute.assert_not_called()
     mock_db_session.commit.assert_not_called()
 
 def test_not_enough_activities_for_sequence(mock_db_session: MagicMock, sample_user: User):
@@ -93,7 +110,7 @@ def test_new_process_note_creation(mock_db_session: MagicMock, sample_user: User
             base_time += timedelta(minutes=1)
             act_id_counter += 1
         # Add some other activities in between to make it slightly more realistic
-        activities.append(create_mock_activity(act_id_counter, user_id, "Logout", base_time))
+        activities.append(create_mock_activity(act_id_counter, user_id, f"Other{i}", base_time))
         base_time += timedelta(minutes=1)
         act_id_counter +=1
 
@@ -106,20 +123,20 @@ def test_new_process_note_creation(mock_db_session: MagicMock, sample_user: User
     assert new_count == 1 # One new note for the "Login -> ViewDashboard -> EditProfile" sequence
     assert updated_count == 0
     
-    # Check that db.add was called once with a ProcessNote instance
-    mock_db_session.add.assert_called_once()
-    added_note = mock_db_session.add.call_args[0][0] # Get the object passed to add()
+    # Check that one ProcessNote row was inserted in bulk
+    added_notes = inserted_notes(mock_db_session)
+    assert len(added_notes) == 1
+    added_note = added_notes[0]
     
-    assert isinstance(added_note, ProcessNote)
-    assert added_note.user_id == user_id
+    assert added_note["user_id"] == user_id
     expected_sequence_str = _sequence_to_string(common_sequence)
-    assert added_note.process_steps_description == expected_sequence_str
-    assert added_note.inferred_task_name == _generate_task_name(expected_sequence_str)
-    assert added_note.occurrence_count == 3 # Met threshold
-    assert added_note.source_activity_ids == [1, 2, 3] # IDs of the first instance
-    assert added_note.first_observed_at == datetime(2023, 1, 1, 10, 0, 0)
+    assert added_note["process_steps_description"] == expected_sequence_str
+    assert added_note["inferred_task_name"] == _generate_task_name(expected_sequence_str)
+    assert added_note["occurrence_count"] == 3 # Met threshold
+    assert added_note["source_activity_ids"] == [1, 2, 3] # IDs of the first instance
+    assert added_note["first_observed_at"] == datetime(2023, 1, 1, 10, 0, 0)
     # Last observed: Login (act_id 9, 10:08), ViewDashboard (act_id 10, 10:09), EditProfile (act_id 11, 10:10)
-    assert added_note.last_observed_at == datetime(2023, 1, 1, 10, 10, 0) 
+    assert added_note["last_observed_at"] == datetime(2023, 1, 1, 10, 10, 0) 
     
     mock_db_session.commit.assert_called_once()
 
@@ -145,6 +162,9 @@ def test_existing_process_note_update(mock_db_session: MagicMock, sample_user: U
             act_id_counter += 1
         if i == 0:
             first_instance_ids = current_instance_ids
+        # A distinct separator, so only A -> B -> C recurs
+        activities.append(create_mock_activity(act_id_counter, user_id, f"X{i}", base_time))
+        act_id_counter += 1
 
     mock_db_session.query(Activity).filter().order_by().all.return_value = activities
     
@@ -159,20 +179,19 @@ def test_existing_process_note_update(mock_db_session: MagicMock, sample_user: U
         first_observed_at=datetime(2023, 1, 1, 9, 0, 0), # Old timestamp
         last_observed_at=datetime(2023, 1, 1, 9, 58, 0) # Old timestamp
     )
-    mock_db_session.query(ProcessNote).filter().first.return_value = existing_note
+    mock_db_session.query(ProcessNote).filter().all.return_value = [existing_note] # Fetched in bulk
     
     new_count, updated_count = identify_and_update_process_notes(mock_db_session, user_id=user_id)
     
     assert new_count == 0
     assert updated_count == 1 # One note updated
     
-    mock_db_session.add.assert_not_called() # No new notes added
-    assert existing_note.occurrence_count == 4 # Updated count
-    # Last observed: A (id 10, 10:09), B (id 11, 10:10), C (id 12, 10:11)
-    assert existing_note.last_observed_at == datetime(2023, 1, 1, 10, 11, 0) 
-    # First observed and source_activity_ids should not change if we only update count and last_observed_at
-    assert existing_note.first_observed_at == datetime(2023, 1, 1, 9, 0, 0) 
-    assert existing_note.source_activity_ids == first_instance_ids
+    assert inserted_notes(mock_db_session) == [] # No new notes added
+    # Only the count and last_observed_at are updated; first_observed_at and source_activity_ids stay
+    # Last observed: A (id 13, 10:09), B (id 14, 10:10), C (id 15, 10:11)
+    assert note_updates(mock_db_session) == [
+        {"id": 101, "occurrence_count": 4, "last_observed_at": datetime(2023, 1, 1, 10, 11, 0)}
+    ]
 
     mock_db_session.commit.assert_called_once()
 
@@ -186,27 +205,31 @@ def test_multiple_patterns_found(mock_db_session: MagicMock, sample_user: User):
     base_time = datetime(2023, 1, 1, 12, 0, 0)
     act_id_counter = 1
 
-    # Create instances of seq1
-    for _ in range(3):
-        for act_type in seq1:
-            activities.append(create_mock_activity(act_id_counter, user_id, act_type, base_time))
-            act_id_counter +=1; base_time += timedelta(seconds=30)
-    
-    # Create instances of seq2
-    for _ in range(3):
-        for act_type in seq2:
-            activities.append(create_mock_activity(act_id_counter, user_id, act_type, base_time))
-            act_id_counter +=1; base_time += timedelta(seconds=30)
+    # Create instances of seq1, then of seq2, each followed by a distinct separator
+    for seq in (seq1, seq2):
+        for i in range(3):
+            for act_type in seq + [f"Idle{act_id_counter}"]:
+                activities.append(create_mock_activity(act_id_counter, user_id, act_type, base_time))
+                act_id_counter +=1; base_time += timedelta(seconds=30)
 
     mock_db_session.query(Activity).filter().order_by().all.return_value = activities
     # Simulate no existing notes, so both should be created
-    mock_db_session.query(ProcessNote).filter().first.side_effect = [None, None] # First call for seq1, second for seq2
 
     new_count, updated_count = identify_and_update_process_notes(mock_db_session, user_id=user_id)
 
-    assert new_count == 2 # Two new notes
+    # Both sequences, plus seq2's 3-step prefix and suffix, which recur as well
+    assert new_count == 4
     assert updated_count == 0
-    assert mock_db_session.add.call_count == 2
+    descriptions = {note["process_steps_description"] for note in inserted_notes(mock_db_session)}
+    assert descriptions == {
+        "Open -> Read -> Reply",
+        "Search -> View -> Download -> Close",
+        "Search -> View -> Download",
+        "View -> Download -> Close",
+    }
+    # One bulk insert of notes; the other sequences occur once, too rarely to become candidates
+    assert sum(1 for c in mock_db_session.execute.call_args_list if c.args[0].is_insert) == 1
+    assert _bulk_rows(mock_db_session, "is_insert", "process_sequence_candidates") == []
     mock_db_session.commit.assert_called_once()
 
 def test_sequence_length_constraints(mock_db_session: MagicMock, sample_user: User):
@@ -236,8 +259,8 @@ def test_sequence_length_constraints(mock_db_session: MagicMock, sample_user: Us
     new_count, _ = identify_and_update_process_notes(mock_db_session, user_id, min_sequence_len=3, max_sequence_len=3, recurrence_threshold=3)
     
     assert new_count == 1 # Only "A -> B -> C" should be found 3 times
-    added_note = mock_db_session.add.call_args[0][0]
-    assert added_note.process_steps_description == "A -> B -> C"
+    added_note = inserted_notes(mock_db_session)[0]
+    assert added_note["process_steps_description"] == "A -> B -> C"
 
     # Reset mocks for next call
     mock_db_session.reset_mock()
@@ -253,10 +276,9 @@ def test_sequence_length_constraints(mock_db_session: MagicMock, sample_user: Us
     assert new_count_short > 0 # Expecting A->B (3 times) and B->C (3 times) etc.
     
     found_ab = False
-    for call_obj in mock_db_session.add.call_args_list:
-        note = call_obj[0][0]
-        if note.process_steps_description == "A -> B":
-            assert note.occurrence_count == 3
+    for note in inserted_notes(mock_db_session):
+        if note["process_steps_description"] == "A -> B":
+            assert note["occurrence_count"] == 3
             found_ab = True
     assert found_ab, "Sequence A -> B was not found or not added correctly."
 
@@ -273,6 +295,6 @@ def test_db_commit_error_handling(mock_db_session: MagicMock, sample_user: User)
     with pytest.raises(Exception, match="Simulated DB commit error"):
         identify_and_update_process_notes(mock_db_session, user_id=user_id)
     
-    mock_db_session.add.assert_called() # Attempted to add
+    mock_db_session.execute.assert_called() # Attempted to insert
     mock_db_session.commit.assert_called_once() # Attempted to commit
     mock_db_session.rollback.assert_called_once() # Rollback should be called on error
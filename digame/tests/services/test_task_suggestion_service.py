@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import Session
+
+from digame.app.models.process_notes import ProcessNote
+from digame.app.models.task import Task
+from digame.app.services.task_suggestion_service import (
+    calculate_task_priorities,
+    calculate_task_priority,
+    suggest_tasks_for_users,
+    suggest_tasks_from_process_notes,
+)
+
+
+def _note(db: Session, user_id: int, steps: str, count: int, last_observed_at: datetime, name=None) -> ProcessNote:
+    note = ProcessNote(
+        user_id=user_id, process_steps_description=steps, inferred_task_name=name,
+        occurrence_count=count, first_observed_at=last_observed_at - timedelta(days=1),
+        last_observed_at=last_observed_at
+    )
+    db.add(note)
+    db.commit()
+    return note
+
+
+def test_vectorized_priorities_match_the_scalar_score():
+    now = datetime(2024, 6, 1, 12)
+    counts = [0, 3, 49, 50, 500]
+    ages = [timedelta(0), timedelta(hours=23), timedelta(days=1), timedelta(days=89, hours=23),
+            timedelta(days=90), timedelta(days=400), timedelta(hours=-5)]
+    pairs = [(count, now - age) for count in counts for age in ages]
+
+    scores = calculate_task_priorities([count for count, _ in pairs], [last for _, last in pairs], now)
+
+    assert scores.tolist() == [calculate_task_priority(count, last, now) for count, last in pairs]
+    assert calculate_task_priority(50, now, now) == pytest.approx(1.0)
+
+
+def test_batch_suggestion_skips_notes_with_active_tasks(db_session_test: Session):
+    now = datetime.utcnow()
+    frequent = _note(db_session_test, 1401, "Open Excel -> Run Macro -> Email Report", 10, now - timedelta(days=2))
+    covered = _note(db_session_test, 1401, "Check Jira -> Reproduce Bug", 20, now - timedelta(days=1))
+    _note(db_session_test, 1401, "Create Account -> Send Email", 5, now - timedelta(days=40)) # Too old
+    _note(db_session_test, 1402, "Rare -> Process", 2, now) # Too few occurrences
+    other = _note(db_session_test, 1402, "A" * 80, 4, now - timedelta(hours=1))
+    db_session_test.add(Task(user_id=1401, description="Triage", process_note_id=covered.id, status="in_progress"))
+    db_session_test.commit()
+
+    assert suggest_tasks_for_users(db_session_test, user_ids=[1401, 1402]) == 2
+    tasks = {task.process_note_id: task for task in db_session_test.query(Task).filter(Task.status == "suggested")}
+    assert set(tasks) == {frequent.id, other.id}
+    assert tasks[other.id].user_id == 1402
+    assert tasks[other.id].description == f"Consider automating or reviewing process: {'A' * 70}..."
+    assert tasks[frequent.id].priority_score == pytest.approx(calculate_task_priority(10, frequent.last_observed_at))
+
+    # Suggested tasks are active, so a second pass suggests nothing new
+    assert suggest_tasks_for_users(db_session_test, user_ids=[1401, 1402]) == 0
+    assert suggest_tasks_from_process_notes(db_session_test, 1401) == []
+
+
+def test_user_suggestions_come_back_loaded(db_session_test: Session):
+    now = datetime.utcnow()
+    note = _note(db_session_test, 1403, "Draft -> Review -> Publish", 6, now, name="Publishing")
+
+    tasks = suggest_tasks_from_process_notes(db_session_test, 1403)
+
+    assert len(tasks) == 1
+    assert tasks[0].id is not None and tasks[0].created_at is not None
+    assert tasks[0].process_note_id == note.id
+    assert tasks[0].source_identifier == str(note.id)
+    assert tasks[0].description == "Consider automating or reviewing process: Publishing"
+    assert db_session_test.get(Task, tasks[0].id).status == "suggested"
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+from digame.app.behavior import _feature_matrix, cluster_activity_logs, encode_activity_features
+
+
+def _activities(n=600, project_contexts=300):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "activity_id": np.arange(n),
+        "activity_type": rng.choice(["app_usage", "web_visit", "meeting"], n),
+        "timestamp": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 7 * 86400, n), unit="s"),
+        "app_category": rng.choice(["ide", "browser", None], n),
+        "project_context": [f"project_{i}" for i in rng.integers(0, project_contexts, n)],
+        "website_category": rng.choice(["docs", None], n),
+        "is_context_switch": rng.random(n) < 0.2,
+    })
+
+
+def test_sparse_encoding_matches_dense():
+    raw_df = _activities()
+    dense = encode_activity_features(raw_df.copy(), max_categories=None)
+    sparse = encode_activity_features(raw_df.copy(), sparse_output=True, max_categories=None)
+
+    assert list(sparse.columns) == list(dense.columns)
+    matrix = _feature_matrix(sparse)
+    assert matrix.nnz < matrix.shape[0] * matrix.shape[1] * 0.05
+    np.testing.assert_allclose(matrix.toarray(), dense.to_numpy())
+
+    labels, _ = cluster_activity_logs(sparse, n_clusters=3, auto_optimize=False)
+    assert len(labels) == len(raw_df)
+
+
+def test_high_cardinality_columns_are_capped():
+    processed = encode_activity_features(_activities(), sparse_output=True, max_categories=20)
+
+    project_columns = [c for c in processed.columns if c.startswith("project_context_")]
+    assert len(project_columns) == 20
+    assert "project_context_infrequent_sklearn" in project_columns
+    assert (processed.sum(axis=1) > 0).all()
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.datasets import make_blobs
+from sklearn.metrics import adjusted_rand_score
+
+from digame.app import behavior
+
+
+@pytest.fixture
+def blobs():
+    data, truth = make_blobs(n_samples=6000, n_features=4, centers=4, cluster_std=0.4, random_state=7)
+    return pd.DataFrame(data), truth
+
+
+def test_large_datasets_select_scalable_backends(blobs, monkeypatch):
+    data = blobs[0].to_numpy()
+    assert behavior.select_clustering_backend("hierarchical", data, n_clusters=4)[0] == "hierarchical"
+
+    monkeypatch.setattr(behavior, "CLUSTER_LARGE_DATASET_ROWS", 1000)
+    for algorithm, backend in behavior.SCALABLE_BACKENDS.items():
+        assert behavior.select_clustering_backend(algorithm, data, n_clusters=4)[0] == backend
+
+
+def test_memory_limit_shrinks_sample_or_refuses(blobs, monkeypatch):
+    data = blobs[0].to_numpy()
+    monkeypatch.setattr(behavior, "CLUSTER_MEMORY_LIMIT_MB", 10)
+    backend, sample_size = behavior.select_clustering_backend("hierarchical", data, n_clusters=4)
+    assert backend == "sampled_hierarchical"
+    assert behavior.estimate_clustering_memory(backend, data, sample_size=sample_size) <= 10 * 1024 * 1024
+
+    monkeypatch.setattr(behavior, "CLUSTER_MEMORY_LIMIT_MB", 0.01)
+    assert behavior.select_clustering_backend("hierarchical", data, n_clusters=4)[0] is None
+    assert behavior.cluster_activity_logs(blobs[0], n_clusters=4, algorithm="hierarchical") == (None, None)
+
+
+@pytest.mark.parametrize("algorithm", ["kmeans", "dbscan", "hdbscan", "hierarchical"])
+def test_scalable_backends_recover_clusters(blobs, monkeypatch, algorithm):
+    data, truth = blobs
+    monkeypatch.setattr(behavior, "CLUSTER_LARGE_DATASET_ROWS", 1000)
+    monkeypatch.setattr(behavior, "CLUSTER_SAMPLE_SIZE", 1500)
+
+    labels, score = behavior.cluster_activity_logs(data, n_clusters=4, algorithm=algorithm)
+
+    assert len(labels) == len(data)
+    assert adjusted_rand_score(truth, labels) > 0.9
+    assert score > 0.5
@@ -0,0 +1,45 @@
+import pytest
+from unittest.mock import patch
+from sqlalchemy.orm import Session, sessionmaker
+
+from digame.app.compute_executor import run_tracked_job
+from digame.app.crud.job_crud import create_job, get_job_by_id
+from digame.app.services.job_queue import start_inline_job
+
+
+def _summary(db: Session, user_id: int, status: str = "success"):
+    if status == "error":
+        raise RuntimeError("clustering exploded")
+    return {"status": status, "message": f"done for {user_id}", "num_clusters": 3}
+
+
+def _run(db_session_test: Session, status: str, leased: bool = False):
+    if leased:
+        job = start_inline_job(db_session_test, 901, "model_training", owner="inline:test")
+    else:
+        job = create_job(db_session_test, user_id=901, job_type="model_training")
+    job_sessions = sessionmaker(bind=db_session_test.get_bind(), autoflush=False)
+    with patch("digame.app.db.SessionLocal", job_sessions):
+        try:
+            run_tracked_job(job.id, _summary, user_id=901, status=status)
+        except RuntimeError:
+            pass
+    db_session_test.expire_all()
+    return get_job_by_id(db_session_test, job.id)
+
+
+@pytest.mark.parametrize("leased", [False, True])
+def test_run_tracked_job_records_result(db_session_test: Session, leased: bool):
+    job = _run(db_session_test, "success", leased)
+    assert job.status == "completed"
+    assert job.locked_by is None
+    assert job.progress == 100
+    assert job.result == {"status": "success", "message": "done for 901", "num_clusters": 3}
+
+
+@pytest.mark.parametrize("leased", [False, True])
+@pytest.mark.parametrize("status, error", [("failed", "done for 901"), ("error", "clustering exploded")])
+def test_run_tracked_job_records_failures(db_session_test: Session, status: str, error: str, leased: bool):
+    job = _run(db_session_test, status, leased)
+    assert job.status == "failed"
+    assert job.error == error
@@ -0,0 +1,41 @@
+import asyncio
+import numpy as np
+import pytest
+import torch
+
+from digame.app.inference_batcher import InferenceBatcher
+from digame.app.predictive import PredictiveModel, script_for_inference
+
+
+def _model():
+    torch.manual_seed(0)
+    return PredictiveModel(input_dim=7, hidden_dim=16, output_dim=4, num_layers=2).eval()
+
+
+def _predict_all(batcher, assets, sequences):
+    async def run():
+        return await asyncio.gather(*(batcher.predict(assets, sequence) for sequence in sequences))
+    return np.stack(asyncio.run(run()))
+
+
+@pytest.mark.parametrize("scripted", [False, True])
+def test_batched_predictions_match_single_forward_passes(scripted):
+    model = _model()
+    assets = {"model": model, "runner": script_for_inference(model) if scripted else model}
+    sequences = np.random.default_rng(1).normal(size=(20, 5, 7)).astype(np.float32)
+    batcher = InferenceBatcher(max_batch_size=8)
+
+    outputs = _predict_all(batcher, assets, sequences)
+
+    with torch.no_grad():
+        expected = np.stack([model(torch.from_numpy(sequence[None]))[0].numpy() for sequence in sequences])
+    np.testing.assert_allclose(outputs, expected, rtol=1e-5, atol=1e-6)
+    assert batcher.stats()["requests"] == 20
+    assert batcher.stats()["batches"] < 20
+
+
+def test_batch_errors_reach_every_request():
+    assets = {"model": _model()}
+    batcher = InferenceBatcher()
+    with pytest.raises(RuntimeError):
+        _predict_all(batcher, assets, np.zeros((3, 5, 2), dtype=np.float32)) # Wrong input_dim
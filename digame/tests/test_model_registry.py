@@ -0,0 +1,85 @@
+import os
+import torch
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+from digame.app.predictive import PredictiveModel, save_model
+from digame.app.model_registry import ModelRegistry
+
+
+def _save(directory, hidden_dim=4):
+    model = PredictiveModel(input_dim=2, hidden_dim=hidden_dim, output_dim=3)
+    encoders = {
+        "activity_encoder": LabelEncoder().fit(["app_usage", "meeting", "web_visit"]),
+        "scaler": StandardScaler().fit([[0.0], [23.0]]),
+    }
+    params = {"input_dim": 2, "hidden_dim": hidden_dim, "output_dim": 3, "num_layers": 1, "sequence_length": 5}
+    path = os.path.join(str(directory), "model.pth")
+    save_model(model, torch.optim.Adam(model.parameters()), encoders, params, path)
+    return path
+
+
+def test_registry_caches_and_reloads_changed_models(tmp_path):
+    registry = ModelRegistry()
+    path = _save(tmp_path)
+
+    first = registry.get(path)
+    assert registry.get(path) is first
+    assert not first["model"].training
+    assert first["sequence_length"] == 5
+
+    _save(tmp_path, hidden_dim=6) # Retrained
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000))
+    reloaded = registry.get(path)
+    assert reloaded is not first
+    assert reloaded["model"].hidden_dim == 6
+
+    stats = registry.stats()
+    assert (stats["hits"], stats["misses"], stats["loads"], stats["invalidations"]) == (1, 2, 2, 1)
+    assert stats["hit_rate"] == 1 / 3
+
+
+def test_registry_evicts_least_recently_used(tmp_path):
+    registry = ModelRegistry(max_models=2)
+    paths = [_save(tmp_path / name) for name in ("a", "b", "c")]
+
+    registry.get(paths[0])
+    registry.get(paths[1])
+    registry.get(paths[0])
+    registry.get(paths[2]) # Evicts b, the least recently used
+
+    assert registry.stats()["evictions"] == 1
+    loads = registry.stats()["loads"]
+    registry.get(paths[0])
+    assert registry.stats()["loads"] == loads
+    registry.get(paths[1])
+    assert registry.stats()["loads"] == loads + 1
+
+
+def test_registry_returns_none_for_missing_models(tmp_path):
+    registry = ModelRegistry()
+    assert registry.get(str(tmp_path / "missing.pth")) is None
+
+
+def test_registry_ignores_shared_encoder_changes(tmp_path):
+    registry = ModelRegistry()
+    path_a = _save(tmp_path)
+    first = registry.get(path_a)
+
+    # Another user's retrain rewrites the encoders and scaler in the same directory
+    for name in ("activity_encoder.joblib", "scaler.joblib"):
+        shared = os.path.join(str(tmp_path), name)
+        os.utime(shared, ns=(0, os.stat(shared).st_mtime_ns + 1_000_000))
+
+    assert registry.get(path_a) is first
+
+
+def test_registry_drops_load_locks_with_entries(tmp_path):
+    registry = ModelRegistry(max_models=1)
+    paths = [_save(tmp_path / name) for name in ("a", "b", "c")]
+    for path in paths:
+        registry.get(path)
+    registry.get(str(tmp_path / "missing.pth"))
+
+    assert set(registry._load_locks) == {paths[-1]}
+    registry.invalidate(paths[-1])
+    assert registry._load_locks == {}
@@ -0,0 +1,20 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.datasets import make_blobs
+
+from digame.app.behavior import _stratified_sample, optimize_clusters
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test_optimize_clusters_finds_separated_groups(n_jobs):
+    data, _ = make_blobs(n_samples=3000, n_features=5, centers=4, cluster_std=0.5, random_state=3)
+    assert optimize_clusters(pd.DataFrame(data), n_jobs=n_jobs, silhouette_sample_size=500) == 4
+
+
+def test_stratified_sample_keeps_small_clusters():
+    labels = np.array([0] * 9900 + [1] * 100)
+    sample = _stratified_sample(labels, 500, np.random.default_rng(0))
+    assert 480 <= len(sample) <= 520
+    assert (labels[sample] == 1).sum() == 5
+    assert len(np.unique(sample)) == len(sample)
@@ -0,0 +1,60 @@
+import asyncio
+import threading
+
+import pytest
+from passlib.context import CryptContext
+
+from digame.app.auth.password_service import PasswordService, PasswordServiceBusy
+
+
+def _context(rounds: int) -> CryptContext:
+    return CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds, bcrypt__min_rounds=rounds)
+
+
+def test_hash_and_verify_run_off_the_event_loop():
+    service = PasswordService(_context(4), max_workers=2, max_pending=2)
+
+    async def scenario():
+        hashed = await service.hash("correct horse")
+        return hashed, await service.verify("correct horse", hashed), await service.verify("wrong", hashed)
+
+    try:
+        hashed, valid, invalid = asyncio.run(scenario())
+    finally:
+        service.shutdown(wait=True)
+    assert hashed.startswith("$2b$04$") and valid and not invalid
+
+
+def test_calls_beyond_the_queue_are_rejected_with_429():
+    service = PasswordService(_context(4), max_workers=1, max_pending=1)
+    gate = threading.Event()
+
+    async def scenario():
+        blocked = [asyncio.ensure_future(service._run(gate.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        assert service.in_flight == 2
+        with pytest.raises(PasswordServiceBusy) as busy:
+            await service.hash("one too many")
+        gate.set()
+        await asyncio.gather(*blocked)
+        return busy.value
+
+    try:
+        busy = asyncio.run(scenario())
+    finally:
+        gate.set()
+        service.shutdown(wait=True)
+    assert busy.status_code == 429 and busy.headers["Retry-After"] == "1"
+    assert service.in_flight == 0 and service.rejected == 1
+
+
+def test_outdated_hashes_are_upgraded_on_verify():
+    old_hash = _context(4).hash("correct horse")
+    service = PasswordService(_context(5), max_workers=1, max_pending=0)
+    try:
+        valid, new_hash = asyncio.run(service.verify_and_update("correct horse", old_hash))
+        assert valid and new_hash.startswith("$2b$05$")
+        assert asyncio.run(service.verify_and_update("correct horse", new_hash)) == (True, None)
+        assert asyncio.run(service.verify_and_update("wrong", old_hash)) == (False, None)
+    finally:
+        service.shutdown(wait=True)
@@ -0,0 +1,112 @@
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from digame.app.auth.enhanced_auth_dependencies import PermissionChecker
+from digame.app.auth.jwt_handler import TokenHandler
+from digame.app.auth.permission_claims import (
+    build_permission_claims,
+    current_rbac_version,
+    decode_permission_bitmap,
+    encode_permission_bitmap,
+    rbac_tables,
+    user_rbac_versions,
+)
+from digame.app.auth.principal_cache import Principal, principal_cache
+from digame.app.crud import rbac_crud, user_crud
+from digame.app.db import get_db
+from digame.app.models.rbac import Permission, Role
+from digame.app.models.user import User
+
+
+def test_permission_bitmap_round_trips():
+    for ids in ([], [0], [1, 7, 8], [3, 64, 65, 1000]):
+        assert decode_permission_bitmap(encode_permission_bitmap(ids)) == frozenset(ids)
+
+
+# Requests run on TestClient's worker threads, so the tests share one SQLite connection with them
+@pytest.fixture
+def guarded_client(shared_db_session_test: Session):
+    principal_cache.clear()
+    rbac_tables.invalidate()
+    user_rbac_versions.invalidate()
+    app = FastAPI()
+    app.dependency_overrides[get_db] = lambda: shared_db_session_test
+
+    @app.get("/reports")
+    def reports(principal: Principal = Depends(PermissionChecker("export_reports", return_principal=True))):
+        return {"user_id": principal.user_id, "roles": sorted(principal.roles)}
+
+    yield TestClient(app)
+    principal_cache.clear()
+    rbac_tables.invalidate()
+    user_rbac_versions.invalidate()
+
+
+def _embedded_token(db: Session, name: str):
+    permission = db.query(Permission).filter_by(name="export_reports").first() or Permission(name="export_reports")
+    role = Role(name=f"{name}_role", permissions=[permission])
+    user = User(username=name, email=f"{name}@example.com", hashed_password="-", is_active=True, roles=[role])
+    db.add(user)
+    db.commit()
+    claims = build_permission_claims(db, user)
+    return user, TokenHandler.create_access_token({"sub": str(user.id), **claims})
+
+
+def test_embedded_permissions_are_checked_without_queries(shared_db_session_test: Session, guarded_client):
+    user, token = _embedded_token(shared_db_session_test, "claims_reader")
+    headers = {"Authorization": f"Bearer {token}"}
+    assert guarded_client.get("/reports", headers=headers).status_code == 200  # loads the RBAC table
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(shared_db_session_test.get_bind(), "before_cursor_execute", listener)
+    try:
+        response = guarded_client.get("/reports", headers=headers)
+    finally:
+        event.remove(shared_db_session_test.get_bind(), "before_cursor_execute", listener)
+    assert response.json() == {"user_id": user.id, "roles": ["claims_reader_role"]}
+    assert statements == []
+
+
+def test_rbac_changes_make_embedded_tokens_stale(shared_db_session_test: Session, guarded_client):
+    user, token = _embedded_token(shared_db_session_test, "stale_reader")
+    headers = {"Authorization": f"Bearer {token}"}
+    assert guarded_client.get("/reports", headers=headers).status_code == 200
+
+    version = current_rbac_version(shared_db_session_test)
+    rbac_crud.remove_permission_from_role_by_names(shared_db_session_test, "stale_reader_role", "export_reports")
+    assert current_rbac_version(shared_db_session_test) == version + 1
+    assert guarded_client.get("/reports", headers=headers).status_code == 401
+
+    _, fresh = _embedded_token(shared_db_session_test, "fresh_reader")
+    assert guarded_client.get("/reports", headers={"Authorization": f"Bearer {fresh}"}).status_code == 200
+
+
+def test_role_assignment_only_makes_that_users_tokens_stale(shared_db_session_test: Session, guarded_client):
+    user, token = _embedded_token(shared_db_session_test, "reassigned_reader")
+    _, other = _embedded_token(shared_db_session_test, "bystander_reader")
+    shared_db_session_test.add(Role(name="reassigned_extra_role"))
+    shared_db_session_test.commit()
+    assert guarded_client.get("/reports", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+
+    version = current_rbac_version(shared_db_session_test)
+    rbac_crud.assign_role_to_user_by_names(shared_db_session_test, user.id, "reassigned_extra_role")
+    assert current_rbac_version(shared_db_session_test) == version
+    assert guarded_client.get("/reports", headers={"Authorization": f"Bearer {token}"}).status_code == 401
+    assert guarded_client.get("/reports", headers={"Authorization": f"Bearer {other}"}).status_code == 200
+
+    fresh = TokenHandler.create_access_token({"sub": str(user.id), **build_permission_claims(shared_db_session_test, user)})
+    response = guarded_client.get("/reports", headers={"Authorization": f"Bearer {fresh}"})
+    assert response.json()["roles"] == ["reassigned_extra_role", "reassigned_reader_role"]
+
+
+def test_suspended_users_embedded_tokens_are_rejected(shared_db_session_test: Session, guarded_client):
+    user, token = _embedded_token(shared_db_session_test, "suspended_claims_reader")
+    headers = {"Authorization": f"Bearer {token}"}
+    assert guarded_client.get("/reports", headers=headers).status_code == 200
+
+    user_crud.set_user_active(shared_db_session_test, user, False)
+    assert guarded_client.get("/reports", headers=headers).status_code == 401
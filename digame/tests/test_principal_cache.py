@@ -0,0 +1,101 @@
+import time
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from digame.app.auth.enhanced_auth_dependencies import MultiPermissionChecker, PermissionChecker
+from digame.app.auth.jwt_handler import TokenHandler
+from digame.app.auth.principal_cache import Principal, PrincipalCache, principal_cache
+from digame.app.crud import rbac_crud, user_crud
+from digame.app.db import get_db
+from digame.app.models.rbac import Permission, Role
+from digame.app.models.user import User
+
+
+def _principal(user_id=1, permissions=("read",)):
+    return Principal(user_id=user_id, username=f"u{user_id}", email=f"u{user_id}@example.com", is_active=True,
+                     roles=frozenset({"User"}), permissions=frozenset(permissions))
+
+
+def test_entries_expire_with_the_token_and_are_evicted_lru():
+    cache = PrincipalCache(ttl_seconds=60, max_entries=2)
+    cache.put("a", _principal(1))
+    cache.put("b", _principal(2), token_expires_at=time.time() - 1)
+    assert cache.get("b") is None and len(cache) == 1
+
+    cache.put("b", _principal(2))
+    cache.get("a")
+    cache.put("c", _principal(3))
+    assert cache.get("b") is None and cache.get("a") is not None
+
+    cache.invalidate_user(1)
+    assert cache.get("a") is None and cache.get("c") is not None
+
+
+@pytest.fixture
+def guarded_client(db_session_test: Session):
+    principal_cache.clear()
+    app = FastAPI()
+    app.dependency_overrides[get_db] = lambda: db_session_test
+
+    @app.get("/reports")
+    def reports(user: User = Depends(PermissionChecker("view_reports"))):
+        return {"user_id": user.id}
+
+    @app.get("/fast")
+    def fast(principal: Principal = Depends(MultiPermissionChecker(["view_reports"], return_principal=True))):
+        return {"user_id": principal.user_id}
+
+    yield TestClient(app)
+    principal_cache.clear()
+
+
+def _user_with_permission(db: Session, name: str) -> User:
+    permission = db.query(Permission).filter_by(name="view_reports").first() or Permission(name="view_reports")
+    role = Role(name=f"{name}_role", permissions=[permission])
+    user = User(username=name, email=f"{name}@example.com", hashed_password="-", is_active=True, roles=[role])
+    db.add(user)
+    db.commit()
+    return user
+
+
+def test_cached_principal_answers_permission_checks_without_queries(db_session_test: Session, guarded_client):
+    user = _user_with_permission(db_session_test, "cached_reader")
+    headers = {"Authorization": f"Bearer {TokenHandler.create_access_token({'sub': str(user.id)})}"}
+    assert guarded_client.get("/reports", headers=headers).json() == {"user_id": user.id}
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db_session_test.get_bind(), "before_cursor_execute", listener)
+    try:
+        assert guarded_client.get("/fast", headers=headers).json() == {"user_id": user.id}
+    finally:
+        event.remove(db_session_test.get_bind(), "before_cursor_execute", listener)
+    assert statements == []
+
+
+def test_rbac_changes_and_logout_invalidate_cached_principals(db_session_test: Session, guarded_client):
+    user = _user_with_permission(db_session_test, "revoked_reader")
+    token = TokenHandler.create_access_token({"sub": str(user.id)})
+    headers = {"Authorization": f"Bearer {token}"}
+    assert guarded_client.get("/fast", headers=headers).status_code == 200
+
+    rbac_crud.remove_permission_from_role_by_names(db_session_test, "revoked_reader_role", "view_reports")
+    assert guarded_client.get("/fast", headers=headers).status_code == 403
+
+    rbac_crud.add_permission_to_role_by_names(db_session_test, "revoked_reader_role", "view_reports")
+    assert guarded_client.get("/fast", headers=headers).status_code == 200
+    TokenHandler.blacklist_token(token)
+    assert guarded_client.get("/fast", headers=headers).status_code == 401
+
+
+def test_suspending_a_user_invalidates_their_cached_principal(db_session_test: Session, guarded_client):
+    user = _user_with_permission(db_session_test, "suspended_reader")
+    headers = {"Authorization": f"Bearer {TokenHandler.create_access_token({'sub': str(user.id)})}"}
+    assert guarded_client.get("/fast", headers=headers).status_code == 200
+
+    user_crud.set_user_active(db_session_test, user, False)
+    assert guarded_client.get("/fast", headers=headers).status_code == 401
@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+from fastapi import Depends, FastAPI, Request
+from fastapi.testclient import TestClient
+
+from digame.app.auth.enhanced_auth_dependencies import create_rate_limiter
+from digame.app.auth.middleware import RateLimitMiddleware
+from digame.app.auth.rate_limiter import InMemoryRateLimitBackend, RedisRateLimitBackend, api_key_key
+
+
+def _hits(backend, times, key="ip:1.2.3.4", limit=10, period=60):
+    async def run():
+        return [await backend.hit(key, limit, period, now=now) for now in times]
+    return asyncio.run(run())
+
+
+def test_sliding_window_weighs_the_previous_window():
+    backend = InMemoryRateLimitBackend()
+    results = _hits(backend, [600 + i for i in range(11)])
+    assert [r.allowed for r in results] == [True] * 10 + [False]
+    assert results[9].remaining == 0 and results[10].retry_after == 50
+
+    # A quarter into the next window, 10 * 0.75 of the old requests still count
+    assert [r.allowed for r in _hits(backend, [675, 676, 677, 678])] == [True, True, True, False]
+    # Two windows later nothing counts any more
+    assert all(r.allowed for r in _hits(backend, [780 + i for i in range(10)]))
+
+
+def test_idle_keys_are_swept():
+    backend = InMemoryRateLimitBackend(sweep_interval=60)
+    for i in range(100):
+        _hits(backend, [1000], key=f"ip:10.0.0.{i}")
+    assert len(backend) == 100
+    _hits(backend, [1200], key="ip:10.0.1.1")
+    assert len(backend) == 1
+
+
+VERIFIED_API_KEYS = {"key-a": 1, "key-b": 2}
+
+
+def test_middleware_limits_per_key_and_reports_headers():
+    app = FastAPI()
+    app.add_middleware(RateLimitMiddleware, calls=2, period=60, key_func=api_key_key, backend=InMemoryRateLimitBackend())
+
+    @app.middleware("http")
+    async def verify_api_key(request: Request, call_next):
+        # Stands in for the auth layer, which runs outside the rate limiter
+        api_key_id = VERIFIED_API_KEYS.get(request.headers.get("x-api-key"))
+        if api_key_id is not None:
+            request.state.api_key_id = api_key_id
+        return await call_next(request)
+
+    @app.get("/items")
+    def items():
+        return []
+
+    client = TestClient(app)
+    first = client.get("/items", headers={"X-API-Key": "key-a"})
+    assert first.status_code == 200 and first.headers["X-RateLimit-Remaining"] == "1"
+    assert client.get("/items", headers={"X-API-Key": "key-a"}).status_code == 200
+    blocked = client.get("/items", headers={"X-API-Key": "key-a"})
+    assert blocked.status_code == 429 and int(blocked.headers["Retry-After"]) >= 1
+    assert client.get("/items", headers={"X-API-Key": "key-b"}).status_code == 200
+    assert client.get("/health").status_code == 404  # exempt paths aren't counted
+
+    # Unverified keys share the client's IP bucket, however many are made up
+    assert client.get("/items", headers={"X-API-Key": "made-up-1"}).status_code == 200
+    assert client.get("/items", headers={"X-API-Key": "made-up-2"}).status_code == 200
+    assert client.get("/items", headers={"X-API-Key": "made-up-3"}).status_code == 429
+
+
+def test_rate_limit_dependency_uses_the_shared_backend(monkeypatch):
+    from digame.app.auth import rate_limiter
+    monkeypatch.setattr(rate_limiter, "_default_backend", InMemoryRateLimitBackend())
+    app = FastAPI()
+
+    @app.post("/login", dependencies=[Depends(create_rate_limiter(max_requests=1, window_seconds=60, name="test-login"))])
+    def login():
+        return {}
+
+    client = TestClient(app)
+    assert client.post("/login").status_code == 200
+    assert client.post("/login").status_code == 429
+
+
+def test_redis_backend_shares_counts_between_clients():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    server = fakeredis.FakeServer()
+    workers = [RedisRateLimitBackend(fakeredis.aioredis.FakeRedis(server=server)) for _ in range(2)]
+
+    async def run():
+        return [await workers[i % 2].hit("user:7", 5, 60, now=600 + i) for i in range(7)]
+
+    assert [r.allowed for r in asyncio.run(run())] == [True] * 5 + [False, False]
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import torch
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+from digame.app.predictive import prepare_sequence_windows, prepare_sequences
+
+
+def _activities(n=400, users=(3, 1, 2, 4), seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "user_id": rng.choice(users, n),
+        "activity_type": rng.choice(["browse", "code", "email", "meeting"], n),
+        "timestamp": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.permutation(n) * 7, unit="min"),
+    })
+
+
+def _looped_windows(df, sequence_length):
+    """The per-user double loop `prepare_sequences` used to run."""
+    df = df.sort_values(by=["user_id", "timestamp"])
+    df["code"] = LabelEncoder().fit_transform(df["activity_type"])
+    df["hour"] = StandardScaler().fit_transform(df[["timestamp"]].apply(lambda t: t.dt.hour))[:, 0]
+    features, targets = [], []
+    for _, group in df.groupby("user_id"):
+        rows = group[["code", "hour"]].values
+        for i in range(len(rows) - sequence_length):
+            features.append(rows[i:i + sequence_length])
+            targets.append(group["code"].values[i + sequence_length])
+    return np.array(features), np.array(targets)
+
+
+def test_windows_match_the_per_user_loop():
+    # User 9 has too few rows for a window; its rows must never end up in another user's
+    df = pd.concat([_activities(), _activities(n=4, users=(9,), seed=1)], ignore_index=True)
+
+    X, y, encoders = prepare_sequences(df.copy(), sequence_length=5)
+
+    expected_X, expected_y = _looped_windows(df, 5)
+    np.testing.assert_allclose(X, expected_X, rtol=1e-6)
+    np.testing.assert_array_equal(y, expected_y)
+    assert set(encoders) == {"activity_encoder", "user_encoder", "cluster_encoder", "scaler"}
+
+
+def test_windows_are_views_and_batches_cover_every_window():
+    windows, _ = prepare_sequence_windows(_activities(), sequence_length=4)
+    assert np.shares_memory(windows.windows, windows.features)
+
+    seen = []
+    for batch_X, batch_y in windows.batch_loader(batch_size=32):
+        assert isinstance(batch_X, torch.Tensor) and batch_X.shape[1:] == (4, 2)
+        assert len(batch_X) == len(batch_y) <= 32
+        seen.append(batch_y)
+    assert sum(len(batch) for batch in seen) == len(windows)
+
+
+def test_short_histories_give_no_windows():
+    X, y, _ = prepare_sequences(_activities(n=6, users=(1, 2)), sequence_length=10)
+    assert X.shape == (0, 10, 2) and y.shape == (0,)
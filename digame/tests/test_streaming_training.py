@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+from sqlalchemy.orm import Session
+
+from digame.app.models.activity import Activity
+from digame.app.predictive import (
+    ActivityStream,
+    DatabaseActivitySource,
+    ParquetActivitySource,
+    fit_stream_encoders,
+    prepare_sequences,
+    train_predictive_model_for_user,
+)
+from digame.app.services.activity_frame_loader import export_activity_snapshot
+
+TYPES = ["browse", "code", "email", "meeting"]
+
+
+def _log(db: Session, user_id: int, count: int, seed: int):
+    rng = np.random.default_rng(seed)
+    start = datetime(2024, 5, 1, 6)
+    db.add_all([
+        Activity(user_id=user_id, activity_type=TYPES[code], timestamp=start + timedelta(minutes=37 * i))
+        for i, code in enumerate(rng.integers(0, len(TYPES), count))
+    ])
+    db.commit()
+
+
+def _frame(source):
+    return pd.concat(list(source.frames()), ignore_index=True)
+
+
+def test_stream_matches_in_memory_windows_across_fetch_boundaries(db_session_test: Session):
+    for user_id, count in ((1401, 23), (1402, 4), (1403, 17)):
+        _log(db_session_test, user_id, count, seed=user_id)
+    # Partitions of 5 rows force windows to be stitched across frames
+    source = DatabaseActivitySource([1401, 1402, 1403], db=db_session_test, fetch_size=5)
+    encoders_scalers, rows = fit_stream_encoders(source)
+    assert rows == 44
+
+    stream = ActivityStream(source, encoders_scalers, sequence_length=6, batch_size=8, shuffle_buffer=0)
+    batches = list(stream)
+    assert all(isinstance(X, torch.Tensor) and len(X) <= 8 for X, _ in batches)
+    X = torch.cat([X for X, _ in batches]).numpy()
+    y = torch.cat([y for _, y in batches]).numpy()
+
+    expected_X, expected_y, _ = prepare_sequences(_frame(source), sequence_length=6)
+    np.testing.assert_allclose(X, expected_X, rtol=1e-5)
+    np.testing.assert_array_equal(y, expected_y)
+
+
+def test_shuffled_stream_yields_every_window_once(db_session_test: Session):
+    _log(db_session_test, 1411, 60, seed=3)
+    source = DatabaseActivitySource([1411], db=db_session_test, fetch_size=7)
+    encoders_scalers, _ = fit_stream_encoders(source)
+
+    stream = ActivityStream(source, encoders_scalers, sequence_length=5, batch_size=4, shuffle_buffer=16, seed=0)
+    windows = np.concatenate([X.numpy() for X, _ in stream])
+
+    expected, _, _ = prepare_sequences(_frame(source), sequence_length=5)
+    assert len(windows) == len(expected) == 55
+    assert sorted(map(bytes, windows)) == sorted(map(bytes, expected.astype(np.float32)))
+
+
+def test_stream_epochs_ignore_activities_logged_after_fitting(db_session_test: Session):
+    _log(db_session_test, 1451, 30, seed=5)
+    source = DatabaseActivitySource([1451], db=db_session_test, fetch_size=8)
+    encoders_scalers, rows = fit_stream_encoders(source)
+    stream = ActivityStream(source, encoders_scalers, sequence_length=5, batch_size=4, shuffle_buffer=0)
+    first_epoch = torch.cat([y for _, y in stream])
+
+    # Logged mid-training, including a type the encoder has never seen
+    db_session_test.add_all([
+        Activity(user_id=1451, activity_type=activity_type, timestamp=datetime(2024, 6, 1, 9, i))
+        for i, activity_type in enumerate(["code", "standup", "email", "code", "standup", "email"])
+    ])
+    db_session_test.commit()
+    assert torch.equal(torch.cat([y for _, y in stream]), first_epoch)
+    assert len(_frame(source)) == rows == 30
+
+
+def test_stream_skips_windows_predicting_unseen_activity_types(db_session_test: Session):
+    _log(db_session_test, 1441, 12, seed=6)
+    db_session_test.add(Activity(user_id=1441, activity_type="standup", timestamp=datetime(2024, 6, 1, 9)))
+    db_session_test.add(Activity(user_id=1441, activity_type="code", timestamp=datetime(2024, 6, 1, 10)))
+    db_session_test.commit()
+    source = DatabaseActivitySource([1441], db=db_session_test)
+    encoders_scalers, _ = fit_stream_encoders(source)
+    encoders_scalers["activity_encoder"].fit(TYPES) # Fitted without "standup"
+
+    X, y = (torch.cat(parts) for parts in zip(*ActivityStream(source, encoders_scalers, sequence_length=4, shuffle_buffer=0)))
+    # 14 activities give 10 windows; the one whose next activity is "standup" is skipped
+    assert len(y) == 9
+    assert int(y.max()) < len(TYPES)
+    assert float(X[-1, -1, 0]) == len(TYPES) # "standup", as the unknown index
+
+
+def test_parquet_snapshot_round_trips_and_shards_users(db_session_test: Session, tmp_path):
+    pytest.importorskip("pyarrow")
+    for user_id in (1421, 1422, 1423):
+        _log(db_session_test, user_id, 12, seed=user_id)
+    path = str(tmp_path / "activities.parquet")
+    assert export_activity_snapshot(db_session_test, path, [1421, 1422, 1423], fetch_size=5) == 36
+
+    snapshot = ParquetActivitySource(path, batch_rows=10)
+    database = DatabaseActivitySource([1421, 1422, 1423], db=db_session_test)
+    pd.testing.assert_frame_equal(_frame(snapshot)[["user_id", "activity_type"]], _frame(database)[["user_id", "activity_type"]],
+                                  check_dtype=False)
+    shard = pd.concat(list(snapshot.frames(worker_id=1, num_workers=2)))
+    assert set(shard["user_id"]) == {1421, 1423}
+
+
+def test_training_a_user_model_streams_from_the_database(db_session_test: Session, tmp_path):
+    _log(db_session_test, 1431, 40, seed=9)
+    summary = train_predictive_model_for_user(db_session_test, 1431, model_path=str(tmp_path / "model.pth"),
+                                              sequence_length=5, hidden_dim=8, num_layers=1, epochs=1)
+    assert summary["status"] == "success" and summary["num_samples"] == 40
+    assert (tmp_path / "model.pth").exists()
+
+    assert train_predictive_model_for_user(db_session_test, 1439, model_path=str(tmp_path / "none.pth"))["status"] == "failed"
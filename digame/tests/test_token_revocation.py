@@ -0,0 +1,82 @@
+import time
+
+from sqlalchemy.orm import Session, sessionmaker
+
+from digame.app.auth.jwt_handler import TokenHandler
+from digame.app.auth.revocation_store import (
+    BloomFilter,
+    DatabaseRevocationStore,
+    InMemoryRevocationStore,
+    get_revocation_store,
+    set_revocation_store,
+)
+
+
+def test_bloom_filter_has_no_false_negatives_and_few_false_positives():
+    bloom = BloomFilter(capacity=2000, error_rate=0.01)
+    for i in range(2000):
+        bloom.add(f"revoked-{i}")
+    assert all(f"revoked-{i}" in bloom for i in range(2000))
+    false_positives = sum(f"valid-{i}" in bloom for i in range(20000))
+    assert false_positives < 20000 * 0.03
+
+
+def test_in_memory_entries_expire_with_the_token():
+    store = InMemoryRevocationStore(sweep_interval=0)
+    store.revoke("live", time.time() + 60)
+    store.revoke("expired", time.time() - 1)
+    assert store.is_revoked("live")
+    assert not store.is_revoked("expired")
+    assert len(store) == 1
+
+
+def test_database_store_is_shared_and_skips_lookups_for_unrevoked_tokens(db_session_test: Session):
+    session_factory = sessionmaker(bind=db_session_test.get_bind())
+    worker_a = DatabaseRevocationStore(session_factory, sync_interval=0)
+    worker_b = DatabaseRevocationStore(session_factory, sync_interval=0)
+    assert not worker_b.is_revoked("shared-jti")
+
+    worker_a.revoke("shared-jti", time.time() + 60)
+    worker_a.revoke("expired-jti", time.time() - 1)
+    assert worker_b.is_revoked("shared-jti")
+    assert not worker_b.is_revoked("expired-jti")
+
+    lookups = worker_b.remote_lookups
+    assert not any(worker_b.is_revoked(f"unrevoked-{i}") for i in range(1000))
+    assert worker_b.remote_lookups - lookups < 10
+
+    worker_b.sync(rebuild=True)  # purges expired rows
+    assert not worker_a.is_revoked("expired-jti")
+    assert worker_a.is_revoked("shared-jti")
+
+
+def test_store_fails_closed_while_it_cannot_sync(db_session_test: Session):
+    def unavailable():
+        raise ConnectionError("database is down")
+
+    store = DatabaseRevocationStore(unavailable, sync_interval=1.0)
+    # Never synced: the empty filter can't vouch for any token
+    assert store.is_revoked("any-jti")
+    assert store.remote_lookups == 1
+
+    healthy = DatabaseRevocationStore(sessionmaker(bind=db_session_test.get_bind()), sync_interval=1.0)
+    assert not healthy.is_revoked("unrevoked-jti")
+    healthy.session_factory = unavailable
+    assert not healthy.is_revoked("unrevoked-jti") # Synced recently: the filter answers
+    healthy._synced_at -= healthy.STALE_AFTER_SYNC_INTERVALS * healthy.sync_interval + 1
+    assert healthy.is_revoked("unrevoked-jti") # Syncs kept failing since
+
+
+def test_blacklisted_tokens_are_rejected_by_jti():
+    previous = get_revocation_store()
+    set_revocation_store(InMemoryRevocationStore())
+    try:
+        tokens = TokenHandler.create_token_pair({"sub": "1"})
+        other = TokenHandler.create_access_token({"sub": "1"})
+        TokenHandler.blacklist_token(tokens["access_token"])
+        TokenHandler.blacklist_token(tokens["refresh_token"])
+        assert TokenHandler.verify_token(tokens["access_token"]) is None
+        assert TokenHandler.verify_token(tokens["refresh_token"], "refresh") is None
+        assert TokenHandler.verify_token(other) is not None
+    finally:
+        set_revocation_store(previous)
@@ -39,6 +39,11 @@ setup(
             "flake8>=6.0.0",
         ],
     },
+    entry_points={
+        "console_scripts": [
+            "digame-worker=digame.app.workers.job_worker:main",
+        ],
+    },
     python_requires=">=3.8",
     description="Digame Platform",
     author="Digame Team",